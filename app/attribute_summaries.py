@@ -0,0 +1,124 @@
+#Buckaroo Project - October 17, 2026
+#This file computes the attribute summaries of a table inside Postgres, every column in one statement over the ID window
+
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+from app.column_stats import NUMERIC_DATA_TYPES, table_columns, read_column_stats, covers_id_window
+from app.error_store import read_error_counts
+from data_management.data_attribute_summary_integration import get_default_attributes_from_rankings
+
+"""
+The attribute summaries endpoint used to read the pandas data state, which the SQL wrangles do not update, and to
+profile the window one column at a time. attribute_summaries_query reads the rows of the window once with one
+aggregate per column: mean, min and max for numeric columns, distinct count and mode for the others (NULL counts
+as the category "N/A" as in get_categorical_stats). The errors of the window are counted per column and type in
+the same statement, from error_codes<table> through its row_id key. A window holding the whole table reads them
+from error_counts<table> instead, one row per column and error type.
+"""
+
+# Data types whose min and max stay integers in the JSON
+INTEGER_DATA_TYPES = ("smallint", "integer", "bigint")
+
+# Category of the NULL values
+MISSING_CATEGORY = "N/A"
+
+
+def column_summary_expression(name, data_type):
+    """
+    :return: SQL aggregate building the JSON summary of one column over the rows of the window
+    """
+    column = quote_identifier(name)
+    if data_type in NUMERIC_DATA_TYPES:
+        value = column if data_type in INTEGER_DATA_TYPES else f"{column}::double precision"
+        return (f"json_build_object('count', COUNT({column}), 'mean', AVG({column}::double precision), "
+                f"'min', MIN({value}), 'max', MAX({value}))")
+    category = f"COALESCE({column}::text, '{MISSING_CATEGORY}')"
+    # ties go to the smallest category, as pandas' mode does
+    return (f"json_build_object('categories', COUNT(DISTINCT {category}), "
+            f"'mode', mode() WITHIN GROUP (ORDER BY {category}))")
+
+
+def attribute_summaries_query(table_name, columns, error_source):
+    """
+    One statement summarizing the given columns over the rows of the ID window
+    :param table_name: the data table
+    :param columns: [(column name, data type)]
+    :param error_source: FROM item of the errors with row_id, column_id and error_type (scatterplot_error_source),
+                         None when the errors are not counted
+    :return: SQL with the :min_id and :max_id parameters returning one row: row_count, column_errors and s0, s1, ...
+    """
+    table = quote_identifier(table_name)
+    summaries = "".join(f",\n            {column_summary_expression(name, data_type)} AS s{index}"
+                        for index, (name, data_type) in enumerate(columns))
+    column_errors = "NULL::json" if error_source is None else f"""(
+                SELECT json_object_agg(column_id, errors)
+                FROM (
+                    SELECT column_id, json_object_agg(error_type, error_count) as errors
+                    FROM (
+                        SELECT e.column_id, e.error_type, COUNT(*) as error_count
+                        FROM {error_source} e
+                        WHERE e.row_id BETWEEN :min_id AND :max_id
+                        GROUP BY 1, 2
+                    ) counted
+                    GROUP BY column_id
+                ) per_column
+            )"""
+    return f"""
+        SELECT
+            COUNT(*) AS row_count,
+            {column_errors} AS column_errors{summaries}
+        FROM {table}
+        WHERE "ID" BETWEEN :min_id AND :max_id
+    """
+
+
+def attribute_distribution(summary, data_type, row_count):
+    """
+    :return: the attributeDistributions entry of a column, numeric columns without values in the window are
+             summarized as the single category "N/A"
+    """
+    if data_type not in NUMERIC_DATA_TYPES:
+        return {"categorical": {"categories": summary["categories"], "mode": summary["mode"]}}
+    if summary["count"] == 0:
+        return {"categorical": {"categories": 1 if row_count else 0, "mode": MISSING_CATEGORY if row_count else None}}
+    return {"numeric": {"mean": summary["mean"], "min": summary["min"], "max": summary["max"]}}
+
+
+def summarize_attributes(table_name, engine, min_id, max_id):
+    """
+    The response of the attribute summaries endpoint computed in Postgres
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param min_id: minimum ID of the window
+    :param max_id: maximum ID of the window
+    :return: {"columnErrors", "attributes", "attributeDistributions", "defaultAttributes"}, the error counts of
+             columnErrors are fractions of the rows in the window as in generate_complete_json
+    """
+    with engine.connect() as conn:
+        columns = table_columns(conn, table_name)
+        error_counts = None
+        if covers_id_window(read_column_stats(conn, table_name, ["ID"]), int(min_id), int(max_id)):
+            error_counts = read_error_counts(conn, table_name)
+        error_source = None
+        if error_counts is None:
+            error_source = conn.execute(text("SELECT scatterplot_error_source(:table, :errors)"),
+                                        {"table": table_name, "errors": f"errors{table_name}"}).scalar_one()
+        result = conn.execute(text(attribute_summaries_query(table_name, columns, error_source)),
+                              {"min_id": int(min_id), "max_id": int(max_id)}).mappings().one()
+
+    row_count = result["row_count"]
+    column_errors = {}
+    for column, errors in (error_counts if error_counts is not None else result["column_errors"] or {}).items():
+        if row_count:
+            column_errors[column] = {error_type: count / row_count for error_type, count in errors.items()}
+
+    return {
+        "columnErrors": column_errors,
+        "attributes": [name for name, _ in columns],
+        "attributeDistributions": {
+            name: attribute_distribution(result[f"s{index}"], data_type, row_count)
+            for index, (name, data_type) in enumerate(columns)
+        },
+        "defaultAttributes": get_default_attributes_from_rankings(table_name, engine),
+    }
@@ -0,0 +1,333 @@
+#Buckaroo Project - October 17, 2026
+#This file keeps bin_cube<table>, the 1D histogram bin of every row and column, and answers cross-filter requests from it
+
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+from app.error_store import ERROR_TYPE_CODES, error_codes_table, error_columns_table
+from app.plot_cache import table_version
+
+"""
+bin_cube<table> has one row per data row: its "ID" and, per column, the bin generate_one_d_histogram_with_errors
+puts the value in over the whole table, NULL for NULL values. Numeric bins are the width_bucket of the value, the
+other columns number their categories in sorted order, so every column is a smallint (an integer past 32767
+categories) named after its code in error_columns<table>. bin_cube_columns<table> keeps the bounds and categories
+of each column and the table version and bin count the cube was built for.
+
+A cross-filter keeps the cube rows whose bins are selected and counts the bins of the other visible columns in one
+GROUP BY, their errors come from error_codes<table> through its (row_id, column_code, error_code) key. The
+histograms have the shape of the 1D histogram endpoint, with the bins of the whole table whatever the ID window.
+"""
+
+# Numeric bins per column when the request does not give a bin count, the default of the 1D histogram
+CROSS_FILTER_BINS = 10
+
+# Categorical columns with more categories than this get integer codes instead of smallint ones
+SMALLINT_CODES = 32767
+
+# One build per table at a time: { table: Lock }
+CUBE_BUILD_LOCKS = {}
+CUBE_BUILD_LOCKS_LOCK = threading.Lock()
+
+
+def bin_cube_table(table_name):
+    """The per row bins of table_name"""
+    return f"bin_cube{table_name}"
+
+
+def bin_cube_columns_table(table_name):
+    """One row per column of the cube: its code, type, bounds or categories"""
+    return f"bin_cube_columns{table_name}"
+
+
+def cube_column(column_code):
+    """Name of the cube column holding the bins of the data column with that code"""
+    return f"c{column_code}"
+
+
+def numeric_bin_expression(value, bin_count, bound_min, bound_max):
+    """The clamped bin generate_one_d_histogram_with_errors gives a numeric value between the two bounds"""
+    return (f"LEAST(GREATEST(COALESCE(width_bucket({value}::double precision, {bound_min}, {bound_max}, "
+            f"{int(bin_count)}) - 1, 0), 0), {int(bin_count) - 1})")
+
+
+def build_bin_cube(table_name, engine, bin_count=CROSS_FILTER_BINS):
+    """
+    Computes the bins of every row and column of a table into bin_cube<table>, replacing the previous cube
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param bin_count: number of bins of the numeric columns
+    :return: {"columns", "rows", "seconds"}
+    """
+    start_time = time.time()
+    version = table_version(table_name, engine)
+    bin_count = int(bin_count)
+    table = quote_identifier(table_name)
+    cube = quote_identifier(bin_cube_table(table_name))
+    cube_columns = quote_identifier(bin_cube_columns_table(table_name))
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": bin_cube_table(table_name)})
+        codes = conn.execute(text(
+            f"SELECT column_code, column_id, column_is_numeric(:table, column_id) "
+            f"FROM {quote_identifier(error_columns_table(table_name))} ORDER BY column_code"
+        ), {"table": table_name}).all()
+
+        # bounds of the numeric columns and sorted categories of the others in one scan
+        expressions = []
+        for code, column, is_numeric in codes:
+            value = quote_identifier(column)
+            if is_numeric:
+                expressions += [f"MIN({value}::double precision)", f"MAX({value}::double precision)"]
+            else:
+                expressions.append(f"COALESCE(array_agg(DISTINCT {value}::text ORDER BY {value}::text) "
+                                   f"FILTER (WHERE {value} IS NOT NULL), '{{}}')")
+        scanned = iter(conn.execute(text(f"SELECT {', '.join(expressions)} FROM {table}")).one())
+        columns = []
+        for code, column, is_numeric in codes:
+            if is_numeric:
+                low, high = next(scanned), next(scanned)
+                columns.append({"column_code": code, "column_id": column, "is_numeric": True,
+                                "min_val": low, "max_val": high, "labels": None})
+            else:
+                columns.append({"column_code": code, "column_id": column, "is_numeric": False,
+                                "min_val": None, "max_val": None, "labels": list(next(scanned))})
+
+        selected, joins, params = ['d."ID"::integer AS "ID"'], [], {}
+        for entry in columns:
+            code, value = entry["column_code"], f'd.{quote_identifier(entry["column_id"])}'
+            if entry["is_numeric"]:
+                if entry["min_val"] is None or entry["min_val"] == entry["max_val"]:
+                    # width_bucket needs two distinct bounds, a constant column is a single bin
+                    bin_value = f"CASE WHEN {value} IS NOT NULL THEN 0 END"
+                else:
+                    bin_value = (f"CASE WHEN {value} IS NOT NULL THEN "
+                                 f"{numeric_bin_expression(value, bin_count, f':min_{code}', f':max_{code}')} END")
+                    params[f"min_{code}"], params[f"max_{code}"] = entry["min_val"], entry["max_val"]
+                code_type = "smallint"
+            else:
+                joins.append(f"LEFT JOIN unnest(CAST(:labels_{code} AS text[])) WITH ORDINALITY l{code}(label, position) "
+                             f"ON l{code}.label = {value}::text")
+                params[f"labels_{code}"] = entry["labels"]
+                bin_value = f"l{code}.position - 1"
+                code_type = "smallint" if len(entry["labels"]) <= SMALLINT_CODES else "integer"
+            selected.append(f"({bin_value})::{code_type} AS {cube_column(code)}")
+
+        conn.execute(text(f"DROP TABLE IF EXISTS {cube}"))
+        conn.execute(text(f"CREATE TABLE {cube} AS SELECT {', '.join(selected)} FROM {table} d {' '.join(joins)}"),
+                     params)
+        conn.execute(text(f'ALTER TABLE {cube} ADD PRIMARY KEY ("ID")'))
+        for entry in columns:
+            name = cube_column(entry["column_code"])
+            conn.execute(text(f"CREATE INDEX {quote_identifier('ix_' + bin_cube_table(table_name) + '_' + name)} "
+                              f"ON {cube} ({name})"))
+
+        conn.execute(text(f"DROP TABLE IF EXISTS {cube_columns}"))
+        conn.execute(text(f"""
+            CREATE TABLE {cube_columns} (
+                column_code smallint PRIMARY KEY,
+                column_id text NOT NULL,
+                is_numeric boolean NOT NULL,
+                min_val double precision,
+                max_val double precision,
+                labels text[],
+                bin_count integer NOT NULL,
+                table_version integer NOT NULL
+            )
+        """))
+        if columns:
+            conn.execute(text(f"""
+                INSERT INTO {cube_columns}
+                VALUES (:column_code, :column_id, :is_numeric, :min_val, :max_val, :labels, :bin_count, :version)
+            """), [{**entry, "bin_count": bin_count, "version": version} for entry in columns])
+        rows = conn.execute(text(f"SELECT COUNT(*) FROM {cube}")).scalar_one()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"ANALYZE {cube}"))
+
+    seconds = time.time() - start_time
+    print(f"[CUBE] {bin_cube_table(table_name)}: {len(columns)} columns, {rows} rows in {seconds:.2f}s")
+    return {"columns": len(columns), "rows": rows, "seconds": round(seconds, 3)}
+
+
+def read_cube_columns(conn, table_name):
+    """
+    :return: {column name: {column_code, is_numeric, labels, bin_count, table_version, ...}}, empty without a cube
+    """
+    cube_columns = bin_cube_columns_table(table_name)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"),
+                          {"name": quote_identifier(cube_columns)}).scalar_one()
+    if not exists:
+        return {}
+    rows = conn.execute(text(f"SELECT * FROM {quote_identifier(cube_columns)}")).mappings()
+    return {row["column_id"]: dict(row) for row in rows}
+
+
+def current_cube_columns(table_name, engine, bin_count=CROSS_FILTER_BINS):
+    """
+    The columns of the cube of the current table version and bin count, built on the first cross-filter after the
+    process starts, a wrangle or a change of bin count
+    :return: the result of read_cube_columns
+    """
+    with CUBE_BUILD_LOCKS_LOCK:
+        build_lock = CUBE_BUILD_LOCKS.setdefault(table_name, threading.Lock())
+    with build_lock:
+        with engine.connect() as conn:
+            cube_columns = read_cube_columns(conn, table_name)
+        built = next(iter(cube_columns.values()), None)
+        if built is None or built["table_version"] != table_version(table_name, engine) or built["bin_count"] != int(bin_count):
+            build_bin_cube(table_name, engine, bin_count)
+            with engine.connect() as conn:
+                cube_columns = read_cube_columns(conn, table_name)
+    return cube_columns
+
+
+def selection_codes(entry, bins):
+    """
+    :param entry: the cube column of the selected column
+    :param bins: the selected bins as the 1D histogram names them, numbers for numeric columns and categories
+    :return: the cube codes of the selected bins, unknown ones are left out
+    """
+    if entry["is_numeric"]:
+        return sorted({int(value) for value in bins if 0 <= int(value) < entry["bin_count"]})
+    positions = {label: position for position, label in enumerate(entry["labels"])}
+    return sorted({positions[str(value)] for value in bins if str(value) in positions})
+
+
+def cross_filter_query(table_name, selection, targets):
+    """
+    One statement returning the filtered 1D histograms of the target columns as JSON
+    :param table_name: the cleaned table name
+    :param selection: [(column code, parameter name of its selected codes)]
+    :param targets: [column code] of the histograms to return
+    :return: SQL with the :min_id and :max_id parameters and one per selected column
+    """
+    cube = quote_identifier(bin_cube_table(table_name))
+    cube_columns = quote_identifier(bin_cube_columns_table(table_name))
+    errors = quote_identifier(error_codes_table(table_name))
+    predicates = ['(CAST(:min_id AS integer) IS NULL OR "ID" >= :min_id)',
+                  '(CAST(:max_id AS integer) IS NULL OR "ID" <= :max_id)']
+    predicates += [f"{cube_column(code)} = ANY(CAST(:{name} AS integer[]))" for code, name in selection]
+    kept = ", ".join(['"ID"'] + [cube_column(code) for code in targets])
+    unpivot = ", ".join(f"({code}, f.{cube_column(code)})" for code in targets)
+    target_bins = " ".join(f"WHEN {code} THEN f.{cube_column(code)}" for code in targets)
+    target_codes = ", ".join(str(code) for code in targets)
+    error_counts = ",\n".join(f"COUNT(*) FILTER (WHERE e.error_code = {code}) as {error_type}"
+                              for error_type, code in ERROR_TYPE_CODES.items())
+    error_object = ", ".join(f"'{error_type}', NULLIF(e.{error_type}, 0)" for error_type in ERROR_TYPE_CODES)
+    return f"""
+        WITH
+        -- Step 1: Cube rows of the window whose bins are selected
+        filtered AS MATERIALIZED (
+            SELECT {kept} FROM {cube}
+            WHERE {" AND ".join(predicates)}
+        ),
+        -- Step 2: Rows per bin of every target column in one GROUP BY
+        item_counts AS (
+            SELECT k.column_code, k.bin, COUNT(*) as items
+            FROM filtered f
+            CROSS JOIN LATERAL (VALUES {unpivot}) k(column_code, bin)
+            WHERE k.bin IS NOT NULL
+            GROUP BY 1, 2
+        ),
+        -- Step 3: Errors of the filtered rows per bin and type, NULL values have no bin as in the 1D histogram
+        error_counts AS (
+            SELECT e.column_code, CASE e.column_code {target_bins} END as bin,
+                   {error_counts}
+            FROM filtered f
+            JOIN {errors} e ON e.row_id = f."ID" AND e.column_code IN ({target_codes})
+            GROUP BY 1, 2
+        ),
+        histogram_bins AS (
+            SELECT i.column_code, i.bin, i.items,
+                   jsonb_strip_nulls(jsonb_build_object({error_object})) as errors
+            FROM item_counts i
+            LEFT JOIN error_counts e ON e.column_code = i.column_code AND e.bin = i.bin
+        ),
+        -- Step 4: The 1D histogram JSON of every target column, numeric bin edges computed as in the 1D histogram
+        histograms AS (
+            SELECT c.column_id, json_build_object(
+                'histograms', COALESCE((
+                    SELECT json_agg(json_build_object(
+                        'xBin', CASE WHEN c.is_numeric THEN to_json(h.bin) ELSE to_json(l.label) END,
+                        'xType', CASE WHEN c.is_numeric THEN 'numeric' ELSE 'categorical' END,
+                        'count', h.errors || jsonb_build_object('items', h.items)
+                    ) ORDER BY h.bin)
+                    FROM histogram_bins h
+                    LEFT JOIN unnest(c.labels) WITH ORDINALITY l(label, position) ON l.position = h.bin + 1
+                    WHERE h.column_code = c.column_code
+                ), '[]'::json),
+                'scaleX', json_build_object(
+                    'numeric', CASE WHEN c.is_numeric THEN (
+                        SELECT COALESCE(json_agg(json_build_object(
+                            'x0', c.min_val::numeric + (n * (c.max_val::numeric - c.min_val::numeric) / c.bin_count::numeric),
+                            'x1', c.min_val::numeric + ((n+1) * (c.max_val::numeric - c.min_val::numeric) / c.bin_count::numeric)
+                        ) ORDER BY n), '[]'::json)
+                        FROM generate_series(0, c.bin_count - 1) n
+                    ) ELSE '[]'::json END,
+                    'categorical', CASE WHEN NOT c.is_numeric THEN COALESCE((
+                        SELECT json_agg(l.label ORDER BY h.bin)
+                        FROM histogram_bins h
+                        JOIN unnest(c.labels) WITH ORDINALITY l(label, position) ON l.position = h.bin + 1
+                        WHERE h.column_code = c.column_code
+                    ), '[]'::json) ELSE '[]'::json END
+                )
+            ) as histogram
+            FROM {cube_columns} c
+            WHERE c.column_code IN ({target_codes})
+        )
+        SELECT json_build_object(
+            'rows', (SELECT COUNT(*) FROM filtered),
+            'histograms', COALESCE((SELECT json_object_agg(column_id, histogram) FROM histograms), '{{}}'::json)
+        )
+    """
+
+
+def cross_filter(table_name, engine, selection, columns, bin_count=CROSS_FILTER_BINS, min_id=None, max_id=None):
+    """
+    1D histograms of the visible columns over the rows whose bins are selected
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param selection: [{"column": name, "bins": [selected bins]}], the bins of a column are ORed and the columns ANDed
+    :param columns: the visible columns, the selected ones are left out of the result
+    :param bin_count: number of bins of the numeric columns
+    :param min_id: start of the ID window, None for no bound
+    :param max_id: end of the ID window, None for no bound
+    :return: {"rows": number of filtered rows, "histograms": {column: 1D histogram}}
+    """
+    if not selection:
+        raise ValueError("A cross-filter needs the selected bins of at least one column")
+    cube_columns = current_cube_columns(table_name, engine, bin_count)
+    params = {"min_id": None if min_id is None else int(min_id), "max_id": None if max_id is None else int(max_id)}
+    selected = []
+    for index, predicate in enumerate(selection):
+        entry = cube_columns.get(predicate["column"])
+        if entry is None:
+            raise ValueError(f"Unknown column {predicate['column']}")
+        params[f"selection_{index}"] = selection_codes(entry, predicate["bins"])
+        selected.append((entry["column_code"], f"selection_{index}"))
+
+    selected_columns = {predicate["column"] for predicate in selection}
+    targets = list(dict.fromkeys(cube_columns[column]["column_code"] for column in columns
+                                 if column in cube_columns and column not in selected_columns))
+    if not targets:
+        return {"rows": None, "histograms": {}}
+    with engine.connect() as conn:
+        return conn.execute(text(cross_filter_query(table_name, selected, targets)), params).scalar_one()
+
+
+def drop_bin_cube(conn, table_name):
+    """Drops the cube, the next cross-filter rebuilds it"""
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(bin_cube_table(table_name))}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(bin_cube_columns_table(table_name))}"))
+
+
+def discard_bin_cube(table_name, engine):
+    """drop_bin_cube in its own transaction, for the wrangles whose data changed"""
+    try:
+        with engine.begin() as conn:
+            drop_bin_cube(conn, table_name)
+    except Exception as e:
+        print(f"Warning: Could not drop the bin cube of {table_name}: {e}")
@@ -0,0 +1,254 @@
+#Buckaroo Project - October 17, 2026
+#This file bulk loads dataframes into postgres with COPY FROM STDIN instead of chunked INSERTs
+
+import hashlib
+import io
+import os
+import time
+
+import pandas as pd
+
+# Print a line per load and per streamed chunk, e.g. LOG_BULK_LOADS=1 in .env while profiling an ingest
+LOG_BULK_LOADS = os.environ.get("LOG_BULK_LOADS", "0") == "1"
+
+# Rows serialised into one in-memory CSV buffer per COPY call, bounds the buffer size on large frames
+COPY_BATCH_ROWS = 50_000
+
+# Marker written for NaN/None so that empty strings survive the round trip as empty strings. A batch holding a cell
+# whose text is the marker gets a numbered variant (\N1, \N2, ...) that none of its cells hold
+COPY_NULL_MARKER = "\\N"
+
+# Postgres truncates identifiers longer than this many bytes
+MAX_IDENTIFIER_BYTES = 63
+
+
+def quote_identifier(name):
+    """
+    Quotes a table or column name for use in raw SQL
+    :param name: the identifier to quote
+    :return: the identifier wrapped in double quotes with embedded quotes escaped
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def staging_table_name(table_name):
+    """
+    Name of the table rows are copied into before being swapped in place of table_name
+    :param table_name: the final table name
+    :return: the staging table name, shortened with a hash of table_name when it would pass MAX_IDENTIFIER_BYTES
+    """
+    name = f"{table_name}__staging"
+    if len(name.encode()) <= MAX_IDENTIFIER_BYTES:
+        return name
+    suffix = f"__staging_{hashlib.md5(table_name.encode()).hexdigest()[:12]}"
+    prefix = table_name.encode()[:MAX_IDENTIFIER_BYTES - len(suffix)].decode(errors="ignore")
+    return prefix + suffix
+
+
+def prepare_frame_for_copy(df, index=False):
+    """
+    Turns the dataframe index into a regular column when it should be stored, mirroring what
+    DataFrame.to_sql(index=True) would have created
+    :param df: the dataframe to load
+    :param index: whether the index is written as a column
+    :return: the frame whose columns are exactly the table columns
+    """
+    if not index:
+        return df
+    index_label = df.index.name if df.index.name is not None else "index"
+    return df.reset_index(names=index_label)
+
+
+def null_marker_for(df):
+    """
+    The NULL marker of a batch: COPY_NULL_MARKER, or the first numbered variant of it that no cell of the batch
+    holds, so a cell whose text is \\N is loaded as that text and not as NULL
+    :param df: the batch about to be serialised
+    :return: the marker
+    """
+    text_columns = [df[column] for column in df.columns if not (pd.api.types.is_numeric_dtype(df[column])
+                                                                or pd.api.types.is_datetime64_any_dtype(df[column]))]
+    marker, attempt = COPY_NULL_MARKER, 0
+    while any((values == marker).any() for values in text_columns):
+        attempt += 1
+        marker = f"{COPY_NULL_MARKER}{attempt}"
+    return marker
+
+
+def dataframe_to_csv_buffer(df, null_marker=COPY_NULL_MARKER):
+    """
+    Serialises a dataframe (without header or index) into an in-memory CSV buffer that
+    COPY ... WITH (FORMAT csv) can read
+    :param df: the dataframe to serialise
+    :param null_marker: the text written for NaN/None, see null_marker_for
+    :return: a StringIO positioned at the start of the data
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep=null_marker)
+    buffer.seek(0)
+    return buffer
+
+
+def build_copy_statement(table_name, columns, null_marker=COPY_NULL_MARKER):
+    """
+    Constructs the COPY FROM STDIN statement for the given table and column order
+    :param table_name: the table to copy into
+    :param columns: the column names in the order they appear in the CSV buffer
+    :param null_marker: the NULL marker of the buffer
+    :return: the COPY statement
+    """
+    column_list = ", ".join(quote_identifier(column) for column in columns)
+    return (f"COPY {quote_identifier(table_name)} ({column_list}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '{null_marker}')")
+
+
+class BulkLoader:
+    """
+    Loads a table through a staging table: the staging table is created with the schema
+    DataFrame.to_sql would have produced, rows are streamed in with COPY FROM STDIN, and on
+    finish() the staging table atomically replaces the target table.
+
+    Frames can be appended several times so that callers can stream chunks without holding the
+    whole table in memory.
+    """
+
+    def __init__(self, table_name, engine, index=False, batch_rows=COPY_BATCH_ROWS, dtype=None):
+        self.table_name = table_name
+        self.engine = engine
+        self.index = index
+        self.batch_rows = batch_rows
+        self.dtype = dtype
+        self.staging_name = staging_table_name(table_name)
+        self.columns = None
+        self.rows_written = 0
+        self.start_time = None
+        self.raw_connection = None
+        self.cursor = None
+
+    def append(self, df):
+        """
+        Copies the rows of the frame into the staging table, creating the table on the first call
+        :param df: the dataframe chunk to load
+        :return: None
+        """
+        frame = prepare_frame_for_copy(df, self.index)
+        if self.columns is None:
+            self._create_staging_table(frame)
+        for start in range(0, len(frame), self.batch_rows):
+            batch = frame.iloc[start:start + self.batch_rows][self.columns]
+            null_marker = null_marker_for(batch)
+            self.cursor.copy_expert(build_copy_statement(self.staging_name, self.columns, null_marker),
+                                    dataframe_to_csv_buffer(batch, null_marker))
+            self.rows_written += len(batch)
+
+    def finish(self, extra_statements=()):
+        """
+        Swaps the staging table in place of the target table and commits
+        :param extra_statements: (sql, params) pairs in psycopg2 format run after the swap in the same transaction,
+        used to build keys or views that must appear together with the new table
+        :return: dictionary with the number of rows written, elapsed seconds and rows per second
+        """
+        if self.cursor is None:
+            raise ValueError(f"No rows were appended to {self.table_name} before finish()")
+        try:
+            for statement, params in [*self.swap_statements(), *extra_statements]:
+                self.cursor.execute(statement, params)
+            self.raw_connection.commit()
+        finally:
+            self._close()
+        return self._write_stats()
+
+    def stage(self):
+        """
+        Commits the rows copied so far into the staging table without touching the target table, so that the swap
+        can run in the transaction of another loader, see swap_statements()
+        :return: dictionary with the number of rows written, elapsed seconds and rows per second
+        """
+        if self.cursor is None:
+            raise ValueError(f"No rows were appended to {self.table_name} before stage()")
+        try:
+            self.raw_connection.commit()
+        finally:
+            self._close()
+        return self._write_stats()
+
+    def swap_statements(self):
+        """
+        Statements that replace the target table with the staging table
+        :return: list of (sql, params) pairs in psycopg2 format
+        """
+        target = quote_identifier(self.table_name)
+        statements = [
+            (f"DROP TABLE IF EXISTS {target} CASCADE", None),
+            (f"ALTER TABLE {quote_identifier(self.staging_name)} RENAME TO {target}", None),
+        ]
+        if self.index:
+            index_column = self.columns[0]
+            statements.append((
+                f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'ix_{self.table_name}_{index_column}')} "
+                f"ON {target} ({quote_identifier(index_column)})", None
+            ))
+        return statements
+
+    def _write_stats(self):
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        stats = {
+            "table": self.table_name,
+            "rows": self.rows_written,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_written / elapsed, 1),
+        }
+        if LOG_BULK_LOADS:
+            print(f"[COPY] {self.table_name}: {stats['rows']} rows in {stats['seconds']}s "
+                  f"({stats['rows_per_second']} rows/s)")
+        return stats
+
+    def abort(self):
+        """
+        Rolls back the load, the target table is left untouched
+        :return: None
+        """
+        if self.raw_connection is not None:
+            self.raw_connection.rollback()
+        self._close()
+
+    def _create_staging_table(self, frame):
+        self.start_time = time.time()
+        self.columns = list(frame.columns)
+        # let pandas pick the column types exactly as the old to_sql path did, but without any rows
+        frame.head(0).to_sql(self.staging_name, self.engine, if_exists="replace", index=False, dtype=self.dtype)
+        self.raw_connection = self.engine.raw_connection()
+        self.cursor = self.raw_connection.cursor()
+
+    def _close(self):
+        if self.cursor is not None:
+            self.cursor.close()
+        if self.raw_connection is not None:
+            self.raw_connection.close()
+        self.cursor = None
+        self.raw_connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+def bulk_write_to_db(df, table_name, engine, index=False, batch_rows=COPY_BATCH_ROWS):
+    """
+    Replaces table_name with the contents of the dataframe using COPY FROM STDIN into a staging table
+    :param df: the dataframe to write
+    :param table_name: the table to replace
+    :param engine: the SQLAlchemy engine
+    :param index: whether to store the dataframe index as a column, as to_sql(index=True) does
+    :param batch_rows: number of rows serialised per COPY call
+    :return: dictionary with the number of rows written, elapsed seconds and rows per second
+    """
+    if LOG_BULK_LOADS:
+        print(f"[START] Bulk load for {table_name}: {len(df)} rows...")
+    with BulkLoader(table_name, engine, index=index, batch_rows=batch_rows) as loader:
+        loader.append(df)
+        return loader.finish()
@@ -0,0 +1,195 @@
+#Buckaroo Project - October 17, 2026
+#This file keeps column_stats<table>, a catalog of per-column statistics filled at ingest and refreshed after wrangles
+
+import time
+
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+
+# Data types the plots and wranglers treat as numeric
+NUMERIC_DATA_TYPES = ("smallint", "integer", "bigint", "decimal", "numeric", "real", "double precision")
+
+# Values the wranglers treat as missing besides NULL, they are left out of the mode
+MISSING_VALUE_TOKENS = ("", "null", "undefined")
+
+# Columns of the catalog, one row per column of the data table
+STATS_COLUMNS = ["column_name", "data_type", "is_numeric", "row_count", "null_count", "distinct_count",
+                 "min_value", "max_value", "mean_value", "stddev_value", "mode_value"]
+
+
+def column_stats_table(table_name):
+    """The catalog of the statistics of table_name's columns"""
+    return f"column_stats{table_name}"
+
+
+def missing_predicate(column):
+    """Boolean SQL expression that is TRUE when the column is missing"""
+    tokens = ", ".join(f"'{token}'" for token in MISSING_VALUE_TOKENS)
+    return f'("{column}" IS NULL OR "{column}"::text IN ({tokens}))'
+
+
+def table_columns(conn, table_name):
+    """
+    :return: [(column name, data type)] of the data table in table order, without the stored dataframe index
+    """
+    rows = conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_name = :table AND table_schema = current_schema() ORDER BY ordinal_position"
+    ), {"table": table_name}).all()
+    return [(name, data_type) for name, data_type in rows if name != "index"]
+
+
+def column_stats_query(table_name, columns):
+    """
+    One statement computing the statistics of the given columns, the modes come from column_modes_query
+    :param table_name: the data table
+    :param columns: [(column name, data type)]
+    :return: SQL returning one row: row_count, then per column its count, distinct count, min, max, mean and stddev
+    """
+    table = quote_identifier(table_name)
+    expressions = ["COUNT(*) AS row_count"]
+    for index, (name, data_type) in enumerate(columns):
+        column = quote_identifier(name)
+        expressions += [f"COUNT({column}) AS n{index}", f"COUNT(DISTINCT {column}) AS d{index}"]
+        if data_type in NUMERIC_DATA_TYPES:
+            value = f"{column}::double precision"
+            expressions += [f"MIN({value}) AS lo{index}", f"MAX({value}) AS hi{index}",
+                            f"AVG({value}) AS mean{index}", f"STDDEV_SAMP({value}) AS sd{index}"]
+        else:
+            expressions += [f"NULL::double precision AS {stat}{index}" for stat in ("lo", "hi", "mean", "sd")]
+    return f"SELECT {', '.join(expressions)} FROM {table}"
+
+
+def column_modes_query(table_name, columns):
+    """
+    One grouped pass computing the mode of every non-numeric column: the columns are unpivoted into
+    (column index, value) pairs and counted together instead of one scan per column
+    :param table_name: the data table
+    :param columns: [(column name, data type)]
+    :return: SQL returning (column_index, mode) rows, None when no column has a mode
+    """
+    values = [f"({index}, t.{quote_identifier(name)}::text)"
+              for index, (name, data_type) in enumerate(columns) if data_type not in NUMERIC_DATA_TYPES]
+    if not values:
+        return None
+    tokens = ", ".join(f"'{token}'" for token in MISSING_VALUE_TOKENS)
+    # ties go to the smallest value so the mode does not change between refreshes of the same data
+    return f"""
+        SELECT DISTINCT ON (column_index) column_index, value AS mode
+        FROM (
+            SELECT v.column_index, v.value, COUNT(*) AS frequency
+            FROM {quote_identifier(table_name)} t
+            CROSS JOIN LATERAL (VALUES {", ".join(values)}) AS v(column_index, value)
+            WHERE v.value IS NOT NULL AND v.value NOT IN ({tokens})
+            GROUP BY v.column_index, v.value
+        ) counted
+        ORDER BY column_index, frequency DESC, value
+    """
+
+
+def refresh_column_stats(table_name, engine, columns=None):
+    """
+    Computes the statistics of the columns of a table and writes them to column_stats<table>
+    :param table_name: the data table
+    :param engine: the SQLAlchemy engine
+    :param columns: the columns to refresh, None for all of them
+    :return: {"columns", "seconds"}
+    """
+    start_time = time.time()
+    stats_table = quote_identifier(column_stats_table(table_name))
+    with engine.begin() as conn:
+        described = table_columns(conn, table_name)
+        if columns is not None:
+            wanted = set(columns)
+            described = [(name, data_type) for name, data_type in described if name in wanted]
+        if not described:
+            return {"columns": 0, "seconds": 0.0}
+        stats = conn.execute(text(column_stats_query(table_name, described))).mappings().one()
+        modes_query = column_modes_query(table_name, described)
+        modes = dict(conn.execute(text(modes_query)).all()) if modes_query is not None else {}
+
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {stats_table} (
+                column_name text PRIMARY KEY,
+                data_type text NOT NULL,
+                is_numeric boolean NOT NULL,
+                row_count bigint NOT NULL,
+                null_count bigint NOT NULL,
+                distinct_count bigint NOT NULL,
+                min_value double precision,
+                max_value double precision,
+                mean_value double precision,
+                stddev_value double precision,
+                mode_value text,
+                updated_at timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+        rows = [{
+            "column_name": name,
+            "data_type": data_type,
+            "is_numeric": data_type in NUMERIC_DATA_TYPES,
+            "row_count": stats["row_count"],
+            "null_count": stats["row_count"] - stats[f"n{index}"],
+            "distinct_count": stats[f"d{index}"],
+            "min_value": stats[f"lo{index}"],
+            "max_value": stats[f"hi{index}"],
+            "mean_value": stats[f"mean{index}"],
+            "stddev_value": stats[f"sd{index}"],
+            "mode_value": modes.get(index),
+        } for index, (name, data_type) in enumerate(described)]
+        conn.execute(text(f"""
+            INSERT INTO {stats_table} ({", ".join(STATS_COLUMNS)})
+            VALUES ({", ".join(":" + column for column in STATS_COLUMNS)})
+            ON CONFLICT (column_name) DO UPDATE SET
+                {", ".join(f"{column} = EXCLUDED.{column}" for column in STATS_COLUMNS[1:])},
+                updated_at = now()
+        """), rows)
+        if columns is None:
+            # columns dropped from the table since the last refresh
+            conn.execute(text(f"DELETE FROM {stats_table} WHERE NOT (column_name = ANY(:names))"),
+                         {"names": [name for name, _ in described]})
+    seconds = time.time() - start_time
+    print(f"[STATS] {column_stats_table(table_name)}: {len(described)} columns in {seconds:.2f}s")
+    return {"columns": len(described), "seconds": round(seconds, 3)}
+
+
+def drop_column_stats(conn, table_name):
+    """Drops the catalog, readers go back to scanning the table"""
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(column_stats_table(table_name))}"))
+
+
+def read_column_stats(conn, table_name, columns=None):
+    """
+    :param conn: an open connection
+    :param table_name: the data table
+    :param columns: the columns to read, None for all of them
+    :return: {column name: {statistic: value}}, empty when the table has no catalog
+    """
+    stats_table = column_stats_table(table_name)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"),
+                          {"name": quote_identifier(stats_table)}).scalar_one()
+    if not exists:
+        return {}
+    query = f"SELECT {', '.join(STATS_COLUMNS)} FROM {quote_identifier(stats_table)}"
+    params = {}
+    if columns is not None:
+        query += " WHERE column_name = ANY(:names)"
+        params["names"] = list(columns)
+    return {row["column_name"]: dict(row) for row in conn.execute(text(query), params).mappings()}
+
+
+def covers_id_window(stats, min_id, max_id):
+    """
+    True when the ID window holds every row of the table, only then do the table-wide statistics describe it
+    :param stats: the result of read_column_stats, it must include the "ID" column
+    :param min_id: start of the window, None for no bound
+    :param max_id: end of the window, None for no bound
+    """
+    id_stats = stats.get("ID")
+    if id_stats is None:
+        return False
+    if id_stats["row_count"] == 0:
+        return True
+    return ((min_id is None or int(min_id) <= id_stats["min_value"])
+            and (max_id is None or int(max_id) >= id_stats["max_value"]))
@@ -3,13 +3,96 @@
 import logging
 from sqlalchemy import text
 
+from app.error_store import error_type_columns
+from detectors.profile import MISMATCH_TRIMMED, NUMBER_PATTERN, NUMERIC_STRING_BODY
+from detectors.vectorized import ANOMALY_MIN_NUMERIC, ANOMALY_Z_SCORE, INCOMPLETE_FREQUENCY_THRESHOLD, \
+    INCOMPLETE_RARE_COUNT, MISSING_STRINGS
+
 logger = logging.getLogger(__name__)
 
+# jsonb_build_object arguments of the error counts of a histogram bin, NULL (dropped) for error types it does not hold
+BIN_ERROR_COUNTS = error_type_columns("'{error_type}', NULLIF(COUNT(*) FILTER (WHERE error_type = '{error_type}'), 0)")
+TILE_ERROR_COUNTS = error_type_columns("'{error_type}', NULLIF(SUM({error_type})::bigint, 0)")
+# the per error type count columns of heatmap_tiles<table>
+TILE_ERROR_COLUMNS = error_type_columns("{error_type}", ", ")
+
+# The rules of the detector functions, written from the constants of the python detectors
+DETECTOR_NUMBER_PATTERN = "'^" + NUMBER_PATTERN + "$'"
+DETECTOR_NUMERIC_STRING_PATTERN = "'^" + NUMERIC_STRING_BODY + "$'"
+DETECTOR_TRIMMED = "E'" + "".join(f"\\x{ord(character):02x}" for character in MISMATCH_TRIMMED) + "'"
+DETECTOR_MISSING_STRINGS = ", ".join(f"'{token}'" for token in MISSING_STRINGS)
+
 # Dictionary to store all the user's database functions
 DB_FUNCTIONS = {
+    "column_is_numeric": """
+    -- Whether a column is numeric, read from the column_stats<table> catalog (app/column_stats.py) and from
+    -- information_schema for tables without one. NULL when the column does not exist
+    CREATE OR REPLACE FUNCTION column_is_numeric(
+        main_table_name text,
+        column_name_in text
+    ) RETURNS boolean
+    LANGUAGE plpgsql
+    STABLE
+    AS $FUNC$
+    DECLARE
+        stats_table text := 'column_stats' || main_table_name;
+        result boolean;
+    BEGIN
+        IF to_regclass(quote_ident(stats_table)) IS NOT NULL THEN
+            EXECUTE format('SELECT is_numeric FROM %I WHERE column_name = $1', stats_table)
+            INTO result
+            USING column_name_in;
+        END IF;
+
+        IF result IS NULL THEN
+            SELECT data_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint')
+            INTO result
+            FROM information_schema.columns
+            WHERE table_name = main_table_name AND table_schema = current_schema() AND column_name = column_name_in;
+        END IF;
+
+        RETURN result;
+    END;
+    $FUNC$;
+    """,
+    "column_stats_bounds": """
+    -- Min and max of a numeric column from the column_stats<table> catalog. NULLs when the table has no catalog or
+    -- the ID window leaves rows out, the caller then scans the window
+    CREATE OR REPLACE FUNCTION column_stats_bounds(
+        main_table_name text,
+        column_name_in text,
+        min_id integer,
+        max_id integer,
+        OUT min_val double precision,
+        OUT max_val double precision
+    )
+    LANGUAGE plpgsql
+    STABLE
+    AS $FUNC$
+    DECLARE
+        stats_table text := 'column_stats' || main_table_name;
+        id_min double precision;
+        id_max double precision;
+    BEGIN
+        IF to_regclass(quote_ident(stats_table)) IS NULL THEN
+            RETURN;
+        END IF;
+
+        EXECUTE format('SELECT min_value, max_value FROM %I WHERE column_name = ''ID''', stats_table)
+        INTO id_min, id_max;
+
+        IF (min_id IS NULL OR min_id <= id_min) AND (max_id IS NULL OR max_id >= id_max) THEN
+            EXECUTE format('SELECT min_value, max_value FROM %I WHERE column_name = $1 AND is_numeric', stats_table)
+            INTO min_val, max_val
+            USING column_name_in;
+        END IF;
+    END;
+    $FUNC$;
+    """,
     "generate_one_d_histogram_with_errors": """
-    -- Simplified unified version - single query path for numeric and categorical
-    -- Fixed: Changed nested dollar-quote from $SQL$ to $QUERY$ to avoid parsing issues
+    -- Single pass kernel: bounds are computed once in double precision, errors<table> is joined once and the item
+    -- and per error type counts come out of one GROUP BY. The error types are the four the detectors report
+    -- (ERROR_TYPE_CODES in app/error_store.py)
     CREATE OR REPLACE FUNCTION generate_one_d_histogram_with_errors(
         main_table_name text,
         error_table_name text,
@@ -23,12 +106,13 @@ DB_FUNCTIONS = {
     DECLARE
         result json;
         is_numeric boolean;
+        known_min double precision;
+        known_max double precision;
     BEGIN
-        -- Check if column is numeric
-        SELECT data_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint')
-        INTO is_numeric
-        FROM information_schema.columns
-        WHERE table_name = main_table_name AND column_name = axis_column;
+        -- Check if column is numeric, its bounds come from the catalog when the window covers the whole table
+        is_numeric := column_is_numeric(main_table_name, axis_column);
+        SELECT min_val, max_val INTO known_min, known_max
+        FROM column_stats_bounds(main_table_name, axis_column, min_id, max_id);
 
         -- Single unified query for both numeric and categorical
         EXECUTE format($QUERY$
@@ -43,8 +127,20 @@ DB_FUNCTIONS = {
                   AND ($1 IS NULL OR "ID" >= $1)
                   AND ($2 IS NULL OR "ID" <= $2)
             ),
-            -- Step 2: Assign bins (keep as text for both numeric and categorical)
-            binned_data AS (
+            -- Step 2: Get min/max once for numeric columns, from the catalog ($6, $7) or by scanning the rows
+            -- (FILTER skips the cast for categorical ones)
+            bounds AS (
+                SELECT $6 as min_val, $7 as max_val
+                WHERE $6 IS NOT NULL
+                UNION ALL
+                SELECT
+                    MIN(value::double precision) FILTER (WHERE $3) as min_val,
+                    MAX(value::double precision) FILTER (WHERE $3) as max_val
+                FROM data_rows
+                HAVING $6 IS NULL
+            ),
+            -- Step 3: Assign bins (keep as text for both numeric and categorical)
+            binned_data AS MATERIALIZED (
                 SELECT
                     d."ID",
                     CASE
@@ -52,15 +148,7 @@ DB_FUNCTIONS = {
                             -- Clamp bin number to 0..(bin_count-1) range
                             LEAST(
                                 GREATEST(
-                                    COALESCE(
-                                        width_bucket(
-                                            d.value::numeric,
-                                            (SELECT MIN(value::numeric) FROM data_rows),
-                                            (SELECT MAX(value::numeric) FROM data_rows),
-                                            $4
-                                        ) - 1,
-                                        0
-                                    ),
+                                    COALESCE(width_bucket(d.value::double precision, b.min_val, b.max_val, $4) - 1, 0),
                                     0
                                 ),
                                 $4 - 1
@@ -69,47 +157,39 @@ DB_FUNCTIONS = {
                             d.value::text
                     END as bin
                 FROM data_rows d
+                CROSS JOIN bounds b
             ),
-            -- Step 3: Get error counts per bin
-            errors_per_bin AS (
-                SELECT
-                    b.bin,
-                    e.error_type,
-                    COUNT(*) as error_count
+            -- Step 4: One row per data row plus one per error of the column
+            binned_items AS (
+                SELECT bin, NULL::text as error_type
+                FROM binned_data
+                UNION ALL
+                SELECT b.bin, e.error_type
                 FROM binned_data b
                 JOIN %I e ON b."ID" = e.row_id
                 WHERE e.column_id = $5
-                GROUP BY b.bin, e.error_type
             ),
-            -- Step 4: Aggregate by bin
+            -- Step 5: Item and error counts per bin in a single pass
             histogram_bins AS (
                 SELECT
-                    b.bin,
-                    COUNT(*) as total_items,
-                    jsonb_object_agg(
-                        e.error_type,
-                        e.error_count
-                    ) FILTER (WHERE e.error_type IS NOT NULL) as errors
-                FROM binned_data b
-                LEFT JOIN errors_per_bin e ON b.bin = e.bin
-                GROUP BY b.bin
+                    bin,
+                    COUNT(*) FILTER (WHERE error_type IS NULL) as total_items,
+                    jsonb_strip_nulls(jsonb_build_object(""" + BIN_ERROR_COUNTS + """)) as errors
+                FROM binned_items
+                GROUP BY bin
             ),
-            -- Step 5: Build scale data for numeric columns (ALL bins, not just ones with data)
+            -- Step 6: Build scale data for numeric columns (ALL bins, not just ones with data), the few bin edges
+            -- are computed in numeric so their labels do not carry floating point noise
             numeric_scale_data AS (
                 SELECT
                     n as bin_num,
-                    CASE WHEN $3 THEN
-                        (SELECT MIN(value::numeric) FROM data_rows) +
-                        (n * ((SELECT MAX(value::numeric) FROM data_rows) - (SELECT MIN(value::numeric) FROM data_rows)) / $4::numeric)
-                    ELSE NULL END as x0,
-                    CASE WHEN $3 THEN
-                        (SELECT MIN(value::numeric) FROM data_rows) +
-                        ((n+1) * ((SELECT MAX(value::numeric) FROM data_rows) - (SELECT MIN(value::numeric) FROM data_rows)) / $4::numeric)
-                    ELSE NULL END as x1
+                    b.min_val::numeric + (n * (b.max_val::numeric - b.min_val::numeric) / $4::numeric) as x0,
+                    b.min_val::numeric + ((n+1) * (b.max_val::numeric - b.min_val::numeric) / $4::numeric) as x1
                 FROM generate_series(0, $4-1) n
+                CROSS JOIN bounds b
                 WHERE $3
             )
-            -- Step 6: Build final JSON (split into two subqueries to avoid type mismatch)
+            -- Step 7: Build final JSON (split into two subqueries to avoid type mismatch)
             SELECT json_build_object(
                 'histograms',
                 CASE WHEN $3 THEN
@@ -118,7 +198,7 @@ DB_FUNCTIONS = {
                         json_build_object(
                             'xBin', bin::integer,
                             'xType', 'numeric',
-                            'count', COALESCE(errors, '{}'::jsonb) || jsonb_build_object('items', total_items)
+                            'count', errors || jsonb_build_object('items', total_items)
                         ) ORDER BY bin::integer
                     ), '[]'::json) FROM histogram_bins)
                 ELSE
@@ -127,7 +207,7 @@ DB_FUNCTIONS = {
                         json_build_object(
                             'xBin', bin,
                             'xType', 'categorical',
-                            'count', COALESCE(errors, '{}'::jsonb) || jsonb_build_object('items', total_items)
+                            'count', errors || jsonb_build_object('items', total_items)
                         ) ORDER BY bin
                     ), '[]'::json) FROM histogram_bins)
                 END,
@@ -147,157 +227,43 @@ DB_FUNCTIONS = {
             axis_column,              -- %I: WHERE column IS NOT NULL
             error_table_name          -- %I: error table name
         )
-        USING min_id, max_id, is_numeric, bin_count, axis_column
+        USING min_id, max_id, is_numeric, bin_count, axis_column, known_min, known_max
         INTO result;
 
         RETURN result;
     END;
     $FUNC$;
     """,
-    "generate_two_d_histogram_with_errors": """
-    -- Simplified unified version - single query path for all type combinations
-    -- Follows the same pattern as 1D histogram
-    CREATE OR REPLACE FUNCTION generate_two_d_histogram_with_errors(
-        main_table_name text,
-        error_table_name text,
-        x_axis_column text,
-        y_axis_column text,
-        x_bin_count integer DEFAULT 10,
-        y_bin_count integer DEFAULT 10,
-        min_id integer DEFAULT NULL,
-        max_id integer DEFAULT NULL
-    ) RETURNS json
-    LANGUAGE plpgsql
+    "two_d_histogram_json_query": """
+    -- The end of the 2D histogram query, shared by the scanning kernel and the heatmap tiles: the numeric scales and
+    -- the final JSON. It follows CTEs named bounds (x_min, x_max, y_min, y_max) and histogram_bins (x_bin, y_bin,
+    -- total_items, errors) and reads $3/$4 as x/y_is_numeric and $5/$6 as the bin counts
+    CREATE OR REPLACE FUNCTION two_d_histogram_json_query() RETURNS text
+    LANGUAGE sql
+    IMMUTABLE
     AS $FUNC$
-    DECLARE
-        result json;
-        x_is_numeric boolean;
-        y_is_numeric boolean;
-    BEGIN
-        -- Check if columns are numeric
-        SELECT data_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint')
-        INTO x_is_numeric
-        FROM information_schema.columns
-        WHERE table_name = main_table_name AND column_name = x_axis_column;
-
-        SELECT data_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint')
-        INTO y_is_numeric
-        FROM information_schema.columns
-        WHERE table_name = main_table_name AND column_name = y_axis_column;
-
-        -- Single unified query for all type combinations
-        EXECUTE format($QUERY$
-            WITH
-            -- Step 1: Get all data rows with optional ID filtering
-            data_rows AS (
-                SELECT
-                    "ID",
-                    %I as x_value,
-                    %I as y_value
-                FROM %I
-                WHERE %I IS NOT NULL
-                  AND %I IS NOT NULL
-                  AND ($1 IS NULL OR "ID" >= $1)
-                  AND ($2 IS NULL OR "ID" <= $2)
-            ),
-            -- Step 2: Get min/max for numeric columns (for width_bucket)
-            x_bounds AS (
-                SELECT
-                    COALESCE(MIN(x_value::numeric), 0) as min_val,
-                    COALESCE(MAX(x_value::numeric), 1) as max_val
-                FROM data_rows
-                WHERE $3  -- only compute for numeric
-            ),
-            y_bounds AS (
-                SELECT
-                    COALESCE(MIN(y_value::numeric), 0) as min_val,
-                    COALESCE(MAX(y_value::numeric), 1) as max_val
-                FROM data_rows
-                WHERE $4  -- only compute for numeric
-            ),
-            -- Step 3: Assign bins for both X and Y
-            binned_data AS (
-                SELECT
-                    d."ID",
-                    CASE
-                        WHEN $3 THEN  -- x_is_numeric: clamp to [0, bin_count-1]
-                            LEAST(GREATEST(
-                                width_bucket(
-                                    d.x_value::numeric,
-                                    (SELECT min_val FROM x_bounds),
-                                    (SELECT max_val FROM x_bounds),
-                                    $5
-                                ) - 1,
-                                0
-                            ), $5 - 1)::text
-                        ELSE
-                            d.x_value::text
-                    END as x_bin,
-                    CASE
-                        WHEN $4 THEN  -- y_is_numeric: clamp to [0, bin_count-1]
-                            LEAST(GREATEST(
-                                width_bucket(
-                                    d.y_value::numeric,
-                                    (SELECT min_val FROM y_bounds),
-                                    (SELECT max_val FROM y_bounds),
-                                    $6
-                                ) - 1,
-                                0
-                            ), $6 - 1)::text
-                        ELSE
-                            d.y_value::text
-                    END as y_bin
-                FROM data_rows d
-            ),
-            -- Step 5: Get error counts per (x_bin, y_bin) pair
-            errors_per_bin AS (
-                SELECT
-                    b.x_bin,
-                    b.y_bin,
-                    e.error_type,
-                    COUNT(*) as error_count
-                FROM binned_data b
-                JOIN %I e ON b."ID" = e.row_id
-                WHERE e.column_id IN ($7, $8)
-                GROUP BY b.x_bin, b.y_bin, e.error_type
-            ),
-            -- Step 6: Aggregate by bin
-            histogram_bins AS (
-                SELECT
-                    b.x_bin,
-                    b.y_bin,
-                    COUNT(*) as total_items,
-                    jsonb_object_agg(
-                        e.error_type,
-                        e.error_count
-                    ) FILTER (WHERE e.error_type IS NOT NULL) as errors
-                FROM binned_data b
-                LEFT JOIN errors_per_bin e ON b.x_bin = e.x_bin AND b.y_bin = e.y_bin
-                GROUP BY b.x_bin, b.y_bin
-            ),
-            -- Step 7: Build X scale data for numeric columns
+    SELECT $TEMPLATE$
+            -- Step 6: Build X scale data for numeric columns, bin edges in numeric as in the 1D histogram
             x_numeric_scale_data AS (
                 SELECT
                     n as bin_num,
-                    (SELECT min_val FROM x_bounds) +
-                        (n * ((SELECT max_val FROM x_bounds) - (SELECT min_val FROM x_bounds)) / $5::numeric) as x0,
-                    (SELECT min_val FROM x_bounds) +
-                        ((n+1) * ((SELECT max_val FROM x_bounds) - (SELECT min_val FROM x_bounds)) / $5::numeric) as x1
+                    b.x_min::numeric + (n * (b.x_max::numeric - b.x_min::numeric) / $5::numeric) as x0,
+                    b.x_min::numeric + ((n+1) * (b.x_max::numeric - b.x_min::numeric) / $5::numeric) as x1
                 FROM generate_series(0, $5-1) n
+                CROSS JOIN bounds b
                 WHERE $3  -- only generate for numeric columns
             ),
-            -- Step 8: Build Y scale data for numeric columns
+            -- Step 7: Build Y scale data for numeric columns
             y_numeric_scale_data AS (
                 SELECT
                     n as bin_num,
-                    (SELECT min_val FROM y_bounds) +
-                        (n * ((SELECT max_val FROM y_bounds) - (SELECT min_val FROM y_bounds)) / $6::numeric) as x0,
-                    (SELECT min_val FROM y_bounds) +
-                        ((n+1) * ((SELECT max_val FROM y_bounds) - (SELECT min_val FROM y_bounds)) / $6::numeric) as x1
+                    b.y_min::numeric + (n * (b.y_max::numeric - b.y_min::numeric) / $6::numeric) as x0,
+                    b.y_min::numeric + ((n+1) * (b.y_max::numeric - b.y_min::numeric) / $6::numeric) as x1
                 FROM generate_series(0, $6-1) n
+                CROSS JOIN bounds b
                 WHERE $4  -- only generate for numeric columns
             )
-            -- Step 9: Build final JSON (split into 4 type combinations to avoid type mismatch)
+            -- Step 8: Build final JSON (split into 4 type combinations to avoid type mismatch)
             SELECT json_build_object(
                 'histograms',
                 CASE
@@ -309,7 +275,7 @@ DB_FUNCTIONS = {
                                 'yBin', y_bin::integer,
                                 'xType', 'numeric',
                                 'yType', 'numeric',
-                                'count', COALESCE(errors, '{}'::jsonb) || jsonb_build_object('items', total_items)
+                                'count', errors || jsonb_build_object('items', total_items)
                             ) ORDER BY x_bin::integer, y_bin::integer
                         ), '[]'::json) FROM histogram_bins)
                     WHEN $3 AND NOT $4 THEN
@@ -320,7 +286,7 @@ DB_FUNCTIONS = {
                                 'yBin', y_bin,
                                 'xType', 'numeric',
                                 'yType', 'categorical',
-                                'count', COALESCE(errors, '{}'::jsonb) || jsonb_build_object('items', total_items)
+                                'count', errors || jsonb_build_object('items', total_items)
                             ) ORDER BY x_bin::integer, y_bin
                         ), '[]'::json) FROM histogram_bins)
                     WHEN NOT $3 AND $4 THEN
@@ -331,7 +297,7 @@ DB_FUNCTIONS = {
                                 'yBin', y_bin::integer,
                                 'xType', 'categorical',
                                 'yType', 'numeric',
-                                'count', COALESCE(errors, '{}'::jsonb) || jsonb_build_object('items', total_items)
+                                'count', errors || jsonb_build_object('items', total_items)
                             ) ORDER BY x_bin, y_bin::integer
                         ), '[]'::json) FROM histogram_bins)
                     ELSE
@@ -342,7 +308,7 @@ DB_FUNCTIONS = {
                                 'yBin', y_bin,
                                 'xType', 'categorical',
                                 'yType', 'categorical',
-                                'count', COALESCE(errors, '{}'::jsonb) || jsonb_build_object('items', total_items)
+                                'count', errors || jsonb_build_object('items', total_items)
                             ) ORDER BY x_bin, y_bin
                         ), '[]'::json) FROM histogram_bins)
                 END,
@@ -363,13 +329,106 @@ DB_FUNCTIONS = {
                     ELSE '[]'::json END
                 )
             )
+    $TEMPLATE$
+    $FUNC$;
+    """,
+    "generate_two_d_histogram_with_errors": """
+    -- Single pass kernel, same structure as the 1D histogram: bounds once in double precision, errors<table>
+    -- joined once and one GROUP BY for the item and per error type counts
+    CREATE OR REPLACE FUNCTION generate_two_d_histogram_with_errors(
+        main_table_name text,
+        error_table_name text,
+        x_axis_column text,
+        y_axis_column text,
+        x_bin_count integer DEFAULT 10,
+        y_bin_count integer DEFAULT 10,
+        min_id integer DEFAULT NULL,
+        max_id integer DEFAULT NULL
+    ) RETURNS json
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        result json;
+        x_is_numeric boolean;
+        y_is_numeric boolean;
+    BEGIN
+        -- Check if columns are numeric
+        x_is_numeric := column_is_numeric(main_table_name, x_axis_column);
+        y_is_numeric := column_is_numeric(main_table_name, y_axis_column);
+
+        -- Single unified query for all type combinations
+        EXECUTE format($QUERY$
+            WITH
+            -- Step 1: Get all data rows with optional ID filtering
+            data_rows AS (
+                SELECT
+                    "ID",
+                    %I as x_value,
+                    %I as y_value
+                FROM %I
+                WHERE %I IS NOT NULL
+                  AND %I IS NOT NULL
+                  AND ($1 IS NULL OR "ID" >= $1)
+                  AND ($2 IS NULL OR "ID" <= $2)
+            ),
+            -- Step 2: Get min/max of both axes in one pass (FILTER skips the cast for categorical ones)
+            bounds AS (
+                SELECT
+                    COALESCE(MIN(x_value::double precision) FILTER (WHERE $3), 0) as x_min,
+                    COALESCE(MAX(x_value::double precision) FILTER (WHERE $3), 1) as x_max,
+                    COALESCE(MIN(y_value::double precision) FILTER (WHERE $4), 0) as y_min,
+                    COALESCE(MAX(y_value::double precision) FILTER (WHERE $4), 1) as y_max
+                FROM data_rows
+            ),
+            -- Step 3: Assign bins for both X and Y
+            binned_data AS MATERIALIZED (
+                SELECT
+                    d."ID",
+                    CASE
+                        WHEN $3 THEN  -- x_is_numeric: clamp to [0, bin_count-1]
+                            LEAST(GREATEST(width_bucket(d.x_value::double precision, b.x_min, b.x_max, $5) - 1, 0), $5 - 1)::text
+                        ELSE
+                            d.x_value::text
+                    END as x_bin,
+                    CASE
+                        WHEN $4 THEN  -- y_is_numeric: clamp to [0, bin_count-1]
+                            LEAST(GREATEST(width_bucket(d.y_value::double precision, b.y_min, b.y_max, $6) - 1, 0), $6 - 1)::text
+                        ELSE
+                            d.y_value::text
+                    END as y_bin
+                FROM data_rows d
+                CROSS JOIN bounds b
+            ),
+            -- Step 4: One row per data row plus one per error of either column
+            binned_items AS (
+                SELECT x_bin, y_bin, NULL::text as error_type
+                FROM binned_data
+                UNION ALL
+                SELECT b.x_bin, b.y_bin, e.error_type
+                FROM binned_data b
+                JOIN %I e ON b."ID" = e.row_id
+                WHERE e.column_id IN ($7, $8)
+            ),
+            -- Step 5: Item and error counts per (x_bin, y_bin) pair in a single pass
+            histogram_bins AS (
+                SELECT
+                    x_bin,
+                    y_bin,
+                    COUNT(*) FILTER (WHERE error_type IS NULL) as total_items,
+                    jsonb_strip_nulls(jsonb_build_object(""" + BIN_ERROR_COUNTS + """)) as errors
+                FROM binned_items
+                GROUP BY x_bin, y_bin
+            ),
+            -- Steps 6 to 8: scales and the final JSON
+            %s
         $QUERY$,
             x_axis_column,              -- %I: x column name
             y_axis_column,              -- %I: y column name
             main_table_name,            -- %I: main table name
             x_axis_column,              -- %I: WHERE x IS NOT NULL
             y_axis_column,              -- %I: WHERE y IS NOT NULL
-            error_table_name            -- %I: error table name
+            error_table_name,           -- %I: error table name
+            two_d_histogram_json_query()  -- %s: steps 6 to 8
         )
         USING min_id, max_id, x_is_numeric, y_is_numeric, x_bin_count, y_bin_count, x_axis_column, y_axis_column
         INTO result;
@@ -378,10 +437,253 @@ DB_FUNCTIONS = {
     END;
     $FUNC$;
     """,
+    "generate_two_d_histogram_from_tiles": """
+    -- generate_two_d_histogram_with_errors for the whole table read from heatmap_tiles<table> (app/heatmap_tiles.py)
+    -- instead of the rows: every stored cell knows the range of its values, so it is summed into the coarse bin of
+    -- its lowest value once its highest value lands in the same bin. NULL when a cell straddles two coarse bins or
+    -- the pair has no tiles, the caller then scans the table
+    CREATE OR REPLACE FUNCTION generate_two_d_histogram_from_tiles(
+        main_table_name text,
+        x_axis_column text,
+        y_axis_column text,
+        x_bin_count integer DEFAULT 10,
+        y_bin_count integer DEFAULT 10
+    ) RETURNS json
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        result json;
+        tiles_table text := 'heatmap_tiles' || main_table_name;
+        pairs_table text := 'heatmap_pairs' || main_table_name;
+        x_is_numeric boolean;
+        y_is_numeric boolean;
+        cell_bins text;
+        nested boolean;
+    BEGIN
+        IF to_regclass(quote_ident(pairs_table)) IS NULL OR to_regclass(quote_ident(tiles_table)) IS NULL THEN
+            RETURN NULL;
+        END IF;
+        EXECUTE format('SELECT x_is_numeric, y_is_numeric FROM %I WHERE x_column = $1 AND y_column = $2', pairs_table)
+        INTO x_is_numeric, y_is_numeric
+        USING x_axis_column, y_axis_column;
+        IF x_is_numeric IS NULL THEN
+            RETURN NULL;
+        END IF;
+
+        -- Step 1: Coarse bins of the lowest and highest value of every stored cell, clamped as the scanning kernel
+        -- clamps them: width_bucket puts the maximum in bin count + 1, the kernel counts it in the last bin
+        cell_bins := format($QUERY$
+            cell_ranges AS (
+                SELECT
+                    LEAST(GREATEST(width_bucket(t.x_low, b.x_min, b.x_max, $5) - 1, 0), $5 - 1) as x_low_bin,
+                    LEAST(GREATEST(width_bucket(t.x_high, b.x_min, b.x_max, $5) - 1, 0), $5 - 1) as x_high_bin,
+                    LEAST(GREATEST(width_bucket(t.y_low, b.y_min, b.y_max, $6) - 1, 0), $6 - 1) as y_low_bin,
+                    LEAST(GREATEST(width_bucket(t.y_high, b.y_min, b.y_max, $6) - 1, 0), $6 - 1) as y_high_bin,
+                    t.x_bin as x_category, t.y_bin as y_category,
+                    t.items, """ + error_type_columns("t.{error_type}", ", ") + """
+                FROM %I t
+                JOIN %I b ON b.x_column = t.x_column AND b.y_column = t.y_column
+                WHERE t.x_column = $1 AND t.y_column = $2
+            ),
+            cell_bins AS MATERIALIZED (
+                SELECT
+                    CASE WHEN $3 THEN x_low_bin::text ELSE x_category END as x_bin,
+                    CASE WHEN $4 THEN y_low_bin::text ELSE y_category END as y_bin,
+                    (NOT $3 OR x_low_bin = x_high_bin) AND (NOT $4 OR y_low_bin = y_high_bin) as nested,
+                    items, """ + TILE_ERROR_COLUMNS + """
+                FROM cell_ranges
+            )
+        $QUERY$, tiles_table, pairs_table);
+
+        EXECUTE format('WITH %s SELECT COALESCE(bool_and(nested), true) FROM cell_bins', cell_bins)
+        INTO nested
+        USING x_axis_column, y_axis_column, x_is_numeric, y_is_numeric, x_bin_count, y_bin_count;
+        IF NOT nested THEN
+            RETURN NULL;
+        END IF;
+
+        -- Step 2: Sum the cells per coarse bin, then the same scales and JSON as the scanning kernel
+        EXECUTE format($QUERY$
+            WITH
+            %s,
+            bounds AS (
+                SELECT x_min, x_max, y_min, y_max FROM %I WHERE x_column = $1 AND y_column = $2
+            ),
+            histogram_bins AS (
+                SELECT
+                    x_bin,
+                    y_bin,
+                    SUM(items)::bigint as total_items,
+                    jsonb_strip_nulls(jsonb_build_object(""" + TILE_ERROR_COUNTS + """)) as errors
+                FROM cell_bins
+                GROUP BY x_bin, y_bin
+            ),
+            %s
+        $QUERY$, cell_bins, pairs_table, two_d_histogram_json_query())
+        USING x_axis_column, y_axis_column, x_is_numeric, y_is_numeric, x_bin_count, y_bin_count
+        INTO result;
+
+        RETURN result;
+    END;
+    $FUNC$;
+    """,
+    "scatterplot_error_source": """
+    -- errors<table> as a FROM item that keeps the integer row_id of error_codes<table>, the view casts it to bigint
+    -- which hides the index from joins on "ID". Legacy errors tables are returned as they are
+    CREATE OR REPLACE FUNCTION scatterplot_error_source(
+        main_table_name text,
+        error_table_name text
+    ) RETURNS text
+    LANGUAGE plpgsql
+    AS $FUNC$
+    BEGIN
+        IF to_regclass(quote_ident('error_codes' || main_table_name)) IS NULL THEN
+            RETURN quote_ident(error_table_name);
+        END IF;
+        RETURN format(
+            '(SELECT e.row_id, c.column_id, t.error_type FROM %I e '
+            'JOIN %I c ON c.column_code = e.column_code JOIN error_types t ON t.error_code = e.error_code)',
+            'error_codes' || main_table_name, 'error_columns' || main_table_name);
+    END;
+    $FUNC$;
+    """,
+    "sample_scatterplot_rows": """
+    -- Random IDs for the scatterplot sample without sorting the window by RANDOM(): "ID" is dense and indexed, so
+    -- uniformly drawn IDs are checked against the primary key and the (row_id, column_code) key of
+    -- error_codes<table>, an anti-join keeps the clean rows. Small windows, sparse hits and datasets without the
+    -- encoded error store draw from the window exactly instead
+    CREATE OR REPLACE FUNCTION sample_scatterplot_rows(
+        main_table_name text,
+        error_table_name text,
+        x_axis_column text,
+        y_axis_column text,
+        min_id bigint,
+        max_id bigint,
+        sample_size integer,
+        error_rows boolean
+    ) RETURNS bigint[]
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        exact_window CONSTANT bigint := 10000;
+        error_pool CONSTANT integer := 5000;
+        codes_table text := 'error_codes' || main_table_name;
+        error_relation text := error_table_name;
+        error_match text := 'e.column_id IN ($1, $2)';
+        can_probe boolean := false;
+        column_codes smallint[] := '{}';
+        window_size bigint := max_id - min_id + 1;
+        pool_count bigint;
+        probes bigint;
+        exact_query text;
+        probe_query text;
+        sampled bigint[] := '{}';
+    BEGIN
+        IF sample_size IS NULL OR sample_size <= 0 OR window_size IS NULL OR window_size <= 0 THEN
+            RETURN sampled;
+        END IF;
+
+        -- errors<table> casts row_id, so lookups by ID go to the encoded table directly
+        IF to_regclass(quote_ident(codes_table)) IS NOT NULL THEN
+            EXECUTE format('SELECT COALESCE(array_agg(column_code), ''{}'') FROM %I WHERE column_id IN ($1, $2)',
+                           'error_columns' || main_table_name)
+            INTO column_codes
+            USING x_axis_column, y_axis_column;
+            error_relation := codes_table;
+            error_match := 'e.column_code = ANY($6)';
+            can_probe := true;
+        END IF;
+
+        IF error_rows THEN
+            exact_query := format($QUERY$
+                SELECT COALESCE(array_agg(row_id), '{}') FROM (
+                    SELECT row_id FROM (
+                        SELECT DISTINCT e.row_id::bigint AS row_id FROM %I e
+                        WHERE %s AND e.row_id BETWEEN $3 AND $4
+                    ) d
+                    ORDER BY RANDOM()
+                    LIMIT $5
+                ) s
+            $QUERY$, error_relation, error_match);
+        ELSE
+            exact_query := format($QUERY$
+                SELECT COALESCE(array_agg(row_id), '{}') FROM (
+                    SELECT m."ID"::bigint AS row_id FROM %I m
+                    WHERE m."ID" BETWEEN $3 AND $4
+                      AND NOT EXISTS (SELECT 1 FROM %I e WHERE e.row_id = m."ID" AND %s)
+                    ORDER BY RANDOM()
+                    LIMIT $5
+                ) s
+            $QUERY$, main_table_name, error_relation, error_match);
+        END IF;
+
+        -- how many probes to start with: error rows are counted up to error_pool, fewer than that are drawn exactly
+        IF can_probe AND error_rows THEN
+            EXECUTE format('SELECT count(*) FROM (SELECT 1 FROM %I e WHERE %s AND e.row_id BETWEEN $3 AND $4 LIMIT $5) s',
+                           error_relation, error_match)
+            INTO pool_count
+            USING x_axis_column, y_axis_column, min_id, max_id, error_pool + 1, column_codes;
+            IF pool_count > error_pool THEN
+                probes := ceil(2.0 * sample_size * window_size / pool_count)::bigint + 64;
+            END IF;
+        ELSIF can_probe AND window_size > exact_window THEN
+            probes := 2 * sample_size + 64;
+        END IF;
+
+        IF probes IS NULL THEN
+            EXECUTE exact_query INTO sampled
+            USING x_axis_column, y_axis_column, min_id, max_id, sample_size, column_codes;
+            RETURN sampled;
+        END IF;
+
+        -- draws keep their first position, so the IDs come back in draw order without repeats
+        probe_query := format($QUERY$
+            WITH draws AS (
+                SELECT DISTINCT ON (row_id) row_id, draw
+                FROM (
+                    SELECT $3 + floor(RANDOM() * ($4 - $3 + 1))::bigint AS row_id, draw
+                    FROM generate_series(1, $7) AS draw
+                ) r
+                ORDER BY row_id, draw
+            )
+            SELECT COALESCE(array_agg(row_id ORDER BY draw), '{}') FROM (
+                SELECT d.row_id, d.draw FROM draws d
+                WHERE %s
+                  AND %s (SELECT 1 FROM %I e WHERE e.row_id = d.row_id AND %s)
+                ORDER BY d.draw
+                LIMIT $5
+            ) s
+        $QUERY$,
+            CASE WHEN error_rows THEN 'TRUE'
+                 ELSE format('EXISTS (SELECT 1 FROM %I m WHERE m."ID" = d.row_id)', main_table_name) END,
+            CASE WHEN error_rows THEN 'EXISTS' ELSE 'NOT EXISTS' END,
+            error_relation,
+            error_match
+        );
+
+        LOOP
+            EXECUTE probe_query INTO sampled
+            USING x_axis_column, y_axis_column, min_id, max_id, sample_size, column_codes, probes;
+            EXIT WHEN cardinality(sampled) >= sample_size;
+            -- hits are too sparse for probing to beat reading the window
+            IF probes * 4 > window_size THEN
+                EXECUTE exact_query INTO sampled
+                USING x_axis_column, y_axis_column, min_id, max_id, sample_size, column_codes;
+                EXIT;
+            END IF;
+            probes := probes * 4;
+        END LOOP;
+
+        RETURN sampled;
+    END;
+    $FUNC$;
+    """,
     "generate_scatterplot_with_errors": """
     -- Generate scatterplot data with intelligent sampling
     -- Prioritizes rows with errors, then fills with random clean rows
-    -- Simplified version: 4 CTEs instead of 10, fewer table scans
+    -- Simplified version: 4 CTEs instead of 10, fewer table scans. The rows come from sample_scatterplot_rows,
+    -- sample_seed makes the sample repeatable
+    DROP FUNCTION IF EXISTS generate_scatterplot_with_errors(text, text, text, text, integer, integer, integer, integer);
     CREATE OR REPLACE FUNCTION generate_scatterplot_with_errors(
         main_table_name text,
         error_table_name text,
@@ -390,7 +692,8 @@ DB_FUNCTIONS = {
         error_sample_size integer DEFAULT 30,
         total_sample_size integer DEFAULT 100,
         min_id integer DEFAULT NULL,
-        max_id integer DEFAULT NULL
+        max_id integer DEFAULT NULL,
+        sample_seed integer DEFAULT NULL
     ) RETURNS json
     LANGUAGE plpgsql
     AS $FUNC$
@@ -398,50 +701,38 @@ DB_FUNCTIONS = {
         result json;
         x_is_numeric boolean;
         y_is_numeric boolean;
+        first_id bigint;
+        last_id bigint;
+        error_ids bigint[];
+        clean_ids bigint[];
+        error_source text := scatterplot_error_source(main_table_name, error_table_name);
     BEGIN
         -- Check if columns are numeric
-        SELECT data_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint')
-        INTO x_is_numeric
-        FROM information_schema.columns
-        WHERE table_name = main_table_name AND column_name = x_axis_column;
+        x_is_numeric := column_is_numeric(main_table_name, x_axis_column);
+        y_is_numeric := column_is_numeric(main_table_name, y_axis_column);
 
-        SELECT data_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint')
-        INTO y_is_numeric
-        FROM information_schema.columns
-        WHERE table_name = main_table_name AND column_name = y_axis_column;
+        IF sample_seed IS NOT NULL THEN
+            PERFORM setseed(sample_seed / 2147483648.0);
+        END IF;
+
+        -- The IDs the window actually holds, read from the primary key
+        EXECUTE format('SELECT MIN("ID"), MAX("ID") FROM %I WHERE ($1 IS NULL OR "ID" >= $1) AND ($2 IS NULL OR "ID" <= $2)',
+                       main_table_name)
+        INTO first_id, last_id
+        USING min_id, max_id;
+
+        -- Sample IDs (prioritize errors, then clean rows)
+        error_ids := sample_scatterplot_rows(main_table_name, error_table_name, x_axis_column, y_axis_column,
+                                             first_id, last_id, error_sample_size, true);
+        clean_ids := sample_scatterplot_rows(main_table_name, error_table_name, x_axis_column, y_axis_column,
+                                             first_id, last_id, GREATEST(total_sample_size - error_sample_size, 0), false);
 
         -- Build scatterplot with intelligent sampling
         EXECUTE format($QUERY$
             WITH
-            -- Step 1: Sample IDs (prioritize errors, then clean rows)
+            -- Step 1: The sampled IDs
             all_sampled_ids AS (
-                (
-                    -- Sample error rows
-                    SELECT e.row_id
-                    FROM %I e
-                    WHERE e.column_id IN ($1, $2)
-                      AND ($3 IS NULL OR e.row_id >= $3)
-                      AND ($4 IS NULL OR e.row_id <= $4)
-                    ORDER BY RANDOM()
-                    LIMIT $5
-                )
-                UNION ALL
-                (
-                    -- Sample clean rows to fill quota
-                    SELECT "ID" as row_id
-                    FROM %I
-                    WHERE ($3 IS NULL OR "ID" >= $3)
-                      AND ($4 IS NULL OR "ID" <= $4)
-                      AND "ID" NOT IN (
-                          SELECT DISTINCT row_id
-                          FROM %I
-                          WHERE column_id IN ($1, $2)
-                            AND ($3 IS NULL OR row_id >= $3)
-                            AND ($4 IS NULL OR row_id <= $4)
-                      )
-                    ORDER BY RANDOM()
-                    LIMIT GREATEST($6 - $5, 0)
-                )
+                SELECT unnest($9::bigint[]) AS row_id
             ),
             -- Step 2: Get data for sampled IDs with error aggregation
             sampled_data AS (
@@ -455,7 +746,7 @@ DB_FUNCTIONS = {
                     ) as error_list
                 FROM all_sampled_ids s
                 JOIN %I m ON s.row_id = m."ID"
-                LEFT JOIN %I e ON s.row_id = e.row_id AND e.column_id IN ($1, $2)
+                LEFT JOIN %s e ON s.row_id = e.row_id AND e.column_id IN ($1, $2)
                 GROUP BY m."ID", m.%I, m.%I
             ),
             -- Step 3: Pre-compute numeric bounds for X axis
@@ -527,23 +818,484 @@ DB_FUNCTIONS = {
                 )
             )
         $QUERY$,
-            error_table_name,       -- %I: error table for sampling
-            main_table_name,        -- %I: main table for clean sampling
-            error_table_name,       -- %I: error table for NOT IN subquery
             x_axis_column,          -- %I: x column
             y_axis_column,          -- %I: y column
             main_table_name,        -- %I: main table for data join
-            error_table_name,       -- %I: error table for error aggregation
+            error_source,           -- %s: errors for the aggregation
             x_axis_column,          -- %I: x column in GROUP BY
             y_axis_column           -- %I: y column in GROUP BY
         )
-        USING x_axis_column, y_axis_column, min_id, max_id, error_sample_size, total_sample_size, x_is_numeric, y_is_numeric
+        USING x_axis_column, y_axis_column, min_id, max_id, error_sample_size, total_sample_size, x_is_numeric, y_is_numeric,
+              error_ids || clean_ids
+        INTO result;
+
+        RETURN result;
+    END;
+    $FUNC$;
+    """,
+    "generate_scatterplot_density": """
+    -- Density mode of the scatterplot: every row of the window lands in a cell of a grid_width x grid_height pixel
+    -- grid, each non empty cell reports its clean and error row counts so the payload follows the grid and not the
+    -- row count. Numeric axes are split evenly between their bounds, categorical axes give the most frequent
+    -- categories a cell each and put the rest in one "other" cell. A sample of error rows is overlaid as points
+    CREATE OR REPLACE FUNCTION generate_scatterplot_density(
+        main_table_name text,
+        error_table_name text,
+        x_axis_column text,
+        y_axis_column text,
+        grid_width integer DEFAULT 100,
+        grid_height integer DEFAULT 100,
+        min_id integer DEFAULT NULL,
+        max_id integer DEFAULT NULL,
+        error_overlay_size integer DEFAULT 30,
+        sample_seed integer DEFAULT NULL
+    ) RETURNS json
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        result json;
+        x_is_numeric boolean;
+        y_is_numeric boolean;
+        x_min double precision;
+        x_max double precision;
+        y_min double precision;
+        y_max double precision;
+        x_labels text[] := '{}';
+        y_labels text[] := '{}';
+        x_other boolean := false;
+        y_other boolean := false;
+        x_cells integer := grid_width;
+        y_cells integer := grid_height;
+        x_cell text := 'LEAST(GREATEST(width_bucket(d.x_value::double precision, $3, $4, $5) - 1, 0), $5 - 1)';
+        y_cell text := 'LEAST(GREATEST(width_bucket(d.y_value::double precision, $6, $7, $8) - 1, 0), $8 - 1)';
+        x_join text := '';
+        y_join text := '';
+        overlay json;
+    BEGIN
+        -- Check if columns are numeric
+        x_is_numeric := column_is_numeric(main_table_name, x_axis_column);
+        y_is_numeric := column_is_numeric(main_table_name, y_axis_column);
+
+        -- Bounds of the numeric axes from the catalog when the window covers the whole table, otherwise one scan
+        IF x_is_numeric THEN
+            SELECT min_val, max_val INTO x_min, x_max
+            FROM column_stats_bounds(main_table_name, x_axis_column, min_id, max_id);
+        END IF;
+        IF y_is_numeric THEN
+            SELECT min_val, max_val INTO y_min, y_max
+            FROM column_stats_bounds(main_table_name, y_axis_column, min_id, max_id);
+        END IF;
+        IF (x_is_numeric AND x_min IS NULL) OR (y_is_numeric AND y_min IS NULL) THEN
+            EXECUTE format($QUERY$
+                SELECT
+                    MIN(%I::double precision) FILTER (WHERE $3),
+                    MAX(%I::double precision) FILTER (WHERE $3),
+                    MIN(%I::double precision) FILTER (WHERE $4),
+                    MAX(%I::double precision) FILTER (WHERE $4)
+                FROM %I
+                WHERE ($1 IS NULL OR "ID" >= $1)
+                  AND ($2 IS NULL OR "ID" <= $2)
+            $QUERY$, x_axis_column, x_axis_column, y_axis_column, y_axis_column, main_table_name)
+            INTO x_min, x_max, y_min, y_max
+            USING min_id, max_id, x_is_numeric, y_is_numeric;
+        END IF;
+        -- width_bucket needs two distinct bounds, a constant axis fills the first cell
+        x_min := COALESCE(x_min, 0);
+        x_max := GREATEST(COALESCE(x_max, 1), x_min + 1e-9 * GREATEST(abs(x_min), 1));
+        y_min := COALESCE(y_min, 0);
+        y_max := GREATEST(COALESCE(y_max, 1), y_min + 1e-9 * GREATEST(abs(y_min), 1));
+
+        -- Categories of the categorical axes, the grid_width - 1 most frequent ones when there are too many
+        IF NOT x_is_numeric THEN
+            EXECUTE format($QUERY$
+                SELECT COALESCE(array_agg(value ORDER BY frequency DESC, value), '{}') FROM (
+                    SELECT %I::text AS value, count(*) AS frequency FROM %I
+                    WHERE %I IS NOT NULL AND ($1 IS NULL OR "ID" >= $1) AND ($2 IS NULL OR "ID" <= $2)
+                    GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT $3 + 1
+                ) s
+            $QUERY$, x_axis_column, main_table_name, x_axis_column)
+            INTO x_labels
+            USING min_id, max_id, grid_width;
+            IF cardinality(x_labels) > grid_width THEN
+                x_labels := x_labels[1:grid_width - 1];
+                x_other := true;
+            END IF;
+            SELECT COALESCE(array_agg(label ORDER BY label), '{}') INTO x_labels FROM unnest(x_labels) label;
+            x_cells := cardinality(x_labels);
+            x_cell := 'COALESCE(xl.cell - 1, $5)';
+            x_join := 'LEFT JOIN unnest($9::text[]) WITH ORDINALITY xl(label, cell) ON xl.label = d.x_value::text';
+        END IF;
+        IF NOT y_is_numeric THEN
+            EXECUTE format($QUERY$
+                SELECT COALESCE(array_agg(value ORDER BY frequency DESC, value), '{}') FROM (
+                    SELECT %I::text AS value, count(*) AS frequency FROM %I
+                    WHERE %I IS NOT NULL AND ($1 IS NULL OR "ID" >= $1) AND ($2 IS NULL OR "ID" <= $2)
+                    GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT $3 + 1
+                ) s
+            $QUERY$, y_axis_column, main_table_name, y_axis_column)
+            INTO y_labels
+            USING min_id, max_id, grid_height;
+            IF cardinality(y_labels) > grid_height THEN
+                y_labels := y_labels[1:grid_height - 1];
+                y_other := true;
+            END IF;
+            SELECT COALESCE(array_agg(label ORDER BY label), '{}') INTO y_labels FROM unnest(y_labels) label;
+            y_cells := cardinality(y_labels);
+            y_cell := 'COALESCE(yl.cell - 1, $8)';
+            y_join := 'LEFT JOIN unnest($10::text[]) WITH ORDINALITY yl(label, cell) ON yl.label = d.y_value::text';
+        END IF;
+
+        -- The error points drawn over the grid
+        overlay := generate_scatterplot_with_errors(main_table_name, error_table_name, x_axis_column, y_axis_column,
+                                                    error_overlay_size, error_overlay_size, min_id, max_id,
+                                                    sample_seed) -> 'data';
+
+        EXECUTE format($QUERY$
+            WITH
+            -- Step 1: Rows of the window that have both coordinates
+            data_rows AS (
+                SELECT "ID", %I AS x_value, %I AS y_value
+                FROM %I
+                WHERE %I IS NOT NULL
+                  AND %I IS NOT NULL
+                  AND ($1 IS NULL OR "ID" >= $1)
+                  AND ($2 IS NULL OR "ID" <= $2)
+            ),
+            -- Step 2: Rows with an error in either column
+            error_rows AS (
+                SELECT DISTINCT e.row_id
+                FROM %s e
+                WHERE e.column_id IN ($11, $12)
+                  AND ($1 IS NULL OR e.row_id >= $1)
+                  AND ($2 IS NULL OR e.row_id <= $2)
+            ),
+            -- Step 3: Clean and error rows per cell in a single pass, grouped on one key x_cell * height + y_cell
+            cells AS (
+                SELECT
+                    (%s) * $18 + (%s) AS cell,
+                    COUNT(*) FILTER (WHERE er.row_id IS NULL) AS clean,
+                    COUNT(er.row_id) AS errors
+                FROM data_rows d
+                LEFT JOIN error_rows er ON er.row_id = d."ID"
+                %s
+                %s
+                GROUP BY 1
+            )
+            SELECT json_build_object(
+                'xType', CASE WHEN $13 THEN 'numeric' ELSE 'categorical' END,
+                'yType', CASE WHEN $14 THEN 'numeric' ELSE 'categorical' END,
+                'width', $5 + CASE WHEN $15 THEN 1 ELSE 0 END,
+                'height', $18,
+                'cells', (
+                    SELECT COALESCE(json_agg(
+                        json_build_object('xBin', cell / $18, 'yBin', mod(cell, $18), 'clean', clean, 'errors', errors)
+                        ORDER BY cell
+                    ), '[]'::json)
+                    FROM cells
+                ),
+                'scaleX', json_build_object(
+                    'numeric', CASE WHEN $13 THEN json_build_array($3, $4) ELSE '[]'::json END,
+                    'categorical', to_json($9::text[]),
+                    'other', $15
+                ),
+                'scaleY', json_build_object(
+                    'numeric', CASE WHEN $14 THEN json_build_array($6, $7) ELSE '[]'::json END,
+                    'categorical', to_json($10::text[]),
+                    'other', $16
+                ),
+                'overlay', COALESCE($17, '[]'::json)
+            )
+        $QUERY$,
+            x_axis_column,              -- %I: x column
+            y_axis_column,              -- %I: y column
+            main_table_name,            -- %I: main table
+            x_axis_column,              -- %I: WHERE x IS NOT NULL
+            y_axis_column,              -- %I: WHERE y IS NOT NULL
+            scatterplot_error_source(main_table_name, error_table_name),  -- %s: errors of the table
+            x_cell,                     -- %s: x cell of a row
+            y_cell,                     -- %s: y cell of a row
+            x_join,                     -- %s: categories of x
+            y_join                      -- %s: categories of y
+        )
+        USING min_id, max_id, x_min, x_max, x_cells, y_min, y_max, y_cells, x_labels, y_labels,
+              x_axis_column, y_axis_column, x_is_numeric, y_is_numeric, x_other, y_other, overlay,
+              y_cells + CASE WHEN y_other THEN 1 ELSE 0 END
         INTO result;
 
         RETURN result;
     END;
     $FUNC$;
     """,
+    "safe_double_precision": """
+    -- text to double precision, NULL when the number is out of its range ('1e400') instead of failing the query
+    CREATE OR REPLACE FUNCTION safe_double_precision(value text) RETURNS double precision
+    LANGUAGE plpgsql
+    IMMUTABLE STRICT
+    AS $FUNC$
+    BEGIN
+        RETURN value::double precision;
+    EXCEPTION WHEN numeric_value_out_of_range OR invalid_text_representation THEN
+        RETURN NULL;
+    END;
+    $FUNC$;
+    """,
+    "detector_numeric_expression": """
+    -- SQL expression for the numeric value of a column, the in-database pd.to_numeric(errors='coerce'):
+    -- numeric columns are cast, booleans count as 0/1 and text is cast only when it looks like a number.
+    -- Text with a 3 digit exponent or too many digits may not fit a double precision and goes through
+    -- safe_double_precision, the other numbers keep the plain cast
+    CREATE OR REPLACE FUNCTION detector_numeric_expression(
+        main_table_name text,
+        target_column text
+    ) RETURNS text
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        column_type text;
+    BEGIN
+        SELECT data_type
+        INTO column_type
+        FROM information_schema.columns
+        WHERE table_name = main_table_name AND table_schema = current_schema() AND column_name = target_column;
+
+        IF column_type IN ('integer', 'bigint', 'numeric', 'real', 'double precision', 'smallint') THEN
+            RETURN format('%I::double precision', target_column);
+        ELSIF column_type = 'boolean' THEN
+            RETURN format('%I::int::double precision', target_column);
+        ELSIF column_type IN ('text', 'character varying', 'character') THEN
+            RETURN format(
+                $EXPR$CASE WHEN %I ~ """ + DETECTOR_NUMBER_PATTERN + """ THEN
+                    CASE WHEN %I ~ '[eE][-+]?\\d{3}' OR length(%I) > 300 THEN safe_double_precision(btrim(%I))
+                    ELSE btrim(%I)::double precision END
+                END$EXPR$,
+                target_column, target_column, target_column, target_column, target_column
+            );
+        END IF;
+        RETURN 'NULL::double precision';
+    END;
+    $FUNC$;
+    """,
+    "detect_missing_errors": """
+    -- missing_value: cells that are NULL or hold one of the MISSING_STRINGS of detectors/vectorized.py
+    CREATE OR REPLACE FUNCTION detect_missing_errors(
+        main_table_name text,
+        target_column text
+    ) RETURNS TABLE(row_id bigint, column_id text, error_type text)
+    LANGUAGE plpgsql
+    AS $FUNC$
+    BEGIN
+        RETURN QUERY EXECUTE format($QUERY$
+            SELECT "ID"::bigint, %L::text, 'missing'::text
+            FROM %I
+            WHERE %I IS NULL OR %I::text IN (""" + DETECTOR_MISSING_STRINGS + """)
+        $QUERY$, target_column, main_table_name, target_column, target_column);
+    END;
+    $FUNC$;
+    """,
+    "detect_anomaly_errors": """
+    -- anomaly: numeric values more than ANOMALY_Z_SCORE sample standard deviations from the column mean,
+    -- columns with fewer than ANOMALY_MIN_NUMERIC numeric values or no spread are skipped
+    CREATE OR REPLACE FUNCTION detect_anomaly_errors(
+        main_table_name text,
+        target_column text
+    ) RETURNS TABLE(row_id bigint, column_id text, error_type text)
+    LANGUAGE plpgsql
+    AS $FUNC$
+    BEGIN
+        RETURN QUERY EXECUTE format($QUERY$
+            WITH
+            numeric_values AS (
+                SELECT "ID", %s AS value
+                FROM %I
+            ),
+            column_stats AS (
+                SELECT COUNT(value) AS n, AVG(value) AS mean, STDDEV_SAMP(value) AS std
+                FROM numeric_values
+            )
+            SELECT v."ID"::bigint, %L::text, 'anomaly'::text
+            FROM numeric_values v
+            CROSS JOIN column_stats s
+            WHERE s.n >= """ + str(ANOMALY_MIN_NUMERIC) + """
+              AND s.std > 0
+              AND abs(v.value - s.mean) > """ + str(ANOMALY_Z_SCORE) + """ * s.std
+        $QUERY$, detector_numeric_expression(main_table_name, target_column), main_table_name, target_column);
+    END;
+    $FUNC$;
+    """,
+    "detect_incomplete_errors": """
+    -- incomplete: values of a text column that occur fewer than INCOMPLETE_RARE_COUNT times,
+    -- columns holding more than INCOMPLETE_FREQUENCY_THRESHOLD numeric values are skipped
+    CREATE OR REPLACE FUNCTION detect_incomplete_errors(
+        main_table_name text,
+        target_column text
+    ) RETURNS TABLE(row_id bigint, column_id text, error_type text)
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        is_text boolean;
+    BEGIN
+        SELECT data_type IN ('text', 'character varying', 'character')
+        INTO is_text
+        FROM information_schema.columns
+        WHERE table_name = main_table_name AND table_schema = current_schema() AND column_name = target_column;
+
+        IF is_text IS NOT TRUE THEN
+            RETURN;
+        END IF;
+
+        RETURN QUERY EXECUTE format($QUERY$
+            WITH
+            counted AS (
+                SELECT
+                    "ID",
+                    %I AS value,
+                    COUNT(*) OVER (PARTITION BY %I) AS value_count,
+                    COUNT(%s) OVER () AS numeric_count
+                FROM %I
+            )
+            SELECT "ID"::bigint, %L::text, 'incomplete'::text
+            FROM counted
+            WHERE value IS NOT NULL
+              AND numeric_count <= """ + str(INCOMPLETE_FREQUENCY_THRESHOLD) + """
+              AND value_count < """ + str(INCOMPLETE_RARE_COUNT) + """
+        $QUERY$, target_column, target_column, detector_numeric_expression(main_table_name, target_column),
+           main_table_name, target_column);
+    END;
+    $FUNC$;
+    """,
+    "detect_mismatch_errors": """
+    -- datatype_mismatch: values of a text column whose type class ('numeric' when the trimmed text
+    -- is digits with an optional decimal part, 'str' otherwise) differs from the majority class.
+    -- Ties go to the class of the most frequent value, as in the python detector
+    CREATE OR REPLACE FUNCTION detect_mismatch_errors(
+        main_table_name text,
+        target_column text
+    ) RETURNS TABLE(row_id bigint, column_id text, error_type text)
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        is_text boolean;
+    BEGIN
+        SELECT data_type IN ('text', 'character varying', 'character')
+        INTO is_text
+        FROM information_schema.columns
+        WHERE table_name = main_table_name AND table_schema = current_schema() AND column_name = target_column;
+
+        IF is_text IS NOT TRUE THEN
+            RETURN;
+        END IF;
+
+        RETURN QUERY EXECUTE format($QUERY$
+            WITH
+            classified AS (
+                SELECT
+                    "ID",
+                    CASE WHEN btrim(%I, """ + DETECTOR_TRIMMED + """) ~ """ + DETECTOR_NUMERIC_STRING_PATTERN + """ THEN 'numeric' ELSE 'str' END AS type_class,
+                    COUNT(*) OVER (PARTITION BY %I) AS value_count
+                FROM %I
+                WHERE %I IS NOT NULL
+            ),
+            class_counts AS (
+                SELECT type_class, COUNT(*) AS n, MAX(value_count) AS top_value_count
+                FROM classified
+                GROUP BY type_class
+            ),
+            majority AS (
+                SELECT type_class
+                FROM class_counts
+                WHERE (SELECT COUNT(*) FROM class_counts) > 1
+                ORDER BY n DESC, top_value_count DESC
+                LIMIT 1
+            )
+            SELECT c."ID"::bigint, %L::text, 'mismatch'::text
+            FROM classified c
+            JOIN majority m ON c.type_class <> m.type_class
+        $QUERY$, target_column, target_column, main_table_name, target_column, target_column);
+    END;
+    $FUNC$;
+    """,
+    "maintain_error_counts": """
+    -- Statement trigger of error_codes<table> keeping error_counts<table> (app/error_store.py) in step with it, the
+    -- rows a statement inserted or deleted are counted per column and error type from its transition tables.
+    -- TG_ARGV[0] is the name of the counts table
+    CREATE OR REPLACE FUNCTION maintain_error_counts()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        counts_table text := TG_ARGV[0];
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            EXECUTE format('UPDATE %I SET error_count = 0 WHERE error_count <> 0', counts_table);
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            EXECUTE format($QUERY$
+                UPDATE %I n
+                SET error_count = n.error_count - o.error_count
+                FROM (
+                    SELECT column_code, error_code, COUNT(*) as error_count
+                    FROM old_rows
+                    GROUP BY column_code, error_code
+                ) o
+                WHERE n.column_code = o.column_code AND n.error_code = o.error_code
+            $QUERY$, counts_table);
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            EXECUTE format($QUERY$
+                INSERT INTO %I AS n (column_code, error_code, error_count)
+                SELECT column_code, error_code, COUNT(*)
+                FROM new_rows
+                GROUP BY column_code, error_code
+                ON CONFLICT (column_code, error_code)
+                DO UPDATE SET error_count = n.error_count + EXCLUDED.error_count
+            $QUERY$, counts_table);
+        END IF;
+
+        RETURN NULL;
+    END;
+    $FUNC$;
+    """,
+    "detect_errors_in_database": """
+    -- Runs the four detectors inside the database and rewrites the encoded error table with one
+    -- INSERT ... SELECT, the data never leaves Postgres. The columns come from the column lookup table of the
+    -- dataset and the error types are encoded through error_types. Returns the number of error rows written
+    CREATE OR REPLACE FUNCTION detect_errors_in_database(
+        main_table_name text,
+        error_codes_table_name text,
+        error_columns_table_name text
+    ) RETURNS bigint
+    LANGUAGE plpgsql
+    AS $FUNC$
+    DECLARE
+        error_count bigint;
+    BEGIN
+        EXECUTE format('TRUNCATE %I', error_codes_table_name);
+
+        EXECUTE format($QUERY$
+            INSERT INTO %I (row_id, column_code, error_code)
+            SELECT d.row_id, c.column_code, t.error_code
+            FROM %I c
+            CROSS JOIN LATERAL (
+                SELECT * FROM detect_anomaly_errors(%L, c.column_id)
+                UNION ALL
+                SELECT * FROM detect_incomplete_errors(%L, c.column_id)
+                UNION ALL
+                SELECT * FROM detect_missing_errors(%L, c.column_id)
+                UNION ALL
+                SELECT * FROM detect_mismatch_errors(%L, c.column_id)
+            ) d
+            JOIN error_types t ON t.error_type = d.error_type
+        $QUERY$, error_codes_table_name, error_columns_table_name,
+            main_table_name, main_table_name, main_table_name, main_table_name);
+
+        GET DIAGNOSTICS error_count = ROW_COUNT;
+        RETURN error_count;
+    END;
+    $FUNC$;
+    """,
     # Add more functions here as needed
     # "another_function_name": """CREATE OR REPLACE FUNCTION...""",
 }
@@ -0,0 +1,640 @@
+#Buckaroo Project - October 17, 2026
+#This file answers the plot endpoints of chosen datasets with DuckDB over Parquet snapshots instead of Postgres
+
+import os
+import shutil
+import threading
+import time
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP, localcontext
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+from app.column_stats import table_columns
+from app.error_store import ERROR_TYPE_CODES
+from app.plot_cache import table_version
+from detectors.profile import MISMATCH_TRIMMED, NUMBER_PATTERN, NUMERIC_STRING_BODY
+from detectors.vectorized import ANOMALY_MIN_NUMERIC, ANOMALY_Z_SCORE, DETECTOR_ORDER, EXCLUDED_ERROR_COLUMNS, \
+    INCOMPLETE_FREQUENCY_THRESHOLD, INCOMPLETE_RARE_COUNT, MISSING_STRINGS
+
+"""
+A dataset listed in DUCKDB_DATASETS is exported once per table version to two Parquet files, the data table and
+its errors<table> view, and its 1D histograms, 2D histograms and scatterplots are computed by an in-process DuckDB
+connection over them. The responses are the JSON of generate_one_d_histogram_with_errors,
+generate_two_d_histogram_with_errors and generate_scatterplot_with_errors in app/db_functions.py: the same bins
+(width_bucket is reproduced in double precision), the same per error type counts and the same numbers, including
+the numeric arithmetic Postgres uses for the bin edges of the scales.
+
+Numeric columns keep their type in the snapshot except numeric/decimal ones, which are stored as double precision
+and so only match the Postgres scatterplot values up to 15 significant digits. Other columns are stored as their
+Postgres text, as the histograms bin them.
+
+The errors of these datasets are re-detected over a Parquet export of the data table as well: detect_errors runs
+the four detectors as one DuckDB statement with the rules of the SQL detectors in app/db_functions.py
+(detect_anomaly_errors, detect_incomplete_errors, detect_missing_errors and detect_mismatch_errors).
+"""
+
+# Datasets whose plots are computed by DuckDB, e.g. DUCKDB_DATASETS=gamesbig,crimes in .env. The others are served
+# by the functions in Postgres
+DUCKDB_DATASETS = {name.strip() for name in os.environ.get("DUCKDB_DATASETS", "").split(",") if name.strip()}
+
+# Snapshots are written to SNAPSHOT_DIR/<table>/{data,errors}.parquet
+SNAPSHOT_DIR = Path("snapshots")
+
+# Rows read from Postgres per chunk while exporting a snapshot
+SNAPSHOT_CHUNK_ROWS = 100_000
+
+# Snapshot column type per Postgres data type, the remaining types are exported as text
+SNAPSHOT_TYPES = {
+    "smallint": "BIGINT", "integer": "BIGINT", "bigint": "BIGINT",
+    "real": "FLOAT", "double precision": "DOUBLE", "numeric": "DOUBLE", "decimal": "DOUBLE",
+}
+
+# Significant digits Postgres keeps when casting a float to numeric (FLT_DIG and DBL_DIG)
+FLOAT_DIGITS = {"FLOAT": 6, "DOUBLE": 15}
+
+# The error types of app/error_store.py ERROR_TYPE_CODES, in the key order of a Postgres jsonb object
+# (shorter keys first), the order of the "count" objects of the histograms
+ERROR_TYPES = sorted(ERROR_TYPE_CODES, key=lambda key: (len(key), key))
+
+# Postgres data types the incomplete and datatype_mismatch detectors look at
+TEXT_DATA_TYPES = ("text", "character varying", "character")
+
+# Raised by width_bucket for a constant numeric axis, as in postgres_wrangling/histogram_batch.py
+EQUAL_BOUNDS_ERROR = "lower bound cannot equal upper bound"
+
+
+def use_duckdb(table_name):
+    """True when the plots of table_name are computed by DuckDB"""
+    return table_name in DUCKDB_DATASETS
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Snapshots
+# ─────────────────────────────────────────────────────────────────────────────
+
+class DatasetSnapshot:
+    """
+    Parquet files holding one version of a dataset
+    """
+
+    def __init__(self, table_name, version, directory, column_types, data_types=None):
+        self.table_name = table_name
+        self.version = version
+        self.directory = Path(directory)
+        self.column_types = column_types    # column -> snapshot type, see SNAPSHOT_TYPES
+        self.data_types = data_types or {}  # column -> Postgres data type
+
+    @property
+    def data_path(self):
+        return self.directory / "data.parquet"
+
+    @property
+    def errors_path(self):
+        return self.directory / "errors.parquet"
+
+    def is_numeric(self, column):
+        if column not in self.column_types:
+            raise KeyError(f'column "{column}" does not exist')
+        return self.column_types[column] != "VARCHAR"
+
+    def connect(self):
+        """An in-memory DuckDB connection with the views data and errors over the snapshot"""
+        import duckdb
+        conn = duckdb.connect()
+        for view, path in (("data", self.data_path), ("errors", self.errors_path)):
+            location = str(path).replace("'", "''")
+            conn.execute(f"CREATE VIEW {view} AS SELECT * FROM read_parquet('{location}')")
+        return conn
+
+
+SNAPSHOTS = {}
+SNAPSHOTS_LOCK = threading.Lock()
+SNAPSHOT_BUILD_LOCKS = {}
+
+
+def export_snapshot(table_name, engine, directory=None, with_errors=True):
+    """
+    Writes the data table and errors<table> of a dataset to Parquet
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param directory: where the Parquet files go, SNAPSHOT_DIR/<table> when None
+    :param with_errors: False to leave errors.parquet empty, for the exports the detectors read
+    :return: the DatasetSnapshot, for the table version current when the export started
+    """
+    import duckdb
+    start_time = time.time()
+    version = table_version(table_name, engine)
+    directory = Path(directory) if directory is not None else SNAPSHOT_DIR / table_name
+    staging = directory.parent / f".{directory.name}.staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    duck = duckdb.connect()
+    with engine.connect() as conn:
+        columns = table_columns(conn, table_name)
+        column_types = {name: SNAPSHOT_TYPES.get(data_type, "VARCHAR") for name, data_type in columns}
+        duck.execute("CREATE TABLE data ({})".format(
+            ", ".join(f"{quote_identifier(name)} {column_types[name]}" for name, _ in columns)))
+        duck.execute("CREATE TABLE errors (row_id BIGINT, column_id VARCHAR, error_type VARCHAR)")
+
+        select = ", ".join(
+            quote_identifier(name) + {"VARCHAR": "::text", "DOUBLE": "::double precision"}.get(column_types[name], "")
+            for name, _ in columns
+        )
+        sources = [("data", f"SELECT {select} FROM {quote_identifier(table_name)}")]
+        if with_errors:
+            sources.append(("errors",
+                            f"SELECT row_id, column_id, error_type FROM {quote_identifier('errors' + table_name)}"))
+        streaming = conn.execution_options(stream_results=True)
+        for target, query in sources:
+            for chunk in pd.read_sql_query(text(query), streaming, chunksize=SNAPSHOT_CHUNK_ROWS):
+                duck.register("chunk", chunk)
+                duck.execute(f"INSERT INTO {target} SELECT * FROM chunk")
+                duck.unregister("chunk")
+
+    for target in ("data", "errors"):
+        location = str(staging / f"{target}.parquet").replace("'", "''")
+        duck.execute(f"COPY {target} TO '{location}' (FORMAT parquet)")
+    duck.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+    print(f"[DUCKDB] Snapshot of {table_name} (version {version}) in {time.time() - start_time:.2f}s")
+    return DatasetSnapshot(table_name, version, directory, column_types, dict(columns))
+
+
+def current_snapshot(table_name, engine):
+    """
+    The snapshot of the current table version, exported on the first plot after the process starts or a wrangle
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :return: the DatasetSnapshot
+    """
+    with SNAPSHOTS_LOCK:
+        build_lock = SNAPSHOT_BUILD_LOCKS.setdefault(table_name, threading.Lock())
+    # one export per table at a time, requests arriving during it wait and use its result
+    with build_lock:
+        snapshot = SNAPSHOTS.get(table_name)
+        if snapshot is None or snapshot.version != table_version(table_name, engine):
+            snapshot = export_snapshot(table_name, engine)
+            SNAPSHOTS[table_name] = snapshot
+    return snapshot
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Postgres numeric arithmetic
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _Numeric:
+    """
+    A Postgres numeric value: exact digits and a display scale (digits after the decimal point), enough to follow
+    the +, -, * and / of the scale expressions and print the same JSON number
+    """
+
+    def __init__(self, value, scale):
+        self.value = Decimal(value)
+        self.scale = scale
+
+    @classmethod
+    def from_float(cls, value, digits=15):
+        """float::numeric, Postgres keeps DBL_DIG (or FLT_DIG for real) significant digits"""
+        parsed = Decimal(f"{value:.{digits}g}")
+        return cls(parsed, max(0, -parsed.as_tuple().exponent))
+
+    def __add__(self, other):
+        return _Numeric(self.value + other.value, max(self.scale, other.scale))
+
+    def __sub__(self, other):
+        return _Numeric(self.value - other.value, max(self.scale, other.scale))
+
+    def __mul__(self, other):
+        return _Numeric(self.value * other.value, self.scale + other.scale)
+
+    def __truediv__(self, other):
+        scale = _division_scale(self, other)
+        with localcontext() as context:
+            context.prec = 1000
+            quotient = (self.value / other.value).quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+        return _Numeric(quotient, scale)
+
+    def to_json(self):
+        """The number Postgres prints, parsed back the way psycopg2 does: a float when it has decimals"""
+        if self.scale > 0:
+            return float(self.value)
+        return int(self.value)
+
+
+def _base_10000_digit(value):
+    """(weight, first digit) of a numeric in Postgres' base 10000 representation"""
+    if value == 0:
+        return 0, 0
+    weight = value.copy_abs().adjusted() // 4
+    first = int(value.copy_abs().scaleb(-4 * weight).to_integral_value(rounding=ROUND_FLOOR))
+    return weight, first
+
+
+def _division_scale(dividend, divisor):
+    """select_div_scale of Postgres: 16 significant digits and at least the scales of the inputs"""
+    weight1, first1 = _base_10000_digit(dividend.value)
+    weight2, first2 = _base_10000_digit(divisor.value)
+    quotient_weight = weight1 - weight2
+    if first1 <= first2:
+        quotient_weight -= 1
+    scale = max(16 - quotient_weight * 4, dividend.scale, divisor.scale, 0)
+    return min(scale, 1000)
+
+
+def _numeric_value(value, snapshot_type):
+    """x::numeric of a snapshot value, as a _Numeric"""
+    if snapshot_type == "BIGINT":
+        return _Numeric(int(value), 0)
+    return _Numeric.from_float(value, FLOAT_DIGITS[snapshot_type])
+
+
+def _scale_edges(low, high, bin_count):
+    """
+    The numeric scale of a histogram axis: low + n * (high - low) / bin_count for n and n + 1, in numeric
+    :param low: the lower bound, a float or None
+    :param high: the upper bound, a float or None
+    :return: [{"x0", "x1"}] for every bin
+    """
+    if low is None or high is None:
+        return [{"x0": None, "x1": None} for _ in range(bin_count)]
+    low = _Numeric.from_float(low)
+    width = _Numeric.from_float(high) - low
+    count = _Numeric(bin_count, 0)
+    return [{"x0": (low + _Numeric(n, 0) * width / count).to_json(),
+             "x1": (low + _Numeric(n + 1, 0) * width / count).to_json()}
+            for n in range(bin_count)]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Plots
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _id_window(column, min_id, max_id):
+    """ID window predicate and its parameters"""
+    return f"(CAST(? AS BIGINT) IS NULL OR {column} >= ?) AND (CAST(? AS BIGINT) IS NULL OR {column} <= ?)", \
+        [min_id, min_id, max_id, max_id]
+
+
+def _bin_expression(value, low, high, bin_count):
+    """
+    width_bucket(value, low, high, bin_count) - 1 of Postgres, clamped to 0..bin_count-1
+    :param low: the lower bound expression, a placeholder is bound in the order low, high, low, high, low
+    """
+    bucket = f"""CASE
+        WHEN {value} < {low} THEN 0
+        WHEN {value} >= {high} THEN {bin_count} + 1
+        ELSE LEAST(CAST(floor({bin_count} * (({value} - {low}) / ({high} - {low}))) AS BIGINT), {bin_count} - 1) + 1
+    END"""
+    return f"LEAST(GREATEST({bucket} - 1, 0), {bin_count} - 1)"
+
+
+def _error_counts(row):
+    """The "count" object of a bin from its items and per error type counts"""
+    items, errors = row[0], dict(zip(ERROR_TYPES, row[1:]))
+    count = {"items": items}
+    count.update((error_type, errors[error_type]) for error_type in ERROR_TYPES if errors[error_type])
+    return count
+
+
+ERROR_COUNTS_SQL = ", ".join(
+    ["COUNT(*) FILTER (WHERE error_type IS NULL)"]
+    + [f"COUNT(*) FILTER (WHERE error_type = '{error_type}')" for error_type in ERROR_TYPES]
+)
+
+
+def one_d_histogram(table_name, engine, column, bin_count=10, min_id=None, max_id=None):
+    """
+    generate_one_d_histogram_with_errors computed by DuckDB
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine, used to export the snapshot
+    :param column: the plotted column
+    :param bin_count: number of bins of a numeric column
+    :param min_id: start of the ID window, None for no bound
+    :param max_id: end of the ID window, None for no bound
+    :return: {"histograms", "scaleX"}
+    """
+    snapshot = current_snapshot(table_name, engine)
+    is_numeric = snapshot.is_numeric(column)
+    value = quote_identifier(column)
+    window, window_params = _id_window('"ID"', min_id, max_id)
+    conn = snapshot.connect()
+    try:
+        conn.execute(f"""
+            CREATE TEMP TABLE data_rows AS
+            SELECT "ID", {f"CAST({value} AS DOUBLE)" if is_numeric else value} AS value
+            FROM data WHERE {value} IS NOT NULL AND {window}
+        """, window_params)
+        low, high, rows = conn.execute("SELECT MIN(value), MAX(value), COUNT(*) FROM data_rows").fetchone() \
+            if is_numeric else (None, None, 0)
+        if is_numeric and rows and low == high:
+            raise ValueError(EQUAL_BOUNDS_ERROR)
+        bin_sql = _bin_expression("value", "CAST(? AS DOUBLE)", "CAST(? AS DOUBLE)", int(bin_count)) \
+            if is_numeric else "value"
+        bin_params = [low, high, low, high, low] if is_numeric else []
+        bins = conn.execute(f"""
+            WITH binned AS (SELECT "ID", {bin_sql} AS bin FROM data_rows),
+            items AS (
+                SELECT bin, NULL AS error_type FROM binned
+                UNION ALL
+                SELECT b.bin, e.error_type FROM binned b JOIN errors e ON b."ID" = e.row_id WHERE e.column_id = ?
+            )
+            SELECT bin, {ERROR_COUNTS_SQL} FROM items GROUP BY bin ORDER BY bin
+        """, bin_params + [column]).fetchall()
+    finally:
+        conn.close()
+
+    x_type = "numeric" if is_numeric else "categorical"
+    return {
+        "histograms": [{"xBin": row[0], "xType": x_type, "count": _error_counts(row[1:])} for row in bins],
+        "scaleX": {
+            "numeric": _scale_edges(low, high, int(bin_count)) if is_numeric else [],
+            "categorical": [] if is_numeric else [row[0] for row in bins],
+        },
+    }
+
+
+def two_d_histogram(table_name, engine, x_column, y_column, x_bins=10, y_bins=10, min_id=None, max_id=None):
+    """
+    generate_two_d_histogram_with_errors computed by DuckDB
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine, used to export the snapshot
+    :param x_column: the column on the x axis
+    :param y_column: the column on the y axis
+    :param x_bins: number of bins of a numeric x axis
+    :param y_bins: number of bins of a numeric y axis
+    :param min_id: start of the ID window, None for no bound
+    :param max_id: end of the ID window, None for no bound
+    :return: {"histograms", "scaleX", "scaleY"}
+    """
+    snapshot = current_snapshot(table_name, engine)
+    axes = [(x_column, snapshot.is_numeric(x_column), int(x_bins)), (y_column, snapshot.is_numeric(y_column), int(y_bins))]
+    window, window_params = _id_window('"ID"', min_id, max_id)
+    conn = snapshot.connect()
+    try:
+        values = ", ".join(
+            f"{f'CAST({quote_identifier(column)} AS DOUBLE)' if is_numeric else quote_identifier(column)} AS v{axis}"
+            for axis, (column, is_numeric, _) in enumerate(axes)
+        )
+        conn.execute(f"""
+            CREATE TEMP TABLE data_rows AS
+            SELECT "ID", {values} FROM data
+            WHERE {quote_identifier(x_column)} IS NOT NULL AND {quote_identifier(y_column)} IS NOT NULL AND {window}
+        """, window_params)
+        rows, x_low, x_high, y_low, y_high = conn.execute(
+            "SELECT COUNT(*), {} FROM data_rows".format(", ".join(
+                f"MIN(v{axis}), MAX(v{axis})" if is_numeric else "NULL, NULL"
+                for axis, (_, is_numeric, _) in enumerate(axes)
+            ))
+        ).fetchone()
+        # bounds of an axis without rows are 0 and 1, as the COALESCE of the Postgres function
+        bounds = [(0.0 if low is None else low, 1.0 if high is None else high)
+                  for low, high in ((x_low, x_high), (y_low, y_high))]
+        bin_sql, bin_params = [], []
+        for axis, (_, is_numeric, bin_count) in enumerate(axes):
+            if is_numeric:
+                low, high = bounds[axis]
+                if rows and low == high:
+                    raise ValueError(EQUAL_BOUNDS_ERROR)
+                bin_sql.append(_bin_expression(f"v{axis}", "CAST(? AS DOUBLE)", "CAST(? AS DOUBLE)", bin_count))
+                bin_params += [low, high, low, high, low]
+            else:
+                bin_sql.append(f"v{axis}")
+        bins = conn.execute(f"""
+            WITH binned AS (SELECT "ID", {bin_sql[0]} AS x_bin, {bin_sql[1]} AS y_bin FROM data_rows),
+            items AS (
+                SELECT x_bin, y_bin, NULL AS error_type FROM binned
+                UNION ALL
+                SELECT b.x_bin, b.y_bin, e.error_type
+                FROM binned b JOIN errors e ON b."ID" = e.row_id
+                WHERE e.column_id IN (?, ?)
+            )
+            SELECT x_bin, y_bin, {ERROR_COUNTS_SQL} FROM items GROUP BY x_bin, y_bin ORDER BY x_bin, y_bin
+        """, bin_params + [x_column, y_column]).fetchall()
+    finally:
+        conn.close()
+
+    types = ["numeric" if is_numeric else "categorical" for _, is_numeric, _ in axes]
+    scales = {}
+    for axis, (name, (_, is_numeric, bin_count)) in enumerate(zip(("scaleX", "scaleY"), axes)):
+        scales[name] = {
+            "numeric": _scale_edges(*bounds[axis], bin_count) if is_numeric else [],
+            "categorical": [] if is_numeric else sorted({row[axis] for row in bins}),
+        }
+    return {
+        "histograms": [{"xBin": row[0], "yBin": row[1], "xType": types[0], "yType": types[1],
+                        "count": _error_counts(row[2:])} for row in bins],
+        **scales,
+    }
+
+
+def scatterplot(table_name, engine, x_column, y_column, error_sample_size=30, total_sample_size=100,
+                min_id=None, max_id=None, seed=None):
+    """
+    generate_scatterplot_with_errors computed by DuckDB: up to error_sample_size random error rows of the two
+    columns, then random clean rows up to total_sample_size
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine, used to export the snapshot
+    :param x_column: the column on the x axis
+    :param y_column: the column on the y axis
+    :param error_sample_size: number of sampled error rows
+    :param total_sample_size: number of sampled rows
+    :param min_id: start of the ID window, None for no bound
+    :param max_id: end of the ID window, None for no bound
+    :param seed: integer seed for a repeatable sample, None for a fresh one
+    :return: {"data", "scaleX", "scaleY"}
+    """
+    snapshot = current_snapshot(table_name, engine)
+    columns = [x_column, y_column]
+    numeric = [snapshot.is_numeric(column) for column in columns]
+    error_window, error_params = _id_window("row_id", min_id, max_id)
+    window, window_params = _id_window('"ID"', min_id, max_id)
+    error_sample_size, total_sample_size = int(error_sample_size), int(total_sample_size)
+    conn = snapshot.connect()
+    try:
+        if seed is not None:
+            # random() only repeats its sequence on a single thread
+            conn.execute("SET threads TO 1")
+            conn.execute("SELECT setseed(?)", [int(seed) / 2 ** 31])
+        rows = conn.execute(f"""
+            WITH
+            sampled_ids AS (
+                (SELECT row_id FROM (SELECT DISTINCT row_id FROM errors
+                                     WHERE column_id IN (?, ?) AND {error_window})
+                 ORDER BY random() LIMIT ?)
+                UNION ALL
+                (SELECT "ID" AS row_id FROM data
+                 WHERE {window}
+                   AND "ID" NOT IN (SELECT row_id FROM errors WHERE column_id IN (?, ?) AND {error_window})
+                 ORDER BY random() LIMIT ?)
+            )
+            SELECT m."ID", m.{quote_identifier(x_column)}, m.{quote_identifier(y_column)},
+                   list(e.error_type) FILTER (WHERE e.error_type IS NOT NULL)
+            FROM sampled_ids s
+            JOIN data m ON s.row_id = m."ID"
+            LEFT JOIN errors e ON s.row_id = e.row_id AND e.column_id IN (?, ?)
+            GROUP BY ALL
+            ORDER BY m."ID"
+        """, columns + error_params + [error_sample_size] + window_params + columns + error_params
+             + [max(total_sample_size - error_sample_size, 0)] + columns).fetchall()
+    finally:
+        conn.close()
+
+    types = [snapshot.column_types[column] for column in columns]
+    values = [[None if row[1 + axis] is None else
+               _numeric_value(row[1 + axis], types[axis]) if numeric[axis] else str(row[1 + axis])
+               for row in rows] for axis in range(2)]
+
+    def point_value(axis, index):
+        value = values[axis][index]
+        if value is None:
+            return "null"
+        return value.to_json() if numeric[axis] else value
+
+    def scale(axis):
+        if numeric[axis]:
+            present = [value for value in values[axis] if value is not None]
+            low = min(present, key=lambda value: value.value) if present else _Numeric(0, 0)
+            high = max(present, key=lambda value: value.value) if present else _Numeric(1, 0)
+            return {"numeric": [low.to_json(), (high + _Numeric(1, 0)).to_json()], "categorical": []}
+        labels = sorted({value for value in values[axis] if value is not None})
+        if any(value is None for value in values[axis]):
+            labels.append(None)
+        return {"numeric": [], "categorical": labels}
+
+    return {
+        "data": [{
+            "ID": row[0],
+            "xType": "numeric" if numeric[0] else "categorical",
+            "yType": "numeric" if numeric[1] else "categorical",
+            "x": point_value(0, index),
+            "y": point_value(1, index),
+            "errors": row[3] or [],
+        } for index, row in enumerate(rows)],
+        "scaleX": scale(0),
+        "scaleY": scale(1),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Detectors
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _numeric_expression(column, data_type, snapshot_type):
+    """
+    The numeric value of a snapshot column as detector_numeric_expression reads it: numbers are cast, booleans
+    count as 0/1, text only when it looks like a number and fits a double (NULL for '1e400', as in Postgres)
+    """
+    value = quote_identifier(column)
+    if snapshot_type != "VARCHAR":
+        return f"CAST({value} AS DOUBLE)"
+    if data_type == "boolean":
+        return f"CASE {value} WHEN 'true' THEN 1.0 WHEN 'false' THEN 0.0 END"
+    if data_type in TEXT_DATA_TYPES:
+        number = f"TRY_CAST(trim({value}) AS DOUBLE)"
+        return (f"CASE WHEN regexp_full_match({value}, '{NUMBER_PATTERN}') AND NOT isinf({number}) "
+                f"THEN {number} END")
+    return "CAST(NULL AS DOUBLE)"
+
+
+def _column_detectors(column, data_type, snapshot_type):
+    """
+    :return: the SELECTs of (row_id, column_id, error_type) flagging one column, one per detector that applies
+    """
+    value = quote_identifier(column)
+    name = "'{}'".format(column.replace("'", "''"))
+    numeric = _numeric_expression(column, data_type, snapshot_type)
+    missing_strings = ", ".join(f"'{token}'" for token in MISSING_STRINGS)
+    selects = [
+        f"""SELECT "ID" AS row_id, 'anomaly' AS error_type FROM (
+                SELECT "ID", v, COUNT(v) OVER () AS n, AVG(v) OVER () AS mean, STDDEV_SAMP(v) OVER () AS sd
+                FROM (SELECT "ID", {numeric} AS v FROM data)
+            ) WHERE n >= {ANOMALY_MIN_NUMERIC} AND sd > 0 AND abs(v - mean) > {ANOMALY_Z_SCORE} * sd""",
+        f"""SELECT "ID" AS row_id, 'missing' AS error_type FROM data
+            WHERE {value} IS NULL OR CAST({value} AS VARCHAR) IN ({missing_strings})""",
+    ]
+    if data_type in TEXT_DATA_TYPES:
+        trimmed = f"trim({value}, '{MISMATCH_TRIMMED}')"
+        selects += [
+            f"""SELECT "ID" AS row_id, 'incomplete' AS error_type FROM (
+                    SELECT "ID", {value} AS v, COUNT(*) OVER (PARTITION BY {value}) AS value_count,
+                           COUNT({numeric}) OVER () AS numeric_count
+                    FROM data
+                ) WHERE v IS NOT NULL AND numeric_count <= {INCOMPLETE_FREQUENCY_THRESHOLD}
+                    AND value_count < {INCOMPLETE_RARE_COUNT}""",
+            f"""SELECT "ID" AS row_id, 'mismatch' AS error_type FROM (
+                    WITH classified AS (
+                        SELECT "ID",
+                               CASE WHEN regexp_full_match({trimmed}, '{NUMERIC_STRING_BODY}')
+                                    THEN 'numeric' ELSE 'str' END AS type_class,
+                               COUNT(*) OVER (PARTITION BY {value}) AS value_count
+                        FROM data WHERE {value} IS NOT NULL
+                    ),
+                    class_counts AS (
+                        SELECT type_class, COUNT(*) AS n, MAX(value_count) AS top_value_count
+                        FROM classified GROUP BY type_class
+                    ),
+                    majority AS (
+                        SELECT type_class FROM class_counts
+                        WHERE (SELECT COUNT(*) FROM class_counts) > 1
+                        ORDER BY n DESC, top_value_count DESC LIMIT 1
+                    )
+                    SELECT c."ID" FROM classified c JOIN majority m ON c.type_class <> m.type_class
+                )""",
+        ]
+    return [f"SELECT row_id, {name} AS column_id, error_type FROM ({select})" for select in selects]
+
+
+def detector_query(snapshot):
+    """
+    One statement running the four detectors over the data of a snapshot
+    :param snapshot: the DatasetSnapshot, its data_types tell the text and boolean columns apart
+    :return: SQL returning (row_id, column_id, error_type) ordered by detector, column and row
+    """
+    columns = [column for column in snapshot.column_types if column not in EXCLUDED_ERROR_COLUMNS]
+    selects = [select for column in columns for select in _column_detectors(
+        column, snapshot.data_types.get(column), snapshot.column_types[column])]
+    if not selects:
+        return "SELECT CAST(NULL AS BIGINT) AS row_id, '' AS column_id, '' AS error_type WHERE false"
+    detector_order = ", ".join(f"'{error_type}'" for error_type in DETECTOR_ORDER)
+    column_order = ", ".join("'{}'".format(column.replace("'", "''")) for column in columns)
+    return f"""
+        SELECT row_id, column_id, error_type FROM ({" UNION ALL ".join(selects)})
+        ORDER BY list_position([{detector_order}], error_type), list_position([{column_order}], column_id), row_id
+    """
+
+
+def detect_snapshot_errors(snapshot):
+    """
+    :param snapshot: the DatasetSnapshot whose data is detected
+    :return: long format error dataframe {row_id, column_id, error_type}
+    """
+    conn = snapshot.connect()
+    try:
+        return conn.execute(detector_query(snapshot)).df()
+    finally:
+        conn.close()
+
+
+def detect_errors(table_name, engine):
+    """
+    Re-runs the detectors of a dataset over a Parquet export of its current data, in place of run_detectors or
+    detect_errors_in_database. The export is removed afterwards, the plot snapshot is left as it is
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :return: (long format error dataframe {row_id, column_id, error_type}, the column names of the data table)
+    """
+    start_time = time.time()
+    directory = SNAPSHOT_DIR / ".detection" / table_name
+    try:
+        snapshot = export_snapshot(table_name, engine, directory, with_errors=False)
+        errors = detect_snapshot_errors(snapshot)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(f"[DUCKDB] Detected {len(errors)} errors in {table_name} in {time.time() - start_time:.2f}s")
+    return errors, list(snapshot.column_types)
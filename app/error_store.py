@@ -0,0 +1,433 @@
+#Buckaroo Project - October 17, 2026
+#This file stores the detected errors dictionary encoded, errors<table> is a compatibility view over the encoded rows
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.types import Integer, SmallInteger
+
+from app.bulk_loader import BulkLoader, quote_identifier, LOG_BULK_LOADS
+from detectors.vectorized import EXCLUDED_ERROR_COLUMNS
+
+# Codes of the error types, shared by every dataset through the error_types lookup table
+ERROR_TYPE_CODES = {"anomaly": 1, "incomplete": 2, "missing": 3, "mismatch": 4}
+ERROR_TYPES_TABLE = "error_types"
+
+# row_id is stored as int, the column is widened to bigint if an ID does not fit
+INT_MAX = 2 ** 31 - 1
+
+ENCODED_ERROR_DTYPE = {"row_id": Integer(), "column_code": SmallInteger(), "error_code": SmallInteger()}
+
+
+def error_type_columns(template, separator=",\n"):
+    """
+    One SQL fragment per error type of ERROR_TYPE_CODES, so the queries counting errors per type follow the lookup
+    :param template: SQL with {error_type} where the name of the error type goes
+    :param separator: what the fragments are joined with
+    :return: the joined fragments
+    """
+    return separator.join(template.format(error_type=error_type) for error_type in ERROR_TYPE_CODES)
+
+
+def error_codes_table(table_name):
+    """Table holding the encoded (row_id, column_code, error_code) rows"""
+    return f"error_codes{table_name}"
+
+
+def error_codes_index_name(table_name):
+    """The (column_code, row_id) index of error_codes<table>"""
+    return f"ix_{error_codes_table(table_name)}_column_row"
+
+
+def error_columns_table(table_name):
+    """Lookup table of the column codes of one dataset"""
+    return f"error_columns{table_name}"
+
+
+def error_counts_table(table_name):
+    """Error rows per (column_code, error_code) of error_codes<table>, kept in step by its triggers"""
+    return f"error_counts{table_name}"
+
+
+def errors_view(table_name):
+    """The compatibility view with the old errors<table> columns (row_id, column_id, error_type)"""
+    return f"errors{table_name}"
+
+
+def column_codes_for(columns):
+    """
+    Assigns a code to every column errors can be reported on, in table order starting at 1
+    :param columns: the column names of the data table
+    :return: {column name: code}
+    """
+    names = [column for column in columns if column not in EXCLUDED_ERROR_COLUMNS]
+    return {name: code for code, name in enumerate(names, start=1)}
+
+
+def encode_errors(errors, column_codes):
+    """
+    Turns long format errors into their encoded form
+    :param errors: dataframe {row_id, column_id, error_type}
+    :param column_codes: {column name: code}
+    :return: dataframe {row_id, column_code, error_code}
+    """
+    column_code = errors["column_id"].map(column_codes)
+    error_code = errors["error_type"].map(ERROR_TYPE_CODES)
+    if column_code.isna().any() or error_code.isna().any():
+        unknown = errors.loc[column_code.isna() | error_code.isna(), ["column_id", "error_type"]].drop_duplicates()
+        raise ValueError(f"Cannot encode errors for {unknown.to_dict('records')}")
+    return pd.DataFrame({
+        "row_id": errors["row_id"].to_numpy(dtype=np.int64),
+        "column_code": column_code.to_numpy(dtype=np.int16),
+        "error_code": error_code.to_numpy(dtype=np.int16),
+    })
+
+
+def errors_relation_kind(conn, name):
+    """
+    :return: 'r' for a table, 'v' for a view, None when nothing has that name
+    """
+    return conn.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": quote_identifier(name)},
+    ).scalar()
+
+
+def drop_error_store(conn, table_name):
+    """
+    Drops the errors of a dataset: the view (or a legacy errors<table> table) and the encoded tables
+    :param conn: an open connection inside a transaction
+    :param table_name: the data table
+    :return: None
+    """
+    view = errors_view(table_name)
+    kind = errors_relation_kind(conn, view)
+    if kind == "v":
+        conn.execute(text(f"DROP VIEW IF EXISTS {quote_identifier(view)} CASCADE"))
+    elif kind is not None:
+        conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(view)} CASCADE"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(error_codes_table(table_name))} CASCADE"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(error_columns_table(table_name))} CASCADE"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(error_counts_table(table_name))}"))
+
+
+def error_counts_statements(table_name):
+    """
+    Statements that rebuild error_counts<table> from error_codes<table> and install the statement triggers that
+    keep it in step: maintain_error_counts (app/db_functions.py) adds the rows of every INSERT, subtracts those of
+    every DELETE and zeroes the counts on TRUNCATE, so the wrangles never recount the error rows
+    :param table_name: the data table
+    :return: list of (sql, params) pairs in psycopg2 format
+    """
+    codes = quote_identifier(error_codes_table(table_name))
+    counts = quote_identifier(error_counts_table(table_name))
+    counts_literal = error_counts_table(table_name).replace("'", "''")
+    statements = [
+        (f"DROP TABLE IF EXISTS {counts}", None),
+        (f"""
+            CREATE TABLE {counts} (
+                column_code smallint NOT NULL,
+                error_code smallint NOT NULL,
+                error_count bigint NOT NULL,
+                PRIMARY KEY (column_code, error_code)
+            )
+        """, None),
+        (f"INSERT INTO {counts} (column_code, error_code, error_count) "
+         f"SELECT column_code, error_code, COUNT(*) FROM {codes} GROUP BY column_code, error_code", None),
+    ]
+    transitions = {
+        "INSERT": "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT",
+        "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT",
+        "DELETE": "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT",
+        "TRUNCATE": "FOR EACH STATEMENT",
+    }
+    for event, transition in transitions.items():
+        trigger = quote_identifier(f"maintain_error_counts_{event.lower()}")
+        statements += [
+            (f"DROP TRIGGER IF EXISTS {trigger} ON {codes}", None),
+            (f"CREATE TRIGGER {trigger} AFTER {event} ON {codes} {transition} "
+             f"EXECUTE FUNCTION maintain_error_counts('{counts_literal}')", None),
+        ]
+    return statements
+
+
+def read_error_counts(conn, table_name):
+    """
+    :param conn: an open connection
+    :param table_name: the data table
+    :return: {column: {error type: error rows}} over the whole table in column order, None when the dataset has
+             no error_counts<table>
+    """
+    counts = error_counts_table(table_name)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"),
+                          {"name": quote_identifier(counts)}).scalar_one()
+    if not exists:
+        return None
+    rows = conn.execute(text(f"""
+        SELECT c.column_id, t.error_type, n.error_count
+        FROM {quote_identifier(counts)} n
+        JOIN {quote_identifier(error_columns_table(table_name))} c ON c.column_code = n.column_code
+        JOIN {ERROR_TYPES_TABLE} t ON t.error_code = n.error_code
+        WHERE n.error_count > 0
+        ORDER BY n.column_code, n.error_code
+    """)).all()
+    error_counts = {}
+    for column, error_type, error_count in rows:
+        error_counts.setdefault(column, {})[error_type] = error_count
+    return error_counts
+
+
+def error_dictionary_query(error_source, by_row_ids=False):
+    """
+    SQL building the {column: {row_id: [error types]}} dictionary of create_error_dict inside the database, only
+    the errors of the rows :min_row_id to :max_row_id are read through the row_id key
+    :param error_source: FROM item of the errors with row_id, column_id and error_type (scatterplot_error_source)
+    :param by_row_ids: read the errors of the rows in the :row_ids array instead of the window
+    :return: SQL with the :min_row_id and :max_row_id (or :row_ids) parameters returning the dictionary as JSON text
+    """
+    rows = "e.row_id = ANY(:row_ids)" if by_row_ids else "e.row_id BETWEEN :min_row_id AND :max_row_id"
+    return f"""
+        SELECT COALESCE(jsonb_object_agg(column_id, cells), '{{}}'::jsonb)::text
+        FROM (
+            SELECT column_id, jsonb_object_agg(row_id, error_types) as cells
+            FROM (
+                SELECT e.column_id, e.row_id, jsonb_agg(e.error_type ORDER BY e.error_type) as error_types
+                FROM {error_source} e
+                WHERE {rows}
+                GROUP BY e.column_id, e.row_id
+            ) per_cell
+            GROUP BY column_id
+        ) per_column
+    """
+
+
+def read_error_dictionary(conn, table_name, max_row_id, min_row_id=1):
+    """
+    :param conn: an open connection
+    :param table_name: the data table
+    :param max_row_id: the last row whose errors are returned
+    :param min_row_id: the first row whose errors are returned
+    :return: the JSON text of the {column: {row_id: [error types]}} dictionary of the rows min_row_id to max_row_id
+    """
+    error_source = conn.execute(text("SELECT scatterplot_error_source(:table, :errors)"),
+                                {"table": table_name, "errors": errors_view(table_name)}).scalar_one()
+    return conn.execute(text(error_dictionary_query(error_source)), {"min_row_id": int(min_row_id), "max_row_id": int(max_row_id)}).scalar_one()
+
+
+def read_page_error_dictionary(conn, table_name, row_ids):
+    """
+    :param conn: an open connection
+    :param table_name: the data table
+    :param row_ids: the IDs of the rows whose errors are returned, e.g. the rows of a table view page
+    :return: the JSON text of the {column: {row_id: [error types]}} dictionary of those rows
+    """
+    error_source = conn.execute(text("SELECT scatterplot_error_source(:table, :errors)"),
+                                {"table": table_name, "errors": errors_view(table_name)}).scalar_one()
+    return conn.execute(text(error_dictionary_query(error_source, by_row_ids=True)),
+                        {"row_ids": [int(row_id) for row_id in row_ids]}).scalar_one()
+
+
+def top_error_columns(error_counts, limit):
+    """
+    :param error_counts: the result of read_error_counts
+    :param limit: number of columns to return
+    :return: the columns with the most error rows, ties in column order as calculate_attribute_rankings sees them
+    """
+    totals = {column: sum(by_type.values()) for column, by_type in error_counts.items()}
+    return sorted(totals, key=lambda column: -totals[column])[:limit]
+
+
+def error_store_statements(table_name, column_codes):
+    """
+    Statements that build everything around a freshly loaded error_codes<table>: the lookup tables, the primary
+    key, the (column_code, row_id) index, error_counts<table> and the errors<table> view. They run in the
+    transaction that swaps the table in, so readers never see the errors of a dataset half built
+    :param table_name: the data table
+    :param column_codes: {column name: code}
+    :return: list of (sql, params) pairs in psycopg2 format
+    """
+    codes = quote_identifier(error_codes_table(table_name))
+    columns = quote_identifier(error_columns_table(table_name))
+    view = quote_identifier(errors_view(table_name))
+    view_literal = view.replace("'", "''")
+    return [
+        (f"""
+            CREATE TABLE IF NOT EXISTS {ERROR_TYPES_TABLE} (
+                error_code smallint PRIMARY KEY,
+                error_type text NOT NULL UNIQUE
+            )
+        """, None),
+        (f"INSERT INTO {ERROR_TYPES_TABLE} (error_code, error_type) "
+         f"SELECT * FROM unnest(%(codes)s::smallint[], %(types)s::text[]) ON CONFLICT DO NOTHING",
+         {"codes": list(ERROR_TYPE_CODES.values()), "types": list(ERROR_TYPE_CODES.keys())}),
+        (f"DROP TABLE IF EXISTS {columns} CASCADE", None),
+        (f"CREATE TABLE {columns} (column_code smallint PRIMARY KEY, column_id text NOT NULL UNIQUE)", None),
+        (f"INSERT INTO {columns} (column_code, column_id) "
+         f"SELECT * FROM unnest(%(codes)s::smallint[], %(names)s::text[])",
+         {"codes": list(column_codes.values()), "names": [str(name) for name in column_codes]}),
+        (f"ALTER TABLE {codes} ADD PRIMARY KEY (row_id, column_code, error_code)", None),
+        (f"CREATE INDEX IF NOT EXISTS {quote_identifier(error_codes_index_name(table_name))} "
+         f"ON {codes} (column_code, row_id)", None),
+        *error_counts_statements(table_name),
+        # datasets loaded before the encoded schema still have a plain errors table in place of the view
+        (f"""
+            DO $$
+            BEGIN
+                IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('{view_literal}')) = 'r' THEN
+                    DROP TABLE {view} CASCADE;
+                END IF;
+            END $$
+        """, None),
+        (f"""
+            CREATE OR REPLACE VIEW {view} AS
+            SELECT e.row_id::bigint AS row_id, c.column_id, t.error_type
+            FROM {codes} e
+            JOIN {columns} c ON c.column_code = e.column_code
+            JOIN {ERROR_TYPES_TABLE} t ON t.error_code = e.error_code
+        """, None),
+    ]
+
+
+class ErrorStoreLoader:
+    """
+    Loads the errors of a dataset in the encoded schema. Long format error frames are encoded and copied into
+    error_codes<table> through a BulkLoader, finish() swaps the table in together with its lookups, keys and view
+    """
+
+    def __init__(self, table_name, engine, columns):
+        """
+        :param table_name: the data table
+        :param engine: the SQLAlchemy engine
+        :param columns: the column names of the data table, they define the column codes
+        """
+        self.table_name = table_name
+        self.engine = engine
+        self.column_codes = column_codes_for(columns)
+        self.loader = BulkLoader(error_codes_table(table_name), engine, dtype=ENCODED_ERROR_DTYPE)
+        self.wide_ids = False
+
+    def append(self, errors):
+        """
+        Encodes and copies a chunk of long format errors
+        :param errors: dataframe {row_id, column_id, error_type}
+        :return: None
+        """
+        encoded = encode_errors(errors, self.column_codes)
+        if self.loader.columns is None:
+            self.loader.append(encoded.head(0))
+        if not self.wide_ids and len(encoded) > 0 and encoded["row_id"].max() > INT_MAX:
+            self.loader.cursor.execute(
+                f"ALTER TABLE {quote_identifier(self.loader.staging_name)} ALTER COLUMN row_id TYPE bigint"
+            )
+            self.wide_ids = True
+        self.loader.append(encoded)
+
+    def finish(self):
+        """
+        Swaps error_codes<table> in and creates the lookup tables, the keys and the errors<table> view
+        :return: the write statistics of the BulkLoader
+        """
+        self._ensure_staging_table()
+        return self.loader.finish(error_store_statements(self.table_name, self.column_codes))
+
+    def stage(self):
+        """
+        Commits the copied errors to the staging table, for callers that swap error_codes<table> in within the
+        transaction that swaps the data table in
+        :return: (the (sql, params) pairs that swap the errors in with their lookups, keys and view,
+        the write statistics of the BulkLoader)
+        """
+        self._ensure_staging_table()
+        stats = self.loader.stage()
+        return self.loader.swap_statements() + error_store_statements(self.table_name, self.column_codes), stats
+
+    def _ensure_staging_table(self):
+        if self.loader.columns is None:
+            self.append(pd.DataFrame({"row_id": [], "column_id": [], "error_type": []}))
+
+    def abort(self):
+        self.loader.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+def write_errors(errors, table_name, engine, columns):
+    """
+    Replaces the errors of a dataset
+    :param errors: long format dataframe {row_id, column_id, error_type}
+    :param table_name: the data table
+    :param engine: the SQLAlchemy engine
+    :param columns: the column names of the data table
+    :return: the write statistics
+    """
+    if LOG_BULK_LOADS:
+        print(f"[START] Bulk load for errors{table_name}: {len(errors)} rows...")
+    with ErrorStoreLoader(table_name, engine, columns) as loader:
+        loader.append(errors)
+        return loader.finish()
+
+
+def error_row_params(errors):
+    """Long format error rows as the array parameters of an unnest(row_ids, column_ids, error_types)"""
+    return {
+        "row_ids": errors["row_id"].astype("int64").tolist(),
+        "column_ids": errors["column_id"].astype(str).tolist(),
+        "error_types": errors["error_type"].astype(str).tolist(),
+    }
+
+
+def delete_errors_for_rows(conn, table_name, row_ids):
+    """
+    Deletes every error of the given rows
+    :param conn: an open connection inside a transaction
+    :param table_name: the data table
+    :param row_ids: the row IDs
+    :return: None
+    """
+    conn.execute(
+        text(f"DELETE FROM {quote_identifier(error_codes_table(table_name))} WHERE row_id = ANY(:ids)"),
+        {"ids": [int(row_id) for row_id in row_ids]},
+    )
+
+
+def delete_error_rows(conn, table_name, errors):
+    """
+    Deletes specific error rows
+    :param conn: an open connection inside a transaction
+    :param table_name: the data table
+    :param errors: long format dataframe {row_id, column_id, error_type}
+    :return: the number of error rows deleted
+    """
+    return conn.execute(text(f"""
+        DELETE FROM {quote_identifier(error_codes_table(table_name))} e
+        USING unnest(CAST(:row_ids AS bigint[]), CAST(:column_ids AS text[]), CAST(:error_types AS text[]))
+                AS r(row_id, column_id, error_type)
+        JOIN {quote_identifier(error_columns_table(table_name))} c ON c.column_id = r.column_id
+        JOIN {ERROR_TYPES_TABLE} t ON t.error_type = r.error_type
+        WHERE e.row_id = r.row_id AND e.column_code = c.column_code AND e.error_code = t.error_code
+    """), error_row_params(errors)).rowcount
+
+
+def insert_error_rows(conn, table_name, errors):
+    """
+    Inserts error rows, encoding their column and error type with the lookup tables. A row that is already stored
+    violates the primary key and raises, so a caller whose view of the errors drifted does not go unnoticed
+    :param conn: an open connection inside a transaction
+    :param table_name: the data table
+    :param errors: long format dataframe {row_id, column_id, error_type}
+    :return: None
+    """
+    conn.execute(text(f"""
+        INSERT INTO {quote_identifier(error_codes_table(table_name))} (row_id, column_code, error_code)
+        SELECT r.row_id, c.column_code, t.error_code
+        FROM unnest(CAST(:row_ids AS bigint[]), CAST(:column_ids AS text[]), CAST(:error_types AS text[]))
+                AS r(row_id, column_id, error_type)
+        JOIN {quote_identifier(error_columns_table(table_name))} c ON c.column_id = r.column_id
+        JOIN {ERROR_TYPES_TABLE} t ON t.error_type = r.error_type
+    """), error_row_params(errors))
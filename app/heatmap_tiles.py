@@ -0,0 +1,244 @@
+#Buckaroo Project - October 17, 2026
+#This file keeps heatmap_tiles<table>, fine 2D bin counts of the plotted column pairs that coarser heatmaps are summed from
+
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+from app.column_stats import read_column_stats, covers_id_window
+from app.error_store import error_type_columns
+from app.plot_cache import table_version
+
+"""
+The first heatmap of a column pair over the whole table bins every row once into HEATMAP_TILE_BINS bins per numeric
+axis (categorical axes keep one bin per category) and stores the item and per error type counts of each cell with
+the lowest and highest value it holds. generate_two_d_histogram_from_tiles in app/db_functions.py then answers any
+bin count by summing the stored cells, a cell goes to the coarse bin of its lowest value when its highest value
+lands in the same one. With a bin count dividing HEATMAP_TILE_BINS that is every cell but for rounding at the bin
+edges, when a cell straddles two coarse bins or the ID window leaves rows out the table is scanned as before.
+
+The tiles of a pair are stamped with the table version they were built for and rebuilt on the first heatmap after
+it changes, the wrangles and resets also drop them so a restarted process never reads tiles of older data.
+"""
+
+# Fine bins per numeric axis, 360 is divisible by the bin counts 1 to 6, 8, 9, 10, 12, 15, 18, 20, 24, 30, 36, 40, ...
+HEATMAP_TILE_BINS = 360
+
+# Column pairs kept per table, the least recently built are dropped past this count
+HEATMAP_TILE_MAX_PAIRS = 32
+
+# One build per column pair at a time: { (table, x column, y column): Lock }
+TILE_BUILD_LOCKS = {}
+TILE_BUILD_LOCKS_LOCK = threading.Lock()
+
+
+def heatmap_tiles_table(table_name):
+    """The fine cells of every built column pair of table_name"""
+    return f"heatmap_tiles{table_name}"
+
+
+def heatmap_pairs_table(table_name):
+    """One row per built column pair: its table version, axis types and bounds"""
+    return f"heatmap_pairs{table_name}"
+
+
+def axis_expressions(column, is_numeric, bound_min, bound_max):
+    """
+    :return: (fine bin, value) SQL expressions of one axis over the rows d of the data table, the value is NULL for
+             categorical axes
+    """
+    value = f"d.{quote_identifier(column)}"
+    if not is_numeric:
+        return f"{value}::text", "NULL::double precision"
+    fine_bin = (f"LEAST(GREATEST(width_bucket({value}::double precision, {bound_min}, {bound_max}, "
+                f"{HEATMAP_TILE_BINS}) - 1, 0), {HEATMAP_TILE_BINS - 1})::text")
+    return fine_bin, f"{value}::double precision"
+
+
+def build_heatmap_tiles(table_name, x_column, y_column, engine):
+    """
+    Bins every row of the table into the fine cells of a column pair, replacing its previous tiles
+    :param table_name: the cleaned table name
+    :param x_column: the column on the x axis
+    :param y_column: the column on the y axis
+    :param engine: the SQLAlchemy engine
+    :return: {"cells", "seconds"}
+    """
+    start_time = time.time()
+    version = table_version(table_name, engine)
+    table = quote_identifier(table_name)
+    errors = quote_identifier(f"errors{table_name}")
+    tiles = quote_identifier(heatmap_tiles_table(table_name))
+    pairs = quote_identifier(heatmap_pairs_table(table_name))
+    x, y = quote_identifier(x_column), quote_identifier(y_column)
+    pair = {"x": x_column, "y": y_column}
+
+    with engine.begin() as conn:
+        # builds of the same pair from other processes wait for this one
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                     {"key": f"{heatmap_tiles_table(table_name)}/{x_column}/{y_column}"})
+        x_numeric, y_numeric = conn.execute(
+            text("SELECT column_is_numeric(:table, :x), column_is_numeric(:table, :y)"),
+            {"table": table_name, **pair},
+        ).one()
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {pairs} (
+                x_column text NOT NULL,
+                y_column text NOT NULL,
+                table_version integer NOT NULL,
+                x_is_numeric boolean NOT NULL,
+                y_is_numeric boolean NOT NULL,
+                x_min double precision NOT NULL,
+                x_max double precision NOT NULL,
+                y_min double precision NOT NULL,
+                y_max double precision NOT NULL,
+                cell_count bigint NOT NULL,
+                built_at timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (x_column, y_column)
+            )
+        """))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {tiles} (
+                x_column text NOT NULL,
+                y_column text NOT NULL,
+                x_bin text NOT NULL,
+                y_bin text NOT NULL,
+                x_low double precision,
+                x_high double precision,
+                y_low double precision,
+                y_high double precision,
+                items bigint NOT NULL,
+                {error_type_columns("{error_type} bigint NOT NULL")}
+            )
+        """))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {quote_identifier('ix_' + heatmap_tiles_table(table_name) + '_pair')} "
+                          f"ON {tiles} (x_column, y_column)"))
+        conn.execute(text(f"DELETE FROM {tiles} WHERE x_column = :x AND y_column = :y"), pair)
+        conn.execute(text(f"DELETE FROM {pairs} WHERE x_column = :x AND y_column = :y"), pair)
+
+        # the bounds of generate_two_d_histogram_with_errors: rows with both values, 0 and 1 when there are none
+        x_min, x_max, y_min, y_max = conn.execute(text(f"""
+            SELECT
+                COALESCE(MIN({x}::double precision) FILTER (WHERE :x_numeric), 0),
+                COALESCE(MAX({x}::double precision) FILTER (WHERE :x_numeric), 1),
+                COALESCE(MIN({y}::double precision) FILTER (WHERE :y_numeric), 0),
+                COALESCE(MAX({y}::double precision) FILTER (WHERE :y_numeric), 1)
+            FROM {table}
+            WHERE {x} IS NOT NULL AND {y} IS NOT NULL
+        """ if x_numeric or y_numeric else "SELECT 0.0, 1.0, 0.0, 1.0"),
+            {"x_numeric": x_numeric, "y_numeric": y_numeric}).one()
+
+        x_bin, x_value = axis_expressions(x_column, x_numeric, ":x_min", ":x_max")
+        y_bin, y_value = axis_expressions(y_column, y_numeric, ":y_min", ":y_max")
+        cell_count = conn.execute(text(f"""
+            WITH
+            binned_data AS MATERIALIZED (
+                SELECT d."ID", {x_bin} as x_bin, {y_bin} as y_bin, {x_value} as x_value, {y_value} as y_value
+                FROM {table} d
+                WHERE d.{x} IS NOT NULL AND d.{y} IS NOT NULL
+            ),
+            binned_items AS (
+                SELECT x_bin, y_bin, x_value, y_value, NULL::text as error_type
+                FROM binned_data
+                UNION ALL
+                SELECT b.x_bin, b.y_bin, b.x_value, b.y_value, e.error_type
+                FROM binned_data b
+                JOIN {errors} e ON b."ID" = e.row_id
+                WHERE e.column_id IN (:x, :y)
+            ),
+            inserted AS (
+                INSERT INTO {tiles}
+                SELECT
+                    :x, :y, x_bin, y_bin,
+                    MIN(x_value), MAX(x_value), MIN(y_value), MAX(y_value),
+                    COUNT(*) FILTER (WHERE error_type IS NULL),
+                    {error_type_columns("COUNT(*) FILTER (WHERE error_type = '{error_type}')")}
+                FROM binned_items
+                GROUP BY x_bin, y_bin
+                RETURNING 1
+            )
+            SELECT COUNT(*) FROM inserted
+        """), {**pair, "x_min": x_min, "x_max": x_max, "y_min": y_min, "y_max": y_max}).scalar_one()
+
+        conn.execute(text(f"""
+            INSERT INTO {pairs} (x_column, y_column, table_version, x_is_numeric, y_is_numeric,
+                                 x_min, x_max, y_min, y_max, cell_count)
+            VALUES (:x, :y, :version, :x_numeric, :y_numeric, :x_min, :x_max, :y_min, :y_max, :cells)
+        """), {**pair, "version": version, "x_numeric": x_numeric, "y_numeric": y_numeric,
+               "x_min": x_min, "x_max": x_max, "y_min": y_min, "y_max": y_max, "cells": cell_count})
+
+        stale = conn.execute(text(f"""
+            DELETE FROM {pairs} WHERE (x_column, y_column) IN (
+                SELECT x_column, y_column FROM {pairs} ORDER BY built_at DESC OFFSET :keep
+            ) RETURNING x_column, y_column
+        """), {"keep": HEATMAP_TILE_MAX_PAIRS}).all()
+        for stale_x, stale_y in stale:
+            conn.execute(text(f"DELETE FROM {tiles} WHERE x_column = :x AND y_column = :y"),
+                         {"x": stale_x, "y": stale_y})
+
+    seconds = time.time() - start_time
+    print(f"[TILES] {heatmap_tiles_table(table_name)} ({x_column}, {y_column}): {cell_count} cells in {seconds:.2f}s")
+    return {"cells": cell_count, "seconds": round(seconds, 3)}
+
+
+def tiles_version(conn, table_name, x_column, y_column):
+    """The table version the tiles of a column pair were built for, None when the pair has no tiles"""
+    pairs = heatmap_pairs_table(table_name)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"),
+                          {"name": quote_identifier(pairs)}).scalar_one()
+    if not exists:
+        return None
+    return conn.execute(text(f"SELECT table_version FROM {quote_identifier(pairs)} WHERE x_column = :x AND y_column = :y"),
+                        {"x": x_column, "y": y_column}).scalar()
+
+
+def heatmap_from_tiles(table_name, x_column, y_column, x_bins, y_bins, min_id, max_id, engine):
+    """
+    The response of generate_two_d_histogram_with_errors summed from the tiles of the column pair, which are built
+    on the first request of the current table version
+    :param table_name: the cleaned table name
+    :param x_column: the column on the x axis
+    :param y_column: the column on the y axis
+    :param x_bins: number of x bins
+    :param y_bins: number of y bins
+    :param min_id: start of the ID window
+    :param max_id: end of the ID window
+    :param engine: the SQLAlchemy engine
+    :return: the histogram, None when the tiles cannot answer and the table has to be scanned
+    """
+    try:
+        with engine.connect() as conn:
+            if not covers_id_window(read_column_stats(conn, table_name, ["ID"]), min_id, max_id):
+                return None
+        with TILE_BUILD_LOCKS_LOCK:
+            build_lock = TILE_BUILD_LOCKS.setdefault((table_name, x_column, y_column), threading.Lock())
+        with build_lock:
+            with engine.connect() as conn:
+                built_version = tiles_version(conn, table_name, x_column, y_column)
+            if built_version != table_version(table_name, engine):
+                build_heatmap_tiles(table_name, x_column, y_column, engine)
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT generate_two_d_histogram_from_tiles(:table, :x, :y, :x_bins, :y_bins)"),
+                {"table": table_name, "x": x_column, "y": y_column, "x_bins": int(x_bins), "y_bins": int(y_bins)},
+            ).scalar()
+    except Exception as e:
+        print(f"Warning: Could not use the heatmap tiles of {table_name} ({x_column}, {y_column}): {e}")
+        return None
+
+
+def drop_heatmap_tiles(conn, table_name):
+    """Drops the tiles of every column pair, the next heatmaps rebuild them"""
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(heatmap_tiles_table(table_name))}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_identifier(heatmap_pairs_table(table_name))}"))
+
+
+def discard_heatmap_tiles(table_name, engine):
+    """drop_heatmap_tiles in its own transaction, for the wrangles whose data changed"""
+    try:
+        with engine.begin() as conn:
+            drop_heatmap_tiles(conn, table_name)
+    except Exception as e:
+        print(f"Warning: Could not drop the heatmap tiles of {table_name}: {e}")
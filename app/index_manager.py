@@ -0,0 +1,167 @@
+#Buckaroo Project - October 17, 2026
+#This file creates the keys and indexes of a dataset after ingest and after its errors are rewritten
+
+import time
+
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+from app.error_store import error_codes_table, error_codes_index_name, errors_view, errors_relation_kind
+
+# BRIN indexes on the ID columns serve ID window filters on big tables at a fraction of the size of a btree,
+# they are only built for tables with at least BRIN_INDEX_MIN_ROWS rows
+CREATE_BRIN_INDEXES = True
+BRIN_INDEX_MIN_ROWS = 1_000_000
+
+
+def primary_key_name(table_name):
+    return f"{table_name}_pkey"
+
+
+def brin_index_name(table_name, column):
+    return f"brin_{table_name}_{column}"
+
+
+def relation_exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": quote_identifier(name)}).scalar_one()
+
+
+def has_primary_key(conn, name):
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'p')"
+    ), {"name": quote_identifier(name)}).scalar_one()
+
+
+def table_row_estimate(conn, name):
+    """Row count from the planner statistics, counted exactly when the table was never analyzed"""
+    estimate = conn.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"), {"name": quote_identifier(name)}
+    ).scalar()
+    if estimate is None or estimate < 0:
+        estimate = conn.execute(text(f"SELECT COUNT(*) FROM {quote_identifier(name)}")).scalar_one()
+    return estimate
+
+
+def needs_analyze(conn, name):
+    """True when the table was never analyzed or was modified since its last ANALYZE"""
+    return conn.execute(text("""
+        SELECT COALESCE(last_analyze, last_autoanalyze) IS NULL OR n_mod_since_analyze > 0
+        FROM pg_stat_user_tables
+        WHERE relid = to_regclass(:name)
+    """), {"name": quote_identifier(name)}).scalar() is not False
+
+
+def dataset_indexes(table_name, engine):
+    """
+    The indexes of the tables of a dataset
+    :param table_name: the data table
+    :param engine: the SQLAlchemy engine
+    :return: {relation: {index name: definition}} for the data table and its error table
+    """
+    with engine.connect() as conn:
+        return dataset_indexes_on(conn, table_name)
+
+
+def dataset_indexes_on(conn, table_name):
+    """dataset_indexes on an open connection"""
+    relations = [table_name, error_codes_table(table_name), errors_view(table_name)]
+    rows = conn.execute(text("""
+        SELECT tablename, indexname, indexdef
+        FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = ANY(:relations)
+        ORDER BY tablename, indexname
+    """), {"relations": relations}).all()
+    indexes = {}
+    for relation, index_name, definition in rows:
+        indexes.setdefault(relation, {})[index_name] = definition
+    return indexes
+
+
+def planned_index_statements(conn, table_name, brin=CREATE_BRIN_INDEXES):
+    """
+    The key and index statements a dataset is still missing
+    :param conn: an open connection
+    :param table_name: the data table
+    :param brin: whether BRIN indexes are wanted for big tables
+    :return: list of (relation, index name, sql) for everything that does not exist yet
+    """
+    planned = []
+    existing = {name for indexes in dataset_indexes_on(conn, table_name).values() for name in indexes}
+
+    if relation_exists(conn, table_name) and not has_primary_key(conn, table_name):
+        planned.append((table_name, primary_key_name(table_name),
+                        f"ALTER TABLE {quote_identifier(table_name)} "
+                        f"ADD CONSTRAINT {quote_identifier(primary_key_name(table_name))} PRIMARY KEY (\"ID\")"))
+
+    codes = error_codes_table(table_name)
+    if relation_exists(conn, codes):
+        if not has_primary_key(conn, codes):
+            planned.append((codes, primary_key_name(codes),
+                            f"ALTER TABLE {quote_identifier(codes)} "
+                            f"ADD PRIMARY KEY (row_id, column_code, error_code)"))
+        if error_codes_index_name(table_name) not in existing:
+            planned.append((codes, error_codes_index_name(table_name),
+                            f"CREATE INDEX {quote_identifier(error_codes_index_name(table_name))} "
+                            f"ON {quote_identifier(codes)} (column_code, row_id)"))
+    else:
+        # datasets loaded before the encoded schema have a plain errors table
+        legacy = errors_view(table_name)
+        legacy_index = f"ix_{legacy}_column_row"
+        legacy_row_index = f"ix_{legacy}_row"
+        if errors_relation_kind(conn, legacy) == "r":
+            if legacy_index not in existing:
+                planned.append((legacy, legacy_index,
+                                f"CREATE INDEX {quote_identifier(legacy_index)} "
+                                f"ON {quote_identifier(legacy)} (column_id, row_id)"))
+            # the ID windows of /api/get-errors
+            if legacy_row_index not in existing:
+                planned.append((legacy, legacy_row_index,
+                                f"CREATE INDEX {quote_identifier(legacy_row_index)} "
+                                f"ON {quote_identifier(legacy)} (row_id)"))
+
+    if brin and relation_exists(conn, table_name) and table_row_estimate(conn, table_name) >= BRIN_INDEX_MIN_ROWS:
+        for relation, column in [(table_name, "ID"), (codes, "row_id")]:
+            name = brin_index_name(relation, column)
+            if relation_exists(conn, relation) and name not in existing:
+                planned.append((relation, name,
+                                f"CREATE INDEX {quote_identifier(name)} "
+                                f"ON {quote_identifier(relation)} USING brin ({quote_identifier(column)})"))
+    return planned
+
+
+def ensure_dataset_indexes(table_name, engine, brin=CREATE_BRIN_INDEXES):
+    """
+    Creates the keys and indexes a dataset is missing and analyzes its tables when their statistics are stale.
+    Indexes that already exist and tables analyzed since their last change are skipped, so calling this again
+    after nothing changed does no work
+    :param table_name: the data table
+    :param engine: the SQLAlchemy engine
+    :param brin: whether BRIN indexes are wanted for big tables
+    :return: dictionary with the created indexes, the analyzed tables, the failures and the elapsed seconds
+    """
+    start_time = time.time()
+    report = {"created": [], "analyzed": [], "failed": []}
+    with engine.connect() as conn:
+        planned = planned_index_statements(conn, table_name, brin)
+
+    # one transaction per index, a table whose IDs are not unique still gets its other indexes
+    for relation, index_name, statement in planned:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(statement))
+            report["created"].append(index_name)
+        except Exception as e:
+            print(f"[INDEX] Could not create {index_name} on {relation}: {e}")
+            report["failed"].append(index_name)
+
+    for relation in [table_name, error_codes_table(table_name), errors_view(table_name)]:
+        with engine.begin() as conn:
+            if errors_relation_kind(conn, relation) != "r" or not needs_analyze(conn, relation):
+                continue
+            conn.execute(text(f"ANALYZE {quote_identifier(relation)}"))
+        report["analyzed"].append(relation)
+
+    report["seconds"] = round(time.time() - start_time, 3)
+    print(f"[INDEX] {table_name}: created {report['created'] or 'nothing'}, "
+          f"analyzed {report['analyzed'] or 'nothing'} in {report['seconds']}s")
+    return report
@@ -0,0 +1,291 @@
+#Buckaroo Project - October 17, 2026
+#This file runs dataset ingestion (parse, detect, write, rank) as background jobs on a local worker pool
+
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.bulk_loader import BulkLoader
+from app.column_stats import refresh_column_stats
+from app.error_store import ErrorStoreLoader
+from app.heatmap_tiles import discard_heatmap_tiles
+from app.bin_cube import discard_bin_cube
+from app.index_manager import ensure_dataset_indexes
+from app.plot_cache import bump_table_version
+from app.service_helpers import run_detectors, calculate_attribute_rankings, rankings_statements
+from app.set_id_column import set_id_column
+from app.streaming_ingest import stream_ingest_csv
+
+# Number of datasets that can be ingested at the same time
+INGEST_WORKER_COUNT = 4
+
+# Files at least this large are ingested chunk by chunk instead of being read into memory at once
+STREAM_INGEST_MIN_BYTES = 64 * 1024 * 1024
+
+# Stages a job moves through, in order, reported by /api/jobs/<id>
+INGEST_STAGES = ["queued", "parse", "detect", "write main", "write errors", "rankings", "statistics", "indexes", "done"]
+
+# --- GLOBAL JOB REGISTRY ---
+# Stores every job by id: { "3f2a...": IngestJob, ... }
+INGEST_JOBS = {}
+INGEST_JOBS_LOCK = threading.Lock()
+INGEST_EXECUTOR = ThreadPoolExecutor(max_workers=INGEST_WORKER_COUNT, thread_name_prefix="ingest")
+
+
+class IngestJobActiveError(Exception):
+    """Raised by submit_new_ingest_job when the table is already being loaded by another job"""
+
+    def __init__(self, job):
+        super().__init__(f"{job.table_name} is already being loaded by job {job.id}")
+        self.job = job
+
+
+class IngestJob:
+    """
+    Progress of one background ingestion, updated by the worker thread and read by the jobs endpoint
+    """
+
+    def __init__(self, table_name):
+        self.id = uuid.uuid4().hex
+        self.table_name = table_name
+        self.status = "queued"
+        self.stage = "queued"
+        self.rows_processed = 0
+        self.error = None
+        self.report = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def update_progress(self, stage, rows_processed=None):
+        """
+        Moves the job to a stage, passed to the ingest functions as their progress callback
+        :param stage: one of INGEST_STAGES
+        :param rows_processed: the number of csv rows handled so far, unchanged when None
+        :return: None
+        """
+        with self.lock:
+            self.stage = stage
+            if rows_processed is not None:
+                self.rows_processed = int(rows_processed)
+        print(f"[JOB] {self.table_name} ({self.id[:8]}): {stage}, {self.rows_processed} rows")
+
+    @property
+    def is_active(self):
+        return self.status in ("queued", "running")
+
+    def run(self, ingest_function, *args, **kwargs):
+        with self.lock:
+            self.status = "running"
+            self.started_at = time.time()
+        try:
+            report = ingest_function(*args, progress=self.update_progress, **kwargs)
+            with self.lock:
+                self.report = report
+                self.status = "done"
+                self.stage = "done"
+        except Exception as e:
+            traceback.print_exc()
+            with self.lock:
+                self.status = "failed"
+                self.error = str(e)
+        finally:
+            with self.lock:
+                self.finished_at = time.time()
+
+    def to_dict(self):
+        """
+        :return: the job state as a json serialisable dictionary
+        """
+        with self.lock:
+            if self.started_at is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self.finished_at or time.time()) - self.started_at
+            return {
+                "job_id": self.id,
+                "table_name": self.table_name,
+                "status": self.status,
+                "stage": self.stage,
+                "rows_processed": self.rows_processed,
+                "elapsed_seconds": round(elapsed, 3),
+                "error": self.error,
+                "report": self.report,
+            }
+
+
+def get_ingest_job(job_id):
+    """
+    :param job_id: the id returned when the job was submitted
+    :return: the IngestJob or None when the id is unknown
+    """
+    with INGEST_JOBS_LOCK:
+        return INGEST_JOBS.get(job_id)
+
+
+def find_active_ingest_job(table_name):
+    """
+    :param table_name: the cleaned table name
+    :return: the queued or running job loading this table, or None
+    """
+    with INGEST_JOBS_LOCK:
+        return _active_job_for(table_name)
+
+
+def _active_job_for(table_name):
+    for job in INGEST_JOBS.values():
+        if job.table_name == table_name and job.is_active:
+            return job
+    return None
+
+
+def find_failed_ingest_job(table_name):
+    """
+    :param table_name: the cleaned table name
+    :return: the latest job of this table when it failed, None when it succeeded, is still running or there is none
+    """
+    with INGEST_JOBS_LOCK:
+        jobs = [job for job in INGEST_JOBS.values() if job.table_name == table_name]
+    # INGEST_JOBS keeps the submission order, the last job of the table is its latest load
+    if jobs and jobs[-1].status == "failed":
+        return jobs[-1]
+    return None
+
+
+def forget_ingest_jobs(table_name):
+    """Drops the finished jobs of a table from the registry, a failed load is then tried again on the next request"""
+    with INGEST_JOBS_LOCK:
+        for job_id in [job_id for job_id, job in INGEST_JOBS.items()
+                       if job.table_name == table_name and not job.is_active]:
+            del INGEST_JOBS[job_id]
+
+
+def _submit(table_name, exclusive, ingest_function, args, kwargs):
+    with INGEST_JOBS_LOCK:
+        active_job = _active_job_for(table_name)
+        if active_job is not None:
+            if exclusive:
+                raise IngestJobActiveError(active_job)
+            return active_job
+        job = IngestJob(table_name)
+        INGEST_JOBS[job.id] = job
+    INGEST_EXECUTOR.submit(job.run, ingest_function, *args, **kwargs)
+    return job
+
+
+def submit_ingest_job(table_name, ingest_function, *args, **kwargs):
+    """
+    Queues ingest_function on the worker pool, a table that is already being loaded is not loaded twice
+    :param table_name: the cleaned table name the job loads
+    :param ingest_function: the function doing the work, called with a progress keyword argument
+    :return: the new IngestJob, or the job already loading table_name
+    """
+    return _submit(table_name, False, ingest_function, args, kwargs)
+
+
+def submit_new_ingest_job(table_name, ingest_function, *args, **kwargs):
+    """
+    submit_ingest_job for loads that must not be merged into a running one, such as uploads of a new file
+    :return: the new IngestJob
+    :raises IngestJobActiveError: when the table is already being loaded
+    """
+    return _submit(table_name, True, ingest_function, args, kwargs)
+
+
+def use_streaming_ingest(size_bytes, mode=None):
+    """
+    Decides whether a csv is ingested through the chunked streaming path
+    :param size_bytes: the size of the csv in bytes
+    :param mode: optional override from the request, "stream" or "memory"
+    :return: True when the csv should be streamed
+    """
+    if mode == "stream": return True
+    if mode == "memory": return False
+    return size_bytes >= STREAM_INGEST_MIN_BYTES
+
+
+def ingest_csv(csv_path, table_name, engine, mode=None, remove_source=False, progress=None):
+    """
+    Loads a csv into <table_name>, errors<table_name> and rankings<table_name> and writes report/<table_name>.json
+    :param csv_path: path of the csv on disk
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param mode: "stream", "memory" or None to decide by file size
+    :param remove_source: delete csv_path once the load is finished, for uploads saved to a temporary file
+    :param progress: callback(stage, rows_processed) reporting the current stage
+    :return: the report dictionary
+    """
+    progress = progress or (lambda stage, rows_processed=None: None)
+    try:
+        if use_streaming_ingest(os.path.getsize(csv_path), mode):
+            report = stream_ingest_csv(csv_path, table_name, engine, progress=progress)
+        else:
+            report = ingest_csv_in_memory(csv_path, table_name, engine, progress)
+    finally:
+        if remove_source and os.path.exists(csv_path):
+            os.remove(csv_path)
+
+    progress("statistics")
+    report["column_stats"] = refresh_column_stats(table_name, engine)
+
+    progress("indexes")
+    report["index_stats"] = ensure_dataset_indexes(table_name, engine)
+
+    if not os.path.exists("report"): os.makedirs("report")
+    with open(f"report/{table_name}.json", "w") as report_file:
+        json.dump(report, report_file)
+
+    from app.wrangler_routes_sql import get_table_history, discard_error_state
+    discard_heatmap_tiles(table_name, engine)
+    discard_bin_cube(table_name, engine)
+    bump_table_version(table_name, engine)
+    get_table_history(table_name)
+    # a reloaded table starts over with a full error refresh on its first wrangle
+    discard_error_state(table_name)
+    return report
+
+
+def ingest_csv_in_memory(csv_path, table_name, engine, progress):
+    """
+    Reads the whole csv into a dataframe, runs the detectors and writes the three tables
+    :param csv_path: path of the csv on disk
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param progress: callback(stage, rows_processed) reporting the current stage
+    :return: the report dictionary
+    """
+    progress("parse")
+    dataframe = pd.read_csv(csv_path)
+    rows = len(dataframe)
+    table_with_id_added = set_id_column(dataframe)
+
+    progress("detect", rows)
+    start_time = time.time()
+    detected_data = run_detectors(dataframe)
+    time_to_detect = time.time() - start_time
+    report = {'db': table_name, "clean_time": time_to_detect, "dataframe_shape": list(detected_data.shape)}
+    del dataframe
+
+    with BulkLoader(table_name, engine, index=True) as main_loader, \
+            ErrorStoreLoader(table_name, engine, list(table_with_id_added.columns)) as error_loader:
+        progress("write main", rows)
+        main_loader.append(table_with_id_added)
+        del table_with_id_added
+
+        progress("write errors", rows)
+        error_loader.append(detected_data)
+        error_swap, error_write_stats = error_loader.stage()
+
+        progress("rankings", rows)
+        rankings = calculate_attribute_rankings(detected_data)
+        # the data table, its errors and the rankings are swapped in by one transaction
+        main_write_stats = main_loader.finish(error_swap + rankings_statements(table_name, rankings))
+    report["write_stats"] = [main_write_stats, error_write_stats]
+    return report
@@ -0,0 +1,188 @@
+#Buckaroo Project - October 17, 2026
+#This file caches plot responses per table version, a wrangle bumps the version so stale plots are never served
+
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+# Plot responses kept across requests, the least recently used are dropped past this count
+PLOT_CACHE_SIZE = 256
+
+# Version of every table's contents, one row per table bumped whenever its rows or errors change. It lives in the
+# database so every server process stamps and checks cached plots, heatmap tiles and bin cubes against the same counter
+TABLE_VERSIONS_TABLE = "table_versions"
+TABLE_VERSIONS_LOCK = threading.Lock()
+_TABLE_VERSIONS_READY = False
+
+
+def ensure_table_versions(engine):
+    """
+    Creates the table_versions table once per process
+    :param engine: the SQLAlchemy engine
+    :return: None
+    """
+    global _TABLE_VERSIONS_READY
+    with TABLE_VERSIONS_LOCK:
+        if _TABLE_VERSIONS_READY:
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE} (
+                        table_name text PRIMARY KEY,
+                        version integer NOT NULL
+                    )
+                """))
+        except Exception:
+            # another process creating the table at the same moment makes CREATE ... IF NOT EXISTS fail
+            with engine.connect() as conn:
+                if conn.execute(text("SELECT to_regclass(:table)"), {"table": TABLE_VERSIONS_TABLE}).scalar() is None:
+                    raise
+        _TABLE_VERSIONS_READY = True
+
+
+def table_version(table_name, engine):
+    """
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :return: the current version of the table, 0 before its first bump
+    """
+    ensure_table_versions(engine)
+    with engine.connect() as conn:
+        version = conn.execute(text(f"SELECT version FROM {TABLE_VERSIONS_TABLE} WHERE table_name = :table"),
+                               {"table": table_name}).scalar()
+    return version or 0
+
+
+def increment_table_version(conn, table_name):
+    """
+    Bumps the version of a table inside the caller's transaction, so the new version is visible exactly when the
+    change it marks is committed
+    :param conn: an open connection inside a transaction
+    :param table_name: the cleaned table name
+    :return: the new version
+    """
+    ensure_table_versions(conn.engine)
+    return conn.execute(text(f"""
+        INSERT INTO {TABLE_VERSIONS_TABLE} AS v (table_name, version) VALUES (:table, 1)
+        ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1
+        RETURNING version
+    """), {"table": table_name}).scalar_one()
+
+
+def bump_table_version(table_name, engine):
+    """
+    Marks the contents of a table as changed, plots this process cached for older versions are dropped
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :return: the new version
+    """
+    with engine.begin() as conn:
+        version = increment_table_version(conn, table_name)
+    PLOT_CACHE.invalidate(table_name, version)
+    return version
+
+
+class PlotResponseCache:
+    """
+    Bounded LRU cache of plot responses keyed by (table, table version, endpoint, parameters)
+    """
+
+    def __init__(self, max_entries=PLOT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        :param key: the cache key, its first two items are the table name and version
+        :param compute: function returning the response on a miss, exceptions are not cached
+        :return: the cached or freshly computed response
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        # the query runs outside the lock, two requests missing on the same key both compute it
+        response = compute()
+        self.put(key, response)
+        return response
+
+    def get(self, key):
+        """The cached response for key, None on a miss"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        """Stores a response computed by the caller, e.g. one cell of a batch request"""
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, table_name, current_version=None):
+        """
+        Drops the entries of a table, or only those older than current_version
+        :return: the number of entries dropped
+        """
+        with self.lock:
+            stale = [key for key in self.entries
+                     if key[0] == table_name and (current_version is None or key[1] < current_version)]
+            for key in stale:
+                del self.entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+PLOT_CACHE = PlotResponseCache()
+
+
+def plot_cache_key(table_name, version, endpoint, columns, bins, min_id, max_id, *extra):
+    """
+    :param table_name: the cleaned table name
+    :param version: the current version of the table, from table_version
+    :param endpoint: name of the plot, e.g. "1d"
+    :param columns: the plotted columns
+    :param bins: the bin counts, empty for plots without bins
+    :param min_id: start of the ID window
+    :param max_id: end of the ID window
+    :param extra: any other parameter the response depends on
+    :return: the key of the response for this version of the table
+    """
+    return (table_name, version, endpoint, tuple(columns), tuple(bins), (min_id, max_id)) + extra
+
+
+def cached_plot(key, compute):
+    """The response for key from PLOT_CACHE, computed on a miss"""
+    return PLOT_CACHE.get_or_compute(key, compute)
@@ -23,6 +23,12 @@ from flask import request
 
 from app import app, engine
 from app.service_helpers import clean_table_name
+from app.plot_cache import PLOT_CACHE, plot_cache_key, cached_plot, table_version
+from postgres_wrangling.histogram_batch import generate_histogram_batch, parse_histogram_cell
+from app import duckdb_backend
+from app.heatmap_tiles import heatmap_from_tiles
+from app.bin_cube import CROSS_FILTER_BINS, cross_filter
+from app.attribute_summaries import summarize_attributes
 
 # Toggle between pandas (in-memory) and PostgreSQL (database) histogram generation
 # False = Use PostgreSQL stored procedures with database tables (recommended)
@@ -34,6 +40,46 @@ USE_PANDAS_FOR_HISTOGRAMS = False
 # True  = Use pandas with data_state_manager (legacy, for testing)
 USE_PANDAS_FOR_SCATTERPLOT = False
 
+# Toggle between pandas (in-memory) and PostgreSQL (database) attribute summaries
+# False = Use one aggregate statement over the table in app/attribute_summaries.py (recommended)
+# True  = Use generate_complete_json with data_state_manager (legacy, for testing)
+USE_PANDAS_FOR_SUMMARIES = False
+
+# Serve repeated plot requests from the versioned response cache in app/plot_cache.py
+USE_PLOT_CACHE = True
+
+# Answer whole-table heatmaps from the column pair's tiles in app/heatmap_tiles.py instead of scanning the table
+USE_HEATMAP_TILES = True
+
+# Grid of the scatterplot density mode: default and largest number of cells per axis
+DENSITY_GRID_SIZE = 100
+MAX_DENSITY_GRID_SIZE = 512
+
+
+def run_plot_function(query_str, function_name):
+    """Runs one of the generate_*_with_errors functions and returns its JSON result"""
+    result = pd.read_sql_query(query_str, engine).to_dict()
+    return result[function_name][0]
+
+
+def plot_response(key, compute):
+    """The plot for key, from the cache when USE_PLOT_CACHE is on"""
+    if USE_PLOT_CACHE:
+        return cached_plot(key, compute)
+    return compute()
+
+def duckdb_histogram_cell(table, cell, min_id, max_id):
+    """One cell of a histogram batch computed by the DuckDB backend, shaped like the results of generate_histogram_batch"""
+    columns, bins = parse_histogram_cell(cell)
+    try:
+        if len(columns) == 1:
+            histogram = duckdb_backend.one_d_histogram(table, engine, columns[0], bins[0], min_id, max_id)
+        else:
+            histogram = duckdb_backend.two_d_histogram(table, engine, columns[0], columns[1], bins[0], bins[1], min_id, max_id)
+        return {"Success": True, "histogram": histogram}
+    except Exception as e:
+        return {"Success": False, "Error": str(e)}
+
 @app.get("/api/plots/1-d-histogram")
 def get_1d_histogram():
     """
@@ -55,8 +101,12 @@ def get_1d_histogram():
             histogram = generate_1d_histogram_data(column_name, int(number_of_bins), min_id, max_id)
         else:
             query = f"SELECT generate_one_d_histogram_with_errors('{table}', 'errors{table}', '{column}', {bin_count}, {min_id}, {max_id});"
-            result = pd.read_sql_query(query, engine).to_dict()
-            histogram = result["generate_one_d_histogram_with_errors"][0]
+            key = plot_cache_key(table, table_version(table, engine), "1d", [column], [int(bin_count)], int(min_id), int(max_id))
+            if duckdb_backend.use_duckdb(table):
+                compute = lambda: duckdb_backend.one_d_histogram(table, engine, column, int(bin_count), int(min_id), int(max_id))
+            else:
+                compute = lambda: run_plot_function(query, "generate_one_d_histogram_with_errors")
+            histogram = plot_response(key, compute)
 
         return {"Success": True, "histogram": histogram}
 
@@ -93,8 +143,19 @@ def get_2d_histogram():
 
         else:
             query_str = f"SELECT generate_two_d_histogram_with_errors('{table}', 'errors{table}', '{column_x}','{column_y}', {x_bins},{y_bins}, {min_id}, {max_id});"
-            binned_data = pd.read_sql_query(query_str, engine).to_dict()
-            histogram = binned_data["generate_two_d_histogram_with_errors"][0]
+            key = plot_cache_key(table, table_version(table, engine), "2d", [column_x, column_y], [int(x_bins), int(y_bins)], int(min_id), int(max_id))
+            if duckdb_backend.use_duckdb(table):
+                compute = lambda: duckdb_backend.two_d_histogram(table, engine, column_x, column_y, int(x_bins), int(y_bins),
+                                                                 int(min_id), int(max_id))
+            else:
+                def compute():
+                    if USE_HEATMAP_TILES:
+                        histogram = heatmap_from_tiles(table, column_x, column_y, int(x_bins), int(y_bins),
+                                                       int(min_id), int(max_id), engine)
+                        if histogram is not None:
+                            return histogram
+                    return run_plot_function(query_str, "generate_two_d_histogram_with_errors")
+            histogram = plot_response(key, compute)
 
         return {"Success": True, "histogram": histogram}
 
@@ -102,6 +163,85 @@ def get_2d_histogram():
         return {"Success": False, "Error": str(e)}
 
 
+@app.post("/api/plots/histogram-batch")
+def get_histogram_batch():
+    """
+    Endpoint to return every histogram of the scatterplot matrix in one request, it expects a JSON body with:
+        1. tablename, min_id and max_id as for the single histogram endpoints
+        2. cells, a list of {"column", "bins"} for 1D and {"column_x", "column_y", "x_bins", "y_bins"} for 2D histograms
+    Cells already in the plot cache are served from it, the others are computed together by generate_histogram_batch
+    (or one by one by the DuckDB backend for datasets in DUCKDB_DATASETS)
+    :return: one {"Success", "histogram"} or {"Success", "Error"} per cell, in the order of cells
+    """
+    try:
+        body = request.get_json(force=True)
+        table = clean_table_name(body["tablename"])
+        min_id = int(body.get("min_id", 0))
+        max_id = int(body.get("max_id", 200))
+        cells = body["cells"]
+
+        # the keys of the single endpoints, so both share the cached histograms
+        keys = []
+        version = table_version(table, engine)
+        for cell in cells:
+            columns, bins = parse_histogram_cell(cell)
+            keys.append(plot_cache_key(table, version, "1d" if len(columns) == 1 else "2d", columns, bins, min_id, max_id))
+
+        histograms = [None] * len(cells)
+        if USE_PLOT_CACHE:
+            for index, key in enumerate(keys):
+                cached = PLOT_CACHE.get(key)
+                if cached is not None:
+                    histograms[index] = {"Success": True, "histogram": cached}
+
+        missing = [index for index, histogram in enumerate(histograms) if histogram is None]
+        if missing:
+            if duckdb_backend.use_duckdb(table):
+                computed = [duckdb_histogram_cell(table, cells[index], min_id, max_id) for index in missing]
+            else:
+                computed = generate_histogram_batch(table, [cells[index] for index in missing], min_id, max_id)
+            for index, result in zip(missing, computed):
+                histograms[index] = result
+                if USE_PLOT_CACHE and result["Success"]:
+                    PLOT_CACHE.put(keys[index], result["histogram"])
+
+        return {"Success": True, "histograms": histograms}
+
+    except Exception as e:
+        return {"Success": False, "Error": str(e)}
+
+
+@app.post("/api/plots/cross-filter")
+def get_cross_filter():
+    """
+    Endpoint for linked brushing: the 1D histograms of the visible columns over the rows whose bins are selected in
+    other histograms, counted from the bin cube of app/bin_cube.py. It expects a JSON body with:
+        1. tablename, and optionally min_id and max_id (the whole table when left out)
+        2. selection, a list of {"column", "bins"} with the selected bins as the 1D histogram names them
+        3. columns, the visible columns, and optionally bins, the number of numeric bins
+    :return: {"Success", "cross_filter": {"rows", "histograms": {column: 1D histogram}}} or {"Success", "Error"}
+    """
+    try:
+        body = request.get_json(force=True)
+        table = clean_table_name(body["tablename"])
+        min_id = body.get("min_id")
+        max_id = body.get("max_id")
+        min_id = None if min_id is None else int(min_id)
+        max_id = None if max_id is None else int(max_id)
+        bins = int(body.get("bins", CROSS_FILTER_BINS))
+        selection = body.get("selection") or []
+        columns = body.get("columns") or []
+
+        selected = tuple((predicate["column"], tuple(str(value) for value in predicate["bins"]))
+                         for predicate in selection)
+        key = plot_cache_key(table, table_version(table, engine), "cross-filter", columns, [bins], min_id, max_id, selected)
+        result = plot_response(key, lambda: cross_filter(table, engine, selection, columns, bins, min_id, max_id))
+        return {"Success": True, "cross_filter": result}
+
+    except Exception as e:
+        return {"Success": False, "Error": str(e)}
+
+
 
 
 
@@ -191,20 +331,71 @@ def get_scatterplot_data():
     max_id = request.args.get("max_id", default=200)
     error_sample_count = request.args.get("error_sample_count", default=30)
     total_sample_count = request.args.get("total_sample_count", default=100)
+    # optional integer seed, the same seed and window give the same sample
+    seed = request.args.get("seed", default=None, type=int)
+    # "density" aggregates every row of the window into a grid instead of sampling points
+    mode = request.args.get("mode", default="sample")
 
     try:
+        if mode == "density":
+            return {"Success": True, "density_data": scatterplot_density(table, x_column_name, y_column_name,
+                                                                          int(min_id), int(max_id),
+                                                                          int(error_sample_count), seed)}
         if USE_PANDAS_FOR_SCATTERPLOT:
-            scatterplot_data = generate_scatterplot_sample_data(x_column_name, y_column_name, int(min_id), int(max_id), int(error_sample_count), int(total_sample_count))
+            scatterplot_data = generate_scatterplot_sample_data(x_column_name, y_column_name, int(min_id), int(max_id), int(error_sample_count), int(total_sample_count), seed=seed)
         else:
-            query = f"SELECT generate_scatterplot_with_errors('{table}', 'errors{table}', '{x_column_name}', '{y_column_name}', {error_sample_count}, {total_sample_count}, {min_id}, {max_id});"
-            result = pd.read_sql_query(query, engine).to_dict()
-            scatterplot_data = result["generate_scatterplot_with_errors"][0]
+            sql_seed = "NULL" if seed is None else seed
+            query = f"SELECT generate_scatterplot_with_errors('{table}', 'errors{table}', '{x_column_name}', '{y_column_name}', {error_sample_count}, {total_sample_count}, {min_id}, {max_id}, {sql_seed});"
+            # a cached sample is served again until the table changes, so a redraw shows the same points
+            key = plot_cache_key(table, table_version(table, engine), "scatterplot", [x_column_name, y_column_name], [], int(min_id), int(max_id),
+                                 int(error_sample_count), int(total_sample_count), seed)
+            if duckdb_backend.use_duckdb(table):
+                compute = lambda: duckdb_backend.scatterplot(table, engine, x_column_name, y_column_name,
+                                                             int(error_sample_count), int(total_sample_count),
+                                                             int(min_id), int(max_id), seed)
+            else:
+                compute = lambda: run_plot_function(query, "generate_scatterplot_with_errors")
+            scatterplot_data = plot_response(key, compute)
 
         return {"Success": True, "scatterplot_data": scatterplot_data}
     except Exception as e:
         return {"Success": False, "Error": str(e)}
 
 
+def scatterplot_density(table, x_column_name, y_column_name, min_id, max_id, error_sample_count, seed):
+    """
+    Density mode of the scatterplot, computed by generate_scatterplot_density for the pandas and DuckDB setups too
+    since it has to read every row of the window
+    :param table: the cleaned table name
+    :param x_column_name: the column on the x axis
+    :param y_column_name: the column on the y axis
+    :param min_id: start of the ID window
+    :param max_id: end of the ID window
+    :param error_sample_count: number of error points overlaid on the grid
+    :param seed: integer seed of the overlay sample, None for a fresh one
+    :return: {"xType", "yType", "width", "height", "cells", "scaleX", "scaleY", "overlay"}
+    """
+    width = min(max(request.args.get("width", default=DENSITY_GRID_SIZE, type=int), 1), MAX_DENSITY_GRID_SIZE)
+    height = min(max(request.args.get("height", default=DENSITY_GRID_SIZE, type=int), 1), MAX_DENSITY_GRID_SIZE)
+    sql_seed = "NULL" if seed is None else seed
+    query = (f"SELECT generate_scatterplot_density('{table}', 'errors{table}', '{x_column_name}', '{y_column_name}', "
+             f"{width}, {height}, {min_id}, {max_id}, {error_sample_count}, {sql_seed});")
+    key = plot_cache_key(table, table_version(table, engine), "scatterplot-density", [x_column_name, y_column_name], [width, height], min_id, max_id,
+                         error_sample_count, seed)
+    return plot_response(key, lambda: run_plot_function(query, "generate_scatterplot_density"))
+
+
+@app.get("/api/plots/cache-stats")
+def get_plot_cache_stats():
+    """
+    Hit and miss statistics of the plot response cache
+    :return: the statistics, ?clear=true empties the cache and resets them
+    """
+    if request.args.get("clear", "false").lower() == "true":
+        PLOT_CACHE.clear()
+    return {"Success": True, "enabled": USE_PLOT_CACHE, "stats": PLOT_CACHE.stats()}
+
+
 @app.get("/api/plots/group-by")
 def get_group_by():
     """
@@ -217,7 +408,8 @@ def get_group_by():
     column_a = df[column_a_name]
     group_by = df[group_by_name]
     try:
-        if is_categorical(column_a) and is_categorical(group_by):
+        version = service_helpers.state_version()
+        if is_categorical(column_a, version) and is_categorical(group_by, version):
             new_df = group_by_attribute(df, column_a_name, group_by_name).to_json()
             return {"Success": True, "group_by": new_df}
         return {"Success": False, "Error": "Both column input to the group_by are not categorical"}
@@ -270,8 +462,13 @@ def attribute_summaries():
     max_id = request.args.get("max_id", default=200)
     tablename = request.args.get("tablename")
     try:
-        #get the current error table
-        table_attribute_summaries = generate_complete_json(int(min_id), int(max_id), tablename)
+        if USE_PANDAS_FOR_SUMMARIES:
+            table_attribute_summaries = generate_complete_json(int(min_id), int(max_id), tablename)
+        else:
+            table = clean_table_name(tablename)
+            key = plot_cache_key(table, table_version(table, engine), "summaries", [], [], int(min_id), int(max_id))
+            table_attribute_summaries = plot_response(
+                key, lambda: summarize_attributes(table, engine, min_id, max_id))
         return {"success": True, "data": table_attribute_summaries}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -7,52 +7,54 @@ import time
 import gc
 from app import app
 from app import connection, engine
-from app.service_helpers import clean_table_name, get_whole_table_query, run_detectors, create_error_dict
+from app.service_helpers import clean_table_name, get_whole_table_query
 from app import data_state_manager
-from app.set_id_column import set_id_column
-import json
+from app.ingest_jobs import submit_ingest_job, submit_new_ingest_job, get_ingest_job, find_active_ingest_job, \
+    find_failed_ingest_job, forget_ingest_jobs, IngestJobActiveError, ingest_csv
+from app.error_store import drop_error_store, read_error_dictionary
+from app.column_stats import drop_column_stats
+from app.heatmap_tiles import drop_heatmap_tiles
+from app.bin_cube import drop_bin_cube
+from app.table_view import TABLE_VIEW_PAGE_SIZE, table_view_page
+from app.index_manager import dataset_indexes, ensure_dataset_indexes
+from app.plot_cache import bump_table_version
+import tempfile
 from sqlalchemy import inspect, text
 
 # IMPORT ACTION HISTORIES
-from app.wrangler_routes_sql import ACTION_HISTORIES, get_table_history
-
-# --- CORE OPTIMIZATION: Safe Chunked Write ---
-def safe_write_to_db_with_sleep(df, table_name, engine, chunk_size=2000):
-    total_rows = len(df)
-    print(f"[START] Safe write for {table_name}: {total_rows} rows...")
-    
-    try:
-        first_chunk = df.iloc[0:chunk_size]
-        use_index = "rankings" not in table_name
-        first_chunk.to_sql(table_name, engine, if_exists='replace', index=use_index)
-        print(f"   [WRITE] Initialized table with first {len(first_chunk)} rows...")
-        time.sleep(1) 
-        
-        for i in range(chunk_size, total_rows, chunk_size):
-            chunk = df.iloc[i : i + chunk_size]
-            chunk.to_sql(table_name, engine, if_exists='append', index=use_index)
-            print(f"   [WRITE] Chunk starting at row {i}...")
-            time.sleep(1) 
-            
-    except Exception as e:
-        print(f"[ERROR] Write failed for {table_name}: {e}")
-        raise e 
-    print(f"[SUCCESS] Finished writing {table_name}!")
+from app.wrangler_routes_sql import ACTION_HISTORIES, get_table_history, discard_error_state
 
 # --- Auto-Load Logic ---
 def initialize_dataset_if_needed(cleaned_table_name, original_filename):
+    """
+    Queues a background load of a provided dataset whose tables are missing
+    :param cleaned_table_name: the cleaned table name
+    :param original_filename: the csv name in provided_datasets
+    :return: the IngestJob loading the dataset, or the failed job of its last load which is not retried until the
+             dataset is reset, None when the tables already exist or the csv is missing
+    """
+    active_job = find_active_ingest_job(cleaned_table_name)
+    if active_job is not None:
+        return active_job
+
     inspector = inspect(engine)
     has_main = inspector.has_table(cleaned_table_name)
     has_error = inspector.has_table("errors" + cleaned_table_name)
 
     if not has_main or not has_error:
+        failed_job = find_failed_ingest_job(cleaned_table_name)
+        if failed_job is not None:
+            return failed_job
         print(f"[WARN] Data mismatch for {cleaned_table_name}. Starting clean reload...")
         
         try:
             with engine.connect() as conn:
                 trans = conn.begin()
                 conn.execute(text(f'DROP TABLE IF EXISTS "{cleaned_table_name}" CASCADE;'))
-                conn.execute(text(f'DROP TABLE IF EXISTS "errors{cleaned_table_name}" CASCADE;'))
+                drop_error_store(conn, cleaned_table_name)
+                drop_column_stats(conn, cleaned_table_name)
+                drop_heatmap_tiles(conn, cleaned_table_name)
+                drop_bin_cube(conn, cleaned_table_name)
                 conn.execute(text(f'DROP TABLE IF EXISTS "rankings{cleaned_table_name}" CASCADE;'))
                 trans.commit()
         except Exception as e:
@@ -66,82 +68,55 @@ def initialize_dataset_if_needed(cleaned_table_name, original_filename):
         csv_path = next((p for p in paths if os.path.exists(p)), None)
              
         if csv_path:
-            try:
-                print(f"[READ] Reading CSV: {original_filename}")
-                df = pd.read_csv(csv_path)
-                
-                print("[PROCESS] Running detectors...")
-                df_with_id = set_id_column(df)
-                detected_data = run_detectors(df)
-                
-                del df
-                gc.collect()
-                
-                safe_write_to_db_with_sleep(df_with_id, cleaned_table_name, engine)
-                del df_with_id
-                gc.collect()
-                
-                safe_write_to_db_with_sleep(detected_data, "errors" + cleaned_table_name, engine)
-                
-                from app.service_helpers import calculate_attribute_rankings
-                rankings = calculate_attribute_rankings(detected_data)
-                rankings.to_sql("rankings" + cleaned_table_name, engine, if_exists='replace', index=False)
-                
-                del detected_data
-                del rankings
-                gc.collect()
-                
-                # Initialize history
-                get_table_history(cleaned_table_name)
-                
-                print(f"[DONE] Successfully loaded {cleaned_table_name}")
-            except Exception as e:
-                print(f"[FAIL] Failed to auto-load: {e}")
-                with engine.connect() as conn:
-                    conn.execute(text(f'DROP TABLE IF EXISTS "{cleaned_table_name}" CASCADE;'))
-        else:
-            print(f"[ERROR] CSV file not found: {original_filename}")
+            print(f"[READ] Queueing load of CSV: {original_filename}")
+            return submit_ingest_job(cleaned_table_name, ingest_csv, csv_path, cleaned_table_name, engine)
+        print(f"[ERROR] CSV file not found: {original_filename}")
+    return None
+
+def loading_response(job):
+    """
+    Response for data requests on a dataset that is still being loaded, the client polls /api/jobs/<id>
+    :param job: the IngestJob loading the dataset
+    :return: the json body and the 202 status code, 500 with the error when the load failed
+    """
+    if job.status == "failed":
+        return {"success": False, "loading": False, **job.to_dict()}, 500
+    return {"success": False, "loading": True, **job.to_dict()}, 202
 
 # --- API Routes ---
 
 @app.post("/api/upload")
 def upload_csv():
+    upload_file = None
     try:
         csv_file = request.files['file']
-        dataframe = pd.read_csv(csv_file)
-        table_with_id_added = set_id_column(dataframe)
-        
-        start_time = time.time()
-        detected_data = run_detectors(dataframe)
-        time_to_detect = time.time() - start_time
-        
         cleaned_table_name = clean_table_name(csv_file.filename)
-        if not os.path.exists("report"): os.makedirs("report")
-        json.dump({'db': cleaned_table_name, "clean_time": time_to_detect, "dataframe_shape": list(detected_data.shape)}, open(f"report/{cleaned_table_name}.json", "w"))
-
-        del dataframe
-        gc.collect()
-
-        safe_write_to_db_with_sleep(table_with_id_added, cleaned_table_name, engine)
-        del table_with_id_added
-        gc.collect()
-
-        safe_write_to_db_with_sleep(detected_data, "errors"+cleaned_table_name, engine)
-        
-        from app.service_helpers import calculate_attribute_rankings
-        rankings = calculate_attribute_rankings(detected_data)
-        rankings.to_sql("rankings"+cleaned_table_name, engine, if_exists='replace', index=False)
-        
-        del detected_data
-        del rankings
-        gc.collect()
-        
-        get_table_history(cleaned_table_name)
+        active_job = find_active_ingest_job(cleaned_table_name)
+        if active_job is not None:
+            raise IngestJobActiveError(active_job)
+        # the request stream is gone once we return, so the job reads its own copy of the upload
+        upload_file = tempfile.NamedTemporaryFile(prefix=cleaned_table_name + "_", suffix=".csv", delete=False)
+        csv_file.save(upload_file)
+        upload_file.close()
 
-        return{"success": True, "rows for undetected data": "inserted", "clean_table_name": cleaned_table_name}
+        job = submit_new_ingest_job(cleaned_table_name, ingest_csv, upload_file.name, cleaned_table_name, engine,
+                                    mode=request.args.get("mode"), remove_source=True)
+        return {"success": True, "job_id": job.id, "clean_table_name": cleaned_table_name}, 202
+    except IngestJobActiveError as e:
+        if upload_file is not None:
+            os.remove(upload_file.name)
+        return {"success": False, "error": str(e), **e.job.to_dict()}, 409
     except Exception as e:
+        if upload_file is not None and os.path.exists(upload_file.name):
+            os.remove(upload_file.name)
         return {"success": False, "error": str(e)}
 
+@app.get("/api/jobs/<job_id>")
+def get_job(job_id):
+    job = get_ingest_job(job_id)
+    if job is None: return {"success": False, "error": f"Unknown job {job_id}"}, 404
+    return {"success": True, **job.to_dict()}
+
 @app.get("/api/get-sample")
 def get_sample():
     filename = request.args.get("filename")
@@ -150,7 +125,8 @@ def get_sample():
     if not filename: return {"success": False, "error": "Filename required"}
     
     try:
-        initialize_dataset_if_needed(cleaned_table_name, filename)
+        job = initialize_dataset_if_needed(cleaned_table_name, filename)
+        if job is not None: return loading_response(job)
     except Exception as e:
         print(f"Init Error: {e}")
 
@@ -162,6 +138,37 @@ def get_sample():
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@app.get("/api/table-view")
+def get_table_view():
+    """
+    One page of the table view in ID order, the pages seek on "ID" so every page costs the same wherever it is.
+    Query parameters: filename, after_id (or before_id to scroll back), limit, columns (comma separated, all of
+    them when left out) and errors_only (true to keep only the rows with an error in the columns)
+    """
+    filename = request.args.get("filename")
+    if not filename: return {"success": False, "error": "Filename required"}
+    cleaned_table_name = clean_table_name(filename)
+
+    try:
+        job = initialize_dataset_if_needed(cleaned_table_name, filename)
+        if job is not None: return loading_response(job)
+    except Exception as e:
+        print(f"Init Error: {e}")
+
+    try:
+        columns = request.args.get("columns")
+        page = table_view_page(
+            cleaned_table_name, engine,
+            after_id=request.args.get("after_id", type=int),
+            before_id=request.args.get("before_id", type=int),
+            limit=request.args.get("limit", default=TABLE_VIEW_PAGE_SIZE, type=int),
+            columns=[column for column in columns.split(",") if column] if columns else None,
+            errors_only=request.args.get("errors_only", "false").lower() == "true",
+        )
+        return {"success": True, **page}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @app.get("/api/get-errors")
 def get_errors():
     filename = request.args.get("filename")
@@ -170,13 +177,15 @@ def get_errors():
     if not filename: return {"success": False, "error": "Filename required"}
     
     try:
-        initialize_dataset_if_needed(cleaned_table_name, filename)
+        job = initialize_dataset_if_needed(cleaned_table_name, filename)
+        if job is not None: return loading_response(job)
     except: pass
 
-    QUERY = get_whole_table_query(cleaned_table_name,True)
     try:
-        full_error_df = pd.read_sql_query(QUERY, engine)
-        return create_error_dict(full_error_df, int(data_size))
+        # the dictionary of create_error_dict built in the database from the errors of the window only
+        with engine.connect() as conn:
+            errors_json = read_error_dictionary(conn, cleaned_table_name, int(data_size))
+        return Response(errors_json, mimetype="application/json")
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -195,19 +204,45 @@ def reset_dataset():
     try:
         with engine.connect() as conn:
             trans = conn.begin()
-            for table in [cleaned_name, "errors"+cleaned_name, "rankings"+cleaned_name]:
+            for table in [cleaned_name, "rankings"+cleaned_name]:
                 conn.execute(text(f'DROP TABLE IF EXISTS "{table}" CASCADE;'))
+            drop_error_store(conn, cleaned_name)
+            drop_column_stats(conn, cleaned_name)
+            drop_heatmap_tiles(conn, cleaned_name)
+            drop_bin_cube(conn, cleaned_name)
             trans.commit()
         
         # Reset Action History
         if cleaned_name in ACTION_HISTORIES:
             del ACTION_HISTORIES[cleaned_name]
+        discard_error_state(cleaned_name)
+        bump_table_version(cleaned_name, engine)
+        # a provided dataset whose load failed is loaded again on its next request
+        forget_ingest_jobs(cleaned_name)
         
         gc.collect()
         return {"success": True, "message": f"Dataset {cleaned_name} reset."}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@app.route('/api/admin/indexes')
+def dataset_index_report():
+    """
+    Admin: The indexes of a dataset's tables, ?ensure=true first creates the missing ones
+    """
+    filename = request.args.get('filename')
+    if not filename: return "Filename required", 400
+    cleaned_name = clean_table_name(filename)
+
+    try:
+        report = {"success": True}
+        if request.args.get('ensure', 'false').lower() == 'true':
+            report["ensure"] = ensure_dataset_indexes(cleaned_name, engine)
+        report["indexes"] = dataset_indexes(cleaned_name, engine)
+        return report
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @app.route('/api/admin/download_table')
 def download_table():
     table_name = request.args.get('table')
@@ -2,15 +2,24 @@
 #This file helps deliver on endpoint services
 
 import re
+import threading
+from collections import OrderedDict
 
 import pandas as pd
 
 from app import data_state_manager
+from app.bulk_loader import quote_identifier
 from app.set_id_column import set_id_column
-from detectors.anomaly import anomaly
-from detectors.datatype_mismatch import datatype_mismatch
-from detectors.incomplete import incomplete
-from detectors.missing_value import missing_value
+from detectors.profile import ColumnProfile
+from detectors.parallel import DETECTOR_WORKER_COUNT, detect_errors_parallel, use_parallel_detectors
+from detectors.vectorized import detect_errors
+
+# Column profiles kept across requests, the least recently used are dropped past this count
+COLUMN_PROFILE_CACHE_SIZE = 64
+
+# { (dataset version, column name): ColumnProfile }
+COLUMN_PROFILES = OrderedDict()
+COLUMN_PROFILES_LOCK = threading.Lock()
 
 
 def clean_table_name(csv_name):
@@ -140,20 +149,22 @@ def perform_melt(dfs):
 
     return df_combined
 
-def run_detectors(data_frame):
+def run_detectors(data_frame, workers=None):
     """
     Runs all 4 detectors that are implemented
-    on the server, on the data, and returns a compiled dataframe of the complete errors
+    on the server, on the data, and returns a compiled dataframe of the complete errors. The detectors run
+    through the vectorized engine in detectors/vectorized.py, which gives the same rows as melting the
+    dictionaries of the detectors in detectors/ but without the per cell loops
     :param data_frame:the dataframe to run the detectors on
+    :param workers: worker processes for large frames, defaults to DETECTOR_WORKER_COUNT (0 runs serially)
     :return: a single compiled dataframe of all the errors detected
     """
     df_with_id = set_id_column(data_frame)
-    anomaly_df = pd.DataFrame(anomaly(df_with_id.copy())).rename_axis("ID", axis="index").reset_index()
-    incomplete_df = pd.DataFrame(incomplete(df_with_id.copy())).rename_axis("ID", axis="index").reset_index()
-    missing_value_df = pd.DataFrame(missing_value(df_with_id.copy())).rename_axis("ID", axis="index").reset_index()
-    datatype_mismatch_df = pd.DataFrame(datatype_mismatch(df_with_id.copy())).rename_axis("ID", axis="index").reset_index()
-    frames = [anomaly_df, incomplete_df, missing_value_df,datatype_mismatch_df]
-    return perform_melt(frames)
+    if workers is None:
+        workers = DETECTOR_WORKER_COUNT
+    if use_parallel_detectors(df_with_id, workers):
+        return detect_errors_parallel(df_with_id, workers)
+    return detect_errors(df_with_id)
 
 def calculate_attribute_rankings(error_df):
     """
@@ -164,13 +175,44 @@ def calculate_attribute_rankings(error_df):
     if error_df.empty:
         return pd.DataFrame(columns=['attribute', 'total_errors', 'rank'])
 
-    ranking = error_df.groupby('column_id').size().reset_index(name='total_errors')
+    return rankings_from_error_counts(error_df.groupby('column_id').size())
+
+def rankings_from_error_counts(error_counts):
+    """
+    Builds the attribute rankings from error counts that were already aggregated per column, used when the
+    errors are produced chunk by chunk and never exist as one dataframe
+    :param error_counts: Series of total error counts indexed by column name
+    :return: DataFrame with columns [attribute, total_errors, rank] sorted by total_errors descending
+    """
+    if len(error_counts) == 0:
+        return pd.DataFrame(columns=['attribute', 'total_errors', 'rank'])
+
+    ranking = error_counts.rename_axis('column_id').reset_index(name='total_errors')
     ranking = ranking.sort_values('total_errors', ascending=False)
     ranking['rank'] = range(1, len(ranking) + 1)
     ranking = ranking.rename(columns={'column_id': 'attribute'})
 
     return ranking[['attribute', 'total_errors', 'rank']]
 
+def rankings_statements(table_name, rankings):
+    """
+    Statements that replace rankings<table_name>, run in the transaction that swaps the dataset in so the
+    rankings never describe another version of the errors
+    :param table_name: the data table
+    :param rankings: DataFrame with columns [attribute, total_errors, rank]
+    :return: list of (sql, params) pairs in psycopg2 format
+    """
+    target = quote_identifier("rankings" + table_name)
+    return [
+        (f"DROP TABLE IF EXISTS {target}", None),
+        (f"CREATE TABLE {target} (attribute text, total_errors bigint, rank bigint)", None),
+        (f"INSERT INTO {target} (attribute, total_errors, rank) "
+         f"SELECT * FROM unnest(%(attributes)s::text[], %(totals)s::bigint[], %(ranks)s::bigint[])",
+         {"attributes": [str(attribute) for attribute in rankings['attribute']],
+          "totals": [int(total) for total in rankings['total_errors']],
+          "ranks": [int(rank) for rank in rankings['rank']]}),
+    ]
+
 def get_error_dist(error_df,normal_df):
     """
     Gets the distribution of errors in the error dataframe, this is used to create a pivot table, and also in the attribute summaries
@@ -261,50 +303,58 @@ def slice_data_by_min_max_ranges(min_val,max_val,df,error_df):
 
     return sliced_min_max_df, sliced_min_max_error_df
 
-def is_categorical(column_a):
+def state_version(min_id=None, max_id=None):
+    """
+    Version key of the current data state (optionally sliced to an ID window) for get_column_profile
+    :param min_id: the minimum ID of the window, None for the whole frame
+    :param max_id: the maximum ID of the window, None for the whole frame
+    :return: a hashable key that changes whenever the data state changes
+    """
+    return "data_state", data_state_manager.version, min_id, max_id
+
+def get_column_profile(column, version=None):
+    """
+    Returns the profile of a column, profiles are cached per dataset version so a column is only type
+    scanned once per change of the data
+    :param column: the column as a Series
+    :param version: hashable key of the dataset version the column belongs to, None skips the cache
+    :return: the ColumnProfile
+    """
+    if version is None:
+        return ColumnProfile(column)
+    key = (version, column.name)
+    with COLUMN_PROFILES_LOCK:
+        profile = COLUMN_PROFILES.get(key)
+        if profile is not None:
+            COLUMN_PROFILES.move_to_end(key)
+            return profile
+    profile = ColumnProfile(column)
+    with COLUMN_PROFILES_LOCK:
+        COLUMN_PROFILES[key] = profile
+        while len(COLUMN_PROFILES) > COLUMN_PROFILE_CACHE_SIZE:
+            COLUMN_PROFILES.popitem(last=False)
+    return profile
+
+def is_categorical(column_a, version=None):
     """
     Checks if the column is categorical, used in endpoints which need to determine if the column is categorical or not
-    such as the attribute summaries endpoint
+    such as the attribute summaries endpoint. The column is categorical when most of its values are strings
     :param column_a: the column to check
+    :param version: dataset version key of the column, reuses the cached profile when given
     :return: True if the column is categorical, False otherwise
     """
-    value_counts = column_a.value_counts()
-    type_count = {}
-    type_key = {}
-    largest_type = 0
-    value_type = None
-    # populate the count of each type in the column
-    for key, value in value_counts.items():
-        type_of_key = type(key).__name__
-        if (isinstance(key, str)) and (bool(re.fullmatch(r'^\d+(\.\d+)?$', key.strip()))): type_of_key = "numeric"
-        if type_of_key in type_count:
-            type_count[type_of_key] += value
-            if type_of_key in type_key:
-                type_key[type_of_key].append(key)
-        else:
-            type_count[type_of_key] = value
-            type_key[type_of_key] = [key]
-    types = type_count.items()
-    for key, value in types:
-        if value > largest_type:
-            largest_type = value
-            value_type = key
-    if value_type == "str":
-        return True
-    if value_type is None:
-        return True
-    else:
-        return False
-
-def create_bins_for_a_numeric_column(column,bin_count):
+    return get_column_profile(column_a, version).is_categorical
+
+def create_bins_for_a_numeric_column(column,bin_count, numeric=None):
     """
     Creates bins for a numeric column, used in endpoints which need to create bins for numeric columns
     such as attribute summaries and 2D histogram endpoints
     :param column: the column to create bins for
     :param bin_count: the number of bins to create
+    :param numeric: the column already coerced with pd.to_numeric (from its profile), computed when None
     :return: bins for the column as a pandas object
     """
-    column_numeric = pd.to_numeric(column, errors='coerce')
+    column_numeric = pd.to_numeric(column, errors='coerce') if numeric is None else numeric
     return pd.cut(column_numeric, bins=bin_count)
 
     # return pd.cut(column, bins=bin_count)
\ No newline at end of file
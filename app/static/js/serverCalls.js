@@ -17,14 +17,57 @@ async function uploadFileToDB(fileToSend){
             if (!response.ok) {
                 throw new Error(`Response status: ${response.status}`);
             }
-            if(response.statusText === "OK"){
-                return true
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error);
             }
+            await waitForIngestJob(data.job_id);
+            return true
         } catch (error) {
                 console.error(error.message);
             }
 }
 
+/**
+ * Polls the background ingestion job until it has finished loading the dataset
+ * @param {string} jobId the id returned by /api/upload or by a data request on a dataset that is still loading
+ * @param {function} onProgress optional callback receiving the job state (stage, rows_processed, elapsed_seconds)
+ * @param {number} intervalMs time between polls
+ * @returns {Promise<object>} the final job state
+ */
+async function waitForIngestJob(jobId, onProgress, intervalMs = 1000) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`, {method: "GET"});
+        if (!response.ok) {
+            throw new Error(`Response status: ${response.status}`);
+        }
+        const job = await response.json();
+        if (onProgress) onProgress(job);
+        if (job.status === "done") return job;
+        if (job.status === "failed") throw new Error(`Loading ${job.table_name} failed: ${job.error}`);
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
+/**
+ * Fetches a data endpoint, waiting for the dataset's background load first when the server reports it is still loading
+ * @param {string} url the endpoint to fetch
+ * @returns {Promise<object>} the json body of the response
+ */
+async function fetchWhenLoaded(url) {
+    let response = await fetch(url, {method: "GET"});
+    if (response.status === 202) {
+        const loading = await response.json();
+        console.log(`waiting for ${loading.table_name} to load`);
+        await waitForIngestJob(loading.job_id, job => console.log(`loading: ${job.stage}, ${job.rows_processed} rows`));
+        response = await fetch(url, {method: "GET"});
+    }
+    if (!response.ok){
+        throw new Error(`Response status: ${response.status}`);
+    }
+    return await response.json();
+}
+
 /**
  * Get a window of data from the full datatable stored in the database
  * @returns {Promise<void>}
@@ -36,11 +79,7 @@ async function getSampleData(filename,dataSize) {
     const params = new URLSearchParams({filename: filename,datasize:dataSize});
     const url = `/api/get-sample?${params}`
     try{
-        const response = await fetch(url, {method: "GET"});
-        if (!response.ok){
-            throw new Error(`Response status: ${response.status}`);
-        }
-        const jsonTable = await response.json();
+        const jsonTable = await fetchWhenLoaded(url);
         console.log(jsonTable[0]);
         return jsonTable;
     }
@@ -60,11 +99,7 @@ async function getErrorData(filename,dataSize) {
     const params = new URLSearchParams({filename: filename,datasize:dataSize});
     const url = `/api/get-errors?${params}`
     try{
-        const response = await fetch(url, {method: "GET"});
-        if (!response.ok){
-            throw new Error(`Response status: ${response.status}`);
-        }
-        const jsonTable = await response.json();
+        const jsonTable = await fetchWhenLoaded(url);
         console.log(jsonTable[0]);
         return jsonTable;
     }
@@ -74,27 +109,89 @@ async function getErrorData(filename,dataSize) {
 }
 
 /**
- * Get the data for the 1d histogram in the view
- * @returns {Promise<void>}
+ * Get one page of the table view, pages seek on the ID so scrolling far into a big table costs the same as the first page
+ * @param {string} filename the name of the file the user wants to get data from
+ * @param {object} options afterId (or beforeId to scroll back), limit, columns (array) and errorsOnly
+ * @returns {Promise<object>} {columns, rows, errors, next_after_id, previous_before_id, total_rows}
  */
-async function queryHistogram1d(columnName,tableName,minId,maxId,binCount) {
-    console.log("1d histogram fetch");
-    const params = new URLSearchParams({
-        column:columnName,
-        tablename:tableName,
-        min_id:minId,
-        max_id:maxId,
-        bins:binCount});
-    const url = `/api/plots/1-d-histogram?${params}`
+async function getTablePage(filename, {afterId = null, beforeId = null, limit = 100, columns = null, errorsOnly = false} = {}) {
+    const params = new URLSearchParams({filename: filename, limit: limit, errors_only: errorsOnly});
+    if (afterId !== null) params.set("after_id", afterId);
+    if (beforeId !== null) params.set("before_id", beforeId);
+    if (columns) params.set("columns", columns.join(","));
+    const page = await fetchWhenLoaded(`/api/table-view?${params}`);
+    if (!page.success) {
+        throw new Error(page.error);
+    }
+    return page;
+}
+
+/**
+ * Histogram requests waiting to be sent together, keyed by table and ID window. The matrix view draws all of its
+ * cells in one loop, so the requests made in the same tick go to /api/plots/histogram-batch in a single POST
+ */
+const pendingHistograms = new Map();
+
+/**
+ * Queue one histogram cell, the batch is sent on the next tick
+ * @param {string} tableName the table the histogram is computed on
+ * @param minId start of the ID window
+ * @param maxId end of the ID window
+ * @param {object} cell the parameters of the single histogram endpoint, e.g. {column, bins}
+ * @returns {Promise<any>} resolves with the {Success, histogram} response of that cell
+ */
+function queueHistogram(tableName, minId, maxId, cell) {
+    const key = JSON.stringify([tableName, minId, maxId]);
+    let batch = pendingHistograms.get(key);
+    if (!batch) {
+        batch = {tableName, minId, maxId, cells: [], callers: []};
+        pendingHistograms.set(key, batch);
+        setTimeout(() => {
+            pendingHistograms.delete(key);
+            sendHistogramBatch(batch);
+        }, 0);
+    }
+    return new Promise(resolve => {
+        batch.cells.push(cell);
+        batch.callers.push(resolve);
+    });
+}
+
+/**
+ * Send the queued cells and resolve every caller with its own histogram
+ * @param {object} batch the cells and callers queued for one table and ID window
+ */
+async function sendHistogramBatch(batch) {
+    console.log(`histogram batch fetch (${batch.cells.length} cells)`);
     try{
-        const response = await fetch(url, {method: "GET"});
-        return await response.json();
+        const response = await fetch("/api/plots/histogram-batch", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({
+                tablename: batch.tableName,
+                min_id: batch.minId,
+                max_id: batch.maxId,
+                cells: batch.cells}),
+        });
+        const result = await response.json();
+        batch.callers.forEach((resolve, i) =>
+            resolve(result.Success ? result.histograms[i] : {Success: false, Error: result.Error}));
     }
     catch (error){
         console.error(error.message)
+        batch.callers.forEach(resolve => resolve(undefined));
     }
 }
 
+/**
+ * Get the data for the 1d histogram in the view
+ * @returns {Promise<void>}
+ */
+async function queryHistogram1d(columnName,tableName,minId,maxId,binCount) {
+    console.log("1d histogram fetch");
+    return queueHistogram(tableName, minId, maxId, {column: columnName, bins: binCount});
+}
+
 
 
 /**
@@ -108,23 +205,8 @@ async function queryHistogram1d(columnName,tableName,minId,maxId,binCount) {
  * @returns {Promise<any>}
  */
 async function queryHistogram2d(columnX,columnY,tableName,minId,maxID,bins) {
-    console.log("1d histogram fetch");
-    const params = new URLSearchParams({
-        column_x:columnX,
-        column_y:columnY,
-        tablename:tableName,
-        min_id: minId,
-        max_id: maxID,
-        x_bins: bins,
-        y_bins: bins});
-    const url = `/api/plots/2-d-histogram?${params}`
-    try{
-        const response = await fetch(url, {method: "GET"});
-        return await response.json();
-    }
-    catch (error){
-        console.error(error.message)
-    }
+    console.log("2d histogram fetch");
+    return queueHistogram(tableName, minId, maxID, {column_x: columnX, column_y: columnY, x_bins: bins, y_bins: bins});
 }
 
 
@@ -200,4 +282,4 @@ export async function wrangleRemove(xCol, minId, maxId) {
 }
 
 
-export {uploadFileToDB, getSampleData, getErrorData, queryHistogram1d, queryHistogram2d};
\ No newline at end of file
+export {uploadFileToDB, waitForIngestJob, getSampleData, getErrorData, getTablePage, queryHistogram1d, queryHistogram2d};
\ No newline at end of file
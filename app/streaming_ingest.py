@@ -0,0 +1,118 @@
+#Buckaroo Project - October 17, 2026
+#This file ingests a csv in fixed size chunks so that peak memory stays flat regardless of the file size
+
+import time
+
+import pandas as pd
+
+from app.bulk_loader import BulkLoader, LOG_BULK_LOADS
+from app.error_store import ErrorStoreLoader
+from app.service_helpers import rankings_from_error_counts, rankings_statements
+from detectors.chunked import DetectorStatistics, detect_chunk_errors
+
+# Rows read from the csv per chunk, every chunk is detected and copied to the database before the next is read
+STREAM_CHUNK_ROWS = 100_000
+
+
+def read_csv_chunks(source, chunk_size):
+    """
+    Reads the csv as raw strings in chunks of chunk_size rows
+    :param source: a path or a readable file object positioned at the start of the csv
+    :param chunk_size: the number of rows per chunk
+    :return: an iterator of dataframe chunks
+    """
+    return pd.read_csv(source, chunksize=chunk_size, dtype=str)
+
+
+def rewind_source(source):
+    """
+    Puts a file object back at the start of the csv for the second pass, paths are simply reopened
+    :param source: a path or a seekable file object
+    :return: None
+    """
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def collect_detector_statistics(source, chunk_size=STREAM_CHUNK_ROWS, progress=None):
+    """
+    First pass over the csv, accumulates the column statistics the detectors need
+    :param source: a path or a readable file object
+    :param chunk_size: the number of rows per chunk
+    :param progress: optional callback(stage, rows_processed)
+    :return: the finalized DetectorStatistics
+    """
+    statistics = DetectorStatistics()
+    for raw_chunk in read_csv_chunks(source, chunk_size):
+        statistics.update(raw_chunk)
+        if progress is not None:
+            progress("parse", statistics.total_rows)
+    if statistics.column_order is None:
+        raise ValueError("The uploaded csv has no columns")
+    statistics.finalize()
+    return statistics
+
+
+def stream_ingest_csv(source, table_name, engine, chunk_size=STREAM_CHUNK_ROWS, progress=None):
+    """
+    Loads a csv into <table_name>, errors<table_name> and rankings<table_name> without reading it into memory
+    at once. The first pass collects the detector statistics, the second pass assigns IDs, detects the
+    errors of each chunk and copies the chunk and its errors into the database as it goes
+    :param source: a path or a seekable file object
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param chunk_size: the number of rows per chunk
+    :param progress: optional callback(stage, rows_processed), chunks are reported as "detect" because
+    detection and both table writes are interleaved per chunk
+    :return: a report dictionary with timings, row/error counts and the write statistics
+    """
+    print(f"[START] Streaming ingest for {table_name} in chunks of {chunk_size} rows...")
+    start_time = time.time()
+    progress = progress or (lambda stage, rows_processed=None: None)
+    statistics = collect_detector_statistics(source, chunk_size, progress)
+    statistics_time = time.time() - start_time
+
+    rewind_source(source)
+    error_counts = {}
+    error_rows = 0
+    rows = 0
+    detect_time = 0.0
+    with BulkLoader(table_name, engine, index=True) as main_loader, \
+            ErrorStoreLoader(table_name, engine, statistics.converted_columns) as error_loader:
+        for raw_chunk in read_csv_chunks(source, chunk_size):
+            # the index continues across chunks so the stored "index" column matches a whole-table write
+            raw_chunk.index = pd.RangeIndex(rows, rows + len(raw_chunk))
+            chunk = statistics.convert_chunk(raw_chunk, first_id=rows + 1)
+
+            detect_start = time.time()
+            chunk_errors = detect_chunk_errors(chunk, statistics)
+            detect_time += time.time() - detect_start
+
+            main_loader.append(chunk)
+            if len(chunk_errors) > 0:
+                error_loader.append(chunk_errors)
+                for column, count in chunk_errors["column_id"].value_counts().items():
+                    error_counts[column] = error_counts.get(column, 0) + int(count)
+            rows += len(chunk)
+            error_rows += len(chunk_errors)
+            if LOG_BULK_LOADS:
+                print(f"[STREAM] {table_name}: {rows} rows, {error_rows} errors")
+            progress("detect", rows)
+
+        progress("write errors", rows)
+        error_swap, error_stats = error_loader.stage()
+        progress("rankings", rows)
+        rankings = rankings_from_error_counts(pd.Series(error_counts, dtype="int64").sort_index())
+        # the data table, its errors and the rankings are swapped in by one transaction
+        progress("write main", rows)
+        main_stats = main_loader.finish(error_swap + rankings_statements(table_name, rankings))
+
+    return {
+        "db": table_name,
+        "clean_time": statistics_time + detect_time,
+        "dataframe_shape": [error_rows, 3],
+        "rows": rows,
+        "chunk_size": chunk_size,
+        "total_time": round(time.time() - start_time, 3),
+        "write_stats": [main_stats, error_stats],
+    }
@@ -0,0 +1,115 @@
+#Buckaroo Project - October 17, 2026
+#This file serves the table view one page of rows at a time, seeking on the "ID" key instead of reading the table
+
+import json
+
+from sqlalchemy import text
+
+from app.bulk_loader import quote_identifier
+from app.column_stats import table_columns, read_column_stats
+from app.error_store import read_page_error_dictionary
+
+"""
+A page is the rows after (or before) an ID in ID order: WHERE "ID" > :after_id ORDER BY "ID" LIMIT n reads n rows
+of the primary key wherever the page is, where an OFFSET walks every row before it. One row more than the page
+tells whether there is a next one. Postgres turns the rows into JSON, the errors of the page come from
+error_codes<table> for the IDs of the page only, and neither table is loaded into pandas.
+"""
+
+# Rows per page when the request does not give a limit, and the largest page served
+TABLE_VIEW_PAGE_SIZE = 100
+MAX_TABLE_VIEW_PAGE_SIZE = 1000
+
+
+def table_view_query(table_name, columns, seek, error_source=None):
+    """
+    One page of rows in ID order
+    :param table_name: the data table
+    :param columns: the projected columns, "ID" first
+    :param seek: "after" for the rows after :after_id, "before" for the rows before :before_id, None for the first page
+    :param error_source: FROM item of the errors (scatterplot_error_source) to keep only the rows with an error in
+                         one of the :error_columns, None for every row
+    :return: SQL with the :page_rows parameter returning the rows as a JSON array in ID order
+    """
+    table = quote_identifier(table_name)
+    projection = ", ".join(f"t.{quote_identifier(column)}" for column in columns)
+    predicates = []
+    if seek == "after":
+        predicates.append('t."ID" > :after_id')
+    elif seek == "before":
+        predicates.append('t."ID" < :before_id')
+    if error_source is not None:
+        predicates.append(f'EXISTS (SELECT 1 FROM {error_source} e '
+                          f'WHERE e.row_id = t."ID" AND e.column_id = ANY(CAST(:error_columns AS text[])))')
+    where = f"WHERE {' AND '.join(predicates)}" if predicates else ""
+    return f"""
+        SELECT COALESCE(json_agg(row_to_json(p) ORDER BY p."ID"), '[]'::json)::text
+        FROM (
+            SELECT {projection}
+            FROM {table} t
+            {where}
+            ORDER BY t."ID" {"DESC" if seek == "before" else "ASC"}
+            LIMIT :page_rows
+        ) p
+    """
+
+
+def table_view_page(table_name, engine, after_id=None, before_id=None, limit=TABLE_VIEW_PAGE_SIZE, columns=None,
+                    errors_only=False):
+    """
+    A page of the table view with the errors of its cells
+    :param table_name: the cleaned table name
+    :param engine: the SQLAlchemy engine
+    :param after_id: the page starts after this ID
+    :param before_id: the page ends before this ID, used when scrolling back, after_id wins when both are given
+    :param limit: rows per page, at most MAX_TABLE_VIEW_PAGE_SIZE
+    :param columns: the columns to return, None for all of them. "ID" is always returned
+    :param errors_only: only return the rows with an error in one of the columns
+    :return: {"columns", "rows", "errors": {column: {row_id: [error types]}}, "next_after_id",
+              "previous_before_id", "total_rows"}, the cursors are None when there is nothing in that direction
+    """
+    limit = max(1, min(int(limit), MAX_TABLE_VIEW_PAGE_SIZE))
+    seek = "after" if after_id is not None else "before" if before_id is not None else None
+    with engine.connect() as conn:
+        available = [name for name, _ in table_columns(conn, table_name)]
+        if columns is None:
+            columns = available
+        unknown = [column for column in columns if column not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}")
+        columns = ["ID"] + [column for column in dict.fromkeys(columns) if column != "ID"]
+
+        error_source = None
+        if errors_only:
+            error_source = conn.execute(text("SELECT scatterplot_error_source(:table, :errors)"),
+                                        {"table": table_name, "errors": f"errors{table_name}"}).scalar_one()
+        params = {"page_rows": limit + 1, "error_columns": columns,
+                  "after_id": None if after_id is None else int(after_id),
+                  "before_id": None if before_id is None else int(before_id)}
+        rows = json.loads(conn.execute(text(table_view_query(table_name, columns, seek, error_source)),
+                                       params).scalar_one())
+
+        has_more = len(rows) > limit
+        if has_more:
+            # the extra row is the one furthest from the cursor
+            rows = rows[1:] if seek == "before" else rows[:-1]
+
+        errors = {}
+        if rows:
+            page_errors = json.loads(read_page_error_dictionary(conn, table_name, [row["ID"] for row in rows]))
+            errors = {column: page_errors[column] for column in columns if column in page_errors}
+
+        total_rows = None
+        if not errors_only:
+            total_rows = read_column_stats(conn, table_name, ["ID"]).get("ID", {}).get("row_count")
+
+    first_id = rows[0]["ID"] if rows else None
+    last_id = rows[-1]["ID"] if rows else None
+    return {
+        "columns": columns,
+        "rows": rows,
+        "errors": errors,
+        "next_after_id": last_id if rows and (seek == "before" or has_more) else None,
+        "previous_before_id": first_id if rows and (seek == "after" or (seek == "before" and has_more)) else None,
+        "total_rows": total_rows,
+    }
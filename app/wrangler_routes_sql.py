@@ -8,15 +8,44 @@ from postgres_wrangling import query
 import traceback
 import pandas as pd
 from pprint import pprint
-from app.service_helpers import run_detectors
+from app.service_helpers import run_detectors, clean_table_name
+from app.index_manager import ensure_dataset_indexes
+from app.plot_cache import bump_table_version
+from app.column_stats import refresh_column_stats, drop_column_stats
+from app.heatmap_tiles import discard_heatmap_tiles
+from app.bin_cube import discard_bin_cube
+from app import duckdb_backend
+from app.error_store import write_errors, error_codes_table, error_columns_table, delete_errors_for_rows, \
+    delete_error_rows, insert_error_rows, error_counts_table, error_counts_statements
+from detectors.incremental import ErrorState
 import time
 import gc
+import threading
+from collections import OrderedDict
 from sqlalchemy import text
 
 # --- GLOBAL ACTION HISTORY DICTIONARY ---
 # Stores history per table: { "cars": ["import...", "# Action 1"], "games": [...] }
 ACTION_HISTORIES = {}
 
+# --- INCREMENTAL ERROR STATE ---
+# Detector aggregates and current flags per table: { "cars": ErrorState, ... }, seeded by the first full refresh
+# after a wrangle so later removes/imputes patch errors<table> instead of re-reading and re-detecting the table.
+# The least recently wrangled tables are dropped past either limit and get a full refresh on their next wrangle
+ERROR_STATES = OrderedDict()
+ERROR_STATES_LOCK = threading.Lock()
+ERROR_STATE_MAX_TABLES = 8
+ERROR_STATE_MAX_ROWS = 5_000_000
+
+# One lock per table, held while a wrangle reads and patches the table's ErrorState so concurrent wrangles of the
+# same table apply their changes one after the other
+ERROR_STATE_LOCKS = {}
+ERROR_STATE_LOCKS_GUARD = threading.Lock()
+
+# Tables with at least this many rows are re-detected inside Postgres (detect_errors_in_database in
+# db_functions.py) instead of being read into pandas. They keep no incremental error state
+IN_DATABASE_DETECTION_MIN_ROWS = 2_000_000
+
 def get_table_history(table_name):
     """Ensure a history list exists for the table with headers"""
     # Clean extension if present
@@ -46,46 +75,196 @@ def record_action(table_name, comment, code=None):
     if code:
         history.append(code)
 
-# --- CORE OPTIMIZATION: Safe Chunked Write ---
-def safe_write_to_db_with_sleep(df, table_name, engine, chunk_size=2000):
-    total_rows = len(df)
-    print(f"[WRANGLER] Safe write for {table_name}: {total_rows} rows...")
-    
-    try:
-        first_chunk = df.iloc[0:chunk_size]
-        first_chunk.to_sql(table_name, engine, if_exists='replace', index=False)
-        time.sleep(1) 
-        
-        for i in range(chunk_size, total_rows, chunk_size):
-            chunk = df.iloc[i : i + chunk_size]
-            chunk.to_sql(table_name, engine, if_exists='append', index=False)
-            time.sleep(1) 
-            
-    except Exception as e:
-        print(f"[WRANGLER ERROR] Write failed: {e}")
-        raise e 
+def discard_error_state(table_name):
+    """Forget the incremental error state, the next wrangle refreshes errors<table> in full"""
+    with ERROR_STATES_LOCK:
+        ERROR_STATES.pop(table_name, None)
 
-def update_errors_table(table_name: str) -> None:
-    try:
-        print(f"[WRANGLER] Re-reading table {table_name}...")
-        df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', engine)
-        
-        print("[WRANGLER] Re-running detectors...")
-        detected_errors_df = run_detectors(df)
-        
-        del df
-        gc.collect()
+def get_error_state(table_name):
+    """The incremental error state of table_name, None when it has none"""
+    with ERROR_STATES_LOCK:
+        state = ERROR_STATES.get(table_name)
+        if state is not None:
+            ERROR_STATES.move_to_end(table_name)
+        return state
 
-        errors_table_name = f"errors{table_name}"
-        safe_write_to_db_with_sleep(detected_errors_df, errors_table_name, engine)
-        
-        del detected_errors_df
-        gc.collect()
-        
-        print(f"✓ Updated errors table: {errors_table_name}")
+def keep_error_state(table_name, state):
+    """
+    Stores the incremental error state of table_name, dropping the least recently used states past
+    ERROR_STATE_MAX_TABLES tables or ERROR_STATE_MAX_ROWS rows in total
+    :param table_name: the table
+    :param state: its ErrorState
+    :return: None
+    """
+    with ERROR_STATES_LOCK:
+        ERROR_STATES[table_name] = state
+        ERROR_STATES.move_to_end(table_name)
+        while len(ERROR_STATES) > 1 and (len(ERROR_STATES) > ERROR_STATE_MAX_TABLES or
+                                         sum(len(kept.ids) for kept in ERROR_STATES.values()) > ERROR_STATE_MAX_ROWS):
+            ERROR_STATES.popitem(last=False)
+
+def error_state_lock(table_name):
+    """The lock serializing the error updates of table_name"""
+    with ERROR_STATE_LOCKS_GUARD:
+        return ERROR_STATE_LOCKS.setdefault(table_name, threading.Lock())
+
+def estimated_row_count(table_name):
+    """Row count from the planner statistics, counted exactly when the table was never analyzed"""
+    with engine.connect() as conn:
+        estimate = conn.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": f'"{table_name}"'},
+        ).scalar()
+        if estimate is None or estimate < 0:
+            estimate = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar_one()
+    return estimate
+
+def detect_errors_in_database(table_name: str) -> int:
+    """Rewrite errors<table> with the SQL detectors, the rows never leave Postgres"""
+    print(f"[WRANGLER] Re-running detectors inside the database for {table_name}...")
+    with engine.connect() as conn:
+        has_error_store = conn.execute(
+            text("SELECT to_regclass(:table) IS NOT NULL"), {"table": f'"{error_codes_table(table_name)}"'}
+        ).scalar_one()
+    if not has_error_store:
+        # datasets loaded before the encoded schema get their lookup tables and view built first
+        with engine.connect() as conn:
+            columns = conn.execute(text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_name = :table AND table_schema = current_schema() ORDER BY ordinal_position"
+            ), {"table": table_name}).scalars().all()
+        empty = pd.DataFrame({"row_id": [], "column_id": [], "error_type": []})
+        write_errors(empty, table_name, engine, [column for column in columns if column != "index"])
+    with engine.begin() as conn:
+        has_error_counts = conn.execute(
+            text("SELECT to_regclass(:table) IS NOT NULL"), {"table": f'"{error_counts_table(table_name)}"'}
+        ).scalar_one()
+        if not has_error_counts:
+            # error stores encoded before error_counts<table> existed get it with its triggers
+            for statement, _ in error_counts_statements(table_name):
+                conn.exec_driver_sql(statement)
+        error_count = conn.execute(
+            text("SELECT detect_errors_in_database(:main_table, :codes_table, :columns_table)"),
+            {"main_table": table_name, "codes_table": error_codes_table(table_name),
+             "columns_table": error_columns_table(table_name)},
+        ).scalar_one()
+    print(f"✓ Updated errors table: errors{table_name} ({error_count} errors)")
+    return error_count
+
+def refresh_errors_table(table_name: str) -> None:
+    """Re-detect the whole table, rewrite errors<table> and seed the incremental error state"""
+    if duckdb_backend.use_duckdb(table_name):
+        # DuckDB datasets are detected over a Parquet export, like the largest tables they keep no incremental state
+        discard_error_state(table_name)
+        detected_errors_df, columns = duckdb_backend.detect_errors(table_name, engine)
+        write_errors(detected_errors_df, table_name, engine, columns)
+        ensure_dataset_indexes(table_name, engine)
+        print(f"✓ Updated errors table: errors{table_name} ({len(detected_errors_df)} errors)")
+        return
+    if estimated_row_count(table_name) >= IN_DATABASE_DETECTION_MIN_ROWS:
+        discard_error_state(table_name)
+        detect_errors_in_database(table_name)
+        ensure_dataset_indexes(table_name, engine)
+        return
+
+    print(f"[WRANGLER] Re-reading table {table_name}...")
+    df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', engine)
+    # "index" is the dataframe index stored by the ingest, it is not a data column
+    df = df.drop(columns=["index"], errors="ignore")
+
+    print("[WRANGLER] Re-running detectors...")
+    detected_errors_df = run_detectors(df)
+    keep_error_state(table_name, ErrorState(df[["ID"] + [column for column in df.columns if column != "ID"]]))
+    df_columns = list(df.columns)
+
+    del df
+    gc.collect()
+
+    errors_table_name = f"errors{table_name}"
+    write_errors(detected_errors_df, table_name, engine, df_columns)
+
+    del detected_errors_df
+    gc.collect()
+
+    ensure_dataset_indexes(table_name, engine)
+    print(f"✓ Updated errors table: {errors_table_name}")
+
+def patch_errors_table(table_name: str, state, removed_ids=None, imputed=None) -> None:
+    """
+    Applies a wrangle to the incremental error state and writes only the error rows whose status changed
+    :param table_name: the wrangled table
+    :param state: the table's ErrorState
+    :param removed_ids: IDs of the rows the wrangle deleted
+    :param imputed: {column: (IDs, stored values)} of the cells the wrangle changed
+    :return: None
+    """
+    errors_table_name = f"errors{table_name}"
+    changes = []
+    if removed_ids:
+        changes.append(state.remove_rows(removed_ids))
+    for column, (ids, values) in (imputed or {}).items():
+        if ids:
+            changes.append(state.update_cells(column, ids, values))
+
+    # the changes are applied in order, a row one change adds can be cleared by the next. A stored row that should
+    # not be there (or a missing one) means the state drifted from errors<table>, the caller then refreshes in full
+    with engine.begin() as conn:
+        if removed_ids:
+            delete_errors_for_rows(conn, table_name, removed_ids)
+        for added, cleared in changes:
+            if len(cleared) > 0 and delete_error_rows(conn, table_name, cleared) != len(cleared):
+                raise ValueError(f"{errors_table_name} is missing error rows the incremental error state holds")
+            if len(added) > 0:
+                insert_error_rows(conn, table_name, added)
+
+    n_added = sum(len(change[0]) for change in changes)
+    n_cleared = sum(len(change[1]) for change in changes)
+    print(f"✓ Patched errors table: {errors_table_name} (+{n_added} / -{n_cleared} error rows)")
+
+def update_errors_table(table_name: str, removed_ids=None, imputed=None) -> None:
+    """
+    Brings errors<table> up to date after a wrangle. Once the table has an incremental error state only the
+    removed rows and imputed cells are processed, otherwise (and if patching fails) the table is re-detected
+    :param table_name: the wrangled table
+    :param removed_ids: IDs of the rows the wrangle deleted
+    :param imputed: {column: (IDs, stored values)} of the cells the wrangle changed
+    :return: None
+    """
+    with error_state_lock(table_name):
+        try:
+            state = get_error_state(table_name)
+            if state is not None and (removed_ids is not None or imputed is not None):
+                try:
+                    patch_errors_table(table_name, state, removed_ids, imputed)
+                    return
+                except Exception as e:
+                    print(f"[WRANGLER] Incremental error update failed for {table_name}, re-detecting: {e}")
+                    discard_error_state(table_name)
+            refresh_errors_table(table_name)
+        except Exception as e:
+            discard_error_state(table_name)
+            print(f"Warning: Could not update errors table for {table_name}: {e}")
+            traceback.print_exc()
+
+def update_column_stats(table_name: str, columns=None) -> None:
+    """
+    Refreshes column_stats<table> after a wrangle. If that fails the catalog is dropped, its readers then
+    scan the table instead of using stale statistics
+    :param table_name: the wrangled table
+    :param columns: the columns whose values changed, None when rows were removed
+    :return: None
+    """
+    try:
+        refresh_column_stats(table_name, engine, columns)
     except Exception as e:
-        print(f"Warning: Could not update errors table for {table_name}: {e}")
-        traceback.print_exc()
+        print(f"Warning: Could not update column statistics for {table_name}: {e}")
+        try:
+            with engine.begin() as conn:
+                drop_column_stats(conn, table_name)
+        except Exception as drop_error:
+            # the wrangle itself succeeded, the stale catalog is reported instead of failing the request
+            print(f"Warning: Could not drop the column statistics of {table_name}, they may be stale: {drop_error}")
+            traceback.print_exc()
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Wrangling Endpoints
@@ -93,6 +272,7 @@ def update_errors_table(table_name: str) -> None:
 
 @app.post("/api/wrangle/remove")
 def wrangle_remove():
+    table = None
     try:
         body = request.get_json(force=True)
         currentSelection = body["currentSelection"]
@@ -106,33 +286,41 @@ def wrangle_remove():
         action_comment = ""
 
         if "bin" in first_item and "xBin" not in first_item:
-            remaining_rows = query.remove_flagged_rows_in_1d_bin(currentSelection, cols[0], table)
+            remaining_rows, removed_ids = query.remove_flagged_rows_in_1d_bin(currentSelection, cols[0], table)
             action_comment = f"Removed rows based on Histogram selection in column '{cols[0]}'"
             action_code = f"# Logic: Remove rows where {cols[0]} is in selected bin range"
 
         elif "xBin" in first_item and "yBin" in first_item:
-            remaining_rows = query.remove_flagged_rows_in_bin(currentSelection, cols, table)
+            remaining_rows, removed_ids = query.remove_flagged_rows_in_bin(currentSelection, cols, table)
             action_comment = f"Removed rows based on Heatmap selection in columns {cols}"
             action_code = f"# Logic: Remove rows where {cols} fall in selected 2D bin"
 
         else:
             ids = [point["ID"] for point in currentSelection["data"]]
-            remaining_rows = query.remove_rows_by_ids(table=table, ids=ids)
+            remaining_rows, removed_ids = query.remove_rows_by_ids(table=table, ids=ids)
             action_comment = f"Removed {len(ids)} specific rows selected from Scatterplot"
             action_code = f"ids_to_remove = {ids}\ndf = df[~df['ID'].isin(ids_to_remove)]"
 
         record_action(table, action_comment, action_code)
-        update_errors_table(table)
+        update_errors_table(table, removed_ids=removed_ids)
+        update_column_stats(table)
 
         return {"success": True, "remaining_rows": remaining_rows}
     except Exception as e:
         print("ERROR OCCURRED")
         print(traceback.format_exc())
         return {"success": False, "error": str(e)}, 400
+    finally:
+        # a failed wrangle may still have changed rows, cached plots, heatmap tiles and the bin cube of the table are dropped either way
+        if table is not None:
+            discard_heatmap_tiles(clean_table_name(table), engine)
+            discard_bin_cube(clean_table_name(table), engine)
+            bump_table_version(clean_table_name(table), engine)
 
 
 @app.post("/api/wrangle/impute")
 def wrangle_impute():
+    table = None
     try:
         body = request.get_json(force=True)
         currentSelection = body["currentSelection"]
@@ -147,27 +335,34 @@ def wrangle_impute():
         action_comment = ""
 
         if "bin" in first_item and "xBin" not in first_item:
-            rows_examined, cells_imputed = query.impute_1d_bin_in_place(currentSelection, cols[0], table)
+            rows_examined, cells_imputed, imputed = query.impute_1d_bin_in_place(currentSelection, cols[0], table)
             action_comment = f"Imputed Mean/Mode for column '{cols[0]}' (Histogram selection)"
             action_code = f"# Logic: Fill NA in '{cols[0]}' with mean/mode for selected bin"
 
         elif "xBin" in first_item and "yBin" in first_item:
-            rows_examined, cells_imputed = query.impute_bin_in_place(currentSelection, cols, table)
+            rows_examined, cells_imputed, imputed = query.impute_bin_in_place(currentSelection, cols, table)
             action_comment = f"Imputed Mean/Mode for columns {cols} (Heatmap selection)"
             action_code = f"# Logic: Fill NA in {cols} for selected 2D bin"
 
         else:
             if not col: return {"success": False, "error": "Column required"}, 400
             ids = [point["ID"] for point in currentSelection["data"]]
-            rows_examined, cells_imputed = query.impute_by_ids(table=table, col=col, ids=ids)
+            rows_examined, cells_imputed, imputed = query.impute_by_ids(table=table, col=col, ids=ids)
             action_comment = f"Imputed column '{col}' for {len(ids)} selected IDs"
             action_code = f"ids_to_impute = {ids}\n# df.loc[df['ID'].isin(ids_to_impute), '{col}'] = ... "
 
         record_action(table, action_comment, action_code)
-        update_errors_table(table)
+        update_errors_table(table, imputed=imputed)
+        # row_count and the ID range do not change, only the imputed columns are recomputed
+        update_column_stats(table, list(imputed or {}))
 
         return {"success": True, "rows_examined": rows_examined, "cells_imputed": cells_imputed}
     except Exception as e:
         print("ERROR OCCURRED")
         print(traceback.format_exc())
-        return {"success": False, "error": str(e)}, 400
\ No newline at end of file
+        return {"success": False, "error": str(e)}, 400
+    finally:
+        if table is not None:
+            discard_heatmap_tiles(clean_table_name(table), engine)
+            discard_bin_cube(clean_table_name(table), engine)
+            bump_table_version(clean_table_name(table), engine)
\ No newline at end of file
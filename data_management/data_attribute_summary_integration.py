@@ -3,21 +3,28 @@ Converts the current datastate data into JSON the view can use
 """
 import pandas as pd
 
-from app.service_helpers import get_error_dist, is_categorical
+from app.service_helpers import get_error_dist, is_categorical, get_column_profile, state_version
 from data_management.data_integration import get_filtered_dataframes
 
 
 def get_default_attributes_from_rankings(tablename, engine):
     """
-    Fetch top 3 attributes from pre-computed rankings table
+    Fetch top 3 attributes from the error counts the triggers of error_codes<table> keep up to date, datasets
+    without them read the rankings table computed at upload
     :param tablename: Name of the data table (will be cleaned if needed)
     :param engine: SQLAlchemy engine
     :return: List of top 3 attribute names
     """
     from app.service_helpers import clean_table_name
+    from app.error_store import read_error_counts, top_error_columns
 
     try:
         cleaned_tablename = clean_table_name(tablename)
+        with engine.connect() as conn:
+            error_counts = read_error_counts(conn, cleaned_tablename)
+        if error_counts is not None:
+            return top_error_columns(error_counts, 3)
+
         rankings_table = f"rankings{cleaned_tablename}"
 
         # Try exact match first
@@ -77,30 +84,33 @@ def generate_complete_json(min_id, max_id, tablename=None):
     return {
         "columnErrors": convert_error_list_to_dict(error_list),
         "attributes": list(main_df.columns),
-        "attributeDistributions": build_attribute_distributions(main_df),
+        "attributeDistributions": build_attribute_distributions(main_df, state_version(min_id, max_id)),
         "defaultAttributes": default_attributes
     }
 
-def get_attribute_stats(df, column):
+def get_attribute_stats(df, column, version=None):
     """
     Get statistics for a specific attribute in the DataFrame
     :param df: DataFrame containing the data
     :param column: name of the column to get statistics for
+    :param version: dataset version key, reuses the cached column profile when given
     :return: dictionary containing statistics for the column
     """
-    if is_categorical(df[column]):
+    profile = get_column_profile(df[column], version)
+    if profile.is_categorical:
         return get_categorical_stats(df, column)
-    return get_numeric_stats(df, column)
+    return get_numeric_stats(df, column, profile)
 
-def build_attribute_distributions(main_df):
+def build_attribute_distributions(main_df, version=None):
     """
     Build distributions for each attribute in the main DataFrame
     :param main_df: DataFrame containing the main data
+    :param version: dataset version key of main_df for the column profile cache
     :return: dictionary containing distributions for each attribute
     """
     distributions = {}
     for col in main_df.columns:
-        distributions[col] = get_attribute_stats(main_df, col)
+        distributions[col] = get_attribute_stats(main_df, col, version)
     return distributions
 
 def get_categorical_stats(df, column):
@@ -110,23 +120,24 @@ def get_categorical_stats(df, column):
     :param column: name of the column to get statistics for
     :return: dictionary containing statistics for the categorical column
     """
-    df_cat = df.copy()
-    df_cat[column] = df_cat[column].fillna('N/A')
+    values = df[column].fillna('N/A')
     return {
         "categorical": {
-            "categories": df_cat[column].nunique(),
-            "mode": df_cat[column].mode().iloc[0]
+            "categories": values.nunique(),
+            "mode": values.mode().iloc[0]
         }
     }
 
-def get_numeric_stats(df, column):
+def get_numeric_stats(df, column, profile=None):
     """
     Get statistics for a numeric attribute in the DataFrame
     :param df: DataFrame containing the data
     :param column: name of the column to get statistics for
+    :param profile: the ColumnProfile of the column, its numeric mask is reused when given
     :return: dictionary containing statistics for the numeric column
     """
-    df = df[pd.to_numeric(df[column], errors='coerce').notna()]
+    numeric_mask = profile.numeric_mask if profile is not None else pd.to_numeric(df[column], errors='coerce').notna()
+    df = df[numeric_mask]
     df[column] = df[column].astype('int64')
     return {
         "numeric": {
@@ -5,7 +5,7 @@ to render the data
 """
 from app import data_state_manager
 from app.service_helpers import is_categorical, create_bins_for_a_numeric_column, get_error_dist, \
-    slice_data_by_min_max_ranges
+    slice_data_by_min_max_ranges, get_column_profile, state_version
 import pandas as pd
 import numpy as np
 
@@ -37,8 +37,8 @@ def get_relevant_errors(error_df, column_names):
     return error_df[error_df['column_id'].isin(column_names)]
 
 #Column processing
-def get_column_bin_assignments(dataframe, column_name, number_of_bins):
-    """Create bin assignments for any column type"""
+def get_column_bin_assignments(dataframe, column_name, number_of_bins, version=None):
+    """Create bin assignments for any column type, version is the dataset version key of the cached column profile"""
     column_data = dataframe[column_name].dropna()
 
     if len(column_data) == 0:
@@ -48,38 +48,41 @@ def get_column_bin_assignments(dataframe, column_name, number_of_bins):
         bin_assignments = np.zeros(len(dataframe), dtype=int)
         return bin_assignments, scale_data, "categorical"
 
-    if is_categorical(column_data):
-        unique_categories = column_data.unique()
-        category_to_bin = {category: index for index, category in enumerate(unique_categories)}
-        bin_assignments = dataframe[column_name].map(category_to_bin).values
-        return bin_assignments, unique_categories, "categorical"
+    profile = get_column_profile(dataframe[column_name], version)
+    if profile.is_categorical:
+        # categories in order of first appearance, -1 for the missing values
+        bin_assignments, unique_categories = pd.factorize(dataframe[column_name])
+        return bin_assignments, np.asarray(unique_categories, dtype=object), "categorical"
     else:
-        df_clean = dataframe.dropna(subset=[column_name])
-        numeric_bins = create_bins_for_a_numeric_column(df_clean[column_name], number_of_bins)
-        bin_assignments = numeric_bins.cat.codes.values
+        not_null = dataframe[column_name].notna().to_numpy()
+        numeric_bins = create_bins_for_a_numeric_column(
+            column_data, number_of_bins, profile.numeric[not_null]
+        )
+        # codes of the non null rows put back at their row positions, -1 for the null rows
+        bin_assignments = np.full(len(dataframe), -1, dtype=np.int64)
+        bin_assignments[not_null] = numeric_bins.cat.codes.values
         return bin_assignments, numeric_bins.cat.categories, "numeric"
 
+#bin codes
+def stack_bin_codes(all_bin_assignments, row_count):
+    """
+    Stacks the bin assignments of every dimension into one integer array
+    :param all_bin_assignments: per dimension, the bin of every row by position, negative or NaN when it has none
+    :param row_count: number of rows of the dataframe
+    :return: (codes of shape (dimensions, rows), mask of the rows that have a bin in every dimension)
+    """
+    codes = np.full((len(all_bin_assignments), row_count), -1, dtype=np.int64)
+    for dimension, bin_assignments in enumerate(all_bin_assignments):
+        values = np.asarray(bin_assignments, dtype=float)[:row_count]
+        codes[dimension, :len(values)] = np.nan_to_num(values, nan=-1)
+    return codes, (codes >= 0).all(axis=0)
+
 #row to bin mapping
 def create_row_to_bin_mapping(dataframe, column_names, all_bin_assignments):
     """Map each row ID to its bin coordinates across all dimensions"""
-    row_to_bin_mapping = {}
-
-    for row_index, data_row in dataframe.iterrows():
-        # Get bin coordinates for this row
-        bin_coordinates = []
-        valid_row = True
-
-        for bin_assignments in all_bin_assignments:
-            if row_index < len(bin_assignments) and bin_assignments[row_index] >= 0:
-                bin_coordinates.append(bin_assignments[row_index])
-            else:
-                valid_row = False
-                break
-
-        if valid_row:
-            row_to_bin_mapping[data_row['ID']] = tuple(bin_coordinates)
-
-    return row_to_bin_mapping
+    codes, valid = stack_bin_codes(all_bin_assignments, len(dataframe))
+    row_ids = dataframe['ID'].to_numpy()[valid].tolist()
+    return dict(zip(row_ids, map(tuple, codes[:, valid].T.tolist())))
 
 #counting functions
 def count_items_per_bin(row_to_bin_mapping):
@@ -92,23 +95,54 @@ def count_items_per_bin(row_to_bin_mapping):
 
 def count_errors_per_bin(relevant_errors, row_to_bin_mapping):
     """Count errors by type in each bin"""
-    errors_per_bin = {}
-
-    for _, error_row in relevant_errors.iterrows():
-        row_id = error_row['row_id']
-        error_type = error_row['error_type']
-
-        if row_id in row_to_bin_mapping:
-            bin_coordinates = row_to_bin_mapping[row_id]
-
-            if bin_coordinates not in errors_per_bin:
-                errors_per_bin[bin_coordinates] = {}
-
-            current_count = errors_per_bin[bin_coordinates].get(error_type, 0)
-            errors_per_bin[bin_coordinates][error_type] = current_count + 1
+    if not row_to_bin_mapping or len(relevant_errors) == 0:
+        return {}
+    # position of each error's row among the mapped rows, -1 for rows without a bin
+    positions = pd.Index(list(row_to_bin_mapping.keys())).get_indexer(relevant_errors['row_id'])
+    mapped = positions >= 0
+    coordinates = np.array(list(row_to_bin_mapping.values()))[positions[mapped]]
+    error_bins = pd.DataFrame(coordinates)
+    error_bins['error_type'] = relevant_errors['error_type'].to_numpy()[mapped]
 
+    errors_per_bin = {}
+    for key, count in error_bins.groupby(list(error_bins.columns), sort=False).size().items():
+        bin_coordinates = tuple(int(code) for code in key[:-1])
+        errors_per_bin.setdefault(bin_coordinates, {})[key[-1]] = int(count)
     return errors_per_bin
 
+def count_items_and_errors_per_bin(dataframe, relevant_errors, all_bin_assignments, all_scale_data):
+    """
+    Counts the items and the errors by type of every bin with np.bincount over flattened bin coordinates
+    :param dataframe: the plotted rows
+    :param relevant_errors: the errors of the plotted columns
+    :param all_bin_assignments: per dimension, the bin of every row by position
+    :param all_scale_data: per dimension, the bins
+    :return: (items_per_bin, errors_per_bin) keyed by bin coordinates, as count_items_per_bin and count_errors_per_bin
+    """
+    bins_per_dimension = tuple(len(scale_data) for scale_data in all_scale_data)
+    bin_total = int(np.prod(bins_per_dimension))
+    codes, valid = stack_bin_codes(all_bin_assignments, len(dataframe))
+    flat_bins = np.full(len(dataframe), -1, dtype=np.int64)
+    flat_bins[valid] = np.ravel_multi_index(tuple(codes[:, valid]), bins_per_dimension)
+    item_counts = np.bincount(flat_bins[valid], minlength=bin_total)
+
+    # the errors reach their row's bin through a lookup of their row_id in the ID column
+    positions = pd.Index(dataframe['ID']).get_indexer(relevant_errors['row_id'])
+    error_bins = np.where(positions >= 0, flat_bins[positions], -1)
+    type_codes, error_types = pd.factorize(relevant_errors['error_type'].to_numpy())
+    counted = (error_bins >= 0) & (type_codes >= 0)
+    error_counts = np.bincount(type_codes[counted] * bin_total + error_bins[counted],
+                               minlength=len(error_types) * bin_total).reshape(len(error_types), bin_total)
+
+    def coordinates(flat_bin):
+        return tuple(int(code) for code in np.unravel_index(flat_bin, bins_per_dimension))
+
+    items_per_bin = {coordinates(flat_bin): int(item_counts[flat_bin]) for flat_bin in np.flatnonzero(item_counts)}
+    errors_per_bin = {}
+    for type_code, flat_bin in zip(*np.nonzero(error_counts)):
+        errors_per_bin.setdefault(coordinates(flat_bin), {})[error_types[type_code]] = int(error_counts[type_code, flat_bin])
+    return items_per_bin, errors_per_bin
+
 #scale info functions
 def create_scale_info(scale_data, column_type):
     """Create scale information for histogram axes"""
@@ -137,12 +171,11 @@ def generate_histogram_data_modified(main_df, error_df, column_names, numbers_of
         all_scale_data.append(scale_data)
         all_column_types.append(column_type)
 
-    # Create mappings and count items/errors
-    row_to_bin_mapping = create_row_to_bin_mapping(main_df, column_names, all_bin_assignments)
+    # Count items/errors per bin
     relevant_errors = get_relevant_errors(error_df, column_names)
-
-    items_per_bin = count_items_per_bin(row_to_bin_mapping)
-    errors_per_bin = count_errors_per_bin(relevant_errors, row_to_bin_mapping)
+    items_per_bin, errors_per_bin = count_items_and_errors_per_bin(
+        main_df, relevant_errors, all_bin_assignments, all_scale_data
+    )
 
     # Build histogram entries
     histogram_entries = build_histogram_entries(
@@ -166,6 +199,7 @@ def generate_histogram_data(column_names, numbers_of_bins, min_id, max_id):
         raise ValueError("Maximum 2 dimensions supported for now")
     # Get filtered data ( get the window of min/max data from the datatable)
     main_df, error_df = get_filtered_dataframes(min_id, max_id)
+    version = state_version(min_id, max_id)
     # Process each column to get bin assignments and scale data
     all_bin_assignments = []
     all_scale_data = []
@@ -173,18 +207,17 @@ def generate_histogram_data(column_names, numbers_of_bins, min_id, max_id):
 
     for column_name, number_of_bins in zip(column_names, numbers_of_bins):
         bin_assignments, scale_data, column_type = get_column_bin_assignments(
-            main_df, column_name, number_of_bins
+            main_df, column_name, number_of_bins, version
         )
         all_bin_assignments.append(bin_assignments)
         all_scale_data.append(scale_data)
         all_column_types.append(column_type)
 
-    # Create mappings and count items/errors
-    row_to_bin_mapping = create_row_to_bin_mapping(main_df, column_names, all_bin_assignments)
+    # Count items/errors per bin
     relevant_errors = get_relevant_errors(error_df, column_names)
-
-    items_per_bin = count_items_per_bin(row_to_bin_mapping)
-    errors_per_bin = count_errors_per_bin(relevant_errors, row_to_bin_mapping)
+    items_per_bin, errors_per_bin = count_items_and_errors_per_bin(
+        main_df, relevant_errors, all_bin_assignments, all_scale_data
+    )
 
     # Build histogram entries
     histogram_entries = build_histogram_entries(
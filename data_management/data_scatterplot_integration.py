@@ -2,34 +2,31 @@
 Constructs the JSON formats needed to render data in the view for the scatterplots
 '''
 
-import random
 import numpy as np
 import pandas as pd
 
-from app.service_helpers import is_categorical
+from app.service_helpers import is_categorical, state_version
 from data_management.data_integration import get_filtered_dataframes
 
-def generate_scatterplot_sample_data(x_column, y_column, min_id, max_id, error_sample_size, total_sample_size):
-    """Generate scatterplot data in the required JSON format"""
+def generate_scatterplot_sample_data(x_column, y_column, min_id, max_id, error_sample_size, total_sample_size, seed=None):
+    """Generate scatterplot data in the required JSON format, seed makes the sample reproducible"""
     # Get filtered data
     main_df, error_df = get_filtered_dataframes(min_id, max_id)
     print("got the dfs")
     # Determine column types
-    x_type = get_column_type_for_scatterplot(main_df, x_column)
-    y_type = get_column_type_for_scatterplot(main_df, y_column)
+    version = state_version(min_id, max_id)
+    x_type = get_column_type_for_scatterplot(main_df, x_column, version)
+    y_type = get_column_type_for_scatterplot(main_df, y_column, version)
     print("got the types")
     # Sample data directly using the more efficient approach
     sampled_ids = sample_scatterplot_data(
-        main_df, error_df, x_column, y_column, error_sample_size, total_sample_size
+        main_df, error_df, x_column, y_column, error_sample_size, total_sample_size, seed
     )
     print("got the sampled ids")
     # Build data entries
-    data_entries = []
-    for row_id in sampled_ids:
-        entry = build_scatterplot_data_entry(
-            main_df, error_df, row_id, x_column, y_column, x_type, y_type
-        )
-        data_entries.append(entry)
+    data_entries = build_scatterplot_data_entries(
+        main_df, error_df, sampled_ids, x_column, y_column, x_type, y_type
+    )
     print("data_entries done")
     # Build scale information
     scale_x = get_scale_info_for_scatterplot(main_df, x_column, x_type)
@@ -41,14 +38,12 @@ def generate_scatterplot_sample_data(x_column, y_column, min_id, max_id, error_s
         "scaleY": scale_y
     }
 
-def get_column_type_for_scatterplot(dataframe, column_name):
-    """Determine if column is categorical or numeric for scatterplot"""
-    column_data = dataframe[column_name].dropna()
-
-    if len(column_data) == 0:
+def get_column_type_for_scatterplot(dataframe, column_name, version=None):
+    """Determine if column is categorical or numeric for scatterplot, reusing the cached profile of the dataset version"""
+    if dataframe[column_name].notna().sum() == 0:
         return "categorical"  # Handle all-null case
 
-    return "categorical" if is_categorical(column_data) else "numeric"
+    return "categorical" if is_categorical(dataframe[column_name], version) else "numeric"
 
 
 def get_errors_for_id(error_df, row_id, x_column, y_column):
@@ -67,8 +62,11 @@ def get_column_value_for_scatterplot(dataframe, row_id, column_name, column_type
     if len(row_data) == 0:
         return "null"
 
-    value = row_data[column_name].iloc[0]
+    return to_scatterplot_value(row_data[column_name].iloc[0])
+
 
+def to_scatterplot_value(value):
+    """A cell value as it is sent to the view, "null" for missing values"""
     if pd.isna(value):
         return "null"
 
@@ -99,6 +97,35 @@ def build_scatterplot_data_entry(main_df, error_df, row_id, x_column, y_column,
     }
 
 
+def build_scatterplot_data_entries(main_df, error_df, sampled_ids, x_column, y_column, x_type, y_type):
+    """
+    Build the data entries of all sampled IDs, as build_scatterplot_data_entry does for one
+    :param main_df: the rows of the window
+    :param error_df: the errors of the window
+    :param sampled_ids: IDs returned by sample_scatterplot_data
+    :return: list of entries in the order of sampled_ids
+    """
+    # one take of the sampled rows through the ID index
+    sampled_rows = main_df.iloc[pd.Index(main_df['ID']).get_indexer(sampled_ids)]
+    x_values = [to_scatterplot_value(value) for value in sampled_rows[x_column].tolist()]
+    y_values = [to_scatterplot_value(value) for value in sampled_rows[y_column].tolist()]
+
+    # errors of the two columns grouped by row, in error_df order within a row
+    relevant_errors = error_df[
+        error_df['column_id'].isin([x_column, y_column]) & error_df['row_id'].isin(sampled_ids)
+    ]
+    errors_by_id = relevant_errors.groupby('row_id', sort=False)['error_type'].agg(list).to_dict()
+
+    return [{
+        "ID": row_id,
+        "xType": x_type,
+        "yType": y_type,
+        "x": x_value,
+        "y": y_value,
+        "errors": errors_by_id.get(row_id, [])
+    } for row_id, x_value, y_value in zip(sampled_ids, x_values, y_values)]
+
+
 def get_scale_info_for_scatterplot(dataframe, column_name, column_type):
     """Get scale information for scatterplot axes"""
     if column_type == "categorical":
@@ -119,28 +146,30 @@ def get_scale_info_for_scatterplot(dataframe, column_name, column_type):
         return {"numeric": [int(min_val), int(max_val) + 1], "categorical": []}
 
 
-def sample_scatterplot_data(main_df, error_df, x_column, y_column, error_sample_size, total_sample_size):
-    """Directly sample data for scatterplot following the JavaScript pattern"""
-    # Get IDs that have errors in the specified columns
-    relevant_errors = error_df[error_df['column_id'].isin([x_column, y_column])]
-    error_ids = set(relevant_errors['row_id'].unique())
+def choose_positions(rng, positions, sample_size):
+    """A uniform sample of sample_size positions without replacement, all of them when there are fewer"""
+    if len(positions) <= sample_size:
+        return positions
+    return np.sort(rng.choice(positions, size=sample_size, replace=False))
 
-    # Split main dataframe into error and non-error rows
-    error_rows = main_df[main_df['ID'].isin(error_ids)].copy()
-    non_error_rows = main_df[~main_df['ID'].isin(error_ids)].copy()
 
-    # Randomly remove error rows until we have <= error_sample_size
-    while len(error_rows) > error_sample_size:
-        random_idx = random.randint(0, len(error_rows) - 1)
-        error_rows = error_rows.drop(error_rows.index[random_idx]).reset_index(drop=True)
-
-    # Randomly remove non-error rows until total <= total_sample_size
-    while (len(error_rows) + len(non_error_rows)) > total_sample_size:
-        random_idx = random.randint(0, len(non_error_rows) - 1)
-        non_error_rows = non_error_rows.drop(non_error_rows.index[random_idx]).reset_index(drop=True)
+def sample_scatterplot_data(main_df, error_df, x_column, y_column, error_sample_size, total_sample_size, seed=None):
+    """
+    Directly sample data for scatterplot following the JavaScript pattern: up to error_sample_size rows with errors
+    in the two columns, then clean rows up to total_sample_size
+    :param seed: seed of the random generator, None for a different sample on every call
+    :return: the sampled IDs, error rows first, each group in dataframe order
+    """
+    rng = np.random.default_rng(seed)
+    # Split main dataframe into error and non-error rows
+    relevant_errors = error_df[error_df['column_id'].isin([x_column, y_column])]
+    has_error = main_df['ID'].isin(relevant_errors['row_id']).to_numpy()
 
-    # Combine the sampled data
-    sampled_data = pd.concat([error_rows, non_error_rows], ignore_index=True)
+    error_positions = choose_positions(rng, np.flatnonzero(has_error), error_sample_size)
+    clean_positions = choose_positions(
+        rng, np.flatnonzero(~has_error), max(total_sample_size - len(error_positions), 0)
+    )
 
-    return sampled_data['ID'].tolist()
+    ids = main_df['ID'].to_numpy()
+    return ids[error_positions].tolist() + ids[clean_positions].tolist()
 
@@ -23,18 +23,24 @@ class DataState:
         self.original_df = None
         self.original_cached_for_current_session = False
         self.current_error_dist = None
+        # bumped on every change of the current state, cached column profiles are keyed by it
+        self.version = 0
 
     """
     Setter,Getter functions for the data state management
     """
 
     def push_left_table_stack(self, table):
+        self.version += 1
         self.left_state_stack.append(table)
     def push_right_table_stack(self, table):
+        self.version += 1
         self.right_state_stack.append(table)
     def pop_left_table_stack(self):
+        self.version += 1
         return self.left_state_stack.pop()
     def pop_right_table_stack(self):
+        self.version += 1
         return self.right_state_stack.pop()
 
     def set_original_error_table(self, original_error_table):
@@ -68,11 +74,13 @@ class DataState:
         if len(self.left_state_stack) > 0:
             prev_state = self.left_state_stack.pop()
             self.right_state_stack.append(prev_state)
+            self.version += 1
 
     def redo(self):
         right_table_stack_len = len(self.right_state_stack)
         if right_table_stack_len > 1:
             next_state = self.right_state_stack.pop()
             self.left_state_stack.append(next_state)
+            self.version += 1
 
 
@@ -0,0 +1,356 @@
+import numpy as np
+import pandas as pd
+
+from detectors.profile import NUMERIC_STRING_PATTERN, majority_class
+from detectors.vectorized import ANOMALY_MIN_NUMERIC, ANOMALY_Z_SCORE, INCOMPLETE_FREQUENCY_THRESHOLD, \
+    INCOMPLETE_RARE_COUNT, missing_mask
+
+"""
+Two pass versions of the four server detectors for data that is read in chunks, so the whole table
+never has to be in memory at once.
+
+Pass 1 (DetectorStatistics.update) accumulates per column statistics over every raw chunk: the
+numeric count/mean/M2 used by anomaly, the numeric vs string type counts used by datatype_mismatch and
+hashed value counts used by incomplete. Pass 2 (detect_chunk_errors) flags the cells of one chunk
+against the finished statistics and returns long format error rows {row_id, column_id, error_type}.
+
+Chunks are read as strings (dtype=str) so every chunk sees the same values a whole-file read_csv would
+see for text columns, convert_chunk then casts each chunk to the column type the whole file implies.
+The thresholds, the numeric string pattern and the datatype_mismatch majority rule (majority_class) are the
+ones run_detectors uses. Two cases can still differ from run_detectors on a whole frame: an existing ID column
+is only kept when it is strictly increasing (uniqueness cannot be checked without holding every ID), and a
+datatype_mismatch tie between numeric-looking and string cells is decided by the class of the most frequent
+value only while value counts are kept (columns with at most INCOMPLETE_FREQUENCY_THRESHOLD numbers), past that,
+or when the most frequent values of both classes tie, it goes to the class seen first in the file. Memory does
+not grow with the number of rows, except for one 64-bit hash per distinct value of the text columns incomplete
+can still apply to.
+"""
+
+INTEGER_STRING_PATTERN = r'^[-+]?\d+$'
+BOOLEAN_STRINGS = {"True": True, "False": False, "true": True, "false": False, "TRUE": True, "FALSE": False}
+ERROR_COLUMNS = ["row_id", "column_id", "error_type"]
+
+
+def hash_values(values):
+    """
+    Hashes the values of a string series so value counts can be kept without holding every distinct string
+    :param values: series of non-null strings
+    :return: numpy array of uint64 hashes
+    """
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def empty_error_frame():
+    """
+    :return: an empty error dataframe with the long format columns and dtypes
+    """
+    return pd.DataFrame({
+        "row_id": pd.Series(dtype="int64"),
+        "column_id": pd.Series(dtype="object"),
+        "error_type": pd.Series(dtype="object"),
+    })
+
+
+class ColumnStatistics:
+    """
+    Running statistics of a single column across all chunks of pass 1
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.null_count = 0
+        self.non_null_count = 0
+        self.numeric_count = 0
+        self.numeric_mean = 0.0
+        self.numeric_m2 = 0.0
+        self.has_non_numeric = False
+        self.all_integer = True
+        self.all_boolean = True
+        self.true_count = 0
+        self.numeric_string_count = 0
+        # hashed value counts per type class ("numeric" or "str"), and the classes in order of first appearance
+        self.value_counts = {}
+        self.class_order = []
+        self.tracking_values = True
+        self.rare_hashes = None
+        self.dtype = None
+        self.majority_type = None
+
+    def update(self, raw_values):
+        """
+        Adds one chunk of raw (string) values to the statistics
+        :param raw_values: series of strings/NaN for this column
+        :return: None
+        """
+        non_null = raw_values.dropna()
+        self.null_count += len(raw_values) - len(non_null)
+        self.non_null_count += len(non_null)
+        if len(non_null) == 0:
+            return
+
+        numeric = pd.to_numeric(non_null, errors='coerce')
+        numeric_values = numeric.dropna().to_numpy(dtype="float64")
+        if len(numeric_values) < len(non_null):
+            self.has_non_numeric = True
+        self._merge_numeric(numeric_values)
+
+        if self.all_integer and not non_null.str.fullmatch(INTEGER_STRING_PATTERN).all():
+            self.all_integer = False
+        if self.all_boolean and not non_null.isin(BOOLEAN_STRINGS.keys()).all():
+            self.all_boolean = False
+        if self.all_boolean:
+            self.true_count += int(non_null.map(BOOLEAN_STRINGS).sum())
+        looks_numeric = non_null.str.strip().str.fullmatch(NUMERIC_STRING_PATTERN).to_numpy(dtype=bool)
+        self.numeric_string_count += int(looks_numeric.sum())
+        classes = np.where(looks_numeric, "numeric", "str")
+        for type_class in pd.unique(classes):
+            if type_class not in self.class_order:
+                self.class_order.append(type_class)
+
+        # incomplete is skipped for columns with more than the threshold of numeric values, stop counting then
+        if self.numeric_count > INCOMPLETE_FREQUENCY_THRESHOLD:
+            self.tracking_values = False
+            self.value_counts = None
+        if self.tracking_values:
+            hashes = hash_values(non_null)
+            for type_class in self.class_order:
+                chunk_counts = pd.Series(hashes[classes == type_class]).value_counts()
+                counts = self.value_counts.get(type_class, pd.Series(dtype="int64"))
+                self.value_counts[type_class] = counts.add(chunk_counts, fill_value=0).astype("int64")
+
+    def _merge_numeric(self, values):
+        """
+        Merges the count/mean/M2 of a batch of numbers into the running totals (Chan et al. parallel variance)
+        """
+        batch_count = len(values)
+        if batch_count == 0:
+            return
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = self.numeric_count + batch_count
+        delta = batch_mean - self.numeric_mean
+        self.numeric_mean += delta * batch_count / total
+        self.numeric_m2 += batch_m2 + delta ** 2 * self.numeric_count * batch_count / total
+        self.numeric_count = total
+
+    def finalize(self):
+        """
+        Decides the column type a whole-file read would have produced and the detector thresholds
+        :return: None
+        """
+        if self.non_null_count == 0:
+            self.dtype = "float"
+        elif self.all_boolean and self.null_count == 0:
+            self.dtype = "bool"
+            # a bool column is numeric to anomaly (True=1, False=0) even though its strings are not
+            self.numeric_count = self.non_null_count
+            self.numeric_mean = self.true_count / self.numeric_count
+            self.numeric_m2 = self.numeric_count * self.numeric_mean * (1 - self.numeric_mean)
+        elif not self.has_non_numeric:
+            self.dtype = "int" if self.all_integer and self.null_count == 0 else "float"
+        else:
+            self.dtype = "object"
+
+        self.majority_type = majority_class(self.class_counts())
+
+        if self.tracking_values and self.dtype == "object":
+            self.rare_hashes = np.concatenate([
+                counts[counts < INCOMPLETE_RARE_COUNT].index.to_numpy(dtype="uint64")
+                for counts in self.value_counts.values()
+            ] + [np.array([], dtype="uint64")])
+        self.value_counts = None
+
+    def class_counts(self):
+        """
+        Number of non-null cells per type class, ordered the way ColumnProfile.class_counts orders them: by the
+        count of the most frequent value of each class while value counts are kept, by first appearance otherwise
+        :return: Series of cell counts indexed by type class
+        """
+        totals = {"numeric": self.numeric_string_count, "str": self.non_null_count - self.numeric_string_count}
+        class_order = list(self.class_order)
+        if self.tracking_values:
+            top_counts = {type_class: self.value_counts[type_class].max() for type_class in class_order}
+            class_order.sort(key=lambda type_class: -top_counts[type_class])
+        return pd.Series({type_class: totals[type_class] for type_class in class_order}, dtype="int64")
+
+    @property
+    def numeric_std(self):
+        """
+        Sample standard deviation (ddof=1) of the numeric values, matching pandas' std()
+        """
+        if self.numeric_count < 2:
+            return np.nan
+        return float(np.sqrt(self.numeric_m2 / (self.numeric_count - 1)))
+
+    def convert(self, raw_values):
+        """
+        Casts a chunk of raw string values to the finalized column type
+        :param raw_values: series of strings/NaN
+        :return: the converted series
+        """
+        if self.dtype == "object":
+            return raw_values
+        if self.dtype == "bool":
+            return raw_values.map(BOOLEAN_STRINGS).astype(bool)
+        numeric = pd.to_numeric(raw_values, errors='coerce')
+        if self.dtype == "int":
+            return numeric.astype("int64")
+        return numeric.astype("float64")
+
+
+class DetectorStatistics:
+    """
+    Statistics for every column of a chunked table, plus the ID strategy set_id_column would have picked
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.column_order = None
+        self.total_rows = 0
+        self.id_is_valid = True
+        self.last_id = None
+
+    def update(self, raw_chunk):
+        """
+        Pass 1: accumulates the statistics of one raw chunk (read with dtype=str)
+        :param raw_chunk: the dataframe chunk
+        :return: None
+        """
+        if self.column_order is None:
+            self.column_order = list(raw_chunk.columns)
+            for column in self.column_order:
+                self.columns[column] = ColumnStatistics(column)
+        self.total_rows += len(raw_chunk)
+        for column in self.column_order:
+            self.columns[column].update(raw_chunk[column])
+        if "ID" in raw_chunk.columns:
+            self._check_id_column(raw_chunk["ID"])
+
+    def _check_id_column(self, raw_ids):
+        """
+        An existing ID column is kept only if it is numeric and strictly increasing, which guarantees
+        uniqueness without holding every ID in memory
+        """
+        if not self.id_is_valid or len(raw_ids) == 0:
+            return
+        ids = pd.to_numeric(raw_ids, errors='coerce')
+        if ids.isna().any() or not ids.is_monotonic_increasing or not ids.is_unique:
+            self.id_is_valid = False
+            return
+        if self.last_id is not None and ids.iloc[0] <= self.last_id:
+            self.id_is_valid = False
+            return
+        self.last_id = ids.iloc[-1]
+
+    def finalize(self):
+        """
+        Finishes every column once all chunks have been seen
+        :return: None
+        """
+        for column_stats in self.columns.values():
+            column_stats.finalize()
+
+    @property
+    def keeps_existing_id(self):
+        return self.column_order is not None and "ID" in self.column_order and self.id_is_valid
+
+    @property
+    def converted_columns(self):
+        """The columns of a converted chunk, in order"""
+        if self.keeps_existing_id:
+            return ["ID"] + [c for c in self.column_order if c != "ID"]
+        return ["ID"] + ["Original_ID" if c == "ID" else c for c in self.column_order]
+
+    def convert_chunk(self, raw_chunk, first_id):
+        """
+        Pass 2: casts a raw chunk to the final column types and assigns the ID column the same way
+        set_id_column does for a whole table
+        :param raw_chunk: the dataframe chunk read with dtype=str
+        :param first_id: the ID the first row of this chunk gets when IDs are generated
+        :return: the converted chunk with "ID" as its first column
+        """
+        chunk = pd.DataFrame({column: self.columns[column].convert(raw_chunk[column]) for column in self.column_order},
+                             index=raw_chunk.index)
+        if self.keeps_existing_id:
+            chunk["ID"] = pd.to_numeric(chunk["ID"])
+            return chunk[["ID"] + [c for c in self.column_order if c != "ID"]]
+        if "ID" in chunk.columns:
+            chunk = chunk.rename(columns={"ID": "Original_ID"})
+        chunk.insert(0, "ID", np.arange(first_id, first_id + len(chunk), dtype="int64"))
+        return chunk
+
+    def statistics_for(self, column):
+        """
+        Statistics of a column of the converted table, Original_ID carries the statistics of the raw ID column
+        """
+        if column == "Original_ID" and not self.keeps_existing_id:
+            return self.columns["ID"]
+        return self.columns[column]
+
+
+def _errors_for_mask(ids, column, mask, error_type):
+    """
+    Long format error rows for the cells of one column selected by a boolean mask
+    """
+    flagged = ids[mask]
+    return pd.DataFrame({
+        "row_id": flagged.astype("int64"),
+        "column_id": column,
+        "error_type": error_type,
+    })
+
+
+def detect_chunk_errors(chunk, statistics):
+    """
+    Pass 2: runs anomaly, incomplete, missing_value and datatype_mismatch on one converted chunk
+    against the statistics of the whole table
+    :param chunk: a chunk returned by DetectorStatistics.convert_chunk
+    :param statistics: the finalized DetectorStatistics
+    :return: long format error dataframe {row_id, column_id, error_type}
+    """
+    ids = chunk["ID"].to_numpy()
+    detected_columns = list(chunk.columns[1:])
+    frames = {"anomaly": [], "incomplete": [], "missing": [], "mismatch": []}
+
+    for column in detected_columns:
+        column_stats = statistics.statistics_for(column)
+        values = chunk[column]
+
+        # anomaly: |value - mean| > 2 * std over the numeric values of the whole column
+        std = column_stats.numeric_std
+        if column_stats.numeric_count >= ANOMALY_MIN_NUMERIC and std != 0 and not np.isnan(std):
+            numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype="float64")
+            with np.errstate(invalid="ignore"):
+                mask = np.abs(numeric - column_stats.numeric_mean) > ANOMALY_Z_SCORE * std
+            frames["anomaly"].append(_errors_for_mask(ids, column, mask, "anomaly"))
+
+        # incomplete: values occurring fewer than 3 times in text columns with few numeric values
+        if column_stats.rare_hashes is not None and len(column_stats.rare_hashes) > 0:
+            non_null = values.dropna()
+            mask = np.zeros(len(values), dtype=bool)
+            mask[values.notna().to_numpy()] = np.isin(hash_values(non_null), column_stats.rare_hashes)
+            frames["incomplete"].append(_errors_for_mask(ids, column, mask, "incomplete"))
+
+        # mismatch: text values whose type (numeric-looking vs string) differs from the column majority
+        if column_stats.dtype == "object":
+            non_null = values.notna().to_numpy()
+            looks_numeric = values.str.strip().str.fullmatch(NUMERIC_STRING_PATTERN, na=False).to_numpy(dtype=bool)
+            if column_stats.majority_type == "numeric":
+                mask = non_null & ~looks_numeric
+            else:
+                mask = non_null & looks_numeric
+            if 0 < column_stats.numeric_string_count < column_stats.non_null_count:
+                frames["mismatch"].append(_errors_for_mask(ids, column, mask, "mismatch"))
+
+    # missing: null, "null" or "undefined" cells in any column
+    for column in chunk.columns:
+        values = chunk[column]
+        mask = missing_mask(values)
+        if mask.any():
+            frames["missing"].append(_errors_for_mask(ids, column, mask, "missing"))
+
+    collected = [frame for error_type in ("anomaly", "incomplete", "missing", "mismatch")
+                 for frame in frames[error_type] if len(frame) > 0]
+    if not collected:
+        return empty_error_frame()
+    return pd.concat(collected, ignore_index=True)
@@ -0,0 +1,278 @@
+import numpy as np
+import pandas as pd
+
+from detectors.profile import classify_types, majority_class
+from detectors.vectorized import ANOMALY_MIN_NUMERIC, ANOMALY_Z_SCORE, INCOMPLETE_FREQUENCY_THRESHOLD, \
+    INCOMPLETE_RARE_COUNT, MISSING_STRINGS, DETECTOR_ORDER, EXCLUDED_ERROR_COLUMNS, ID_SKIPPING_DETECTORS
+
+"""
+Incrementally maintained detector results for a table that is being wrangled.
+
+ErrorState keeps, per column, the aggregates the detectors depend on (count/mean/M2 of the numeric values
+for anomaly, the count of every distinct value for incomplete, the count of every type class for
+datatype_mismatch) together with the flags currently stored in errors<table>. Removing rows or changing
+cells updates the aggregates from the removed/added values only, re-evaluates the flags against them and
+reports just the (row_id, column_id, error_type) rows whose status changed, so errors<table> can be patched
+instead of rewritten.
+
+The flags match detect_errors on the current rows: the datatype_mismatch majority is picked by majority_class, the
+rule ColumnProfile uses, over the type classes in value_counts order.
+"""
+
+ERROR_COLUMNS = ["row_id", "column_id", "error_type"]
+
+
+def _merge_moments(count, mean, m2, values):
+    """
+    Adds a batch of numbers to a running count/mean/M2 (Chan et al. parallel variance)
+    """
+    batch_count = len(values)
+    if batch_count == 0:
+        return count, mean, m2
+    batch_mean = values.mean()
+    batch_m2 = ((values - batch_mean) ** 2).sum()
+    total = count + batch_count
+    delta = batch_mean - mean
+    return total, mean + delta * batch_count / total, m2 + batch_m2 + delta ** 2 * count * batch_count / total
+
+
+def _remove_moments(count, mean, m2, values):
+    """
+    Takes a batch of numbers back out of a running count/mean/M2, the inverse of _merge_moments
+    """
+    batch_count = len(values)
+    if batch_count == 0:
+        return count, mean, m2
+    remaining = count - batch_count
+    if remaining <= 0:
+        return 0, 0.0, 0.0
+    batch_mean = values.mean()
+    batch_m2 = ((values - batch_mean) ** 2).sum()
+    remaining_mean = (count * mean - batch_count * batch_mean) / remaining
+    delta = batch_mean - remaining_mean
+    remaining_m2 = m2 - batch_m2 - delta ** 2 * remaining * batch_count / count
+    return remaining, remaining_mean, max(remaining_m2, 0.0)
+
+
+class ColumnErrorState:
+    """
+    Aggregates and current flags of one column
+    """
+
+    def __init__(self, name, position, values):
+        self.name = name
+        self.position = position
+        self.is_text = values.dtype == 'object'
+        self.numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype="float64")
+        valid = self.numeric[~np.isnan(self.numeric)]
+        self.numeric_count, self.numeric_mean, self.numeric_m2 = _merge_moments(0, 0.0, 0.0, valid)
+
+        if self.is_text:
+            codes, uniques = pd.factorize(values)
+            self.codes = codes.astype(np.int64)
+            self.uniques = list(uniques)
+            self.code_of = {value: code for code, value in enumerate(self.uniques)}
+            self.counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.uniques)).astype(np.int64)
+            self.classes = np.asarray(classify_types(pd.Index(self.uniques, dtype=object)), dtype=object)
+            self.missing_codes = np.isin(np.asarray(self.uniques, dtype=object).astype(str), MISSING_STRINGS)
+            self.missing = self.codes < 0
+            self.missing[self.codes >= 0] = self.missing_codes[self.codes[self.codes >= 0]]
+        else:
+            self.missing = values.isna().to_numpy()
+        self.flags = {}
+
+    @property
+    def numeric_std(self):
+        if self.numeric_count < 2:
+            return np.nan
+        return float(np.sqrt(self.numeric_m2 / (self.numeric_count - 1)))
+
+    def _code_for(self, value):
+        """
+        Code of a value, new distinct values are appended to the dictionary
+        """
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return -1
+        code = self.code_of.get(value)
+        if code is None:
+            code = len(self.uniques)
+            self.uniques.append(value)
+            self.code_of[value] = code
+            self.counts = np.append(self.counts, 0)
+            self.classes = np.append(self.classes, classify_types(pd.Index([value], dtype=object)))
+            self.missing_codes = np.append(self.missing_codes, str(value) in MISSING_STRINGS)
+        return code
+
+    def remove_values(self, positions):
+        """
+        Takes the values at positions out of the aggregates
+        """
+        numeric = self.numeric[positions]
+        self.numeric_count, self.numeric_mean, self.numeric_m2 = _remove_moments(
+            self.numeric_count, self.numeric_mean, self.numeric_m2, numeric[~np.isnan(numeric)])
+        if self.is_text:
+            codes = self.codes[positions]
+            self.counts -= np.bincount(codes[codes >= 0], minlength=len(self.counts))
+
+    def add_values(self, positions, values):
+        """
+        Stores new values at positions and adds them to the aggregates
+        """
+        values = pd.Series(values, dtype=object if self.is_text else None)
+        numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype="float64")
+        self.numeric[positions] = numeric
+        self.numeric_count, self.numeric_mean, self.numeric_m2 = _merge_moments(
+            self.numeric_count, self.numeric_mean, self.numeric_m2, numeric[~np.isnan(numeric)])
+        if self.is_text:
+            codes = np.array([self._code_for(value) for value in values], dtype=np.int64)
+            self.codes[positions] = codes
+            self.counts += np.bincount(codes[codes >= 0], minlength=len(self.counts))
+            self.missing[positions] = (codes < 0) | self.missing_codes[np.maximum(codes, 0)]
+        else:
+            self.missing[positions] = values.isna().to_numpy()
+
+    def majority_type(self):
+        """
+        Majority type class with datatype_mismatch's rules, None when the column holds fewer than two classes
+        """
+        present = self.counts > 0
+        if not present.any():
+            return None
+        class_counts = pd.Series(self.counts[present]).groupby(self.classes[present], sort=False).sum()
+        if len(class_counts) < 2:
+            return None
+        # classes are listed in value_counts order, as ColumnProfile.class_counts lists them
+        order = np.argsort(-self.counts[present], kind="stable")
+        return majority_class(class_counts[pd.unique(self.classes[present][order])])
+
+    def evaluate(self, alive):
+        """
+        Flags of every detector for this column against the current aggregates
+        :param alive: boolean array of the rows still in the table
+        :return: {error_type: boolean array}
+        """
+        flags = {"missing": self.missing & alive}
+        if self.position == 0:
+            return flags
+
+        std = self.numeric_std
+        if self.numeric_count < ANOMALY_MIN_NUMERIC or std == 0 or np.isnan(std):
+            flags["anomaly"] = np.zeros(len(alive), dtype=bool)
+        else:
+            with np.errstate(invalid="ignore"):
+                flags["anomaly"] = (np.abs(self.numeric - self.numeric_mean) > ANOMALY_Z_SCORE * std) & alive
+
+        flags["incomplete"] = np.zeros(len(alive), dtype=bool)
+        flags["mismatch"] = np.zeros(len(alive), dtype=bool)
+        if self.is_text:
+            has_value = self.codes >= 0
+            safe_codes = np.maximum(self.codes, 0)
+            if self.numeric_count <= INCOMPLETE_FREQUENCY_THRESHOLD:
+                flags["incomplete"] = has_value & (self.counts[safe_codes] < INCOMPLETE_RARE_COUNT) & alive
+            majority_type = self.majority_type()
+            if majority_type is not None:
+                flags["mismatch"] = has_value & (self.classes[safe_codes] != majority_type) & alive
+        return flags
+
+
+class ErrorState:
+    """
+    Detector results of a whole table plus the aggregates needed to maintain them incrementally
+    """
+
+    def __init__(self, data_frame):
+        """
+        :param data_frame: the table with "ID" as its first column, as set_id_column returns it
+        """
+        self.ids = data_frame["ID"].to_numpy()
+        self.id_index = pd.Index(self.ids)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.columns = {}
+        for position, name in enumerate(data_frame.columns):
+            column_state = ColumnErrorState(name, position, data_frame.iloc[:, position])
+            column_state.flags = column_state.evaluate(self.alive)
+            self.columns[name] = column_state
+
+    def positions_of(self, ids):
+        """
+        :param ids: row IDs
+        :return: positions of the IDs that are still in the table
+        """
+        positions = self.id_index.get_indexer(pd.Index(ids))
+        positions = positions[positions >= 0]
+        return positions[self.alive[positions]]
+
+    def remove_rows(self, ids):
+        """
+        Removes rows from the state, their error rows disappear with them
+        :param ids: the removed row IDs
+        :return: (added, cleared) long format dataframes of the error rows of the remaining rows that changed
+        """
+        positions = self.positions_of(ids)
+        for column_state in self.columns.values():
+            column_state.remove_values(positions)
+        self.alive[positions] = False
+        for column_state in self.columns.values():
+            for flags in column_state.flags.values():
+                flags[positions] = False
+        return self._refresh(self.columns.values())
+
+    def update_cells(self, column, ids, values):
+        """
+        Replaces the values of one column for some rows, only that column is re-evaluated
+        :param column: the column name
+        :param ids: the row IDs whose cells changed
+        :param values: the new values, in the order of ids
+        :return: (added, cleared) long format dataframes of the error rows that changed
+        """
+        column_state = self.columns[column]
+        lookup = self.id_index.get_indexer(pd.Index(ids))
+        keep = (lookup >= 0)
+        keep[keep] = self.alive[lookup[keep]]
+        positions = lookup[keep]
+        new_values = [value for value, kept in zip(values, keep) if kept]
+        column_state.remove_values(positions)
+        column_state.add_values(positions, new_values)
+        return self._refresh([column_state])
+
+    def _refresh(self, column_states):
+        """
+        Re-evaluates the flags of the given columns and collects the ones that changed
+        """
+        added = []
+        cleared = []
+        for column_state in column_states:
+            if column_state.name in EXCLUDED_ERROR_COLUMNS:
+                continue
+            new_flags = column_state.evaluate(self.alive)
+            for error_type, new in new_flags.items():
+                old = column_state.flags.get(error_type, np.zeros(len(new), dtype=bool))
+                added.append(self._error_rows(column_state.name, error_type, new & ~old))
+                cleared.append(self._error_rows(column_state.name, error_type, old & ~new))
+            column_state.flags = new_flags
+        return _concat_errors(added), _concat_errors(cleared)
+
+    def _error_rows(self, column, error_type, mask):
+        flagged = self.ids[mask]
+        return pd.DataFrame({"row_id": flagged, "column_id": column, "error_type": error_type})
+
+    def error_frame(self):
+        """
+        :return: every error row currently flagged, long format, in detector then column order
+        """
+        frames = []
+        for error_type in DETECTOR_ORDER:
+            for column_state in self.columns.values():
+                if column_state.name in EXCLUDED_ERROR_COLUMNS:
+                    continue
+                if column_state.position == 0 and error_type in ID_SKIPPING_DETECTORS:
+                    continue
+                frames.append(self._error_rows(column_state.name, error_type, column_state.flags[error_type]))
+        return _concat_errors(frames)
+
+
+def _concat_errors(frames):
+    frames = [frame for frame in frames if len(frame) > 0]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype="object") for column in ERROR_COLUMNS}).astype({"row_id": "int64"})
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from detectors.vectorized import DETECTOR_ORDER, column_masks, errors_from_cells
+
+"""
+Runs the vectorized detectors as one task per column on a pool of worker processes.
+
+The frame itself is never pickled into the tasks: numeric and boolean columns are copied once into shared
+memory blocks, object columns are dictionary encoded so that their integer codes go into one block and their
+distinct values are pickled once per column into another. A task only carries the names of the blocks. Each
+worker rebuilds the column from the blocks once, runs every detector on it with one shared ColumnProfile (as the
+serial engine does) and sends back the flagged row positions of each detector, which the parent assembles with the same code as the serial engine, so the result is identical to detect_errors.
+
+The workers are started with forkserver (spawn where it is not available): the detectors run from ingest job
+threads, and forking a multithreaded server can copy locks held by its other threads into the child.
+"""
+
+# Worker processes used by run_detectors, 0 keeps the serial engine. Set DETECTOR_WORKERS in the environment/.env
+DETECTOR_WORKER_COUNT = int(os.environ.get("DETECTOR_WORKERS", 0))
+
+# Frames smaller than this run serially, starting the tasks costs more than it saves
+PARALLEL_DETECTOR_MIN_ROWS = 50_000
+
+_POOL = None
+_POOL_WORKERS = None
+# ingest jobs run on several threads, only one of them may create or replace the pool
+_POOL_LOCK = threading.Lock()
+
+
+def get_detector_pool(workers):
+    """
+    The worker pool is created on first use and reused, so the processes start once per server
+    :param workers: the number of worker processes
+    :return: the ProcessPoolExecutor
+    """
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def share_array(array, blocks):
+    """
+    Copies a numpy array into a new shared memory block
+    :param array: the array to share
+    :param blocks: list collecting the blocks so the caller can release them
+    :return: (block name, dtype string, length) describing the array to a worker
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block.name, array.dtype.str, len(array)
+
+
+def share_bytes(data, blocks):
+    """
+    Copies bytes into a new shared memory block
+    :return: (block name, length) describing the bytes to a worker
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    blocks.append(block)
+    block.buf[:len(data)] = data
+    return block.name, len(data)
+
+
+def factorize_exactly(values):
+    """
+    Dictionary encodes an object column without merging values that only compare equal
+    :param values: the object column
+    :return: (codes, uniques), -1 codes are the NaN values of a text column
+    """
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        codes, uniques = pd.factorize(values)
+        return codes, np.asarray(uniques, dtype=object)
+    # mixed columns are encoded on (type, value), pd.factorize alone would merge 1, 1.0 and True
+    objects = values.to_numpy()
+    keys = np.empty(len(objects), dtype=object)
+    keys[:] = [(type(value), value) for value in objects]
+    codes, key_uniques = pd.factorize(keys)
+    uniques = np.empty(len(key_uniques), dtype=object)
+    uniques[:] = [key[1] for key in key_uniques]
+    return codes, uniques
+
+
+def share_column(values, blocks):
+    """
+    Describes a column so a worker can rebuild it from shared memory
+    :param values: the column
+    :param blocks: list collecting the shared memory blocks
+    :return: the column spec passed with each task, it only holds block names
+    """
+    if values.dtype != object and isinstance(values.dtype, np.dtype):
+        return {"kind": "array", "array": share_array(values.to_numpy(), blocks)}
+    if values.dtype != object:
+        # extension dtypes (nullable integers, categoricals) go through their object values
+        values = values.astype(object)
+    codes, uniques = factorize_exactly(values)
+    return {"kind": "codes", "array": share_array(codes, blocks),
+            "uniques": share_bytes(pickle.dumps(uniques, protocol=pickle.HIGHEST_PROTOCOL), blocks)}
+
+
+def load_column(spec):
+    """
+    Rebuilds a column inside a worker process
+    :param spec: the column spec from share_column
+    :return: the column as a Series
+    """
+    name, dtype, length = spec["array"]
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        array = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf).copy()
+    finally:
+        block.close()
+    if spec["kind"] == "array":
+        return pd.Series(array)
+    name, size = spec["uniques"]
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        uniques = pickle.loads(bytes(block.buf[:size]))
+    finally:
+        block.close()
+    values = uniques.take(np.maximum(array, 0))
+    values[array < 0] = np.nan
+    return pd.Series(values, dtype=object)
+
+
+def run_column_task(position, spec):
+    """
+    Worker entry point, runs every detector that applies to one column
+    :return: (position, {detector: flagged row positions or None})
+    """
+    masks = column_masks(load_column(spec), position)
+    return position, {error_type: None if mask is None else np.flatnonzero(mask) for error_type, mask in masks.items()}
+
+
+def detect_errors_parallel(data_frame, workers):
+    """
+    Runs anomaly, incomplete, missing_value and datatype_mismatch as one task per column on a process pool
+    :param data_frame: the dataframe with "ID" as its first column
+    :param workers: the number of worker processes
+    :return: long format error dataframe {row_id, column_id, error_type}, identical to detect_errors
+    """
+    blocks = []
+    try:
+        specs = [share_column(data_frame.iloc[:, position], blocks) for position in range(data_frame.shape[1])]
+        pool = get_detector_pool(workers)
+        futures = [pool.submit(run_column_task, position, spec) for position, spec in enumerate(specs)]
+        results = [future.result() for future in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    cells = {error_type: [] for error_type in DETECTOR_ORDER}
+    for position, flagged in results:
+        for error_type, rows in flagged.items():
+            if rows is not None and len(rows) > 0:
+                cells[error_type].append((position, rows))
+    return errors_from_cells(data_frame["ID"].to_numpy(), data_frame.columns, cells)
+
+
+def use_parallel_detectors(data_frame, workers):
+    """
+    :param data_frame: the frame about to be detected
+    :param workers: the configured number of worker processes
+    :return: True when the frame should go through the process pool
+    """
+    return workers is not None and workers > 1 and len(data_frame) >= PARALLEL_DETECTOR_MIN_ROWS
@@ -0,0 +1,167 @@
+import re
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+"""
+Column profiles: one type scan per column that the detectors and the endpoints share.
+
+A ColumnProfile computes each fact about a column (coerced numeric values, value counts, the type class of every
+distinct value, null count, min/max/mean/std, cardinality and the majority type) the first time it is asked
+for and keeps it, so a column that is profiled once is never re-scanned for the same question. Profiles are
+cached per dataset version by get_column_profile in app/service_helpers.py.
+"""
+
+# Text datatype_mismatch classes as "numeric" once trimmed. The SQL engines (app/db_functions.py and
+# app/duckdb_backend.py) build their patterns from the unanchored body
+NUMERIC_STRING_BODY = r'\d+(\.\d+)?'
+NUMERIC_STRING_PATTERN = rf'^{NUMERIC_STRING_BODY}$'
+
+# Characters the SQL engines trim before classing a value, the ASCII whitespace of str.strip()
+MISMATCH_TRIMMED = " \t\n\r\f\v"
+
+# Text the SQL engines read as a number: the decimal and exponent strings pd.to_numeric accepts,
+# with surrounding whitespace. [[:space:]] reads the same in Postgres and DuckDB regular expressions
+NUMBER_PATTERN = r"[[:space:]]*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?[[:space:]]*"
+
+
+def classify_types(keys):
+    """
+    Type class of each distinct value as datatype_mismatch sees it: the python type name, with strings
+    that look like numbers classed as "numeric"
+    :param keys: index of distinct values
+    :return: numpy array of class names
+    """
+    if pd.api.types.infer_dtype(keys, skipna=False) == "string":
+        looks_numeric = pd.Series(keys, dtype=object).str.strip().str.fullmatch(NUMERIC_STRING_PATTERN)
+        return np.where(looks_numeric.to_numpy(dtype=bool), "numeric", "str")
+    classes = []
+    for key in keys:
+        type_of_key = type(key).__name__
+        if isinstance(key, str) and re.fullmatch(NUMERIC_STRING_PATTERN, key.strip()):
+            type_of_key = "numeric"
+        classes.append(type_of_key)
+    return np.array(classes, dtype=object)
+
+
+def majority_class(class_counts):
+    """
+    The type class holding the most cells with datatype_mismatch's tie rule: a tie goes to int/float, otherwise
+    to the class listed first
+    :param class_counts: Series of cell counts indexed by type class, in order of the class's first value in
+    value_counts (the class of the most frequent value first)
+    :return: the majority class, None when class_counts is empty
+    """
+    majority_type = None
+    majority_count = 0
+    for key, value in class_counts.items():
+        if value == majority_count and (key == "int" or key == "float"):
+            majority_type = key
+            majority_count = value
+        elif value > majority_count:
+            majority_count = value
+            majority_type = key
+    return majority_type
+
+
+class ColumnProfile:
+    """
+    Lazily computed facts about one column, each computed at most once
+    """
+
+    def __init__(self, values):
+        """
+        :param values: the column as a Series
+        """
+        self.values = values
+        self.name = values.name
+        self.dtype = values.dtype
+        self.is_text = values.dtype == 'object'
+
+    @cached_property
+    def numeric(self):
+        """The column passed through pd.to_numeric(errors='coerce')"""
+        return pd.to_numeric(self.values, errors='coerce')
+
+    @cached_property
+    def numeric_mask(self):
+        """Boolean numpy array of the cells holding a number"""
+        return self.numeric.notna().to_numpy()
+
+    @cached_property
+    def numeric_count(self):
+        return int(self.numeric_mask.sum())
+
+    @cached_property
+    def null_count(self):
+        return int(self.values.isna().sum())
+
+    @cached_property
+    def value_counts(self):
+        """Counts of the distinct non-null values, most frequent first"""
+        return self.values.value_counts()
+
+    @cached_property
+    def cardinality(self):
+        return len(self.value_counts)
+
+    @cached_property
+    def type_classes(self):
+        """Type class of each value in value_counts, in the same order"""
+        return classify_types(self.value_counts.index)
+
+    @cached_property
+    def class_counts(self):
+        """Number of cells per type class, classes in order of their first value in value_counts"""
+        return pd.Series(self.value_counts.to_numpy()).groupby(self.type_classes, sort=False).sum()
+
+    @cached_property
+    def majority_type(self):
+        """
+        The type class holding the most cells with datatype_mismatch's tie rule (a tie goes to int/float),
+        None for an empty column
+        """
+        return majority_class(self.class_counts)
+
+    @cached_property
+    def largest_type(self):
+        """The type class holding the most cells, ties go to the class seen first, None for an empty column"""
+        if len(self.class_counts) == 0:
+            return None
+        return self.class_counts.idxmax()
+
+    @cached_property
+    def is_categorical(self):
+        """True when the column is mostly text (or empty), the typing used by the plots and summaries"""
+        return self.largest_type in ("str", None)
+
+    @cached_property
+    def inferred_type(self):
+        return "categorical" if self.is_categorical else "numeric"
+
+    @cached_property
+    def numeric_stats(self):
+        numeric = self.numeric
+        return {
+            "min": numeric.min(),
+            "max": numeric.max(),
+            "mean": numeric.mean(),
+            "std": numeric.std(),
+        }
+
+    @property
+    def min(self):
+        return self.numeric_stats["min"]
+
+    @property
+    def max(self):
+        return self.numeric_stats["max"]
+
+    @property
+    def mean(self):
+        return self.numeric_stats["mean"]
+
+    @property
+    def std(self):
+        return self.numeric_stats["std"]
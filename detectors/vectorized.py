@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+from detectors.profile import ColumnProfile
+
+"""
+Vectorized versions of the four server detectors. Each detector computes one boolean mask per column with
+NumPy/pandas and the engine turns the masks straight into long format arrays {row_id, column_id, error_type},
+without building the {column: {id: type}} dictionaries, the per cell ID lookups or the melt/concat loop.
+
+detect_errors returns exactly what run_detectors did with anomaly, incomplete, missing_value and
+datatype_mismatch, including the row order: within a detector the columns come in the order the
+dictionaries were filled and the rows in the order the melted DataFrame index listed them.
+"""
+
+ANOMALY_MIN_NUMERIC = 10
+ANOMALY_Z_SCORE = 2
+INCOMPLETE_FREQUENCY_THRESHOLD = 10
+INCOMPLETE_RARE_COUNT = 3
+MISSING_STRINGS = ["null", "undefined"]
+
+# columns perform_melt never melted, errors found in them were always dropped
+EXCLUDED_ERROR_COLUMNS = ('ID', "Unnamed: 0", "column_id", "error_type", "row_id")
+
+DETECTOR_ORDER = ("anomaly", "incomplete", "missing", "mismatch")
+
+# anomaly, incomplete and mismatch skip the first (ID) column, missing checks every column
+ID_SKIPPING_DETECTORS = ("anomaly", "incomplete", "mismatch")
+
+
+def anomaly_mask(values, profile=None):
+    """
+    Cells more than 2 standard deviations from the mean of the numeric values of the column
+    :param values: the column
+    :param profile: the ColumnProfile of the column, profiled here when None
+    :return: boolean numpy array, or None when the column is skipped
+    """
+    profile = profile or ColumnProfile(values)
+    if profile.numeric_count < ANOMALY_MIN_NUMERIC:
+        return None
+    numeric = profile.numeric
+    column_mean = profile.mean
+    column_std = profile.std
+    if column_std == 0 or column_std is None:
+        return None
+    with np.errstate(invalid="ignore"):
+        return (np.abs(numeric - column_mean) > ANOMALY_Z_SCORE * column_std).to_numpy(dtype=bool)
+
+
+def incomplete_mask(values, profile=None):
+    """
+    Cells of a text column holding a value that occurs fewer than 3 times, columns with more than
+    10 numeric values are skipped
+    :param values: the column
+    :param profile: the ColumnProfile of the column, profiled here when None
+    :return: boolean numpy array, or None when the column is skipped
+    """
+    if values.dtype != 'object':
+        return None
+    profile = profile or ColumnProfile(values)
+    if profile.numeric_count > INCOMPLETE_FREQUENCY_THRESHOLD:
+        return None
+    value_counts = profile.value_counts
+    if len(value_counts) == 0:
+        return None
+    return values.isin(value_counts.index[value_counts.to_numpy() < INCOMPLETE_RARE_COUNT]).to_numpy()
+
+
+def missing_mask(values):
+    """
+    Cells that are null or hold the strings "null"/"undefined"
+    :param values: the column
+    :return: boolean numpy array
+    """
+    mask = values.isna().to_numpy()
+    if values.dtype == 'object':
+        mask = mask | values.astype(str).isin(MISSING_STRINGS).to_numpy()
+    return mask
+
+
+def mismatch_mask(values, profile=None):
+    """
+    Cells whose type class differs from the majority type class of the column
+    :param values: the column
+    :param profile: the ColumnProfile of the column, profiled here when None
+    :return: boolean numpy array, or None when the column holds a single type
+    """
+    if values.dtype != 'object':
+        # numeric and boolean columns only ever hold one python type
+        return None
+    profile = profile or ColumnProfile(values)
+    if len(profile.value_counts) == 0 or len(profile.class_counts) < 2:
+        return None
+    mismatched_entries = profile.value_counts.index[profile.type_classes != profile.majority_type]
+    return values.isin(mismatched_entries).to_numpy()
+
+
+def _detector_cells(data_frame):
+    """
+    Runs every detector over the columns it applies to
+    :param data_frame: the dataframe with "ID" as its first column
+    :return: {detector: [(column position, flagged row positions), ...]} in column order
+    """
+    cells = {error_type: [] for error_type in DETECTOR_ORDER}
+    for position in range(data_frame.shape[1]):
+        for error_type, mask in column_masks(data_frame.iloc[:, position], position).items():
+            add_flagged_rows(cells, error_type, position, mask)
+    return cells
+
+
+def column_masks(values, position):
+    """
+    Runs every detector that applies to one column
+    :param values: the column
+    :param position: the column position, the ID column (position 0) only goes through missing_value
+    :return: {detector: boolean mask or None}
+    """
+    masks = {"missing": missing_mask(values)}
+    if position == 0:
+        return masks
+    # one profile per column: the coerced values and value counts are shared by the three detectors
+    profile = ColumnProfile(values)
+    masks["anomaly"] = anomaly_mask(values, profile)
+    masks["incomplete"] = incomplete_mask(values, profile)
+    masks["mismatch"] = mismatch_mask(values, profile)
+    return masks
+
+
+def add_flagged_rows(cells, error_type, position, mask):
+    """
+    Records the rows a detector flagged in one column, skipped columns (mask None) and clean columns add nothing
+    :param cells: {detector: [(column position, flagged row positions), ...]}
+    :param error_type: the detector
+    :param position: the column position
+    :param mask: the boolean mask returned by the detector, or None
+    :return: None
+    """
+    if mask is None:
+        return
+    rows = np.flatnonzero(mask)
+    if len(rows) > 0:
+        cells[error_type].append((position, rows))
+
+
+def _ordered_cells(column_rows, row_count):
+    """
+    Flagged (column position, row position) pairs of one detector in the order the melted dictionary listed them:
+    column by column, rows in order of their first appearance in any earlier column
+    :param column_rows: [(column position, flagged row positions), ...] in the order the detector filled its dictionary
+    :param row_count: the number of rows in the frame
+    :return: column positions and row positions as numpy arrays
+    """
+    if not column_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    lengths = [len(rows) for _, rows in column_rows]
+    columns = np.repeat([position for position, _ in column_rows], lengths)
+    group = np.repeat(np.arange(len(column_rows)), lengths)
+    rows = np.concatenate([rows for _, rows in column_rows])
+
+    unique_rows, first_seen = np.unique(rows, return_index=True)
+    rank = np.zeros(row_count, dtype=np.int64)
+    rank[unique_rows] = first_seen
+    order = np.lexsort((rank[rows], group))
+    return columns[order], rows[order]
+
+
+def errors_from_cells(ids, column_names, cells):
+    """
+    Builds the long format error dataframe from the rows each detector flagged
+    :param ids: the ID column as a numpy array
+    :param column_names: the column names of the frame, in order
+    :param cells: {detector: [(column position, flagged row positions), ...]} in column order
+    :return: long format error dataframe {row_id, column_id, error_type}
+    """
+    column_names = np.array(column_names, dtype=object)
+    # missing_value stacked the frame row by row, so its columns appear in the order of their first missing cell
+    missing_cells = sorted(cells["missing"], key=lambda item: (int(item[1][0]), item[0]))
+
+    row_ids = []
+    column_ids = []
+    error_types = []
+    for error_type in DETECTOR_ORDER:
+        column_rows = missing_cells if error_type == "missing" else cells[error_type]
+        columns, rows = _ordered_cells(column_rows, len(ids))
+        names = column_names[columns]
+        keep = ~np.isin(names, EXCLUDED_ERROR_COLUMNS)
+        row_ids.append(ids[rows[keep]])
+        column_ids.append(names[keep])
+        error_types.append(np.full(int(keep.sum()), error_type, dtype=object))
+
+    return pd.DataFrame({
+        "row_id": np.concatenate(row_ids),
+        "column_id": np.concatenate(column_ids),
+        "error_type": np.concatenate(error_types),
+    })
+
+
+def detect_errors(data_frame):
+    """
+    Runs anomaly, incomplete, missing_value and datatype_mismatch on a dataframe whose ID column was set
+    :param data_frame: the dataframe with "ID" as its first column
+    :return: long format error dataframe {row_id, column_id, error_type}
+    """
+    return errors_from_cells(data_frame["ID"].to_numpy(), data_frame.columns, _detector_cells(data_frame))
+
+
+DETECTOR_MASKS = {
+    "anomaly": anomaly_mask,
+    "incomplete": incomplete_mask,
+    "missing": missing_mask,
+    "mismatch": mismatch_mask,
+}
@@ -0,0 +1,357 @@
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch histograms for the scatterplot matrix: every cell in one statement
+# ─────────────────────────────────────────────────────────────────────────────
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from app import engine
+from app.bulk_loader import quote_identifier
+from app.column_stats import covers_id_window, read_column_stats
+
+"""
+A scatterplot matrix asks for one 1D histogram per diagonal cell and one 2D histogram per off-diagonal cell.
+generate_histogram_batch answers all of them with a single statement: the ID window of the table is read
+once (data_rows), the bounds of every numeric axis come out of one aggregate over it (bounds), every bin
+assignment is computed once per row (binned) and errors<table> is joined once for all the plotted columns
+(binned_errors). Each cell then counts its items and errors in one GROUP BY over the materialized CTEs, with the
+same SQL that generate_one_d_histogram_with_errors and generate_two_d_histogram_with_errors use to build their
+JSON, so a cell of the batch is identical to the response of the single endpoint.
+"""
+
+# Data types generate_*_with_errors treat as numeric
+NUMERIC_DATA_TYPES = ("integer", "bigint", "numeric", "real", "double precision", "smallint")
+
+# width_bucket rejects equal bounds, the single endpoints fail with this message for a constant numeric axis
+EQUAL_BOUNDS_ERROR = "lower bound cannot equal upper bound"
+
+# Item and per error type counts of a bin, as in the histogram functions of app/db_functions.py
+BIN_COUNTS_SQL = """COUNT(*) FILTER (WHERE error_type IS NULL) as total_items,
+                        jsonb_strip_nulls(jsonb_build_object(
+                            'anomaly', NULLIF(COUNT(*) FILTER (WHERE error_type = 'anomaly'), 0),
+                            'incomplete', NULLIF(COUNT(*) FILTER (WHERE error_type = 'incomplete'), 0),
+                            'missing', NULLIF(COUNT(*) FILTER (WHERE error_type = 'missing'), 0),
+                            'mismatch', NULLIF(COUNT(*) FILTER (WHERE error_type = 'mismatch'), 0)
+                        )) as errors"""
+
+# work_mem of the batch statement, enough to keep the materialized CTEs of a few hundred thousand rows in memory
+# while every cell scans them
+BATCH_WORK_MEM = "64MB"
+
+
+def parse_histogram_cell(cell: Dict[str, Any]) -> Tuple[List[str], List[int]]:
+    """
+    :param cell: {"column", "bins"} for a 1D histogram or {"column_x", "column_y", "x_bins", "y_bins"} for a 2D one,
+    the parameter names of /api/plots/1-d-histogram and /api/plots/2-d-histogram
+    :return: (columns, bin counts)
+    """
+    if "column" in cell:
+        return [cell["column"]], [int(cell.get("bins", 10))]
+    return [cell["column_x"], cell["column_y"]], [int(cell.get("x_bins", 10)), int(cell.get("y_bins", 10))]
+
+
+def column_numeric_flags(conn, table: str, columns: List[str]) -> Dict[str, bool]:
+    """
+    :return: {column: is numeric} for the columns that exist in the table, from column_stats<table> when it
+    describes all of them
+    """
+    stats = read_column_stats(conn, table, columns)
+    if all(column in stats for column in columns):
+        return {column: stats[column]["is_numeric"] for column in columns}
+    rows = conn.execute(text("""
+        SELECT column_name, data_type = ANY(:numeric_types)
+        FROM information_schema.columns
+        WHERE table_name = :table AND column_name = ANY(:columns)
+    """), {"table": table, "columns": list(columns), "numeric_types": list(NUMERIC_DATA_TYPES)}).all()
+    return {name: bool(is_numeric) for name, is_numeric in rows}
+
+
+class _BatchBuilder:
+    """
+    Collects the shared columns, bounds and bin expressions of a batch and renders the statement
+    """
+
+    def __init__(self, table: str, numeric: Dict[str, bool], known_bounds: Optional[Dict[str, tuple]] = None):
+        self.table = table
+        self.numeric = numeric
+        self.known_bounds = known_bounds or {}  # column -> (min, max) from column_stats<table>, valid for 1D axes
+        self.columns = {}   # column name -> alias in data_rows, numeric columns are cast to double precision once there
+        self.bounds = {}    # bounds spec -> (lo alias, hi alias, lo expression, hi expression)
+        self.bins = {}      # bin spec -> (alias, expression)
+        self.params = {}
+
+    def column(self, name: str) -> str:
+        if name not in self.columns:
+            self.columns[name] = f"c{len(self.columns)}"
+        return self.columns[name]
+
+    def literal(self, value: str) -> str:
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def column_bounds(self, column: str) -> Tuple[str, str]:
+        """Bounds of a 1D axis: min/max over the rows where the column is not null"""
+        spec = ("column", column)
+        if spec not in self.bounds:
+            value = self.column(column)
+            index = len(self.bounds)
+            if column in self.known_bounds:
+                low, high = self.known_bounds[column]
+                self.bounds[spec] = (f"lo{index}", f"hi{index}", f"CAST({self.literal(low)} AS double precision)",
+                                     f"CAST({self.literal(high)} AS double precision)")
+            else:
+                self.bounds[spec] = (f"lo{index}", f"hi{index}", f"MIN({value})", f"MAX({value})")
+        return self.bounds[spec][:2]
+
+    def pair_bounds(self, column: str, x_column: str, y_column: str) -> Tuple[str, str]:
+        """Bounds of a 2D axis: min/max over the rows where both columns are not null, 0/1 when there are none"""
+        spec = ("pair", column, tuple(sorted((x_column, y_column))))
+        if spec not in self.bounds:
+            value = self.column(column)
+            both = f"{self.column(x_column)} IS NOT NULL AND {self.column(y_column)} IS NOT NULL"
+            index = len(self.bounds)
+            self.bounds[spec] = (f"lo{index}", f"hi{index}",
+                                 f"COALESCE(MIN({value}) FILTER (WHERE {both}), 0)",
+                                 f"COALESCE(MAX({value}) FILTER (WHERE {both}), 1)")
+        return self.bounds[spec][:2]
+
+    def bin(self, spec: tuple, expression: str) -> str:
+        if spec not in self.bins:
+            self.bins[spec] = (f"b{len(self.bins)}", expression)
+        return self.bins[spec][0]
+
+    def one_d_bin(self, column: str, bin_count: int) -> str:
+        value = self.column(column)
+        if not self.numeric[column]:
+            return self.bin(("text", column), f"d.{value}::text")
+        lo, hi = self.column_bounds(column)
+        return self.bin(("1d", column, bin_count), f"""
+            CASE WHEN d.{value} IS NOT NULL AND b.{lo} < b.{hi} THEN
+                LEAST(GREATEST(COALESCE(width_bucket(d.{value}, b.{lo}, b.{hi}, {bin_count}) - 1, 0), 0),
+                      {bin_count} - 1)
+            END""")
+
+    def two_d_bin(self, column: str, x_column: str, y_column: str, bin_count: int) -> str:
+        value = self.column(column)
+        if not self.numeric[column]:
+            return self.bin(("text", column), f"d.{value}::text")
+        lo, hi = self.pair_bounds(column, x_column, y_column)
+        return self.bin(("2d", column, tuple(sorted((x_column, y_column))), bin_count), f"""
+            CASE WHEN d.{value} IS NOT NULL AND b.{lo} < b.{hi} THEN
+                LEAST(GREATEST(width_bucket(d.{value}, b.{lo}, b.{hi}, {bin_count}) - 1, 0),
+                      {bin_count} - 1)
+            END""")
+
+    def one_d_cell(self, column: str, bin_count: int) -> str:
+        """JSON of one 1D histogram, steps 3 to 6 of generate_one_d_histogram_with_errors"""
+        is_numeric = self.numeric[column]
+        bin_alias = self.one_d_bin(column, bin_count)
+        column_literal = self.literal(column)
+        if is_numeric:
+            lo, hi = self.column_bounds(column)
+            histograms = """(SELECT COALESCE(json_agg(
+                        json_build_object(
+                            'xBin', bin::integer,
+                            'xType', 'numeric',
+                            'count', errors || jsonb_build_object('items', total_items)
+                        ) ORDER BY bin::integer
+                    ), '[]'::json) FROM histogram_bins)"""
+            scale = """json_build_object(
+                    'numeric', (SELECT COALESCE(json_agg(json_build_object('x0', x0, 'x1', x1) ORDER BY bin_num), '[]'::json) FROM numeric_scale_data),
+                    'categorical', '[]'::json
+                )"""
+            scale_cte = f""",
+                numeric_scale_data AS (
+                    SELECT
+                        n as bin_num,
+                        {lo}::numeric + (n * ({hi}::numeric - {lo}::numeric) / {bin_count}::numeric) as x0,
+                        {lo}::numeric + ((n+1) * ({hi}::numeric - {lo}::numeric) / {bin_count}::numeric) as x1
+                    FROM generate_series(0, {bin_count}-1) n, bounds
+                )"""
+            failed = f"(SELECT {lo} = {hi} FROM bounds)"
+        else:
+            histograms = """(SELECT COALESCE(json_agg(
+                        json_build_object(
+                            'xBin', bin,
+                            'xType', 'categorical',
+                            'count', errors || jsonb_build_object('items', total_items)
+                        ) ORDER BY bin
+                    ), '[]'::json) FROM histogram_bins)"""
+            scale = """json_build_object(
+                    'numeric', '[]'::json,
+                    'categorical', (SELECT COALESCE(json_agg(bin ORDER BY bin), '[]'::json) FROM histogram_bins)
+                )"""
+            scale_cte = ""
+            failed = "false"
+        return f"""
+            CASE WHEN {failed} THEN NULL ELSE (
+                WITH
+                binned_items AS (
+                    SELECT {bin_alias} AS bin, NULL::text as error_type
+                    FROM binned
+                    WHERE {bin_alias} IS NOT NULL
+                    UNION ALL
+                    SELECT {bin_alias}, error_type
+                    FROM binned_errors
+                    WHERE column_id = {column_literal} AND {bin_alias} IS NOT NULL
+                ),
+                histogram_bins AS (
+                    SELECT
+                        bin,
+                        {BIN_COUNTS_SQL}
+                    FROM binned_items
+                    GROUP BY bin
+                ){scale_cte}
+                SELECT json_build_object('histograms', {histograms}, 'scaleX', {scale})
+            ) END"""
+
+    def two_d_cell(self, x_column: str, y_column: str, x_bins: int, y_bins: int) -> str:
+        """JSON of one 2D histogram, steps 5 to 9 of generate_two_d_histogram_with_errors"""
+        x_numeric, y_numeric = self.numeric[x_column], self.numeric[y_column]
+        x_alias = self.two_d_bin(x_column, x_column, y_column, x_bins)
+        y_alias = self.two_d_bin(y_column, x_column, y_column, y_bins)
+        x_literal, y_literal = self.literal(x_column), self.literal(y_column)
+
+        x_bin = "x_bin::integer" if x_numeric else "x_bin"
+        y_bin = "y_bin::integer" if y_numeric else "y_bin"
+        histograms = f"""(SELECT COALESCE(json_agg(
+                        json_build_object(
+                            'xBin', {x_bin},
+                            'yBin', {y_bin},
+                            'xType', '{"numeric" if x_numeric else "categorical"}',
+                            'yType', '{"numeric" if y_numeric else "categorical"}',
+                            'count', errors || jsonb_build_object('items', total_items)
+                        ) ORDER BY {x_bin}, {y_bin}
+                    ), '[]'::json) FROM histogram_bins)"""
+
+        scale_ctes = []
+        failed = []
+        scales = {}
+        for axis, column, bin_count, is_numeric in (("x", x_column, x_bins, x_numeric),
+                                                    ("y", y_column, y_bins, y_numeric)):
+            if is_numeric:
+                lo, hi = self.pair_bounds(column, x_column, y_column)
+                scale_ctes.append(f""",
+                {axis}_numeric_scale_data AS (
+                    SELECT
+                        n as bin_num,
+                        {lo}::numeric + (n * ({hi}::numeric - {lo}::numeric) / {bin_count}::numeric) as x0,
+                        {lo}::numeric + ((n+1) * ({hi}::numeric - {lo}::numeric) / {bin_count}::numeric) as x1
+                    FROM generate_series(0, {bin_count}-1) n, bounds
+                )""")
+                failed.append(f"(SELECT {lo} = {hi} FROM bounds)")
+                scales[axis] = f"""json_build_object(
+                    'numeric', (SELECT COALESCE(json_agg(json_build_object('x0', x0, 'x1', x1) ORDER BY bin_num), '[]'::json) FROM {axis}_numeric_scale_data),
+                    'categorical', '[]'::json
+                )"""
+            else:
+                scales[axis] = f"""json_build_object(
+                    'numeric', '[]'::json,
+                    'categorical', (SELECT COALESCE(json_agg(DISTINCT {axis}_bin ORDER BY {axis}_bin), '[]'::json) FROM histogram_bins)
+                )"""
+        failed_condition = " OR ".join(failed) or "false"
+        return f"""
+            CASE WHEN {failed_condition} THEN NULL ELSE (
+                WITH
+                binned_items AS (
+                    SELECT {x_alias} AS x_bin, {y_alias} AS y_bin, NULL::text as error_type
+                    FROM binned
+                    WHERE {x_alias} IS NOT NULL AND {y_alias} IS NOT NULL
+                    UNION ALL
+                    SELECT {x_alias}, {y_alias}, error_type
+                    FROM binned_errors
+                    WHERE column_id IN ({x_literal}, {y_literal}) AND {x_alias} IS NOT NULL AND {y_alias} IS NOT NULL
+                ),
+                histogram_bins AS (
+                    SELECT
+                        x_bin,
+                        y_bin,
+                        {BIN_COUNTS_SQL}
+                    FROM binned_items
+                    GROUP BY x_bin, y_bin
+                ){"".join(scale_ctes)}
+                SELECT json_build_object('histograms', {histograms}, 'scaleX', {scales["x"]}, 'scaleY', {scales["y"]})
+            ) END"""
+
+    def statement(self, cells: List[str]) -> str:
+        table = quote_identifier(self.table)
+        errors = quote_identifier(f"errors{self.table}")
+        data_columns = ", ".join(
+            f"{quote_identifier(name)}{'::double precision' if self.numeric[name] else ''} AS {alias}"
+            for name, alias in self.columns.items()
+        )
+        bounds = ", ".join(f"{lo_sql} AS {lo}, {hi_sql} AS {hi}" for lo, hi, lo_sql, hi_sql in self.bounds.values())
+        bins = ", ".join(f"{expression} AS {alias}" for alias, expression in self.bins.values())
+        column_list = ", ".join(self.literal(name) for name in self.columns)
+        rows = "\n            UNION ALL\n".join(
+            f"SELECT {index} AS cell, ({cell}) AS histogram" for index, cell in enumerate(cells)
+        )
+        return f"""
+            WITH
+            data_rows AS MATERIALIZED (
+                SELECT "ID", {data_columns}
+                FROM {table}
+                WHERE (CAST(:min_id AS bigint) IS NULL OR "ID" >= :min_id)
+                  AND (CAST(:max_id AS bigint) IS NULL OR "ID" <= :max_id)
+            ),
+            bounds AS MATERIALIZED (
+                SELECT {bounds or "COUNT(*) AS row_count"} FROM data_rows
+            ),
+            binned AS MATERIALIZED (
+                SELECT d."ID", {bins}
+                FROM data_rows d CROSS JOIN bounds b
+            ),
+            binned_errors AS MATERIALIZED (
+                SELECT b.*, e.column_id, e.error_type
+                FROM binned b
+                JOIN {errors} e ON b."ID" = e.row_id
+                WHERE e.column_id IN ({column_list})
+            )
+            {rows}
+        """
+
+
+def generate_histogram_batch(table: str, cells: List[Dict[str, Any]], min_id: Optional[int] = None,
+                             max_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Computes the 1D and 2D histograms of a scatterplot matrix in one statement
+    :param table: the cleaned table name
+    :param cells: list of cells, see parse_histogram_cell
+    :param min_id: start of the ID window, None for no bound
+    :param max_id: end of the ID window, None for no bound
+    :return: one {"Success", "histogram"} or {"Success", "Error"} per cell, in order, shaped like the responses
+    of the single histogram endpoints
+    """
+    parsed = [parse_histogram_cell(cell) for cell in cells]
+    with engine.connect() as conn:
+        numeric = column_numeric_flags(conn, table, [column for columns, _ in parsed for column in columns])
+        # when the window holds the whole table the 1D bounds are the catalog's min/max, the data is not scanned for them
+        stats = read_column_stats(conn, table)
+        known_bounds = {}
+        if covers_id_window(stats, min_id, max_id):
+            known_bounds = {column: (row["min_value"], row["max_value"]) for column, row in stats.items()
+                            if row["is_numeric"] and row["min_value"] is not None}
+        builder = _BatchBuilder(table, numeric, known_bounds)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(parsed)
+        cell_sql = []
+        cell_index = []
+        for index, (columns, bins) in enumerate(parsed):
+            missing = [column for column in columns if column not in numeric]
+            if missing:
+                results[index] = {"Success": False, "Error": f'column "{missing[0]}" does not exist'}
+                continue
+            if len(columns) == 1:
+                cell_sql.append(builder.one_d_cell(columns[0], bins[0]))
+            else:
+                cell_sql.append(builder.two_d_cell(columns[0], columns[1], bins[0], bins[1]))
+            cell_index.append(index)
+
+        if cell_sql:
+            statement = builder.statement(cell_sql)
+            conn.execute(text(f"SET LOCAL work_mem = '{BATCH_WORK_MEM}'"))
+            rows = conn.execute(text(statement), {**builder.params, "min_id": min_id, "max_id": max_id}).all()
+            for position, histogram in rows:
+                if histogram is None:
+                    results[cell_index[position]] = {"Success": False, "Error": EQUAL_BOUNDS_ERROR}
+                else:
+                    results[cell_index[position]] = {"Success": True, "histogram": histogram}
+    return results
@@ -4,6 +4,8 @@
 from typing import Dict, Any, List, Tuple
 from sqlalchemy import text, Engine
 from app import engine
+from app.column_stats import missing_predicate, read_column_stats
+from app.plot_cache import increment_table_version
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -17,7 +19,10 @@ _NUMERIC_TYPES = {
 
 
 def _is_numeric(conn, col: str, table_name: str) -> bool:
-    """Check if a column is numeric."""
+    """Check if a column is numeric, from the column_stats<table> catalog when the table has one."""
+    stats = read_column_stats(conn, table_name, [col])
+    if col in stats:
+        return stats[col]["is_numeric"]
     sql = f"""
         SELECT data_type
         FROM information_schema.columns
@@ -40,10 +45,7 @@ def _get_row_count(conn, table: str) -> int:
 
 def _missing_pred(col: str) -> str:
     """Boolean SQL expression that is TRUE when column is 'missing'."""
-    return (
-        f"(\"{col}\" IS NULL "
-        f"OR \"{col}\"::text IN ('', 'null', 'undefined'))"
-    )
+    return missing_predicate(col)
 
 
 def _compute_imputation_value(conn, table: str, col: str, is_numeric: bool):
@@ -65,7 +67,12 @@ def _compute_imputation_value(conn, table: str, col: str, is_numeric: bool):
     -------
     Any
         Mean value for numeric columns, mode (most frequent) for categorical
+
+    The value is read from the column_stats<table> catalog, the column is only scanned for tables without one.
     """
+    stats = read_column_stats(conn, table, [col])
+    if col in stats:
+        return stats[col]["mean_value"] if is_numeric else stats[col]["mode_value"]
     if is_numeric:
         return conn.execute(
             text(f'SELECT AVG("{col}"::numeric) FROM "{table}" WHERE NOT {_missing_pred(col)}')
@@ -83,6 +90,11 @@ def _compute_imputation_value(conn, table: str, col: str, is_numeric: bool):
         ).scalar()
 
 
+def _returned_cells(rows) -> Tuple[list, list]:
+    """Split the ("ID", value) rows of an UPDATE ... RETURNING into (ids, values)."""
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
 def _get_numeric_bin_bounds(scale, bin_idx: int) -> Tuple[float, float]:
     """
     Extract (low, high) boundaries from numeric scale at given index.
@@ -107,7 +119,7 @@ def _get_numeric_bin_bounds(scale, bin_idx: int) -> Tuple[float, float]:
 # ID-Based Wrangling (for scatterplot point-based selections)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def remove_rows_by_ids(table: str, ids: List[int]) -> int:
+def remove_rows_by_ids(table: str, ids: List[int]) -> Tuple[int, List[int]]:
     """
     Remove rows by ID in-place (for scatterplot selections).
 
@@ -123,17 +135,18 @@ def remove_rows_by_ids(table: str, ids: List[int]) -> int:
 
     Returns
     -------
-    int
-        Number of rows remaining
+    Tuple[int, List[int]]
+        (rows_remaining, removed_ids)
     """
     if not ids:
-        return 0
+        return 0, []
 
     errors_table = _get_errors_table(table)
 
     with engine.begin() as conn:
+        increment_table_version(conn, table)
         # Only delete rows that are both in the ID list AND have errors
-        conn.execute(
+        removed = conn.execute(
             text(f"""
                 DELETE FROM "{table}"
                 WHERE "ID" IN (
@@ -142,15 +155,16 @@ def remove_rows_by_ids(table: str, ids: List[int]) -> int:
                     JOIN "{errors_table}" e ON t."ID" = e.row_id
                     WHERE t."ID" = ANY(:ids)
                 )
+                RETURNING "ID"
             """),
             {"ids": ids}
-        )
+        ).scalars().all()
         n_rows = _get_row_count(conn, table)
 
-    return n_rows
+    return n_rows, removed
 
 
-def impute_by_ids(table: str, col: str, ids: List[int]) -> Tuple[int, int]:
+def impute_by_ids(table: str, col: str, ids: List[int]) -> Tuple[int, int, Dict[str, Tuple[list, list]]]:
     """
     Impute missing values by ID in-place (for scatterplot selections).
 
@@ -167,28 +181,31 @@ def impute_by_ids(table: str, col: str, ids: List[int]) -> Tuple[int, int]:
 
     Returns
     -------
-    Tuple[int, int]
-        (rows_examined, cells_imputed)
+    Tuple[int, int, Dict[str, Tuple[list, list]]]
+        (rows_examined, cells_imputed, imputed) where imputed maps each
+        changed column to the (IDs, stored values) of its imputed cells
     """
     if not ids:
-        return 0, 0
+        return 0, 0, {}
 
     with engine.begin() as conn:
+        increment_table_version(conn, table)
         is_numeric = _is_numeric(conn, col, table)
         fill_val = _compute_imputation_value(conn, table, col, is_numeric)
 
         # Apply imputation
-        result = conn.execute(
+        imputed_rows = conn.execute(
             text(f'''
                 UPDATE "{table}"
                 SET "{col}" = :fill_val
                 WHERE "ID" = ANY(:ids)
                   AND {_missing_pred(col)}
+                RETURNING "ID", "{col}"
             '''),
             {"fill_val": fill_val, "ids": ids}
-        )
+        ).fetchall()
 
-        return len(ids), result.rowcount
+        return len(ids), len(imputed_rows), {col: _returned_cells(imputed_rows)}
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -199,7 +216,7 @@ def remove_flagged_rows_in_1d_bin(
     current_selection: dict,
     col: str,
     table: str,
-) -> int:
+) -> Tuple[int, List[int]]:
     """
     Remove rows in-place from a 1-D histogram bin that have quality flags.
 
@@ -216,8 +233,8 @@ def remove_flagged_rows_in_1d_bin(
 
     Returns
     -------
-    int
-        Number of rows remaining in table
+    Tuple[int, List[int]]
+        (rows_remaining, removed_ids)
     """
     sel = current_selection["data"][0]
     bin_value = sel["bin"]
@@ -240,6 +257,7 @@ def remove_flagged_rows_in_1d_bin(
               AND t."{col}" <= :x_hi
               AND e.column_id = :col_name
         )
+        RETURNING "ID"
         """
         params = {"x_lo": x_lo, "x_hi": x_hi, "col_name": col}
     else:
@@ -255,14 +273,16 @@ def remove_flagged_rows_in_1d_bin(
             WHERE t."{col}" = :cat_val
               AND e.column_id = :col_name
         )
+        RETURNING "ID"
         """
         params = {"cat_val": cat_value, "col_name": col}
 
     with engine.begin() as conn:
-        conn.execute(text(sql), params)
+        increment_table_version(conn, table)
+        removed = conn.execute(text(sql), params).scalars().all()
         n_rows = _get_row_count(conn, table)
 
-    return n_rows
+    return n_rows, removed
 
 
 def impute_1d_bin_in_place(
@@ -286,14 +306,16 @@ def impute_1d_bin_in_place(
 
     Returns
     -------
-    Tuple[int, int]
-        (rows_examined, cells_imputed)
+    Tuple[int, int, Dict[str, Tuple[list, list]]]
+        (rows_examined, cells_imputed, imputed) where imputed maps each
+        changed column to the (IDs, stored values) of its imputed cells
     """
     sel = current_selection["data"][0]
     bin_value = sel["bin"]
     bin_type = sel["type"]
 
     with engine.begin() as conn:
+        increment_table_version(conn, table)
         is_numeric = _is_numeric(conn, col, table)
 
         # Build WHERE clause for the bin
@@ -315,7 +337,7 @@ def impute_1d_bin_in_place(
         ).scalar_one()
 
         if rows_examined == 0:
-            return 0, 0
+            return 0, 0, {}
 
         # Compute imputation value
         fill_val = _compute_imputation_value(conn, table, col, is_numeric)
@@ -326,11 +348,12 @@ def impute_1d_bin_in_place(
             SET "{col}" = :fill_val
             WHERE {bin_where_sql}
               AND {_missing_pred(col)}
+            RETURNING "ID", "{col}"
         ''')
-        result = conn.execute(upd_sql, dict(params, fill_val=fill_val))
-        cells_imputed = result.rowcount
+        imputed_rows = conn.execute(upd_sql, dict(params, fill_val=fill_val)).fetchall()
+        cells_imputed = len(imputed_rows)
 
-    return rows_examined, cells_imputed
+    return rows_examined, cells_imputed, {col: _returned_cells(imputed_rows)}
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -341,7 +364,7 @@ def remove_flagged_rows_in_bin(
     current_selection: dict,
     cols: list[str],
     table: str,
-) -> int:
+) -> Tuple[int, List[int]]:
     """
     Remove rows in-place from a 2-D bin that have quality flags.
 
@@ -362,8 +385,8 @@ def remove_flagged_rows_in_bin(
 
     Returns
     -------
-    int
-        Number of rows remaining in table
+    Tuple[int, List[int]]
+        (rows_remaining, removed_ids)
     """
     sel   = current_selection["data"][0]
     x_bin = sel["xBin"]
@@ -390,10 +413,12 @@ def remove_flagged_rows_in_bin(
             /* Has error in either X or Y column */
             AND e.column_id IN (:col_x, :col_y)
     )
+    RETURNING "ID"
     """
 
     with engine.begin() as conn:
-        conn.execute(
+        increment_table_version(conn, table)
+        removed = conn.execute(
             text(sql),
             {
                 "x_lo": x_lo,
@@ -402,10 +427,10 @@ def remove_flagged_rows_in_bin(
                 "col_x": cols[0],
                 "col_y": cols[1]
             }
-        )
+        ).scalars().all()
         n_rows = _get_row_count(conn, table)
 
-    return n_rows
+    return n_rows, removed
 
 
 def _bin_predicate(
@@ -462,8 +487,9 @@ def impute_bin_in_place(
 
     Returns
     -------
-    Tuple[int, int]
-        (rows_examined, cells_imputed)
+    Tuple[int, int, Dict[str, Tuple[list, list]]]
+        (rows_examined, cells_imputed, imputed) where imputed maps each
+        changed column to the (IDs, stored values) of its imputed cells
     """
     if len(cols) != 2:
         raise ValueError("cols must be exactly [x_column, y_column]")
@@ -494,6 +520,7 @@ def impute_bin_in_place(
     bin_where_sql = " AND ".join(where_parts)
 
     with engine.begin() as conn:
+        increment_table_version(conn, table)
         # Count rows in bin
         rows_examined = conn.execute(
             text(f'SELECT COUNT(*) FROM "{table}" WHERE {bin_where_sql}'),
@@ -501,7 +528,7 @@ def impute_bin_in_place(
         ).scalar_one()
 
         if rows_examined == 0:
-            return 0, 0
+            return 0, 0, {}
 
         # Compute imputation values for each column
         modes_or_means: Dict[str, Any] = {}
@@ -519,6 +546,7 @@ def impute_bin_in_place(
 
         # Apply imputation column-by-column
         cells_imputed = 0
+        imputed: Dict[str, Tuple[list, list]] = {}
         for col in cols:
             upd_sql = text(
                 f'''
@@ -526,12 +554,14 @@ def impute_bin_in_place(
                 SET    "{col}" = :fill_val
                 WHERE  {bin_where_sql}
                   AND  {_missing_pred(col)}
+                RETURNING "ID", "{col}"
                 '''
             )
-            rc = conn.execute(upd_sql, dict(params, fill_val=modes_or_means[col])).rowcount
-            cells_imputed += rc
+            imputed_rows = conn.execute(upd_sql, dict(params, fill_val=modes_or_means[col])).fetchall()
+            cells_imputed += len(imputed_rows)
+            imputed[col] = _returned_cells(imputed_rows)
 
-    return rows_examined, cells_imputed
+    return rows_examined, cells_imputed, imputed
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -0,0 +1,47 @@
+import os
+
+
+def database_engine():
+    """An engine on DATABASE_URL with the database functions created when a database answers there, None otherwise"""
+    from sqlalchemy import create_engine, text
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        return None
+    try:
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        return None
+    from app.db_functions import initialize_database_functions
+    initialize_database_functions(engine)
+    return engine
+
+
+def load_dataset(engine, table_name, data_frame, errors=None):
+    """
+    Writes a test dataset the way the ingest stores it: the data table with its "ID" column and its error store
+    :param errors: long format dataframe {row_id, column_id, error_type}, None for no errors
+    """
+    import pandas as pd
+    from app.error_store import write_errors
+    drop_dataset(engine, table_name)
+    data_frame.to_sql(table_name, engine, index=False)
+    if errors is None:
+        errors = pd.DataFrame({"row_id": [], "column_id": [], "error_type": []})
+    write_errors(errors, table_name, engine, list(data_frame.columns))
+
+
+def drop_dataset(engine, table_name):
+    """Drops the data table, its error store and the tables derived from it"""
+    from sqlalchemy import text
+    from app.bin_cube import drop_bin_cube
+    from app.column_stats import drop_column_stats
+    from app.error_store import drop_error_store
+    from app.heatmap_tiles import drop_heatmap_tiles
+    with engine.begin() as conn:
+        drop_bin_cube(conn, table_name)
+        drop_heatmap_tiles(conn, table_name)
+        drop_column_stats(conn, table_name)
+        drop_error_store(conn, table_name)
+        conn.execute(text(f'DROP TABLE IF EXISTS "{table_name}"'))
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.attribute_summaries import MISSING_CATEGORY, attribute_distribution, attribute_summaries_query
+from database_helpers import database_engine, drop_dataset, load_dataset
+
+
+class TestAttributeSummaries(unittest.TestCase):
+
+    def test_window_summaries_match_pandas(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+        from sqlalchemy import text
+
+        table = "attributesummariestest"
+        frame = pd.DataFrame({
+            "ID": np.arange(1, 11),
+            "Year": [2001, 1999, 2010, np.nan, 2005, 1980, 2020, 2003, np.nan, 1990],
+            # "b" and "a" tie inside the window and N/A is a category of its own
+            "Genre": ["c", "b", "a", None, "b", "a", "d", "a", "c", None],
+            "Empty": [np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, 1.0, 2.0, 3.0],
+        })
+        errors = pd.DataFrame({"row_id": [2, 3, 3, 6, 9], "column_id": ["Year", "Year", "Genre", "Genre", "Genre"],
+                               "error_type": ["anomaly", "missing", "incomplete", "incomplete", "mismatch"]})
+        load_dataset(engine, table, frame, errors)
+        columns = [("Year", "double precision"), ("Genre", "text"), ("Empty", "double precision")]
+        try:
+            with engine.connect() as conn:
+                error_source = conn.execute(text("SELECT scatterplot_error_source(:table, :errors)"),
+                                            {"table": table, "errors": f"errors{table}"}).scalar_one()
+                result = conn.execute(text(attribute_summaries_query(table, columns, error_source)),
+                                      {"min_id": 2, "max_id": 7}).mappings().one()
+        finally:
+            drop_dataset(engine, table)
+
+        window = frame[frame["ID"].between(2, 7)]
+        self.assertEqual(result["row_count"], len(window))
+
+        year = window["Year"]
+        self.assertEqual(attribute_distribution(result["s0"], "double precision", len(window)),
+                         {"numeric": {"mean": year.mean(), "min": year.min(), "max": year.max()}})
+        genre = window["Genre"].fillna(MISSING_CATEGORY)
+        self.assertEqual(attribute_distribution(result["s1"], "text", len(window)),
+                         {"categorical": {"categories": genre.nunique(), "mode": genre.mode().iloc[0]}})
+        self.assertEqual(attribute_distribution(result["s2"], "double precision", len(window)),
+                         {"categorical": {"categories": 1, "mode": MISSING_CATEGORY}})
+
+        window_errors = errors[errors["row_id"].between(2, 7)]
+        expected = {column: group["error_type"].value_counts().to_dict()
+                    for column, group in window_errors.groupby("column_id")}
+        self.assertEqual(result["column_errors"], expected)
+
+    def test_distributions_keep_the_pandas_shape(self):
+        self.assertEqual(attribute_distribution({"categories": 3, "mode": "A"}, "text", 5),
+                         {"categorical": {"categories": 3, "mode": "A"}})
+        self.assertEqual(attribute_distribution({"count": 5, "mean": 3.0, "min": 1, "max": 5}, "bigint", 5),
+                         {"numeric": {"mean": 3.0, "min": 1, "max": 5}})
+
+    def test_numeric_columns_without_values_are_missing(self):
+        summary = {"count": 0, "mean": None, "min": None, "max": None}
+        self.assertEqual(attribute_distribution(summary, "double precision", 4),
+                         {"categorical": {"categories": 1, "mode": "N/A"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.bin_cube import cross_filter, numeric_bin_expression, selection_codes
+from database_helpers import database_engine, drop_dataset, load_dataset
+
+
+class TestBinCube(unittest.TestCase):
+
+    def test_numeric_selection_keeps_the_bins_in_range(self):
+        entry = {"is_numeric": True, "bin_count": 10, "labels": None}
+        self.assertEqual(selection_codes(entry, [3, "1", 1, 10, -1]), [1, 3])
+
+    def test_categorical_selection_maps_labels_to_codes(self):
+        entry = {"is_numeric": False, "bin_count": 10, "labels": ["Action", "Puzzle", "Sports"]}
+        self.assertEqual(selection_codes(entry, ["Sports", "Action", "Racing"]), [0, 2])
+
+    def test_numeric_bins_clamp_the_upper_bound(self):
+        self.assertEqual(numeric_bin_expression('"Year"', 10, ":min_3", ":max_3"),
+                         'LEAST(GREATEST(COALESCE(width_bucket("Year"::double precision, :min_3, :max_3, 10) - 1, 0), 0), 9)')
+
+    def test_cross_filter_matches_pandas(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+
+        table = "bincubetest"
+        ids = np.arange(1, 41)
+        frame = pd.DataFrame({
+            "ID": ids,
+            "Genre": [["a", "b", "c", None][i % 4] for i in ids],
+            "Sales": np.where(ids % 9 == 0, np.nan, (ids * 7) % 101).astype(float),
+            "Region": [["x", "y", "z"][i % 3] for i in ids],
+        })
+        errors = pd.DataFrame({"row_id": [5, 6, 9, 13, 18, 21, 30, 30],
+                               "column_id": ["Sales", "Sales", "Sales", "Region", "Sales", "Region", "Sales", "Region"],
+                               "error_type": ["anomaly", "anomaly", "missing", "incomplete", "anomaly", "mismatch",
+                                              "anomaly", "incomplete"]})
+        load_dataset(engine, table, frame, errors)
+        try:
+            result = cross_filter(table, engine, [{"column": "Genre", "bins": ["a", "c", "unknown"]}],
+                                  ["Genre", "Sales", "Region"], bin_count=10, min_id=5, max_id=35)
+        finally:
+            drop_dataset(engine, table)
+
+        filtered = frame[frame["ID"].between(5, 35) & frame["Genre"].isin(["a", "c"])]
+        self.assertEqual(result["rows"], len(filtered))
+        self.assertEqual(set(result["histograms"]), {"Sales", "Region"})
+
+        sales = frame["Sales"]
+        low, high = sales.min(), sales.max()
+        # width_bucket of the whole table's bounds, the maximum clamped into the last bin
+        bins = {"Sales": np.clip(np.floor(10 * ((sales - low) / (high - low))), 0, 9), "Region": frame["Region"]}
+        for column, histogram in result["histograms"].items():
+            expected = {}
+            for row_id, value in zip(filtered["ID"], bins[column][filtered.index]):
+                if pd.isna(value):
+                    continue
+                key = int(value) if column == "Sales" else value
+                counts = expected.setdefault(key, {"items": 0})
+                counts["items"] += 1
+                for error_type in errors[(errors["row_id"] == row_id) & (errors["column_id"] == column)]["error_type"]:
+                    counts[error_type] = counts.get(error_type, 0) + 1
+            self.assertEqual({entry["xBin"]: entry["count"] for entry in histogram["histograms"]}, expected, column)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import csv
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.bulk_loader import dataframe_to_csv_buffer, build_copy_statement, prepare_frame_for_copy, \
+    staging_table_name, quote_identifier, null_marker_for, COPY_NULL_MARKER, MAX_IDENTIFIER_BYTES
+
+
+class TestBulkLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'ID': [1, 2, 3],
+            'Country': ['USA', None, 'said "hi", twice'],
+            'Salary': [50000.5, np.nan, 7.0],
+            'Notes': ['', 'multi\nline', 'plain'],
+        })
+
+    def test_csv_buffer_round_trips_values(self):
+        rows = list(csv.reader(dataframe_to_csv_buffer(self.df)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], ['1', 'USA', '50000.5', ''])
+        self.assertEqual(rows[1], ['2', COPY_NULL_MARKER, COPY_NULL_MARKER, 'multi\nline'])
+        self.assertEqual(rows[2][1], 'said "hi", twice')
+
+    def test_csv_buffer_has_no_header(self):
+        first_line = dataframe_to_csv_buffer(self.df).readline()
+        self.assertNotIn('Country', first_line)
+
+    def test_prepare_frame_keeps_index_as_column(self):
+        frame = prepare_frame_for_copy(self.df, index=True)
+        self.assertEqual(list(frame.columns), ['index', 'ID', 'Country', 'Salary', 'Notes'])
+        self.assertEqual(frame['index'].tolist(), [0, 1, 2])
+
+    def test_prepare_frame_without_index_is_unchanged(self):
+        frame = prepare_frame_for_copy(self.df, index=False)
+        self.assertEqual(list(frame.columns), list(self.df.columns))
+
+    def test_copy_statement_quotes_identifiers(self):
+        statement = build_copy_statement(staging_table_name("games"), ['ID', 'Sub-issue', 'say "x"'])
+        self.assertEqual(
+            statement,
+            'COPY "games__staging" ("ID", "Sub-issue", "say ""x""") '
+            "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+
+    def test_null_marker_avoids_cell_text(self):
+        self.assertEqual(null_marker_for(self.df), COPY_NULL_MARKER)
+        clashing = pd.DataFrame({'Notes': ['\\N', None, '\\N1'], 'Salary': [1.0, np.nan, 2.0]})
+        marker = null_marker_for(clashing)
+        self.assertEqual(marker, '\\N2')
+        rows = list(csv.reader(dataframe_to_csv_buffer(clashing, marker)))
+        self.assertEqual([row[0] for row in rows], ['\\N', marker, '\\N1'])
+        self.assertTrue(build_copy_statement("games", ['Notes'], marker).endswith("NULL '\\N2')"))
+
+    def test_long_staging_names_fit_postgres_identifiers(self):
+        self.assertEqual(staging_table_name("games"), "games__staging")
+        first, second = staging_table_name("t" * 60 + "_a"), staging_table_name("t" * 60 + "_b")
+        self.assertNotEqual(first, second)
+        self.assertLessEqual(len(first.encode()), MAX_IDENTIFIER_BYTES)
+        self.assertLessEqual(len(staging_table_name("é" * 40).encode()), MAX_IDENTIFIER_BYTES)
+
+    def test_quote_identifier(self):
+        self.assertEqual(quote_identifier('errorsgames'), '"errorsgames"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import io
+import unittest
+
+import pandas as pd
+
+from app.service_helpers import run_detectors, calculate_attribute_rankings, rankings_from_error_counts
+from app.set_id_column import set_id_column
+from app.streaming_ingest import collect_detector_statistics, read_csv_chunks, rewind_source
+from detectors.chunked import detect_chunk_errors
+
+
+def chunked_errors(source, chunk_size):
+    statistics = collect_detector_statistics(source, chunk_size)
+    rewind_source(source)
+    chunks = []
+    errors = []
+    rows = 0
+    for raw_chunk in read_csv_chunks(source, chunk_size):
+        chunk = statistics.convert_chunk(raw_chunk, first_id=rows + 1)
+        rows += len(chunk)
+        chunks.append(chunk)
+        errors.append(detect_chunk_errors(chunk, statistics))
+    return pd.concat(chunks, ignore_index=True), pd.concat(errors, ignore_index=True)
+
+
+def as_error_set(error_df):
+    return set(zip(error_df['row_id'].astype(int), error_df['column_id'], error_df['error_type']))
+
+
+class TestChunkedDetectors(unittest.TestCase):
+
+    def assert_matches_whole_frame(self, source, chunk_size):
+        expected = run_detectors(pd.read_csv(source))
+        rewind_source(source)
+        _, detected = chunked_errors(source, chunk_size)
+        self.assertEqual(as_error_set(detected), as_error_set(expected))
+        self.assertEqual(len(detected), len(expected))
+
+    def test_stackoverflow_matches_run_detectors(self):
+        self.assert_matches_whole_frame('../../provided_datasets/stackoverflow_db_uncleaned.csv', 7)
+
+    def test_complaints_matches_run_detectors(self):
+        self.assert_matches_whole_frame('../../provided_datasets/complaints-2025-04-21_17_31.csv', 1000)
+
+    def test_chunks_have_whole_file_dtypes(self):
+        source = '../../provided_datasets/stackoverflow_db_uncleaned.csv'
+        expected = set_id_column(pd.read_csv(source))
+        converted, _ = chunked_errors(source, 5)
+        self.assertEqual(list(converted.columns), list(expected.columns))
+        self.assertEqual(converted.dtypes.astype(str).tolist(), expected.dtypes.astype(str).tolist())
+
+    def test_mixed_and_boolean_columns(self):
+        csv = "flag,code,score\n" + "".join(
+            f"{'True' if i % 4 else 'False'},{'x' if i == 3 else i},{1000 if i == 0 else i % 3}\n" for i in range(24))
+        self.assert_matches_whole_frame(io.StringIO(csv), 5)
+
+    def test_mismatch_tie_follows_the_most_frequent_value(self):
+        # two string and two numeric-looking cells, "7" is the most frequent value so numeric is the majority
+        csv = "code,other\na,x\nb,y\n7,z\n7,w\n"
+        self.assert_matches_whole_frame(io.StringIO(csv), 2)
+        _, detected = chunked_errors(io.StringIO(csv), 3)
+        mismatches = detected[detected['error_type'] == 'mismatch']
+        self.assertEqual(sorted(mismatches['row_id'].tolist()), [1, 2])
+
+    def test_invalid_id_is_renamed(self):
+        csv = "ID,name\n" + "".join(f"{i % 5},n{i % 2}\n" for i in range(12))
+        converted, _ = chunked_errors(io.StringIO(csv), 4)
+        self.assertEqual(list(converted.columns), ['ID', 'Original_ID', 'name'])
+        self.assertEqual(converted['ID'].tolist(), list(range(1, 13)))
+
+    def test_rankings_from_error_counts(self):
+        error_df = pd.DataFrame({'row_id': [1, 2, 3], 'column_id': ['a', 'b', 'b'],
+                                 'error_type': ['missing', 'missing', 'anomaly']})
+        from_counts = rankings_from_error_counts(pd.Series({'a': 1, 'b': 2}))
+        pd.testing.assert_frame_equal(from_counts.reset_index(drop=True),
+                                      calculate_attribute_rankings(error_df).reset_index(drop=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
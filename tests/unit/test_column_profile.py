@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app import data_state_manager
+from app.service_helpers import get_column_profile, is_categorical, state_version, COLUMN_PROFILES
+from detectors.profile import ColumnProfile
+
+
+class TestColumnProfile(unittest.TestCase):
+
+    def test_profile_of_mixed_text_column(self):
+        profile = ColumnProfile(pd.Series(["1", "2", "2", "x", None, "3.5"], dtype=object, name="mixed"))
+        self.assertEqual(profile.null_count, 1)
+        self.assertEqual(profile.cardinality, 4)
+        self.assertEqual(profile.numeric_count, 4)
+        self.assertEqual(profile.numeric_mask.tolist(), [True, True, True, False, False, True])
+        self.assertEqual(profile.majority_type, "numeric")
+        self.assertEqual(profile.inferred_type, "numeric")
+        self.assertAlmostEqual(profile.mean, 2.125)
+        self.assertEqual((profile.min, profile.max), (1, 3.5))
+
+    def test_profile_of_numeric_column(self):
+        values = pd.Series([1.0, 2.0, np.nan, 4.0], name="number")
+        profile = ColumnProfile(values)
+        self.assertFalse(profile.is_categorical)
+        self.assertEqual(profile.null_count, 1)
+        self.assertAlmostEqual(profile.std, values.std())
+
+    def test_empty_and_text_columns_are_categorical(self):
+        self.assertTrue(ColumnProfile(pd.Series([None, None], dtype=object)).is_categorical)
+        self.assertTrue(is_categorical(pd.Series(["a", "b", "1"], dtype=object)))
+
+    def test_profiles_are_cached_per_version(self):
+        column = pd.Series(["a", "b"], dtype=object, name="profile_cache_test")
+        version = state_version(1, 2)
+        first = get_column_profile(column, version)
+        self.assertIs(get_column_profile(column, version), first)
+        self.assertIn((version, "profile_cache_test"), COLUMN_PROFILES)
+
+        data_state_manager.set_current_state({"df": pd.DataFrame(), "error_df": pd.DataFrame()})
+        self.assertNotEqual(state_version(1, 2), version)
+        self.assertIsNot(get_column_profile(column, state_version(1, 2)), first)
+
+    def test_uncached_without_version(self):
+        column = pd.Series(["a"], dtype=object, name="profile_uncached_test")
+        self.assertIsNot(get_column_profile(column), get_column_profile(column))
+
+
+if __name__ == '__main__':
+    unittest.main()
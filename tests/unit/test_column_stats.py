@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.column_stats import MISSING_VALUE_TOKENS, covers_id_window, missing_predicate, read_column_stats, \
+    refresh_column_stats, column_modes_query
+from database_helpers import database_engine, drop_dataset, load_dataset
+
+
+class TestColumnStats(unittest.TestCase):
+
+    def test_statistics_match_pandas(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+        table = "columnstatstest"
+        frame = pd.DataFrame({
+            "ID": np.arange(1, 13),
+            "score": [1.5, np.nan, 3.0, 4.25, np.nan, 10.0, -2.0, 0.5, 7.0, 7.0, np.nan, 2.0],
+            # "b" and "a" tie, the missing tokens are more frequent but never the mode
+            "genre": ["b", "a", "null", "b", "", None, "a", "null", "c", "undefined", "null", None],
+            "platform": ["y", "x", "y", "x", "z", None, "z", "z", "y", "x", "", "x"],
+        })
+        load_dataset(engine, table, frame)
+        try:
+            refresh_column_stats(table, engine)
+            with engine.connect() as conn:
+                stats = read_column_stats(conn, table)
+        finally:
+            drop_dataset(engine, table)
+
+        for column in frame.columns:
+            values = frame[column]
+            self.assertEqual(stats[column]["row_count"], len(values))
+            self.assertEqual(stats[column]["null_count"], values.isna().sum())
+            self.assertEqual(stats[column]["distinct_count"], values.nunique())
+        score = frame["score"]
+        self.assertTrue(stats["score"]["is_numeric"])
+        self.assertEqual(stats["score"]["min_value"], score.min())
+        self.assertEqual(stats["score"]["max_value"], score.max())
+        self.assertAlmostEqual(stats["score"]["mean_value"], score.mean())
+        self.assertAlmostEqual(stats["score"]["stddev_value"], score.std())
+        self.assertIsNone(stats["score"]["mode_value"])
+
+        for column in ("genre", "platform"):
+            values = frame[column].dropna()
+            counts = values[~values.isin(MISSING_VALUE_TOKENS)].value_counts()
+            self.assertFalse(stats[column]["is_numeric"])
+            self.assertEqual(stats[column]["mode_value"], min(counts[counts == counts.max()].index))
+
+    def test_modes_of_every_text_column_come_from_one_pass(self):
+        columns = [("ID", "bigint"), ("genre", "text"), ("score", "double precision"), ("platform", "text")]
+        query = column_modes_query("games", columns)
+        self.assertEqual(query.count('FROM "games"'), 1)
+        self.assertIn('VALUES (1, t."genre"::text), (3, t."platform"::text)', query)
+        self.assertIsNone(column_modes_query("games", columns[:1]))
+
+    def test_missing_predicate_matches_the_wranglers(self):
+        self.assertEqual(missing_predicate("Year"),
+                         "(\"Year\" IS NULL OR \"Year\"::text IN ('', 'null', 'undefined'))")
+
+    def test_table_statistics_only_describe_windows_holding_every_row(self):
+        stats = {"ID": {"row_count": 100, "min_value": 0.0, "max_value": 99.0}}
+        self.assertTrue(covers_id_window(stats, None, None))
+        self.assertTrue(covers_id_window(stats, 0, 200))
+        self.assertFalse(covers_id_window(stats, 1, 200))
+        self.assertFalse(covers_id_window(stats, 0, 50))
+        self.assertFalse(covers_id_window({}, None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
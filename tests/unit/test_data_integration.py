@@ -218,6 +218,41 @@ class TestDataIntegration(unittest.TestCase):
         result = count_errors_per_bin(empty_error_df, row_to_bin_mapping)
         self.assertEqual(len(result), 0)
 
+    def test_numeric_bin_assignments_stay_aligned_with_nulls(self):
+        """Test that numeric bin assignments keep the row positions when the column has nulls."""
+        df_with_nulls = pd.DataFrame({
+            'ID': [1, 2, 3, 4],
+            'ConvertedSalary': [50000, None, 200000, 60000]
+        })
+
+        bin_assignments, _, column_type = get_column_bin_assignments(df_with_nulls, 'ConvertedSalary', 2)
+
+        self.assertEqual(column_type, 'numeric')
+        self.assertEqual(list(bin_assignments), [0, -1, 1, 0])
+
+    def test_count_items_and_errors_per_bin_matches_the_mapping(self):
+        """Test that the bincount engine gives the counts of the row to bin mapping."""
+        column_names = ['Country', 'ConvertedSalary']
+        # a window of the table, its index labels do not start at 0
+        window_df = self.sample_main_df.iloc[1:]
+        all_bin_assignments, all_scale_data = [], []
+        for column_name in column_names:
+            bin_assignments, scale_data, _ = get_column_bin_assignments(window_df, column_name, 3)
+            all_bin_assignments.append(bin_assignments)
+            all_scale_data.append(scale_data)
+        relevant_errors = get_relevant_errors(self.sample_error_df, column_names)
+
+        items_per_bin, errors_per_bin = count_items_and_errors_per_bin(
+            window_df, relevant_errors, all_bin_assignments, all_scale_data
+        )
+
+        row_to_bin_mapping = create_row_to_bin_mapping(window_df, column_names, all_bin_assignments)
+        self.assertEqual(len(row_to_bin_mapping), 5)
+        self.assertEqual(items_per_bin, count_items_per_bin(row_to_bin_mapping))
+        self.assertEqual(errors_per_bin, count_errors_per_bin(relevant_errors, row_to_bin_mapping))
+        # row 1 is outside the window, its mismatch error is not counted
+        self.assertEqual(sum(sum(errors.values()) for errors in errors_per_bin.values()), 3)
+
     def test_create_scale_info_categorical(self):
         """Test creating scale info for categorical data."""
         scale_data = ['USA', 'Canada', 'Germany']
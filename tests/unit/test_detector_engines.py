@@ -0,0 +1,72 @@
+import io
+import tempfile
+import unittest
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.error_store import error_codes_table, error_columns_table, errors_view
+from app.duckdb_backend import detect_snapshot_errors
+from app.service_helpers import run_detectors
+from app.set_id_column import set_id_column
+from database_helpers import database_engine, drop_dataset, load_dataset
+from detectors.incremental import ErrorState
+from test_chunked_detectors import as_error_set, chunked_errors
+from test_duckdb_backend import write_snapshot
+
+TABLE_NAME = "detectorengines"
+
+
+def engine_test_csv():
+    """A csv touching every detector rule: thresholds, the missing strings, padded and exponent numbers and a tie"""
+    rows = ["amount,label,code,flag,score"]
+    amounts = [str(value) for value in range(17)] + ["500", "null", " 7 "]
+    labels = ["a", "b"] * 8 + ["1", " 2.5 ", "1e400", ""]
+    codes = ["x", "y"] + ["7"] * 2 + ["z"] * 16
+    for position in range(20):
+        rows.append(f"{amounts[position]},{labels[position]},{codes[position]},"
+                    f"{'True' if position % 2 else 'False'},{90.0 if position == 19 else 1.0}")
+    return "\n".join(rows) + "\n"
+
+
+class TestDetectorEngines(unittest.TestCase):
+    """Every engine detects the same errors on the same csv"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.csv = engine_test_csv()
+        cls.data_frame = set_id_column(pd.read_csv(io.StringIO(cls.csv)))
+        cls.expected = as_error_set(run_detectors(pd.read_csv(io.StringIO(cls.csv))))
+
+    def test_frame_touches_every_error_type(self):
+        self.assertEqual({error_type for _, _, error_type in self.expected},
+                         {"anomaly", "incomplete", "missing", "mismatch"})
+
+    def test_chunked_engine(self):
+        _, detected = chunked_errors(io.StringIO(self.csv), 6)
+        self.assertEqual(as_error_set(detected), self.expected)
+
+    def test_incremental_engine(self):
+        self.assertEqual(as_error_set(ErrorState(self.data_frame).error_frame()), self.expected)
+
+    def test_duckdb_engine(self):
+        with tempfile.TemporaryDirectory() as directory:
+            detected = detect_snapshot_errors(write_snapshot(self.data_frame, directory))
+        self.assertEqual(as_error_set(detected), self.expected)
+
+    def test_sql_engine(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("no database at DATABASE_URL")
+        self.addCleanup(drop_dataset, engine, TABLE_NAME)
+        load_dataset(engine, TABLE_NAME, self.data_frame)
+        with engine.begin() as conn:
+            conn.execute(text("SELECT detect_errors_in_database(:main_table, :codes_table, :columns_table)"),
+                         {"main_table": TABLE_NAME, "codes_table": error_codes_table(TABLE_NAME),
+                          "columns_table": error_columns_table(TABLE_NAME)})
+        detected = pd.read_sql(f'SELECT row_id, column_id, error_type FROM "{errors_view(TABLE_NAME)}"', engine)
+        self.assertEqual(as_error_set(detected), self.expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+
+import duckdb
+import pandas as pd
+
+from app.duckdb_backend import DatasetSnapshot, _bin_expression, _scale_edges, detect_snapshot_errors
+from app.set_id_column import set_id_column
+from detectors.vectorized import detect_errors
+
+
+def write_snapshot(data_frame, directory):
+    """A snapshot of a dataframe as export_snapshot writes it: numbers keep their type, the rest is Postgres text"""
+    data_types = {column: {"i": "bigint", "f": "double precision", "b": "boolean"}.get(dtype.kind, "text")
+                  for column, dtype in data_frame.dtypes.items()}
+    column_types = {column: {"i": "BIGINT", "f": "DOUBLE"}.get(dtype.kind, "VARCHAR")
+                    for column, dtype in data_frame.dtypes.items()}
+    stored = data_frame.copy()
+    for column in data_frame.columns:
+        if data_types[column] == "boolean":
+            stored[column] = data_frame[column].map({True: "true", False: "false"})
+    conn = duckdb.connect()
+    conn.register("stored", stored)
+    conn.execute(f"COPY stored TO '{directory}/data.parquet' (FORMAT parquet)")
+    conn.execute(f"COPY (SELECT CAST(NULL AS BIGINT) AS row_id, '' AS column_id, '' AS error_type WHERE false) "
+                 f"TO '{directory}/errors.parquet' (FORMAT parquet)")
+    conn.close()
+    return DatasetSnapshot("test", 0, directory, column_types, data_types)
+
+
+class TestDuckdbBackend(unittest.TestCase):
+
+    def test_scale_edges_follow_postgres_numeric_arithmetic(self):
+        # expected values printed by Postgres for low::numeric + (n * (high::numeric - low::numeric) / count::numeric)
+        edges = _scale_edges(0.5, 97.25, 7)
+        self.assertEqual(edges[3]["x0"], 41.9642857142857143)
+        self.assertIsInstance(_scale_edges(0.0, 1.0, 10)[0]["x0"], float)
+        # a large range divides at scale 0, Postgres prints an integer
+        self.assertEqual(_scale_edges(13.0, 1e20, 10)[2]["x0"], 20000000000000000010)
+        self.assertEqual(_scale_edges(None, None, 2), [{"x0": None, "x1": None}] * 2)
+
+    def test_bins_match_width_bucket(self):
+        # width_bucket(0.3, 0.1, 0.7, 3) = 2 and width_bucket(97.25, 0.5, 97.25, 7) = 8 in Postgres
+        conn = duckdb.connect()
+        low_bin = conn.execute(f"SELECT {_bin_expression('0.3::DOUBLE', '0.1::DOUBLE', '0.7::DOUBLE', 3)}").fetchone()[0]
+        top_bin = conn.execute(f"SELECT {_bin_expression('97.25::DOUBLE', '0.5::DOUBLE', '97.25::DOUBLE', 7)}").fetchone()[0]
+        self.assertEqual(low_bin, 1)
+        self.assertEqual(top_bin, 6)
+
+    def assert_same_errors_as_pandas(self, data_frame):
+        df_with_id = set_id_column(data_frame)
+        with tempfile.TemporaryDirectory() as directory:
+            detected = detect_snapshot_errors(write_snapshot(df_with_id, directory))
+        expected = detect_errors(df_with_id)
+        self.assertEqual(set(detected.itertuples(index=False, name=None)),
+                         set(expected.itertuples(index=False, name=None)))
+        self.assertEqual(len(detected), len(expected))
+
+    def test_detectors_match_pandas_on_stackoverflow(self):
+        self.assert_same_errors_as_pandas(pd.read_csv('../../provided_datasets/stackoverflow_db_uncleaned.csv'))
+
+    def test_detectors_match_pandas_on_edge_values(self):
+        values = [str(value) for value in range(20)]
+        self.assert_same_errors_as_pandas(pd.DataFrame({
+            # one anomaly, a missing token and a number written with spaces
+            "amount": values[:17] + ["500", "null", " 7 "],
+            # the few numbers of a text column are rare values (incomplete) and mismatches
+            "label": ["a", "b"] * 8 + ["1", "2.5", "1e400", None],
+            "flag": [True, False] * 10,
+            "score": [1.0] * 19 + [90.0],
+        }))
+
+
+if __name__ == '__main__':
+    unittest.main()
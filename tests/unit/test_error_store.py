@@ -0,0 +1,76 @@
+import unittest
+
+import pandas as pd
+
+from app.error_store import column_codes_for, encode_errors, error_store_statements, ERROR_TYPE_CODES, \
+    error_counts_statements, top_error_columns, error_dictionary_query, error_type_columns
+
+
+class TestErrorStore(unittest.TestCase):
+
+    def test_column_codes_skip_excluded_columns(self):
+        codes = column_codes_for(["ID", "name", "Unnamed: 0", "price", "row_id"])
+        self.assertEqual(codes, {"name": 1, "price": 2})
+
+    def test_encode_errors(self):
+        errors = pd.DataFrame({
+            "row_id": [3, 7, 7],
+            "column_id": ["price", "name", "price"],
+            "error_type": ["anomaly", "missing", "mismatch"],
+        })
+        encoded = encode_errors(errors, {"name": 1, "price": 2})
+        self.assertEqual(list(encoded.columns), ["row_id", "column_code", "error_code"])
+        self.assertEqual(encoded["row_id"].tolist(), [3, 7, 7])
+        self.assertEqual(encoded["column_code"].tolist(), [2, 1, 2])
+        self.assertEqual(encoded["error_code"].tolist(),
+                         [ERROR_TYPE_CODES["anomaly"], ERROR_TYPE_CODES["missing"], ERROR_TYPE_CODES["mismatch"]])
+        self.assertEqual(str(encoded["column_code"].dtype), "int16")
+
+    def test_encode_unknown_column_raises(self):
+        errors = pd.DataFrame({"row_id": [1], "column_id": ["other"], "error_type": ["missing"]})
+        with self.assertRaises(ValueError):
+            encode_errors(errors, {"name": 1})
+
+    def test_statements_end_with_the_compatibility_view(self):
+        statements = error_store_statements("games", {"name": 1})
+        sql, params = statements[-1]
+        self.assertIn('CREATE OR REPLACE VIEW "errorsgames"', sql)
+        self.assertIsNone(params)
+        self.assertTrue(any('ADD PRIMARY KEY' in sql for sql, _ in statements))
+
+    def test_error_counts_are_seeded_and_kept_by_triggers(self):
+        statements = [sql for sql, _ in error_counts_statements("games")]
+        self.assertTrue(any('INSERT INTO "error_countsgames"' in sql and 'FROM "error_codesgames"' in sql
+                            for sql in statements))
+        for event in ("INSERT", "UPDATE", "DELETE", "TRUNCATE"):
+            self.assertTrue(any(f'AFTER {event} ON "error_codesgames"' in sql
+                                and "maintain_error_counts('error_countsgames')" in sql for sql in statements))
+        self.assertTrue(any('"error_countsgames"' in sql for sql, _ in error_store_statements("games", {"name": 1})))
+
+    def test_top_error_columns_keep_column_order_on_ties(self):
+        error_counts = {"a": {"missing": 2}, "b": {"anomaly": 3, "missing": 1}, "c": {"mismatch": 4}}
+        self.assertEqual(top_error_columns(error_counts, 3), ["b", "c", "a"])
+        self.assertEqual(top_error_columns(error_counts, 1), ["b"])
+
+
+    def test_error_dictionary_reads_only_the_window(self):
+        query = error_dictionary_query('"errorsgames"')
+        self.assertIn('FROM "errorsgames" e', query)
+        self.assertIn("WHERE e.row_id BETWEEN :min_row_id AND :max_row_id", query)
+        self.assertIn("jsonb_object_agg(row_id, error_types)", query)
+        self.assertIn("jsonb_object_agg(column_id, cells)", query)
+
+    def test_page_error_dictionary_reads_only_the_page_rows(self):
+        query = error_dictionary_query('"errorsgames"', by_row_ids=True)
+        self.assertIn("WHERE e.row_id = ANY(:row_ids)", query)
+        self.assertNotIn("BETWEEN", query)
+
+    def test_error_type_columns_follow_the_error_type_codes(self):
+        self.assertEqual(error_type_columns("t.{error_type}", ", "), "t.anomaly, t.incomplete, t.missing, t.mismatch")
+        from app.db_functions import DB_FUNCTIONS
+        for name in ("generate_one_d_histogram_with_errors", "generate_two_d_histogram_with_errors"):
+            for error_type in ERROR_TYPE_CODES:
+                self.assertIn(f"FILTER (WHERE error_type = '{error_type}')", DB_FUNCTIONS[name])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+
+from app.heatmap_tiles import HEATMAP_TILE_BINS, axis_expressions
+from database_helpers import database_engine, drop_dataset
+
+
+def width_bucket(values, low, high, count):
+    """Postgres' width_bucket for low < high: 0 below low, count + 1 from high on"""
+    return np.clip(np.floor((values - low) / (high - low) * count).astype(int) + 1, 0, count + 1)
+
+
+def clamped_bin(values, low, high, count):
+    """The bin of the histogram kernels and of the tiles: LEAST(GREATEST(width_bucket(...) - 1, 0), count - 1)"""
+    return np.clip(width_bucket(values, low, high, count) - 1, 0, count - 1)
+
+
+class TestHeatmapTiles(unittest.TestCase):
+
+    def test_numeric_axes_use_the_fine_bins(self):
+        fine_bin, value = axis_expressions("Year", True, ":x_min", ":x_max")
+        self.assertEqual(fine_bin, f'LEAST(GREATEST(width_bucket(d."Year"::double precision, :x_min, :x_max, '
+                                   f'{HEATMAP_TILE_BINS}) - 1, 0), {HEATMAP_TILE_BINS - 1})::text')
+        self.assertEqual(value, 'd."Year"::double precision')
+
+    def test_categorical_axes_keep_their_categories(self):
+        fine_bin, value = axis_expressions("Genre", False, ":y_min", ":y_max")
+        self.assertEqual(fine_bin, 'd."Genre"::text')
+        self.assertEqual(value, "NULL::double precision")
+
+    def test_common_bin_counts_nest_in_the_fine_bins(self):
+        for bins in (1, 2, 3, 4, 5, 6, 8, 9, 10, 12, 15, 20):
+            self.assertEqual(HEATMAP_TILE_BINS % bins, 0)
+
+
+    def test_coarse_bins_summed_from_the_fine_cells(self):
+        # a continuous column: the last fine cell holds the maximum and values below it
+        values = np.random.default_rng(7).uniform(0.0, 100.0, 20000)
+        low, high = values.min(), values.max()
+        fine = clamped_bin(values, low, high, HEATMAP_TILE_BINS)
+        cells = np.unique(fine)
+        cell_low = np.array([values[fine == cell].min() for cell in cells])
+        cell_high = np.array([values[fine == cell].max() for cell in cells])
+        cell_items = np.array([(fine == cell).sum() for cell in cells])
+        self.assertGreater((fine == HEATMAP_TILE_BINS - 1).sum(), 1)
+
+        for bins in (4, 7, 10, 12):
+            low_bin = clamped_bin(cell_low, low, high, bins)
+            high_bin = clamped_bin(cell_high, low, high, bins)
+            nested = low_bin == high_bin
+            if HEATMAP_TILE_BINS % bins == 0:
+                self.assertTrue(nested.all(), bins)
+                # the unclamped buckets put the maximum past the last bin
+                self.assertNotEqual(width_bucket(cell_low, low, high, bins)[-1],
+                                    width_bucket(cell_high, low, high, bins)[-1])
+            if nested.all():
+                summed = np.bincount(low_bin, weights=cell_items, minlength=bins)
+                scanned = np.bincount(clamped_bin(values, low, high, bins), minlength=bins)
+                np.testing.assert_array_equal(summed, scanned)
+
+    def test_tiles_serve_a_continuous_pair(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+        import pandas as pd
+        from sqlalchemy import text
+        from app.column_stats import refresh_column_stats
+        from app.error_store import write_errors
+        from app.heatmap_tiles import heatmap_from_tiles
+
+        table = "heatmaptilestest"
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{table}"'))
+            conn.execute(text(f"""
+                CREATE TABLE "{table}" AS
+                SELECT n::bigint AS "ID", (n % 4)::double precision AS x, 50 + 50 * sin(n * 12.9898) AS y
+                FROM generate_series(1, 20000) n
+            """))
+        # x has 4 values, so the fine cells at the maximum of y hold many rows
+        errors = pd.DataFrame({"row_id": [1, 2, 3], "column_id": ["x", "x", "y"],
+                               "error_type": ["anomaly", "missing", "anomaly"]})
+        write_errors(errors, table, engine, ["ID", "x", "y"])
+        refresh_column_stats(table, engine)
+        try:
+            histogram = heatmap_from_tiles(table, "x", "y", 10, 10, None, None, engine)
+            self.assertIsNotNone(histogram)
+            with engine.connect() as conn:
+                scanned = conn.execute(text(
+                    f"SELECT generate_two_d_histogram_with_errors('{table}', 'errors{table}', 'x', 'y', 10, 10)"
+                )).scalar_one()
+            self.assertEqual(histogram, scanned)
+        finally:
+            drop_dataset(engine, table)
+
+
+if __name__ == '__main__':
+    unittest.main()
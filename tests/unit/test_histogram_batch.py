@@ -0,0 +1,29 @@
+import unittest
+
+from postgres_wrangling.histogram_batch import _BatchBuilder, parse_histogram_cell
+
+
+class TestHistogramBatch(unittest.TestCase):
+
+    def test_cells_use_the_parameters_of_the_single_endpoints(self):
+        self.assertEqual(parse_histogram_cell({"column": "Year", "bins": "8"}), (["Year"], [8]))
+        self.assertEqual(parse_histogram_cell({"column_x": "Year", "column_y": "Genre"}), (["Year", "Genre"], [10, 10]))
+
+    def test_mirrored_cells_share_bounds_and_bins(self):
+        builder = _BatchBuilder("games", {"Year": True, "Score": True, "Genre": False})
+        builder.two_d_cell("Year", "Score", 10, 10)
+        builder.two_d_cell("Score", "Year", 10, 10)
+        builder.one_d_cell("Year", 10)
+        builder.two_d_cell("Genre", "Year", 10, 10)
+        # (Year, Score) pair bounds for both axes, Year alone, (Genre, Year) pair for Year
+        self.assertEqual(len(builder.bounds), 4)
+        # Year and Score on their pair, Year alone, Genre as text and Year on the (Genre, Year) pair
+        self.assertEqual(len(builder.bins), 5)
+        statement = builder.statement(["1", "2"])
+        self.assertEqual(statement.count('FROM "games"'), 1)
+        self.assertIn('"Year"::double precision AS c0', statement)
+        self.assertIn('"Genre" AS c2', statement)
+
+
+if __name__ == '__main__':
+    unittest.main()
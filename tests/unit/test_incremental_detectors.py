@@ -0,0 +1,108 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from detectors.incremental import ErrorState
+from detectors.vectorized import detect_errors
+
+
+def error_set(errors):
+    return set(zip(errors["row_id"].astype(int), errors["column_id"], errors["error_type"]))
+
+
+def sample_frame(rows=120, seed=3):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(50, 5, rows)
+    values[[5, 17]] = [500, -300]
+    values[[8, 40]] = np.nan
+    labels = rng.choice(["a", "b", "c"], rows).astype(object)
+    labels[[2, 60]] = ["rare", "12"]
+    labels[30] = "null"
+    return pd.DataFrame({
+        "ID": np.arange(1, rows + 1),
+        "value": values,
+        "label": labels,
+    })
+
+
+class TestIncrementalDetectors(unittest.TestCase):
+
+    def test_initial_state_matches_detect_errors(self):
+        df = sample_frame()
+        self.assertEqual(error_set(ErrorState(df).error_frame()), error_set(detect_errors(df)))
+
+    def test_remove_rows_reports_only_changed_errors(self):
+        df = sample_frame()
+        state = ErrorState(df)
+        stored = error_set(state.error_frame())
+
+        removed = [1, 6, 18, 61]
+        added, cleared = state.remove_rows(removed)
+        stored = {error for error in stored if error[0] not in removed}
+        stored = (stored - error_set(cleared)) | error_set(added)
+
+        expected = error_set(detect_errors(df[~df["ID"].isin(removed)].reset_index(drop=True)))
+        self.assertEqual(stored, expected)
+        self.assertEqual(error_set(state.error_frame()), expected)
+        # the outlier at ID 18 is gone, so the mean/std move and the changes stay within the value column
+        self.assertTrue(set(added["column_id"]) | set(cleared["column_id"]) <= {"value", "label"})
+
+    def test_update_cells_only_touches_that_column(self):
+        df = sample_frame()
+        state = ErrorState(df)
+        stored = error_set(state.error_frame())
+
+        added, cleared = state.update_cells("label", [3, 31], ["a", "a"])
+        stored = (stored - error_set(cleared)) | error_set(added)
+
+        updated = df.copy()
+        updated.loc[updated["ID"].isin([3, 31]), "label"] = "a"
+        expected = error_set(detect_errors(updated))
+        self.assertEqual(stored, expected)
+        self.assertEqual(set(added["column_id"]) | set(cleared["column_id"]), {"label"})
+        self.assertIn((3, "label", "incomplete"), error_set(cleared))
+        self.assertIn((31, "label", "missing"), error_set(cleared))
+
+    def test_imputed_numeric_cells_update_the_moments(self):
+        df = sample_frame()
+        state = ErrorState(df)
+        state.update_cells("value", [9, 41], [50.0, 50.0])
+
+        updated = df.copy()
+        updated.loc[updated["ID"].isin([9, 41]), "value"] = 50.0
+        column_state = state.columns["value"]
+        numeric = updated["value"]
+        self.assertEqual(column_state.numeric_count, numeric.notna().sum())
+        self.assertAlmostEqual(column_state.numeric_mean, numeric.mean())
+        self.assertAlmostEqual(column_state.numeric_std, numeric.std())
+        self.assertEqual(error_set(state.error_frame()), error_set(detect_errors(updated)))
+
+    def test_column_crossing_a_threshold_is_reevaluated(self):
+        df = pd.DataFrame({
+            "ID": np.arange(1, 13),
+            "code": ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "x"],
+        })
+        state = ErrorState(df)
+        self.assertNotIn("incomplete", set(state.error_frame()["error_type"]))
+
+        # with 10 numeric values left incomplete starts checking the column
+        added, _ = state.remove_rows([1])
+        self.assertIn((12, "code", "incomplete"), error_set(added))
+        self.assertEqual(error_set(state.error_frame()),
+                         error_set(detect_errors(df[df["ID"] != 1].reset_index(drop=True))))
+
+
+    def test_mismatch_tie_uses_the_profile_rule(self):
+        df = pd.DataFrame({"ID": [1, 2, 3, 4, 5], "code": ["a", "b", "7", "7", "c"]})
+        state = ErrorState(df)
+        self.assertEqual(error_set(state.error_frame()), error_set(detect_errors(df)))
+        # removing "c" leaves two cells of each class, the class of the most frequent value "7" wins the tie
+        state.remove_rows([5])
+        remaining = df[df["ID"] != 5].reset_index(drop=True)
+        self.assertEqual(error_set(state.error_frame()), error_set(detect_errors(remaining)))
+        self.assertIn((1, "code", "mismatch"), error_set(state.error_frame()))
+
+
+if __name__ == '__main__':
+    unittest.main()
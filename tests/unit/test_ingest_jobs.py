@@ -0,0 +1,142 @@
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app.ingest_jobs import submit_ingest_job, submit_new_ingest_job, get_ingest_job, find_active_ingest_job, \
+    find_failed_ingest_job, forget_ingest_jobs, use_streaming_ingest, IngestJobActiveError, STREAM_INGEST_MIN_BYTES
+
+
+def wait_for(job, timeout=10):
+    deadline = time.time() + timeout
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.01)
+    return job.to_dict()
+
+
+class TestIngestJobs(unittest.TestCase):
+
+    def test_job_reports_stages_and_result(self):
+        def fake_ingest(rows, progress):
+            progress("parse")
+            progress("detect", rows)
+            progress("write main", rows)
+            return {"rows": rows}
+
+        job = submit_ingest_job("jobs_test_done", fake_ingest, 25)
+        state = wait_for(job)
+        self.assertEqual(state["status"], "done")
+        self.assertEqual(state["stage"], "done")
+        self.assertEqual(state["rows_processed"], 25)
+        self.assertEqual(state["report"], {"rows": 25})
+        self.assertGreaterEqual(state["elapsed_seconds"], 0)
+        self.assertIs(get_ingest_job(job.id), job)
+
+    def test_failed_job_keeps_stage_and_error(self):
+        def failing_ingest(progress):
+            progress("write errors", 3)
+            raise ValueError("disk full")
+
+        state = wait_for(submit_ingest_job("jobs_test_failed", failing_ingest))
+        self.assertEqual(state["status"], "failed")
+        self.assertEqual(state["stage"], "write errors")
+        self.assertEqual(state["error"], "disk full")
+
+    def test_same_table_is_not_loaded_twice(self):
+        release = threading.Event()
+
+        def blocking_ingest(progress):
+            release.wait(5)
+
+        first = submit_ingest_job("jobs_test_dedupe", blocking_ingest)
+        second = submit_ingest_job("jobs_test_dedupe", blocking_ingest)
+        self.assertIs(first, second)
+        self.assertIs(find_active_ingest_job("jobs_test_dedupe"), first)
+        release.set()
+        wait_for(first)
+        self.assertIsNone(find_active_ingest_job("jobs_test_dedupe"))
+
+    def test_new_load_is_rejected_while_the_table_is_loading(self):
+        release = threading.Event()
+
+        def blocking_ingest(progress):
+            release.wait(5)
+
+        first = submit_ingest_job("jobs_test_conflict", blocking_ingest)
+        with self.assertRaises(IngestJobActiveError) as raised:
+            submit_new_ingest_job("jobs_test_conflict", blocking_ingest)
+        self.assertIs(raised.exception.job, first)
+        release.set()
+        wait_for(first)
+        second = submit_new_ingest_job("jobs_test_conflict", blocking_ingest)
+        self.assertIsNot(second, first)
+        wait_for(second)
+
+    def test_failure_is_kept_until_forgotten(self):
+        def failing_ingest(progress):
+            raise ValueError("bad csv")
+
+        failed = submit_ingest_job("jobs_test_retry", failing_ingest)
+        wait_for(failed)
+        self.assertIs(find_failed_ingest_job("jobs_test_retry"), failed)
+        forget_ingest_jobs("jobs_test_retry")
+        self.assertIsNone(find_failed_ingest_job("jobs_test_retry"))
+        self.assertIsNone(get_ingest_job(failed.id))
+
+        done = submit_ingest_job("jobs_test_retry", lambda progress: None)
+        wait_for(done)
+        self.assertIsNone(find_failed_ingest_job("jobs_test_retry"))
+
+    def test_different_tables_run_concurrently(self):
+        started = threading.Barrier(2, timeout=5)
+
+        def waits_for_other_job(progress):
+            started.wait()
+
+        jobs = [submit_ingest_job(f"jobs_test_concurrent_{i}", waits_for_other_job) for i in range(2)]
+        self.assertEqual([wait_for(job)["status"] for job in jobs], ["done", "done"])
+
+    def test_unknown_job(self):
+        self.assertIsNone(get_ingest_job("missing"))
+
+    def test_use_streaming_ingest(self):
+        self.assertFalse(use_streaming_ingest(10))
+        self.assertTrue(use_streaming_ingest(STREAM_INGEST_MIN_BYTES))
+        self.assertTrue(use_streaming_ingest(10, "stream"))
+        self.assertFalse(use_streaming_ingest(STREAM_INGEST_MIN_BYTES, "memory"))
+
+    def test_failed_swap_keeps_the_previous_dataset(self):
+        from sqlalchemy import text
+        from database_helpers import database_engine, drop_dataset
+        from app.streaming_ingest import stream_ingest_csv
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+
+        table = "streamswaptest"
+
+        def snapshot():
+            with engine.connect() as conn:
+                return [conn.execute(text(query)).fetchall() for query in (
+                    f'SELECT "name" FROM "{table}" ORDER BY "ID"',
+                    f'SELECT row_id, column_id, error_type FROM "errors{table}" ORDER BY 1, 2, 3',
+                    f'SELECT attribute, total_errors FROM "rankings{table}" ORDER BY rank',
+                )]
+
+        try:
+            stream_ingest_csv(io.StringIO("name,price\na,1\nb,\nc,3\n"), table, engine, chunk_size=2)
+            before = snapshot()
+            failing = lambda table_name, rankings: [("SELECT 1 / 0", None)]
+            with mock.patch("app.streaming_ingest.rankings_statements", failing):
+                with self.assertRaises(Exception):
+                    stream_ingest_csv(io.StringIO("name,price\nx,5\n"), table, engine, chunk_size=2)
+            self.assertEqual(snapshot(), before)
+            self.assertEqual(len(before[0]), 3)
+        finally:
+            drop_dataset(engine, table)
+            with engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE IF EXISTS "rankings{table}"'))
+
+if __name__ == '__main__':
+    unittest.main()
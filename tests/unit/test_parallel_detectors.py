@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.service_helpers import run_detectors
+from app.set_id_column import set_id_column
+from detectors.parallel import detect_errors_parallel, share_column, load_column, use_parallel_detectors, \
+    run_column_task, PARALLEL_DETECTOR_MIN_ROWS
+from detectors.vectorized import detect_errors
+
+
+class TestParallelDetectors(unittest.TestCase):
+
+    def assert_same_as_serial(self, data_frame):
+        df_with_id = set_id_column(data_frame)
+        pd.testing.assert_frame_equal(detect_errors_parallel(df_with_id, 2), detect_errors(df_with_id))
+
+    def test_stackoverflow(self):
+        self.assert_same_as_serial(pd.read_csv('../../provided_datasets/stackoverflow_db_uncleaned.csv'))
+
+    def test_complaints(self):
+        self.assert_same_as_serial(pd.read_csv('../../provided_datasets/complaints-2025-04-21_17_31.csv'))
+
+    def test_run_detectors_with_workers(self):
+        df = pd.read_csv('../../provided_datasets/stackoverflow_db_uncleaned.csv')
+        pd.testing.assert_frame_equal(run_detectors(df, workers=2), run_detectors(df, workers=0))
+
+    def test_columns_round_trip_through_shared_memory(self):
+        columns = [
+            pd.Series([1.5, np.nan, 3.0]),
+            pd.Series([True, False, True]),
+            pd.Series(['a', np.nan, 'null'], dtype=object),
+            pd.Series([1, '1', 1.0], dtype=object),
+        ]
+        blocks = []
+        try:
+            for values in columns:
+                rebuilt = load_column(share_column(values, blocks))
+                pd.testing.assert_series_equal(rebuilt, values, check_names=False)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def test_mixed_columns_keep_their_types(self):
+        values = pd.Series([1, '1', 1.0, True, None, 1], dtype=object)
+        blocks = []
+        try:
+            spec = share_column(values, blocks)
+            self.assertEqual(spec["kind"], "codes")
+            rebuilt = load_column(spec)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        self.assertEqual([type(value) for value in rebuilt], [type(value) for value in values])
+        self.assertEqual(list(rebuilt), list(values))
+
+    def test_one_task_per_column(self):
+        values = pd.Series(['7', '7', 'x', None], dtype=object)
+        blocks = []
+        try:
+            position, flagged = run_column_task(1, share_column(values, blocks))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        self.assertEqual(position, 1)
+        self.assertEqual(set(flagged), {"anomaly", "incomplete", "missing", "mismatch"})
+        self.assertEqual(flagged["missing"].tolist(), [3])
+        self.assertEqual(flagged["mismatch"].tolist(), [2])
+
+    def test_small_frames_stay_serial(self):
+        self.assertFalse(use_parallel_detectors(pd.DataFrame({'ID': [1]}), 4))
+        big = pd.DataFrame({'ID': range(PARALLEL_DETECTOR_MIN_ROWS)})
+        self.assertTrue(use_parallel_detectors(big, 4))
+        self.assertFalse(use_parallel_detectors(big, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
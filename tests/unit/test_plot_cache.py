@@ -0,0 +1,88 @@
+import unittest
+
+from app.plot_cache import PlotResponseCache, PLOT_CACHE, bump_table_version, plot_cache_key, table_version, \
+    increment_table_version
+from database_helpers import database_engine
+
+
+class TestPlotCache(unittest.TestCase):
+
+    def setUp(self):
+        PLOT_CACHE.clear()
+
+    def test_hits_and_misses(self):
+        cache = PlotResponseCache(max_entries=4)
+        calls = []
+        compute = lambda: calls.append(1) or {"histograms": []}
+        first = cache.get_or_compute(("games", 0, "1d"), compute)
+        self.assertIs(cache.get_or_compute(("games", 0, "1d"), compute), first)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = PlotResponseCache(max_entries=2)
+        cache.get_or_compute(("t", 0, "a"), lambda: "a")
+        cache.get_or_compute(("t", 0, "b"), lambda: "b")
+        cache.get_or_compute(("t", 0, "a"), lambda: "a")
+        cache.get_or_compute(("t", 0, "c"), lambda: "c")
+        self.assertIn(("t", 0, "a"), cache.entries)
+        self.assertNotIn(("t", 0, "b"), cache.entries)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_failed_computations_are_not_cached(self):
+        cache = PlotResponseCache()
+
+        def fail():
+            raise ValueError("no such column")
+
+        with self.assertRaises(ValueError):
+            cache.get_or_compute(("t", 0, "a"), fail)
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_get_and_put_share_the_entries(self):
+        cache = PlotResponseCache(max_entries=2)
+        self.assertIsNone(cache.get(("t", 0, "a")))
+        cache.put(("t", 0, "a"), "a")
+        self.assertEqual(cache.get(("t", 0, "a")), "a")
+        self.assertEqual(cache.get_or_compute(("t", 0, "a"), lambda: "other"), "a")
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_bumping_the_version_changes_the_key_and_drops_old_entries(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+        key = plot_cache_key("plot_cache_test", table_version("plot_cache_test", engine), "1d", ["Year"], [10], 0, 200)
+        PLOT_CACHE.get_or_compute(key, lambda: "old")
+        PLOT_CACHE.get_or_compute(plot_cache_key("other_table", 0, "1d", ["Year"], [10], 0, 200), lambda: "kept")
+
+        version = bump_table_version("plot_cache_test", engine)
+        self.assertEqual(table_version("plot_cache_test", engine), version)
+        new_key = plot_cache_key("plot_cache_test", table_version("plot_cache_test", engine), "1d", ["Year"], [10], 0, 200)
+        self.assertNotEqual(new_key, key)
+        self.assertNotIn(key, PLOT_CACHE.entries)
+        self.assertEqual(len(PLOT_CACHE.entries), 1)
+        self.assertEqual(PLOT_CACHE.get_or_compute(new_key, lambda: "new"), "new")
+
+
+    def test_version_changes_with_the_transaction_that_bumps_it(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+        version = table_version("plot_cache_test", engine)
+        with self.assertRaises(ZeroDivisionError):
+            with engine.begin() as conn:
+                increment_table_version(conn, "plot_cache_test")
+                1 / 0
+        self.assertEqual(table_version("plot_cache_test", engine), version)
+
+        with engine.begin() as conn:
+            increment_table_version(conn, "plot_cache_test")
+        # the version is read from the database, a second engine (another server process) sees the same one
+        other_process = database_engine()
+        self.assertEqual(table_version("plot_cache_test", other_process), version + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
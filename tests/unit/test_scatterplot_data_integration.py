@@ -2,7 +2,7 @@ import unittest
 import pandas as pd
 
 from data_management.data_scatterplot_integration import sample_scatterplot_data, build_scatterplot_data_entry, \
-    get_errors_for_id
+    get_errors_for_id, build_scatterplot_data_entries
 
 
 class MyTestCase(unittest.TestCase):
@@ -120,6 +120,48 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(entry, expected_entry)
         self.assertEqual(len(entry['errors']), 3)
 
+    def test_seeded_samples_are_reproducible(self):
+        """Test that the same seed gives the same sample."""
+        main_df = pd.DataFrame({'ID': list(range(100)), 'col1': ['A'] * 100, 'col2': list(range(100))})
+        error_df = pd.DataFrame({
+            'row_id': list(range(0, 100, 3)),
+            'column_id': ['col1'] * 34,
+            'error_type': ['anomaly'] * 34
+        })
+
+        first = sample_scatterplot_data(main_df, error_df, 'col1', 'col2', 10, 30, seed=4)
+        self.assertEqual(first, sample_scatterplot_data(main_df, error_df, 'col1', 'col2', 10, 30, seed=4))
+        self.assertEqual(len(first), 30)
+        self.assertEqual(len(set(first)), 30)
+        # error rows first, then the clean rows
+        self.assertTrue(all(row_id % 3 == 0 for row_id in first[:10]))
+        self.assertTrue(all(row_id % 3 != 0 for row_id in first[10:]))
+
+    def test_batch_entries_match_single_entries(self):
+        """Test that the entries built together equal the entries built one at a time."""
+        main_df = pd.DataFrame({
+            'ID': [4, 5, 6, 7],
+            'Continent': ['EU', None, 'AS', 'OC'],
+            'ConvertedSalary': [75000, 45000, float('nan'), 85000]
+        })
+        error_df = pd.DataFrame({
+            'row_id': [6, 4, 6, 7],
+            'column_id': ['Continent', 'Continent', 'ConvertedSalary', 'Gender'],
+            'error_type': ['mismatch', 'anomaly', 'missing', 'incomplete']
+        })
+        sampled_ids = [6, 4, 5, 7]
+
+        entries = build_scatterplot_data_entries(
+            main_df, error_df, sampled_ids, 'Continent', 'ConvertedSalary', 'categorical', 'numeric'
+        )
+
+        self.assertEqual(entries, [
+            build_scatterplot_data_entry(main_df, error_df, row_id, 'Continent', 'ConvertedSalary', 'categorical', 'numeric')
+            for row_id in sampled_ids
+        ])
+        self.assertEqual(entries[0]['errors'], ['mismatch', 'missing'])
+        self.assertEqual(entries[0]['y'], 'null')
+
 
 if __name__ == '__main__':
     unittest.main()
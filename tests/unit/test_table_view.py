@@ -0,0 +1,80 @@
+import unittest
+
+import pandas as pd
+
+from app.table_view import table_view_page, table_view_query
+from database_helpers import database_engine, drop_dataset, load_dataset
+
+
+class TestTableView(unittest.TestCase):
+
+    def test_pages_seek_on_the_id(self):
+        query = table_view_query("games", ["ID", "Name"], "after")
+        self.assertIn('SELECT t."ID", t."Name"', query)
+        self.assertIn('WHERE t."ID" > :after_id', query)
+        self.assertIn('ORDER BY t."ID" ASC', query)
+        self.assertNotIn("OFFSET", query)
+
+    def test_scrolling_back_reads_the_key_backwards(self):
+        query = table_view_query("games", ["ID"], "before")
+        self.assertIn('WHERE t."ID" < :before_id', query)
+        self.assertIn('ORDER BY t."ID" DESC', query)
+        # the page is still returned in ID order
+        self.assertIn('json_agg(row_to_json(p) ORDER BY p."ID")', query)
+
+    def test_pages_walk_the_table_like_pandas(self):
+        engine = database_engine()
+        if engine is None:
+            self.skipTest("needs a PostgreSQL database at DATABASE_URL")
+        from app.column_stats import refresh_column_stats
+
+        table = "tableviewtest"
+        # IDs with gaps, 12 rows: three full pages of 4
+        ids = [1, 2, 4, 5, 6, 9, 10, 11, 15, 16, 20, 21]
+        frame = pd.DataFrame({"ID": ids, "Name": [f"row{i}" for i in ids], "Score": [i * 1.5 for i in ids]})
+        errors = pd.DataFrame({"row_id": [4, 4, 11, 16, 21], "column_id": ["Name", "Score", "Score", "Name", "Score"],
+                               "error_type": ["missing", "anomaly", "anomaly", "incomplete", "anomaly"]})
+        load_dataset(engine, table, frame, errors)
+        try:
+            refresh_column_stats(table, engine)
+            forward, page = [], table_view_page(table, engine, limit=4)
+            self.assertIsNone(page["previous_before_id"])
+            while True:
+                forward.append(page)
+                if page["next_after_id"] is None:
+                    break
+                page = table_view_page(table, engine, after_id=page["next_after_id"], limit=4)
+
+            backward = [table_view_page(table, engine, before_id=forward[-1]["rows"][0]["ID"], limit=4)]
+            while backward[-1]["previous_before_id"] is not None:
+                backward.append(table_view_page(table, engine, before_id=backward[-1]["previous_before_id"], limit=4))
+
+            scores_only = table_view_page(table, engine, limit=2, columns=["Score"], errors_only=True)
+        finally:
+            drop_dataset(engine, table)
+
+        expected = [frame.iloc[start:start + 4] for start in range(0, len(frame), 4)]
+        self.assertEqual([[row["ID"] for row in page["rows"]] for page in forward],
+                         [list(rows["ID"]) for rows in expected])
+        self.assertEqual(forward[0]["rows"][0], {"ID": 1, "Name": "row1", "Score": 1.5})
+        self.assertEqual(forward[0]["total_rows"], len(frame))
+        # the last page is exactly full, it still knows there is no next one
+        self.assertIsNone(forward[-1]["next_after_id"])
+        self.assertEqual(forward[-1]["previous_before_id"], 15)
+        self.assertEqual(forward[0]["errors"], {"Name": {"4": ["missing"]}, "Score": {"4": ["anomaly"]}})
+
+        self.assertEqual([[row["ID"] for row in page["rows"]] for page in backward],
+                         [list(rows["ID"]) for rows in expected[-2::-1]])
+        self.assertIsNone(backward[-1]["previous_before_id"])
+        self.assertEqual(backward[0]["next_after_id"], 11)
+
+        with_errors = frame[frame["ID"].isin(errors.loc[errors["column_id"] == "Score", "row_id"])]
+        self.assertEqual(scores_only["columns"], ["ID", "Score"])
+        self.assertEqual([row["ID"] for row in scores_only["rows"]], list(with_errors["ID"][:2]))
+        self.assertEqual(scores_only["next_after_id"], 11)
+        self.assertEqual(scores_only["errors"], {"Score": {"4": ["anomaly"], "11": ["anomaly"]}})
+        self.assertIsNone(scores_only["total_rows"])
+
+
+if __name__ == '__main__':
+    unittest.main()
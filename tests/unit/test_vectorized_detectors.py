@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.service_helpers import run_detectors, perform_melt
+from app.set_id_column import set_id_column
+from detectors.anomaly import anomaly
+from detectors.datatype_mismatch import datatype_mismatch
+from detectors.incomplete import incomplete
+from detectors.missing_value import missing_value
+from detectors.vectorized import mismatch_mask, incomplete_mask, anomaly_mask, missing_mask
+
+
+def run_dictionary_detectors(data_frame):
+    df_with_id = set_id_column(data_frame)
+    frames = [pd.DataFrame(detector(df_with_id.copy())).rename_axis("ID", axis="index").reset_index()
+              for detector in (anomaly, incomplete, missing_value, datatype_mismatch)]
+    return perform_melt(frames)
+
+
+class TestVectorizedDetectors(unittest.TestCase):
+
+    def assert_same_as_dictionary_detectors(self, data_frame):
+        pd.testing.assert_frame_equal(run_detectors(data_frame), run_dictionary_detectors(data_frame))
+
+    def test_stackoverflow(self):
+        self.assert_same_as_dictionary_detectors(pd.read_csv('../../provided_datasets/stackoverflow_db_uncleaned.csv'))
+
+    def test_complaints(self):
+        self.assert_same_as_dictionary_detectors(pd.read_csv('../../provided_datasets/complaints-2025-04-21_17_31.csv'))
+
+    def test_games(self):
+        self.assert_same_as_dictionary_detectors(pd.read_csv('../../provided_datasets/games.csv'))
+
+    def test_row_order_follows_first_flagged_column(self):
+        df = pd.DataFrame({
+            'ID': [5, 3, 9, 1, 2, 4, 6, 7, 8, 10, 11, 12],
+            'a': ['1', 'x', 'y', '2', '3', 'null', None, 'z', 'z', 'z', '4', '5'],
+            'b': [True] * 11 + [False],
+            'c': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 500.0],
+            'd': [None, 'q', 'q', 'q', 'undefined', 'q', 'q', 'q', 'q', 'q', 'q', 'q'],
+            'Unnamed: 0': [None] * 12,
+        })
+        self.assert_same_as_dictionary_detectors(df)
+
+    def test_mismatch_prefers_majority_type(self):
+        values = pd.Series(['1', '2', '3', 'abc', None], dtype=object)
+        self.assertEqual(mismatch_mask(values).tolist(), [False, False, False, True, False])
+        self.assertIsNone(mismatch_mask(pd.Series([1.0, 2.0, np.nan])))
+
+    def test_incomplete_skips_numeric_columns(self):
+        self.assertIsNone(incomplete_mask(pd.Series([str(i) for i in range(20)], dtype=object)))
+        self.assertEqual(incomplete_mask(pd.Series(['a', 'a', 'a', 'b', None], dtype=object)).tolist(),
+                         [False, False, False, True, False])
+
+    def test_anomaly_needs_ten_numbers(self):
+        self.assertIsNone(anomaly_mask(pd.Series(range(9))))
+        values = pd.Series([1] * 10 + [100])
+        self.assertEqual(np.flatnonzero(anomaly_mask(values)).tolist(), [10])
+
+    def test_missing_strings(self):
+        values = pd.Series(['null', 'undefined', None, 'ok'], dtype=object)
+        self.assertEqual(missing_mask(values).tolist(), [True, True, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()